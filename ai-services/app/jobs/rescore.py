@@ -0,0 +1,510 @@
+"""
+Nightly Rescoring
+=================
+Rescores a full HCP snapshot offline and writes COPY-ready output.
+
+Usage:
+    python -m app.jobs.rescore \\
+        --input hcp_snapshot.parquet \\
+        --output rescore-2026-10-18
+
+Input: one HCPScoringInput per row, as CSV, Parquet or NDJSON. Columns use
+the API field names (hcpId, influenceLevel, ...) or their snake_case forms
+(hcp_id, influence_level, ...). In CSV, list fields (channelHistory,
+consentStatus, segments, ...) are JSON-encoded cells; Parquet may use native
+list/struct columns or JSON strings.
+
+Output directory:
+    ai_scores.tsv     rows for the ai_scores table
+    audit_log.tsv     one ai_decision audit row per score
+    load.sql          psql \\copy commands for both files
+    rejects.ndjson    {"row", "hcpId", "error"} for rows that fail validation
+    checkpoint.json   progress marker
+
+Score files use PostgreSQL's default COPY text format (tab-separated, \\N for
+NULL, no header), which needs no quoting of the JSON columns:
+
+    psql "$DATABASE_URL" -f rescore-2026-10-18/load.sql
+
+The snapshot is read in chunks of --chunk-rows. Each chunk is split across
+worker processes, scored, and appended to the output files. After every chunk
+the files are fsynced and the checkpoint records the rows done and the
+output file sizes. A rerun with the same arguments resumes after the last
+completed chunk: output files are truncated back to the checkpointed sizes,
+so a chunk that was half-written when the job died is written exactly once.
+A checkpoint from a different input or model version is refused unless
+--restart is given.
+
+--model-version selects the version of every score type; a version that
+exists for one score type only (e.g. a trained propensity artifact) goes in
+--engagement-version or --propensity-version instead. An unknown version is
+reported as a usage error before the snapshot is read.
+
+With --changed-only, a score is written only when it moved by more than
+--epsilon versus the row's previousScores (app.services.score_changes), so a
+nightly run emits rows just for HCPs whose scores changed.
+"""
+
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, Optional
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+import time
+
+import pyarrow.parquet as pq
+from pydantic import ValidationError
+
+from app.schemas.scoring import HCPScoringInput
+from app.services.executor import BatchExecutor
+from app.services.factor_registry import registry
+from app.services.input_hash import request_payload
+from app.services.ndjson import first_validation_error
+from app.services.score_changes import DEFAULT_EPSILON, has_changed, previous_score
+from app.services.scoring_engine import (
+    ENGAGEMENT,
+    PROPENSITY,
+    compute_engagement_scores_batch,
+    propensity_scorer,
+    score_propensity_batch,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_ROWS = 20_000
+SCORE_TYPES = (ENGAGEMENT, PROPENSITY)
+
+AI_SCORES_FILE = "ai_scores.tsv"
+AUDIT_LOG_FILE = "audit_log.tsv"
+LOAD_FILE = "load.sql"
+REJECTS_FILE = "rejects.ndjson"
+CHECKPOINT_FILE = "checkpoint.json"
+
+AI_SCORES_COLUMNS = (
+    "hcp_id", "score_type", "score", "confidence", "factors", "model_version",
+    "input_data_hash", "computed_at",
+)
+AUDIT_LOG_COLUMNS = (
+    "user_id", "action", "entity_type", "entity_id", "new_state", "metadata",
+    "ip_address", "user_agent",
+)
+TABLES = {
+    "ai_scores": (AI_SCORES_FILE, AI_SCORES_COLUMNS),
+    "audit_log": (AUDIT_LOG_FILE, AUDIT_LOG_COLUMNS),
+}
+OUTPUT_FILES = (AI_SCORES_FILE, AUDIT_LOG_FILE, REJECTS_FILE)
+
+# Fields that arrive JSON-encoded in flat snapshot formats
+STRUCTURED_FIELDS = {
+    "therapeuticAreas", "channelHistory", "channelColumns", "consentStatus",
+    "previousScores", "segments",
+}
+_FIELD_NAMES = {
+    re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower(): name
+    for name in HCPScoringInput.model_fields
+}
+
+
+# ─── Snapshot readers ──────────────────────────────────────────
+
+def read_snapshot(path: Path, chunk_rows: int, start_row: int = 0) -> Iterator[list[dict]]:
+    """Yield raw snapshot rows in chunks, skipping the first start_row rows."""
+    path = Path(path)
+    if path.suffix in (".parquet", ".pq"):
+        rows = _parquet_rows(path, start_row)
+    elif path.suffix in (".ndjson", ".jsonl"):
+        rows = islice(_ndjson_rows(path), start_row, None)
+    else:
+        rows = islice(_csv_rows(path), start_row, None)
+
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _csv_rows(path: Path) -> Iterator[dict]:
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            yield {key: value if value != "" else None for key, value in row.items()}
+
+
+def _ndjson_rows(path: Path) -> Iterator[dict]:
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _parquet_rows(path: Path, start_row: int) -> Iterator[dict]:
+    seen = 0
+    for batch in pq.ParquetFile(path).iter_batches():
+        if seen + batch.num_rows <= start_row:
+            seen += batch.num_rows
+            continue
+        rows = batch.to_pylist()
+        yield from rows[max(0, start_row - seen):]
+        seen += batch.num_rows
+
+
+def prepare_record(row: dict) -> dict:
+    """
+    Normalize a snapshot row into an HCPScoringInput payload.
+
+    Raises ValidationError (or ValueError for a malformed JSON cell).
+    """
+    record = {}
+    for key, value in row.items():
+        name = _FIELD_NAMES.get(key, key)
+        if value is None:
+            continue
+        if name in STRUCTURED_FIELDS and isinstance(value, str):
+            value = json.loads(value)
+        record[name] = value
+    return request_payload(HCPScoringInput.model_validate(record))
+
+
+# ─── Scoring and output rows ──────────────────────────────────
+#
+# render_rows() runs inside the worker processes: validation, scoring, hashing
+# and CSV encoding all happen there, so the parent only concatenates text.
+
+def render_rows(
+    rows: list[tuple[int, dict]],
+    scorers: list[tuple],
+    changed_epsilon: Optional[float] = None,
+) -> list[tuple[str, str, str, int]]:
+    """
+    Validate and score (row number, snapshot row) pairs with every
+    (score_many, model argument) scorer. Returns, per row, its text for
+    ai_scores and audit_log, its rejects line (empty strings when unused)
+    and the number of scores skipped as unchanged.
+
+    With changed_epsilon set, scores that did not move versus the row's
+    previousScores (see app.services.score_changes) are not written.
+    """
+    records, rendered = [], []
+    for row_no, row in rows:
+        try:
+            records.append(prepare_record(row))
+            rendered.append(None)
+        except ValidationError as e:
+            rendered.append(("", "", _reject_line(row_no, row, first_validation_error(e)), 0))
+        except ValueError as e:
+            rendered.append(("", "", _reject_line(row_no, row, f"invalid JSON cell: {e}"), 0))
+
+    results = [score_many(records, model_arg) for score_many, model_arg in scorers]
+
+    encoded = []
+    for i, record in enumerate(records):
+        score_lines, audit_lines = [], []
+        for per_type in results:
+            result = per_type[i]
+            if changed_epsilon is not None and not has_changed(
+                result, previous_score(record, result["scoreType"]), changed_epsilon
+            ):
+                continue
+            score_row, audit_row = output_rows(result)
+            score_lines.append(copy_line(score_row))
+            audit_lines.append(copy_line(audit_row))
+        encoded.append(
+            ("".join(score_lines), "".join(audit_lines), "", len(results) - len(score_lines))
+        )
+
+    encoded_iter = iter(encoded)
+    return [entry if entry is not None else next(encoded_iter) for entry in rendered]
+
+
+def output_rows(result: dict) -> tuple[list, list]:
+    """(ai_scores row, audit_log row) for one scoring result."""
+    factors = json.dumps(result["factors"], separators=(",", ":"))
+    score_row = [
+        result["hcpId"],
+        result["scoreType"],
+        result["score"],
+        result["confidence"],
+        factors,
+        result["modelVersion"],
+        result["inputDataHash"],
+        _timestamptz(result["computedAt"]),
+    ]
+    audit_row = [
+        None,  # system action
+        "ai_decision",
+        "ai_score",
+        result["hcpId"],
+        json.dumps({
+            "scoreType": result["scoreType"],
+            "score": result["score"],
+            "confidence": result["confidence"],
+            "modelVersion": result["modelVersion"],
+        }, separators=(",", ":")),
+        f'{{"factors":{factors},"job":"rescore"}}',
+        "system",
+        "ai-services-rescore",
+    ]
+    return score_row, audit_row
+
+
+def _timestamptz(value: str) -> str:
+    """
+    An API timestamp (naive UTC) with an explicit +00:00 offset, so COPY into
+    a timestamptz column does not read it in the database session's zone.
+    """
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.isoformat()
+
+
+def copy_line(values: list) -> str:
+    """One row in COPY text format."""
+    return "\t".join([_copy_field(value) for value in values]) + "\n"
+
+
+def _copy_field(value) -> str:
+    if value is None:
+        return "\\N"
+    text = str(value)
+    if "\\" in text:
+        text = text.replace("\\", "\\\\")
+    if "\t" in text or "\n" in text or "\r" in text:
+        text = text.replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return text
+
+
+def _reject_line(row_no: int, row: dict, error: str) -> str:
+    hcp_id = row.get("hcpId", row.get("hcp_id"))
+    return json.dumps({"row": row_no, "hcpId": hcp_id, "error": error}, default=str) + "\n"
+
+
+# ─── Checkpoint ────────────────────────────────────────────────
+
+def load_checkpoint(output_dir: Path) -> Optional[dict]:
+    path = Path(output_dir) / CHECKPOINT_FILE
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(output_dir: Path, checkpoint: dict) -> None:
+    """Atomically replace the checkpoint (write, fsync, rename)."""
+    path = Path(output_dir) / CHECKPOINT_FILE
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _fingerprint(
+    input_path: Path, score_types: tuple[str, ...], versions: dict, changed_epsilon: Optional[float]
+) -> dict:
+    stat = input_path.stat()
+    return {
+        "input": str(input_path.resolve()),
+        "inputBytes": stat.st_size,
+        "inputModified": stat.st_mtime_ns,
+        "scoreTypes": list(score_types),
+        "modelVersions": versions,
+        "changedOnlyEpsilon": changed_epsilon,
+    }
+
+
+def _write_load_script(output_dir: Path) -> None:
+    lines = []
+    for table, (name, columns) in TABLES.items():
+        path = str((output_dir / name).resolve()).replace("'", "''")
+        lines.append(f"\\copy {table} ({', '.join(columns)}) FROM '{path}'\n")
+    (output_dir / LOAD_FILE).write_text("".join(lines))
+
+
+def _open_outputs(output_dir: Path, offsets: Optional[dict]) -> dict:
+    """Open output files for appending, truncated to offsets (or new)."""
+    files = {}
+    for name in OUTPUT_FILES:
+        path = output_dir / name
+        if offsets is None:
+            f = open(path, "w", newline="", encoding="utf-8")
+        else:
+            with open(path, "r+b") as raw:
+                raw.truncate(offsets[name])
+            f = open(path, "a", newline="", encoding="utf-8")
+        files[name] = f
+    return files
+
+
+def _sync(files: dict) -> dict:
+    offsets = {}
+    for name, f in files.items():
+        f.flush()
+        os.fsync(f.fileno())
+        offsets[name] = f.tell()
+    return offsets
+
+
+# ─── Job ───────────────────────────────────────────────────────
+
+def run(
+    input_path: Path,
+    output_dir: Path,
+    score_types: tuple[str, ...] = SCORE_TYPES,
+    model_version: Optional[str] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    workers: Optional[int] = None,
+    restart: bool = False,
+    changed_only: bool = False,
+    epsilon: float = DEFAULT_EPSILON,
+    engagement_version: Optional[str] = None,
+    propensity_version: Optional[str] = None,
+) -> dict:
+    """
+    Score the snapshot (resuming a previous run if possible) and return a
+    summary. With changed_only, scores that did not move by more than
+    epsilon versus previousScores are counted but not written.
+
+    Each score type uses its own version when given, else `model_version`,
+    else its default; an unknown version raises KeyError.
+    """
+    started = time.monotonic()
+    input_path, output_dir = Path(input_path), Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    scorers = {}
+    if ENGAGEMENT in score_types:
+        model = registry.get(ENGAGEMENT, engagement_version or model_version)
+        scorers[ENGAGEMENT] = (model.version, compute_engagement_scores_batch, model)
+    if PROPENSITY in score_types:
+        version, _ = propensity_scorer(propensity_version or model_version)
+        scorers[PROPENSITY] = (version, score_propensity_batch, version)
+    changed_epsilon = epsilon if changed_only else None
+    fingerprint = _fingerprint(
+        input_path,
+        tuple(scorers),
+        {score_type: s[0] for score_type, s in scorers.items()},
+        changed_epsilon,
+    )
+
+    checkpoint = None if restart else load_checkpoint(output_dir)
+    if checkpoint is not None and checkpoint["job"] != fingerprint:
+        raise ValueError(
+            f"{output_dir} holds a checkpoint for a different input or model version; "
+            "use --restart to discard it"
+        )
+    if checkpoint is None:
+        checkpoint = {"job": fingerprint, "rowsDone": 0, "scored": 0, "rejected": 0,
+                      "unchanged": 0, "offsets": None, "complete": False}
+    resumed_from = checkpoint["rowsDone"]
+
+    if not checkpoint["complete"]:
+        executor = BatchExecutor(processes=workers, process_threshold=1)
+        files = _open_outputs(output_dir, checkpoint["offsets"])
+        _write_load_script(output_dir)
+        try:
+            _score_chunks(
+                input_path, chunk_rows, scorers, changed_epsilon, executor, files, output_dir,
+                checkpoint,
+            )
+        finally:
+            for f in files.values():
+                f.close()
+            executor.shutdown()
+
+    return {
+        "input": str(input_path),
+        "output": str(output_dir),
+        "rows": checkpoint["rowsDone"],
+        "scored": checkpoint["scored"],
+        "rejected": checkpoint["rejected"],
+        "unchanged": checkpoint["unchanged"],
+        "resumedFromRow": resumed_from,
+        "modelVersions": fingerprint["modelVersions"],
+        "elapsedSeconds": round(time.monotonic() - started, 1),
+    }
+
+
+def _score_chunks(
+    input_path: Path,
+    chunk_rows: int,
+    scorers: dict,
+    changed_epsilon: Optional[float],
+    executor: BatchExecutor,
+    files: dict,
+    output_dir: Path,
+    checkpoint: dict,
+) -> None:
+    scorer_args = [(score_many, model_arg) for _, score_many, model_arg in scorers.values()]
+    for chunk in read_snapshot(input_path, chunk_rows, checkpoint["rowsDone"]):
+        rows = list(enumerate(chunk, start=checkpoint["rowsDone"] + 1))
+        rendered = executor.map_batch(render_rows, rows, scorer_args, changed_epsilon)
+        scores, audit, rejects, unchanged = zip(*rendered)
+        files[AI_SCORES_FILE].write("".join(scores))
+        files[AUDIT_LOG_FILE].write("".join(audit))
+        files[REJECTS_FILE].write("".join(rejects))
+        rejected = sum(1 for line in rejects if line)
+
+        checkpoint["rowsDone"] += len(chunk)
+        checkpoint["scored"] += len(chunk) - rejected
+        checkpoint["rejected"] += rejected
+        checkpoint["unchanged"] += sum(unchanged)
+        checkpoint["offsets"] = _sync(files)
+        save_checkpoint(output_dir, checkpoint)
+        logger.info("Rescored %d rows (%d rejected)", checkpoint["rowsDone"], checkpoint["rejected"])
+
+    checkpoint["complete"] = True
+    save_checkpoint(output_dir, checkpoint)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Rescore an HCP snapshot for bulk loading")
+    parser.add_argument("--input", type=Path, required=True,
+                        help="HCP snapshot (CSV, Parquet or NDJSON)")
+    parser.add_argument("--output", type=Path, required=True, help="output directory")
+    parser.add_argument("--score-type", choices=[*SCORE_TYPES, "all"], default="all")
+    parser.add_argument("--model-version", default=None,
+                        help="version for every score type without its own option below")
+    parser.add_argument("--engagement-version", default=None,
+                        help="factor model version for engagement scores")
+    parser.add_argument("--propensity-version", default=None,
+                        help="trained artifact or factor model version for propensity scores")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: CPU count; 0 scores in-process)")
+    parser.add_argument("--restart", action="store_true",
+                        help="discard an existing checkpoint and start over")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="skip scores unchanged versus the snapshot's previousScores")
+    parser.add_argument("--epsilon", type=float, default=DEFAULT_EPSILON,
+                        help="score points a score must move to count as changed")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        summary = run(
+            args.input,
+            args.output,
+            score_types=SCORE_TYPES if args.score_type == "all" else (args.score_type,),
+            model_version=args.model_version,
+            chunk_rows=args.chunk_rows,
+            workers=args.workers,
+            restart=args.restart,
+            changed_only=args.changed_only,
+            epsilon=args.epsilon,
+            engagement_version=args.engagement_version,
+            propensity_version=args.propensity_version,
+        )
+    except KeyError as e:
+        parser.error(str(e.args[0]))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
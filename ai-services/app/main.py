@@ -18,20 +18,62 @@ AI Boundaries (ENFORCED):
 5. Commercial content separated from medical content
 """
 
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+
 from fastapi import FastAPI, Depends, HTTPException, Security
 from fastapi.security import APIKeyHeader
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
 
-from app.routers import scoring, nba, summaries, copilot, segmentation
+from app.routers import scoring, nba, summaries, copilot, segmentation, insights, explanations
+from app.services.executor import executor
+from app.services.nba_engine import channel_bandit
+from app.services.percentiles import percentile_index
+from app.services.propensity_model import propensity_models
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and warm trained models before accepting traffic
+    propensity_models.load()
+    percentile_index.load_snapshots()
+    channel_bandit.load_snapshots()
+    merging = [
+        asyncio.create_task(_snapshot_periodically(store))
+        for store in (percentile_index, channel_bandit)
+    ]
+    yield
+    for task in merging:
+        task.cancel()
+    percentile_index.snapshot()
+    channel_bandit.snapshot()
+    executor.shutdown()
+
+
+async def _snapshot_periodically(store):
+    """Save this worker's state and merge the other workers' every snapshot_seconds."""
+    if store.directory is None:
+        return
+    while True:
+        await asyncio.sleep(store.snapshot_seconds)
+        try:
+            await executor.run(store.snapshot)
+        except OSError as e:
+            logger.warning("Snapshot failed: %s", e)
+
+
 app = FastAPI(
     title="PharmaCRM AI Services",
     version="1.0.0",
     description="AI intelligence layer for pharma CRM platform",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -88,6 +130,20 @@ app.include_router(
     dependencies=[Depends(verify_api_key)],
 )
 
+app.include_router(
+    insights.router,
+    prefix="/api/v1/insights",
+    tags=["Insights"],
+    dependencies=[Depends(verify_api_key)],
+)
+
+app.include_router(
+    explanations.router,
+    prefix="/api/v1/explanations",
+    tags=["Explanations"],
+    dependencies=[Depends(verify_api_key)],
+)
+
 
 @app.get("/health")
 async def health():
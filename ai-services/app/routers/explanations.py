@@ -0,0 +1,25 @@
+import json
+
+from fastapi import APIRouter, Request, Response
+from app.services.explanations import CATALOG_VERSION, catalog
+
+router = APIRouter()
+
+# The catalog only changes with a deploy: serialize it once
+_CATALOG_BODY = json.dumps(catalog())
+_ETAG = f'"{CATALOG_VERSION}"'
+_CACHE_HEADERS = {"ETag": _ETAG, "Cache-Control": "public, max-age=86400"}
+
+
+@router.get("/templates")
+async def explanation_templates(request: Request):
+    """
+    Template catalog for rendering `explain=codes` responses.
+
+    Returns {"version", "templates": {templateId: text}}; render a code with
+    `templates[template].format(*args)` (Python format syntax). Responses
+    carry an ETag and may be cached; If-None-Match returns 304.
+    """
+    if request.headers.get("if-none-match") == _ETAG:
+        return Response(status_code=304, headers=_CACHE_HEADERS)
+    return Response(_CATALOG_BODY, media_type="application/json", headers=_CACHE_HEADERS)
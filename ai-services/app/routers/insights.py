@@ -0,0 +1,109 @@
+from typing import Callable, Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.schemas.scoring import (
+    HCPInsightInput,
+    HCPInsightResult,
+    HCPScoringInput,
+    SummaryInput,
+)
+from app.services.consent import consent_masks
+from app.services.executor import executor
+from app.services.factor_registry import CompiledScoreModel, registry
+from app.services.hcp_features import extract_hcp_features
+from app.services.input_hash import RequestPayload, request_payload
+from app.services.nba_engine import compute_next_best_action
+from app.services.percentiles import percentile_index
+from app.services.score_cache import score_cache
+from app.services.scoring_engine import (
+    ENGAGEMENT,
+    PROPENSITY,
+    compute_engagement_score,
+    engagement_inputs,
+    is_default_version,
+    propensity_cache_version,
+    propensity_inputs,
+    propensity_scorer,
+)
+from app.services.summary_engine import generate_account_summary
+from app.services.timestamps import utc_today_iso
+
+router = APIRouter()
+
+
+@router.post("/hcp", response_model=HCPInsightResult, response_model_exclude_unset=True)
+async def hcp_insights(data: HCPInsightInput, model_version: Optional[str] = None):
+    """
+    Compute every profile-page insight for an HCP in a single pass.
+
+    The payload is validated once, channel history is walked once into a
+    shared feature record and consents are resolved once into consent masks;
+    these feed engagement scoring, prescription propensity, Next Best Action
+    and the account summary. Each section is
+    identical to what its dedicated endpoint returns for the same data.
+    `model_version` selects the scoring model version, as on /scoring.
+    """
+    try:
+        engagement_model = registry.get(ENGAGEMENT, model_version)
+        propensity_version, score_propensity = propensity_scorer(model_version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+    return await executor.run(
+        _compute_insights, request_payload(data), engagement_model, propensity_version, score_propensity
+    )
+
+
+def _compute_insights(
+    payload: dict,
+    engagement_model: CompiledScoreModel,
+    propensity_version: str,
+    score_propensity: Callable[[list[dict]], list[dict]],
+) -> dict:
+    """Synchronous body of /hcp, run on the executor's thread pool."""
+    features = extract_hcp_features(payload)
+    consents = consent_masks([payload.get("consentStatus", [])])
+    scoring_payload = _subset(payload, HCPScoringInput)
+
+    engagement = score_cache.get_or_compute(
+        ENGAGEMENT,
+        engagement_model.cache_version,
+        scoring_payload,
+        lambda p: compute_engagement_score(p, features, engagement_model, consents=consents),
+        as_of=utc_today_iso(),
+        inputs=engagement_inputs,
+    )
+    propensity = score_cache.get_or_compute(
+        PROPENSITY,
+        propensity_cache_version(propensity_version),
+        scoring_payload,
+        lambda p: score_propensity([p])[0],
+        inputs=propensity_inputs,
+    )
+    percentile_index.annotate(
+        ENGAGEMENT, [scoring_payload], [engagement],
+        is_default_version(ENGAGEMENT, engagement_model.version),
+    )
+    percentile_index.annotate(
+        PROPENSITY, [scoring_payload], [propensity],
+        is_default_version(PROPENSITY, propensity_version),
+    )
+
+    return {
+        "hcpId": payload["hcpId"],
+        "engagement": engagement,
+        "propensity": propensity,
+        "nextBestAction": compute_next_best_action(payload, consents=consents),
+        "summary": generate_account_summary(_subset(payload, SummaryInput), features),
+    }
+
+
+def _subset(payload: dict, model: type[BaseModel]) -> dict:
+    """Restrict a payload to the fields of a narrower input model."""
+    subset = {name: payload[name] for name in model.model_fields if name in payload}
+    if type(payload) is RequestPayload:
+        sent = payload.sent
+        return RequestPayload(subset, {name: sent[name] for name in subset if name in sent})
+    return subset
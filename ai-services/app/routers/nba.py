@@ -1,12 +1,42 @@
-from fastapi import APIRouter
-from app.schemas.scoring import NBAInput, NBAResult
-from app.services.nba_engine import compute_next_best_action
+from fastapi import APIRouter, Query, Request
+from pydantic import ValidationError
+
+from app.schemas.scoring import (
+    NBABatchInput,
+    NBABatchResult,
+    NBAFeedbackEvent,
+    NBAFeedbackInput,
+    NBAFeedbackResult,
+    NBAInput,
+    NBAPlanInput,
+    NBAPlanResult,
+    NBAResult,
+)
+from app.services.executor import executor
+from app.services.explanations import EXPLAIN_FULL, ExplainMode
+from app.services.input_hash import request_payload
+from app.services.nba_engine import (
+    compute_next_best_action,
+    compute_next_best_actions_batch,
+    plan_next_best_actions,
+    record_feedback,
+)
+from app.services.ndjson import NDJSON_MEDIA_TYPE, STREAM_CHUNK_SIZE, aiter_lines
 
 router = APIRouter()
 
+EXPLAIN = Query(EXPLAIN_FULL, description="full, codes or none")
+EXPLORE = Query(
+    False, description="Thompson-sample channel priorities instead of using posterior means"
+)
+
 
-@router.post("/recommend", response_model=NBAResult)
-async def recommend_next_action(data: NBAInput):
+@router.post("/recommend", response_model=NBAResult, response_model_exclude_unset=True)
+async def recommend_next_action(
+    data: NBAInput,
+    explain: ExplainMode = EXPLAIN,
+    explore: bool = EXPLORE,
+):
     """
     Generate a Next Best Action recommendation for an HCP.
 
@@ -17,7 +47,119 @@ async def recommend_next_action(data: NBAInput):
     - Content suggestions (commercial only, no medical claims)
 
     Returns recommendation with full reasoning and factor breakdown.
+    `explain=codes` returns `reasoningCodes` and factor templates instead
+    of text; `explain=none` omits them. Channel priorities are learned
+    from /feedback per specialty and influence level; `explore=true` samples
+    them so that less proven channels are tried now and then.
     The user (field rep / manager) makes the final decision.
     """
-    result = compute_next_best_action(data.model_dump())
-    return result
+    return await executor.run(
+        compute_next_best_action, request_payload(data), explain, explore=explore
+    )
+
+
+@router.post(
+    "/recommend/batch", response_model=NBABatchResult, response_model_exclude_unset=True
+)
+async def recommend_next_actions_batch(
+    data: NBABatchInput, explain: ExplainMode = EXPLAIN, explore: bool = EXPLORE
+):
+    """
+    Next Best Action recommendations for a list of HCPs of one rep, e.g. the
+    rep's morning list, in one call.
+
+    The rep context (userId, pendingTasks, recentUserInteractions) is sent
+    once. Consent parsing and channel scoring run over the whole list at
+    once, and the rep's scheduled interactions are indexed once so every
+    HCP's timing skips booked slots. Results are returned in request order
+    and each equals /recommend for that HCP with the same context.
+    """
+    return {
+        "results": await executor.run(
+            compute_next_best_actions_batch,
+            [request_payload(h) for h in data.hcps],
+            request_payload(data.context),
+            explain,
+            explore,
+        )
+    }
+
+
+@router.post("/plan", response_model=NBAPlanResult)
+async def plan_next_actions(data: NBAPlanInput):
+    """
+    Plan one action per HCP across a rep's whole book, e.g. a day of
+    8 visits and 20 calls: {"capacities": {"in_person_visit": 8, "phone": 20}}.
+
+    Per-HCP recommendations ignore each other and collide on scarce
+    channels. The plan is solved globally instead: it maximizes the total
+    expected value of the book subject to consent and channel capacities,
+    so a visit goes where it adds most over the HCP's next best channel.
+    HCPs left without a channel come back as "none"; `preferredChannel` is
+    what /recommend would suggest on its own.
+    """
+    return await executor.run(
+        plan_next_best_actions,
+        [request_payload(h) for h in data.hcps],
+        request_payload(data.context),
+        data.capacities,
+    )
+
+
+@router.post("/feedback", response_model=NBAFeedbackResult, response_model_exclude_unset=True)
+async def ingest_feedback(data: NBAFeedbackInput):
+    """
+    Feed what reps did with recommendations back into channel priorities.
+
+    Each accepted or rejected recommendation updates a Beta-Bernoulli arm
+    for its channel and the HCP's (specialty, influenceLevel); later
+    recommendations for that context use the learned priorities. Pending
+    and expired outcomes and unconsentable channels are counted as
+    `ignored`. Updates are merged across workers through snapshots.
+    """
+    return await executor.run(record_feedback, [e.model_dump() for e in data.events])
+
+
+@router.post(
+    "/feedback/stream",
+    response_model=NBAFeedbackResult,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                NDJSON_MEDIA_TYPE: {"schema": NBAFeedbackEvent.model_json_schema()}
+            },
+            "required": True,
+        }
+    },
+)
+async def ingest_feedback_stream(request: Request):
+    """
+    Replay feedback as an NDJSON stream (one NBAFeedbackEvent per line),
+    e.g. the whole next_best_actions history when a deployment starts
+    without bandit snapshots. The body is read incrementally and applied in
+    chunks; lines that fail validation or exceed STREAM_MAX_LINE_BYTES are
+    counted as `invalid`. Replaying history that snapshots already hold
+    counts it twice.
+    """
+    totals = {"applied": 0, "ignored": 0, "invalid": 0}
+    events: list[dict] = []
+
+    async def flush():
+        counted = await executor.run(record_feedback, events.copy())
+        totals["applied"] += counted["applied"]
+        totals["ignored"] += counted["ignored"]
+        events.clear()
+
+    async for _, line in aiter_lines(request.stream()):
+        if line is None:
+            totals["invalid"] += 1  # longer than STREAM_MAX_LINE_BYTES
+            continue
+        try:
+            events.append(NBAFeedbackEvent.model_validate_json(line).model_dump())
+        except ValidationError:
+            totals["invalid"] += 1
+        if len(events) >= STREAM_CHUNK_SIZE:
+            await flush()
+    if events:
+        await flush()
+    return totals
@@ -1,29 +1,482 @@
-from fastapi import APIRouter
-from app.schemas.scoring import HCPScoringInput, ScoringResult
-from app.services.scoring_engine import compute_engagement_score, compute_prescription_propensity
+from typing import Literal, Optional, Union
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+from app.schemas.scoring import (
+    BatchScoringInput,
+    BatchScoringResult,
+    ChangedScoringResult,
+    ColumnarBatchScoringInput,
+    HCPScoringInput,
+    IncrementalScoringInput,
+    IncrementalScoringResult,
+    ScoringResult,
+    SensitivityInput,
+    SensitivityResult,
+    TopKScoringResult,
+)
+from app.services.interaction_columns import (
+    ARROW_STREAM_MEDIA_TYPE,
+    columnar_batch_from_arrow,
+)
+from app.services.executor import executor
+from app.services.explanations import EXPLAIN_FULL, ExplainMode
+from app.services.factor_registry import CompiledScoreModel, registry
+from app.services.input_hash import request_payload
+from app.services.ndjson import NDJSON_MEDIA_TYPE, DuplexStreamingResponse, score_ndjson
+from app.services.percentiles import percentile_index
+from app.services.propensity_model import propensity_models
+from app.services.score_cache import score_cache
+from app.services.score_changes import split_changed
+from app.services.timestamps import utc_today_iso
+from app.services.scoring_engine import (
+    ENGAGEMENT,
+    PROPENSITY,
+    compute_engagement_score,
+    compute_engagement_score_incremental,
+    compute_engagement_scores_batch,
+    compute_engagement_scores_columnar,
+    compute_engagement_sensitivity,
+    compute_engagement_top_k_rows,
+    engagement_inputs,
+    is_default_version,
+    propensity_cache_version,
+    propensity_inputs,
+    propensity_scorer,
+    score_propensity_batch,
+)
 
 router = APIRouter()
 
+# Change-only mode (see app.services.score_changes)
+CHANGED_ONLY = Query(False, description="Return only scores that moved versus previousScores")
+EPSILON = Query(None, ge=0, description="Score points a score must move to count as changed")
+# Explanation verbosity (see app.services.explanations)
+EXPLAIN = Query(EXPLAIN_FULL, description="full: text, codes: template IDs + args, none: omitted")
+
 
-@router.post("/engagement", response_model=ScoringResult)
-async def score_engagement(data: HCPScoringInput):
+@router.post(
+    "/engagement",
+    response_model=Union[ChangedScoringResult, ScoringResult],
+    response_model_exclude_unset=True,
+)
+async def score_engagement(
+    data: HCPScoringInput,
+    model_version: Optional[str] = None,
+    changed_only: bool = CHANGED_ONLY,
+    epsilon: Optional[float] = EPSILON,
+    explain: ExplainMode = EXPLAIN,
+):
     """
     Compute engagement likelihood score for an HCP.
 
     Returns a score (0-100) with confidence and full factor breakdown.
-    Every scoring decision is explainable.
+    Every scoring decision is explainable. Unchanged inputs are served from
+    the score cache (cacheStatus reports hit or miss). `model_version`
+    selects a configured model version (default: the registry default).
+
+    With `changed_only=true` the response is `{"results", "unchanged"}`:
+    the score is returned only if it moved by more than `epsilon` versus
+    the latest entry in `previousScores`.
+
+    `explain=codes` returns factor template IDs and arguments instead of
+    descriptions (render them with /api/v1/explanations/templates);
+    `explain=none` omits explanations.
+
+    When the HCP has a `territoryId`, `territoryPercentile` reports where the
+    score ranks in that territory's percentile index. Only scores from the
+    default model version are added to the index.
     """
-    result = compute_engagement_score(data.model_dump())
+    model = _model(ENGAGEMENT, model_version)
+    payload = request_payload(data)
+    result = await executor.run(
+        score_cache.get_or_compute,
+        _cache_type(ENGAGEMENT, explain),
+        model.cache_version,
+        payload,
+        lambda p: compute_engagement_score(p, model=model, explain=explain),
+        as_of=_today(),
+        inputs=engagement_inputs,
+    )
+    await executor.run(
+        percentile_index.annotate, ENGAGEMENT, [payload], [result],
+        is_default_version(ENGAGEMENT, model.version),
+    )
+    if changed_only:
+        return split_changed([payload], [result], ENGAGEMENT, epsilon)
     return result
 
 
-@router.post("/prescription-propensity", response_model=ScoringResult)
-async def score_prescription_propensity(data: HCPScoringInput):
+@router.post(
+    "/engagement/incremental",
+    response_model=IncrementalScoringResult,
+    response_model_exclude_unset=True,
+)
+async def score_engagement_incremental(
+    data: IncrementalScoringInput,
+    model_version: Optional[str] = None,
+    explain: ExplainMode = EXPLAIN,
+):
+    """
+    Update an engagement score from the interactions logged since the last
+    score, instead of resending the full history.
+
+    Send the `state` returned by the previous call (omit it for the first
+    score) plus `newInteractions`. The response includes the updated score,
+    its factor breakdown and the new state to keep for the next update.
+    """
+    return await executor.run(
+        compute_engagement_score_incremental,
+        request_payload(data),
+        _model(ENGAGEMENT, model_version),
+        explain,
+    )
+
+
+@router.post(
+    "/engagement/batch",
+    response_model=Union[ChangedScoringResult, BatchScoringResult],
+    response_model_exclude_unset=True,
+)
+async def score_engagement_batch(
+    data: BatchScoringInput,
+    model_version: Optional[str] = None,
+    changed_only: bool = CHANGED_ONLY,
+    epsilon: Optional[float] = EPSILON,
+    explain: ExplainMode = EXPLAIN,
+):
+    """
+    Compute engagement likelihood scores for many HCPs in one call.
+
+    Factors are evaluated over whole arrays rather than per HCP. Results are
+    returned in request order and are identical to calling /engagement for
+    each HCP individually. Cached HCPs are skipped; only misses are scored,
+    across worker processes when there are enough of them.
+
+    `changed_only` / `epsilon`, `explain` and `territoryPercentile` work as
+    on /engagement, per HCP.
+    """
+    model = _model(ENGAGEMENT, model_version)
+    payloads = [request_payload(h) for h in data.hcps]
+    results = await executor.run(
+        score_cache.get_or_compute_many,
+        _cache_type(ENGAGEMENT, explain),
+        model.cache_version,
+        payloads,
+        lambda records: executor.map_batch(
+            compute_engagement_scores_batch, records, model, explain
+        ),
+        as_of=_today(),
+        inputs=engagement_inputs,
+    )
+    await executor.run(
+        percentile_index.annotate, ENGAGEMENT, payloads, results,
+        is_default_version(ENGAGEMENT, model.version),
+    )
+    if changed_only:
+        return split_changed(payloads, results, ENGAGEMENT, epsilon)
+    return {"results": results}
+
+
+@router.post(
+    "/engagement/batch/columnar",
+    response_model=BatchScoringResult,
+    response_model_exclude_unset=True,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {
+                    "schema": ColumnarBatchScoringInput.model_json_schema()
+                },
+                ARROW_STREAM_MEDIA_TYPE: {
+                    "schema": {"type": "string", "format": "binary"}
+                },
+            },
+            "required": True,
+        }
+    },
+)
+async def score_engagement_batch_columnar(
+    request: Request, model_version: Optional[str] = None, explain: ExplainMode = EXPLAIN
+):
+    """
+    Compute engagement scores from a struct-of-arrays batch.
+
+    Accepts either JSON (ColumnarBatchScoringInput) or an Arrow IPC stream
+    (Content-Type: application/vnd.apache.arrow.stream). Interaction history
+    is passed as parallel arrays, so no per-interaction objects are validated
+    or allocated. Results match /engagement/batch for the same data. This is
+    the bulk path and bypasses the score cache.
+    """
+    model = _model(ENGAGEMENT, model_version)
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+
+    if content_type.startswith(ARROW_STREAM_MEDIA_TYPE):
+        try:
+            batch = columnar_batch_from_arrow(body)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    else:
+        try:
+            batch = ColumnarBatchScoringInput.model_validate_json(body).model_dump()
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+
+    results = await executor.run(compute_engagement_scores_columnar, batch, model, explain)
+    return {"results": results}
+
+
+@router.post(
+    "/top-k", response_model=TopKScoringResult, response_model_exclude_unset=True
+)
+async def score_top_k(
+    data: BatchScoringInput,
+    k: int = Query(20, ge=1, le=500, description="Number of top HCPs to return"),
+    model_version: Optional[str] = None,
+    explain: ExplainMode = EXPLAIN,
+):
+    """
+    Rank a book of HCPs by engagement score and return the best `k`.
+
+    Every HCP is scored in one vectorized pass and the top `k` are selected
+    without sorting the whole book; factor explanations are built for the
+    winners only. Results are best first (ties in request order) and each
+    matches /engagement/batch for that HCP. This path bypasses the score
+    cache.
+    """
+    model = _model(ENGAGEMENT, model_version)
+    payloads = [request_payload(h) for h in data.hcps]
+    rows, results = await executor.run(compute_engagement_top_k_rows, payloads, k, model, explain)
+    await executor.run(
+        percentile_index.annotate, ENGAGEMENT, [payloads[i] for i in rows], results,
+        is_default_version(ENGAGEMENT, model.version),
+    )
+    return {"results": results, "total": len(payloads)}
+
+
+@router.post(
+    "/engagement/sensitivity",
+    response_model=SensitivityResult,
+    response_model_exclude_unset=True,
+)
+async def score_engagement_sensitivity(
+    data: SensitivityInput,
+    model_version: Optional[str] = None,
+    explain: ExplainMode = EXPLAIN,
+):
+    """
+    What-if analysis: how would an HCP's engagement score move under each
+    scenario (e.g. one more channel, a visit this week)?
+
+    Each scenario overrides interactionCount, lastInteractionDate,
+    influenceLevel or consentStatus and/or adds interactions. All scenarios
+    are scored with the baseline in one vectorized pass; each returns its
+    score, its delta to the baseline and per-factor value changes and
+    effects in score points. `explain` applies to the baseline result.
+    """
+    payload = request_payload(data.hcp)
+    scenarios = [s.model_dump() for s in data.scenarios]
+    return await executor.run(
+        compute_engagement_sensitivity,
+        payload,
+        scenarios,
+        _model(ENGAGEMENT, model_version),
+        explain,
+    )
+
+
+@router.post(
+    "/stream",
+    response_class=DuplexStreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                NDJSON_MEDIA_TYPE: {"schema": HCPScoringInput.model_json_schema()}
+            },
+            "required": True,
+        }
+    },
+)
+async def score_stream(
+    request: Request,
+    score_type: Literal["engagement_likelihood", "prescription_propensity"] = ENGAGEMENT,
+    model_version: Optional[str] = None,
+    explain: ExplainMode = EXPLAIN,
+):
+    """
+    Score an NDJSON stream of HCP records (one HCPScoringInput per line).
+
+    The body is read incrementally and scored in chunks that start small and
+    grow, so the first results arrive quickly while memory stays flat for
+    any input size. Results stream back as NDJSON in input order; a line that
+    fails validation yields `{"line": n, "error": ...}` in its place. This is
+    the bulk path and bypasses the score cache; with the default model
+    version it still feeds the territory percentile index.
+    """
+    if score_type == ENGAGEMENT:
+        score_many, model_arg = compute_engagement_scores_batch, _model(ENGAGEMENT, model_version)
+        record = is_default_version(ENGAGEMENT, model_arg.version)
+    else:
+        score_many, model_arg = score_propensity_batch, _propensity(model_version)[0]
+        record = is_default_version(PROPENSITY, model_arg)
+
+    async def score_chunk(records: list[dict]) -> list[dict]:
+        results = await executor.run_batch(score_many, records, model_arg, explain)
+        await executor.run(percentile_index.annotate, score_type, records, results, record)
+        return results
+
+    return DuplexStreamingResponse(
+        score_ndjson(request.stream(), HCPScoringInput, score_chunk),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
+
+
+@router.post(
+    "/prescription-propensity",
+    response_model=Union[ChangedScoringResult, ScoringResult],
+    response_model_exclude_unset=True,
+)
+async def score_prescription_propensity(
+    data: HCPScoringInput,
+    model_version: Optional[str] = None,
+    changed_only: bool = CHANGED_ONLY,
+    epsilon: Optional[float] = EPSILON,
+    explain: ExplainMode = EXPLAIN,
+):
     """
     Compute prescription propensity score for an HCP.
 
     Based on influence level, engagement patterns, and segment membership.
-    Does NOT make medical claims or predict clinical decisions.
+    Served by the trained propensity model when one is installed, otherwise
+    by the weighted factor model. Does NOT make medical claims or predict
+    clinical decisions. `changed_only` / `epsilon`, `explain` and
+    `territoryPercentile` work as on /engagement.
     """
-    result = compute_prescription_propensity(data.model_dump())
+    version, score_many = _propensity(model_version, explain)
+    payload = request_payload(data)
+    result = await executor.run(
+        score_cache.get_or_compute,
+        _cache_type(PROPENSITY, explain),
+        propensity_cache_version(version),
+        payload,
+        lambda p: score_many([p])[0],
+        inputs=propensity_inputs,
+    )
+    await executor.run(
+        percentile_index.annotate, PROPENSITY, [payload], [result],
+        is_default_version(PROPENSITY, version),
+    )
+    if changed_only:
+        return split_changed([payload], [result], PROPENSITY, epsilon)
     return result
+
+
+@router.post(
+    "/prescription-propensity/batch",
+    response_model=Union[ChangedScoringResult, BatchScoringResult],
+    response_model_exclude_unset=True,
+)
+async def score_prescription_propensity_batch(
+    data: BatchScoringInput,
+    model_version: Optional[str] = None,
+    changed_only: bool = CHANGED_ONLY,
+    epsilon: Optional[float] = EPSILON,
+    explain: ExplainMode = EXPLAIN,
+):
+    """
+    Compute prescription propensity scores for many HCPs in one call.
+
+    Cache misses are scored together (a single predict_proba call for a
+    trained model). Results are returned in request order.
+    `changed_only` / `epsilon`, `explain` and `territoryPercentile` work as
+    on /engagement, per HCP.
+    """
+    version, _ = _propensity(model_version)
+    payloads = [request_payload(h) for h in data.hcps]
+    results = await executor.run(
+        score_cache.get_or_compute_many,
+        _cache_type(PROPENSITY, explain),
+        propensity_cache_version(version),
+        payloads,
+        lambda records: executor.map_batch(score_propensity_batch, records, version, explain),
+        inputs=propensity_inputs,
+    )
+    await executor.run(
+        percentile_index.annotate, PROPENSITY, payloads, results,
+        is_default_version(PROPENSITY, version),
+    )
+    if changed_only:
+        return split_changed(payloads, results, PROPENSITY, epsilon)
+    return {"results": results}
+
+
+@router.get("/percentile")
+async def territory_percentile(
+    territory_id: str,
+    score: float = Query(..., ge=0, le=100),
+    score_type: Literal["engagement_likelihood", "prescription_propensity"] = ENGAGEMENT,
+):
+    """
+    Percentile rank of a score within a territory, from the in-memory index
+    of scores this service has produced (no database query).
+    """
+    return {
+        "territoryId": territory_id,
+        "scoreType": score_type,
+        "score": score,
+        "percentile": percentile_index.percentile(score_type, territory_id, score),
+        "population": percentile_index.population(score_type, territory_id),
+    }
+
+
+@router.get("/models")
+async def list_models():
+    """List resident factor model versions and installed propensity artifacts."""
+    return {**registry.describe(), "propensityArtifacts": propensity_models.describe()}
+
+
+@router.post("/models/reload")
+async def reload_models():
+    """
+    Re-read the factor configuration and propensity artifacts without
+    restarting the service.
+
+    An invalid factor configuration is rejected with 422 and the previously
+    loaded models stay active.
+    """
+    try:
+        versions = registry.reload()
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid model config: {e}")
+    return {
+        "default": registry.default_version,
+        "versions": versions,
+        "propensityArtifacts": propensity_models.load(),
+    }
+
+
+def _model(score_type: str, version: Optional[str]) -> CompiledScoreModel:
+    try:
+        return registry.get(score_type, version)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+
+def _propensity(version: Optional[str], explain: str = EXPLAIN_FULL):
+    try:
+        return propensity_scorer(version, explain)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+
+def _cache_type(score_type: str, explain: str) -> str:
+    """Cache namespace: each explain mode caches its own result shape."""
+    return score_type if explain == EXPLAIN_FULL else f"{score_type}:{explain}"
+
+
+def _today() -> str:
+    """Cache day for date-dependent scores (recency changes daily)."""
+    return utc_today_iso()
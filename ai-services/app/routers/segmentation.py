@@ -1,21 +1,27 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from app.schemas.scoring import SegmentationInput, SegmentResult
+from app.services.executor import executor
+from app.services.explanations import EXPLAIN_FULL, ExplainMode
 from app.services.segmentation_engine import segment_hcps
 
 router = APIRouter()
 
 
-@router.post("/classify", response_model=list[SegmentResult])
-async def classify_hcps(data: SegmentationInput):
+@router.post("/classify", response_model=list[SegmentResult], response_model_exclude_unset=True)
+async def classify_hcps(
+    data: SegmentationInput,
+    explain: ExplainMode = Query(EXPLAIN_FULL, description="full, codes or none"),
+):
     """
     Classify HCPs into AI-driven segments.
 
     Each assignment includes:
     - Segment name
     - Confidence score
-    - Human-readable reasoning
+    - Human-readable reasoning (`reasoningCodes` with explain=codes,
+      omitted with explain=none)
 
-    Segments are engagement-focused, not clinical.
+    Segments are engagement-focused, not clinical. Large populations are
+    classified in chunks across worker processes.
     """
-    results = segment_hcps(data.hcps)
-    return results
+    return await executor.run_batch(segment_hcps, data.hcps, explain)
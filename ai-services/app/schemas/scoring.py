@@ -1,7 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional
 from datetime import datetime
 
+from app.services.consent import CHANNEL_CONSENTS
+from app.services.interaction_columns import validate_columns, validate_offsets
+
 
 class ChannelInteraction(BaseModel):
     channel: str
@@ -10,6 +13,20 @@ class ChannelInteraction(BaseModel):
     date: Optional[str] = None
 
 
+class ChannelHistoryColumns(BaseModel):
+    """Columnar alternative to a list of ChannelInteraction objects."""
+
+    channel: list[int] = []
+    status: list[int] = []
+    sentiment: list[Optional[float]] = []
+    timestamp: list[Optional[float]] = []
+
+    @model_validator(mode="after")
+    def check_columns(self):
+        validate_columns(self.channel, self.status, self.sentiment, self.timestamp)
+        return self
+
+
 class HCPScoringInput(BaseModel):
     hcpId: str
     specialty: Optional[str] = None
@@ -19,16 +36,32 @@ class HCPScoringInput(BaseModel):
     interactionCount: int = 0
     lastInteractionDate: Optional[str] = None
     channelHistory: list[ChannelInteraction] = []
+    channelColumns: Optional[ChannelHistoryColumns] = None
     consentStatus: list[dict] = []
     previousScores: list[dict] = []
     segments: list[str] = []
+    territoryId: Optional[str] = None
+
+
+class Explanation(BaseModel):
+    """A catalog template ID and its positional arguments (explain=codes)."""
+
+    template: str
+    args: list = []
 
 
 class ScoreFactor(BaseModel):
+    """
+    A factor and its explanation: `description` (explain=full), `template`
+    and `args` (explain=codes), or neither (explain=none).
+    """
+
     name: str
     weight: float
     value: float
-    description: str
+    description: Optional[str] = None
+    template: Optional[str] = None
+    args: Optional[list] = None
 
 
 class ScoringResult(BaseModel):
@@ -38,34 +71,223 @@ class ScoringResult(BaseModel):
     confidence: float
     factors: list[ScoreFactor]
     modelVersion: str
+    inputDataHash: Optional[str] = None
     computedAt: str
+    cacheStatus: Optional[str] = None
+    territoryPercentile: Optional[float] = None
+
+
+class EngagementState(BaseModel):
+    sentimentSum: float = 0.0
+    sentimentCount: int = 0
+    channelMask: int = 0
+    otherChannels: list[str] = []  # distinct channels outside the known list
+    lastInteractionDate: Optional[str] = None
+    interactionCount: int = 0
+
+
+class IncrementalScoringInput(BaseModel):
+    hcpId: str
+    influenceLevel: Optional[str] = None
+    lastInteractionDate: Optional[str] = None
+    consentStatus: list[dict] = []
+    newInteractions: list[ChannelInteraction] = []
+    state: Optional[EngagementState] = None
+
+
+class IncrementalScoringResult(ScoringResult):
+    state: EngagementState
+
+
+class BatchScoringInput(BaseModel):
+    hcps: list[HCPScoringInput]
+
 
+class BatchScoringResult(BaseModel):
+    results: list[ScoringResult]
 
-class NBAInput(BaseModel):
+
+class UnchangedScore(BaseModel):
+    hcpId: str
+    score: float
+
+
+class ChangedScoringResult(BatchScoringResult):
+    """Change-only response: moved scores in `results`, the rest in `unchanged`."""
+
+    unchanged: list[UnchangedScore]
+
+
+class TopKScoringResult(BatchScoringResult):
+    """The best `results` of a book, best first, out of `total` HCPs scored."""
+
+    total: int
+
+
+class Perturbation(BaseModel):
+    """One what-if scenario: field overrides and/or interactions to add."""
+
+    name: Optional[str] = None
+    addInteractions: list[ChannelInteraction] = []
+    interactionCount: Optional[int] = None
+    lastInteractionDate: Optional[str] = None
+    influenceLevel: Optional[str] = None
+    consentStatus: Optional[list[dict]] = None
+
+
+class SensitivityInput(BaseModel):
+    hcp: HCPScoringInput
+    scenarios: list[Perturbation] = Field(..., max_length=1000)
+
+
+class ScenarioResult(BaseModel):
+    """A scenario's score, its factor values and each factor's effect in score points."""
+
+    name: str
+    score: float
+    delta: float
+    values: dict[str, float]
+    effects: dict[str, float]
+
+
+class SensitivityResult(BaseModel):
     hcpId: str
+    scoreType: str
+    modelVersion: str
+    baseline: ScoringResult
+    scenarios: list[ScenarioResult]
+
+
+class ColumnarBatchScoringInput(BaseModel):
+    """
+    Struct-of-arrays batch: one entry per HCP in the per-HCP arrays, with
+    interaction and consent rows flattened and sliced by offsets.
+    """
+
+    hcpIds: list[str]
+    influenceLevels: list[Optional[str]]
+    interactionCounts: list[int]
+    lastInteractionAt: list[Optional[float]]
+    historyOffsets: list[int]
+    history: ChannelHistoryColumns
+    consentOffsets: list[int]
+    consentTypes: list[str] = []
+    consentStatuses: list[str] = []
+
+    @model_validator(mode="after")
+    def check_alignment(self):
+        n = len(self.hcpIds)
+        if not (len(self.influenceLevels) == len(self.interactionCounts)
+                == len(self.lastInteractionAt) == n):
+            raise ValueError("per-HCP arrays must have the same length as hcpIds")
+        if len(self.consentTypes) != len(self.consentStatuses):
+            raise ValueError("consentTypes and consentStatuses must have the same length")
+        validate_offsets(self.historyOffsets, n, len(self.history.channel), "historyOffsets")
+        validate_offsets(self.consentOffsets, n, len(self.consentTypes), "consentOffsets")
+        return self
+
+
+class NBAContext(BaseModel):
+    """A rep's context, shared by all of their NBA requests."""
+
     userId: str
+    pendingTasks: int = 0
+    recentUserInteractions: list[dict] = []  # scheduledAt / durationMinutes / status: booked slots
+
+
+class NBAHCPInput(BaseModel):
+    hcpId: str
     specialty: Optional[str] = None
     influenceLevel: Optional[str] = None
     interactionCount: int = 0
     lastInteractionDate: Optional[str] = None
     channelHistory: list[ChannelInteraction] = []
+    channelColumns: Optional[ChannelHistoryColumns] = None
     consentStatus: list[dict] = []
-    pendingTasks: int = 0
-    recentUserInteractions: list[dict] = []
     therapeuticAreas: Optional[list[str]] = None
     segments: list[str] = []
     previousScores: list[dict] = []
 
 
+class NBAInput(NBAHCPInput, NBAContext):
+    """Single-HCP NBA request: the HCP's data plus the rep's context."""
+
+
+class NBABatchInput(BaseModel):
+    """One rep's context plus the HCPs to recommend actions for."""
+
+    context: NBAContext
+    hcps: list[NBAHCPInput]
+
+
+class NBAPlanInput(BaseModel):
+    """A rep's whole book plus how many actions each channel can take."""
+
+    context: NBAContext
+    hcps: list[NBAHCPInput]
+    capacities: dict[str, int] = {}  # channel -> max planned actions; unlisted = unlimited
+
+    @model_validator(mode="after")
+    def check_capacities(self):
+        unknown = sorted(set(self.capacities) - set(CHANNEL_CONSENTS))
+        if unknown:
+            raise ValueError(f"capacities for unknown channels: {', '.join(unknown)}")
+        if any(limit < 0 for limit in self.capacities.values()):
+            raise ValueError("capacities must not be negative")
+        return self
+
+
 class NBAResult(BaseModel):
     hcpId: str
     recommendedChannel: str
     recommendedTiming: str
     suggestedContent: str
-    reasoning: str
+    reasoning: Optional[str] = None
+    reasoningCodes: Optional[list[Explanation]] = None
     confidence: float
     factors: list[ScoreFactor]
+    modelVersion: str  # "+<bandit state>" once the HCP's context has feedback
+    inputDataHash: Optional[str] = None
+    explored: bool = False  # channel priorities were Thompson samples (explore=true)
+
+
+class NBABatchResult(BaseModel):
+    results: list[NBAResult]
+
+
+class PlannedAction(BaseModel):
+    hcpId: str
+    channel: str  # "none" when no consented channel has capacity left
+    expectedValue: float
+    preferredChannel: str  # the /recommend channel, ignoring capacities
+
+
+class NBAPlanResult(BaseModel):
+    plan: list[PlannedAction]
+    totalExpectedValue: float
+    channelLoad: dict[str, int]
+    unassigned: int
     modelVersion: str
+    inputDataHash: str
+
+
+class NBAFeedbackEvent(BaseModel):
+    """What a rep did with a recommendation (next_best_actions.status)."""
+
+    channel: str
+    status: str  # accepted / rejected; pending and expired carry no signal
+    specialty: Optional[str] = None
+    influenceLevel: Optional[str] = None
+
+
+class NBAFeedbackInput(BaseModel):
+    events: list[NBAFeedbackEvent]
+
+
+class NBAFeedbackResult(BaseModel):
+    applied: int
+    ignored: int
+    invalid: int = 0  # NDJSON lines that failed validation
 
 
 class SummaryInput(BaseModel):
@@ -88,6 +310,21 @@ class SummaryResult(BaseModel):
     inputDataHash: str
 
 
+class HCPInsightInput(NBAInput):
+    """Everything the profile page needs, sent once for all engines."""
+
+    yearsOfPractice: Optional[int] = None
+    territoryId: Optional[str] = None
+
+
+class HCPInsightResult(BaseModel):
+    hcpId: str
+    engagement: ScoringResult
+    propensity: ScoringResult
+    nextBestAction: NBAResult
+    summary: SummaryResult
+
+
 class CopilotMessage(BaseModel):
     role: str
     content: str
@@ -113,4 +350,6 @@ class SegmentResult(BaseModel):
     hcpId: str
     segmentName: str
     confidence: float
-    reasoning: str
+    reasoning: Optional[str] = None
+    reasoningCodes: Optional[list[Explanation]] = None
+    inputDataHash: Optional[str] = None
@@ -0,0 +1,164 @@
+"""
+Capacity-Constrained Allocation
+===============================
+Assigns each of n items (HCPs) to at most one of C options (channels) so
+that the total value is as large as possible, while no option receives more
+than its capacity. Used by the NBA planner to spread a rep's whole book
+over a day's visits, calls and emails.
+
+This is a transportation problem, solved exactly as a min-cost flow:
+
+1. Every item starts on its best uncapped option (or none), which is what
+   it gets whenever capacities do not bind.
+2. Capped options are filled by successive shortest augmenting paths: one
+   unit of flow per step, found with Bellman-Ford over the capped options
+   only. A path may move already placed items between capped options to
+   make room ("repair"), e.g. a visit slot goes to the HCP who gains most
+   from it while the HCP it displaces moves to a phone call.
+3. It stops when the best path no longer adds value.
+
+Each step is optimal for its flow amount and path gains only shrink, so the
+result is a global optimum. The number of steps is bounded by the total
+capacity of the capped options, not by n. The best move between two capped
+options is kept in a heap per (from, to) pair, so a step costs O(m^2 log n)
+for m capped options whatever the number of items already placed.
+"""
+
+import heapq
+
+import numpy as np
+
+UNASSIGNED = -1
+UNLIMITED = -1
+
+_EPS = 1e-12
+
+
+def allocate(values: np.ndarray, capacities: np.ndarray) -> np.ndarray:
+    """
+    Best option per item under capacities.
+
+    values:     (n x C) value of each item on each option, -inf where not allowed
+    capacities: (C,) maximum items per option, UNLIMITED (negative) for no limit
+
+    Returns the option code of each item, UNASSIGNED where no option is
+    allowed or every allowed one is full. Leaving an item unassigned is
+    worth 0, so options worth 0 or less are never taken. Ties go to the
+    lower option code, then to the lower item index.
+    """
+    values = np.where(values > 0, values, -np.inf)
+    rows = np.arange(len(values))
+    capacities = np.asarray(capacities, dtype=np.int64)
+    capped = np.flatnonzero(capacities >= 0)
+
+    preferred = _best(values)
+    if not _over_capacity(preferred, capped, capacities):
+        return preferred
+
+    # Start from the best uncapped option, then augment into capped ones
+    fallback = _best(np.where(capacities[None, :] >= 0, -np.inf, values))
+    fallback_value = np.where(
+        fallback == UNASSIGNED, 0.0, values[rows, np.maximum(fallback, 0)]
+    )
+    gains = values[:, capped] - fallback_value[:, None]
+    slots = _augment(gains, capacities[capped])
+
+    placed = slots != UNASSIGNED
+    assignment = fallback.copy()
+    assignment[placed] = capped[slots[placed]]
+    return assignment
+
+
+def _best(values: np.ndarray) -> np.ndarray:
+    """Argmax per row (first on ties), UNASSIGNED where nothing is allowed."""
+    if values.shape[1] == 0:
+        return np.full(len(values), UNASSIGNED, dtype=np.int64)
+    best = values.argmax(axis=1)
+    return np.where(np.isneginf(values[np.arange(len(values)), best]), UNASSIGNED, best)
+
+
+def _over_capacity(assignment: np.ndarray, capped: np.ndarray, capacities: np.ndarray) -> bool:
+    load = np.bincount(assignment[assignment >= 0], minlength=len(capacities))
+    return bool((load[capped] > capacities[capped]).any())
+
+
+def _augment(gains: np.ndarray, capacities: np.ndarray) -> np.ndarray:
+    """
+    Successive shortest paths over m capped options; gains are (n x m)
+    values over each item's fallback. Returns the capped slot per item.
+    """
+    n, m = gains.shape
+    slot = np.full(n, UNASSIGNED, dtype=np.int64)
+    load = np.zeros(m, dtype=np.int64)
+    capacities = np.minimum(capacities, (gains > _EPS).sum(axis=0))
+
+    # Candidates for entering each option, best first; items only ever go
+    # from free to placed, so each list is consumed front to back
+    candidates = []
+    for j in range(m):
+        column = gains[:, j]
+        order = np.argsort(-column, kind="stable")
+        candidates.append(order[column[order] > _EPS].tolist())
+    cursor = [0] * m
+    # moves[j][k]: heap of (-gain of moving the item from j to k, item)
+    moves = [[[] for _ in range(m)] for _ in range(m)]
+
+    for _ in range(int(capacities.sum())):
+        # Source edges: best free item for each option
+        enter = np.full(m, -np.inf)
+        enter_item = [UNASSIGNED] * m
+        for j in range(m):
+            items = candidates[j]
+            while cursor[j] < len(items) and slot[items[cursor[j]]] != UNASSIGNED:
+                cursor[j] += 1
+            if cursor[j] < len(items):
+                enter_item[j] = items[cursor[j]]
+                enter[j] = gains[enter_item[j], j]
+
+        # Move edges: best placed item of option j to move to option k.
+        # Heap entries go stale when their item leaves j and are dropped here.
+        move = np.full((m, m), -np.inf)
+        move_item = np.full((m, m), UNASSIGNED, dtype=np.int64)
+        for j in range(m):
+            for k in range(m):
+                heap = moves[j][k]
+                while heap and slot[heap[0][1]] != j:
+                    heapq.heappop(heap)
+                if heap:
+                    move[j, k] = -heap[0][0]
+                    move_item[j, k] = heap[0][1]
+
+        # Bellman-Ford (longest gain) from the source over the m options
+        dist = enter.copy()
+        parent = np.full(m, UNASSIGNED, dtype=np.int64)  # UNASSIGNED: entered from source
+        for _ in range(m - 1):
+            through = dist[:, None] + move
+            best_from = through.argmax(axis=0)
+            better = through[best_from, np.arange(m)] > dist + _EPS
+            if not better.any():
+                break
+            dist = np.where(better, through[best_from, np.arange(m)], dist)
+            parent = np.where(better, best_from, parent)
+
+        open_options = np.flatnonzero(load < capacities)
+        if len(open_options) == 0:
+            break
+        target = open_options[dist[open_options].argmax()]
+        if not dist[target] > _EPS:
+            break
+
+        # Walk the path back: each hop moves one item into `node`
+        node = target
+        for _ in range(m):
+            source = parent[node]
+            item = enter_item[node] if source == UNASSIGNED else int(move_item[source, node])
+            slot[item] = node
+            deltas = gains[item] - gains[item, node]
+            for k in range(m):
+                if k != node and deltas[k] > -np.inf:
+                    heapq.heappush(moves[node][k], (-deltas[k], item))
+            if source == UNASSIGNED:
+                break
+            node = source
+        load[target] += 1
+    return slot
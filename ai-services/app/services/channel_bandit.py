@@ -0,0 +1,258 @@
+"""
+Channel Bandit
+==============
+Learns NBA channel priorities from what reps do with recommendations.
+
+Every recommendation outcome (`next_best_actions.status`) is a Bernoulli
+trial of its channel: "accepted" is a success, "rejected" a failure;
+"pending" and "expired" carry no signal and are ignored. Outcomes are kept
+per context, the HCP's (specialty, influence level), so each context has
+one Beta-Bernoulli arm per channel:
+
+    acceptance ~ Beta(prior * PRIOR_STRENGTH + accepted,
+                      (1 - prior) * PRIOR_STRENGTH + rejected)
+
+The prior is the static channel priority, worth PRIOR_STRENGTH outcomes, so
+a context without feedback keeps exactly the static priorities and a busy
+one drifts towards its observed acceptance rates. priorities() returns the
+posterior means (deterministic, the default for NBA) or, for exploration,
+one Thompson sample per arm. state_version() fingerprints the counts a
+context's priorities came from, so a recommendation can say which
+posterior it was made with.
+
+Recording an outcome is O(1): one dict lookup and one counter increment,
+so a worker can replay the whole feedback history quickly at startup.
+
+Snapshots: with CHANNEL_BANDIT_DIR set, each worker process writes the
+counts it recorded itself to <dir>/bandit-<pid>.npz (every
+CHANNEL_BANDIT_SNAPSHOT_SECONDS and at shutdown) and reads the other
+workers' files. The posterior adds the worker's own counts to the latest
+counts of every other file, so reloading a file replaces what it
+contributed and merges never count an outcome twice. A snapshot left by an
+earlier process with the same pid is adopted as the worker's own counts.
+"""
+
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PREFIX = "bandit-"
+DEFAULT_SNAPSHOT_SECONDS = 60.0
+DEFAULT_PRIOR_STRENGTH = 20.0
+
+ACCEPTED, REJECTED = "accepted", "rejected"
+
+
+class ChannelBandit:
+    """Beta-Bernoulli arms per (specialty, influence level) and channel."""
+
+    def __init__(self, channels: Sequence[str], prior: Sequence[float],
+                 prior_strength: float = DEFAULT_PRIOR_STRENGTH,
+                 directory: Optional[Path] = None,
+                 snapshot_seconds: float = DEFAULT_SNAPSHOT_SECONDS,
+                 seed: Optional[int] = None):
+        self.channels = list(channels)
+        self.prior = np.asarray(prior, dtype=np.float64)
+        self.prior_strength = prior_strength
+        self.directory = directory
+        self.snapshot_seconds = snapshot_seconds
+        self._codes = {channel: code for code, channel in enumerate(self.channels)}
+        # context -> [accepted per channel..., rejected per channel...]
+        self._local: dict[tuple[str, str], list[int]] = {}
+        # snapshot file name -> {context: (2 x channels) counts}
+        self._remote: dict[str, dict[tuple[str, str], np.ndarray]] = {}
+        self._saved = False
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, channels: Sequence[str], prior: Sequence[float]) -> "ChannelBandit":
+        directory = os.getenv("CHANNEL_BANDIT_DIR")
+        return cls(
+            channels,
+            prior,
+            prior_strength=float(os.getenv("CHANNEL_BANDIT_PRIOR_STRENGTH", DEFAULT_PRIOR_STRENGTH)),
+            directory=Path(directory) if directory else None,
+            snapshot_seconds=float(
+                os.getenv("CHANNEL_BANDIT_SNAPSHOT_SECONDS", DEFAULT_SNAPSHOT_SECONDS)
+            ),
+        )
+
+    # ─── Feedback and priorities ───────────────────────────────
+
+    def record(self, specialty: Optional[str], influence_level: Optional[str],
+               channel: str, status: str) -> bool:
+        """Record one outcome; False if it carries no signal (see module docstring)."""
+        with self._lock:
+            return self._record(specialty, influence_level, channel, status)
+
+    def record_many(self, events: Iterable[tuple]) -> int:
+        """Record (specialty, influence level, channel, status) tuples; returns how many counted."""
+        applied = 0
+        with self._lock:
+            for specialty, influence_level, channel, status in events:
+                applied += self._record(specialty, influence_level, channel, status)
+        return applied
+
+    def priorities(self, contexts: Sequence[tuple[Optional[str], Optional[str]]],
+                   sample: bool = False) -> np.ndarray:
+        """
+        (context x channel) acceptance estimates: posterior means, or one
+        Thompson sample per arm with `sample`. Contexts are
+        (specialty, influence level) pairs.
+        """
+        return self.posterior(contexts, sample)[0]
+
+    def posterior(self, contexts: Sequence[tuple[Optional[str], Optional[str]]],
+                  sample: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        """
+        priorities() plus the (context x 2 x channel) accepted / rejected
+        counts they were computed from, read under the same lock.
+        """
+        keys = [(specialty or "", influence_level or "") for specialty, influence_level in contexts]
+        distinct = {key: i for i, key in enumerate(dict.fromkeys(keys))}
+        rows = np.array([distinct[key] for key in keys], dtype=np.int64)
+        with self._lock:
+            counts = np.stack([self._counts(key) for key in distinct]) if distinct else (
+                np.zeros((0, 2, len(self.channels)), dtype=np.int64)
+            )
+            alpha = self.prior * self.prior_strength + counts[:, 0]
+            beta = (1 - self.prior) * self.prior_strength + counts[:, 1]
+            if sample:
+                # A draw per row, so HCPs of one context explore independently
+                draws = self._rng.beta(alpha[rows], beta[rows]).reshape(len(keys), len(self.channels))
+                return draws, counts[rows].reshape(len(keys), 2, len(self.channels))
+        # Without feedback the mean is exactly the static priority
+        means = np.where(counts.sum(axis=1) > 0, alpha / (alpha + beta), self.prior)
+        return (
+            means[rows].reshape(len(keys), len(self.channels)),
+            counts[rows].reshape(len(keys), 2, len(self.channels)),
+        )
+
+    def state_version(self, counts: np.ndarray) -> Optional[str]:
+        """
+        Short fingerprint of the posterior a context's (2 x channel) counts
+        give, or None without feedback (the priorities are the static prior).
+        """
+        if not counts.any():
+            return None
+        digest = hashlib.sha256(np.asarray(counts, dtype=np.int64).tobytes())
+        digest.update(np.asarray(self.prior, dtype=np.float64).tobytes())
+        digest.update(repr(self.prior_strength).encode())
+        return digest.hexdigest()[:12]
+
+    def outcomes(self, specialty: Optional[str], influence_level: Optional[str]) -> dict:
+        """{channel: [accepted, rejected]} seen for a context, across workers."""
+        with self._lock:
+            counts = self._counts((specialty or "", influence_level or ""))
+        return {
+            channel: [int(counts[0, code]), int(counts[1, code])]
+            for code, channel in enumerate(self.channels)
+        }
+
+    # ─── Snapshots ─────────────────────────────────────────────
+
+    def save(self, path: Path) -> None:
+        """Write this worker's own counts atomically (write to a temp file, then rename)."""
+        with self._lock:
+            keys = list(self._local)
+            counts = np.array([self._local[k] for k in keys], dtype=np.int64).reshape(
+                len(keys), 2, len(self.channels)
+            )
+            self._saved = True
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f,
+                channels=np.array(self.channels, dtype=str),
+                specialties=np.array([k[0] for k in keys], dtype=str),
+                influence_levels=np.array([k[1] for k in keys], dtype=str),
+                counts=counts,
+            )
+        os.replace(tmp, path)
+
+    def load(self, path: Path) -> dict[tuple[str, str], np.ndarray]:
+        """Counts of a snapshot, realigned to this bandit's channels."""
+        with np.load(path) as data:
+            codes = [self._codes.get(c) for c in data["channels"].tolist()]
+            counts = data["counts"]
+            contexts = zip(data["specialties"].tolist(), data["influence_levels"].tolist())
+            loaded = {}
+            for i, key in enumerate(contexts):
+                aligned = np.zeros((2, len(self.channels)), dtype=np.int64)
+                for source, code in enumerate(codes):
+                    if code is not None:
+                        aligned[:, code] = counts[i, :, source]
+                loaded[key] = aligned
+        return loaded
+
+    def load_snapshots(self) -> int:
+        """Read every other worker's snapshot; returns how many were read."""
+        if self.directory is None or not self.directory.is_dir():
+            return 0
+        own = self._own_path().name
+        loaded = 0
+        for path in sorted(self.directory.glob(f"{SNAPSHOT_PREFIX}*.npz")):
+            if path.name == own and self._saved:
+                continue
+            try:
+                counts = self.load(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Skipping bandit snapshot %s: %s", path, e)
+                continue
+            with self._lock:
+                if path.name == own:
+                    # Left by an earlier process with our pid: adopt it
+                    for key, value in counts.items():
+                        local = self._local.setdefault(key, [0] * (2 * len(self.channels)))
+                        for i, n in enumerate(value.reshape(-1).tolist()):
+                            local[i] += n
+                else:
+                    self._remote[path.name] = counts
+            loaded += 1
+        return loaded
+
+    def snapshot(self) -> None:
+        """Save this worker's snapshot, then pick up the other workers' ones."""
+        if self.directory is None:
+            return
+        self.save(self._own_path())
+        self.load_snapshots()
+
+    # ─── Internals ─────────────────────────────────────────────
+
+    def _record(self, specialty, influence_level, channel, status) -> bool:
+        code = self._codes.get(channel)
+        if code is None or (status != ACCEPTED and status != REJECTED):
+            return False
+        key = (specialty or "", influence_level or "")
+        counts = self._local.get(key)
+        if counts is None:
+            counts = self._local[key] = [0] * (2 * len(self.channels))
+        counts[code if status == ACCEPTED else len(self.channels) + code] += 1
+        return True
+
+    def _counts(self, key: tuple[str, str]) -> np.ndarray:
+        """(2 x channels) accepted / rejected counts of a context, all workers."""
+        local = self._local.get(key)
+        counts = (
+            np.zeros((2, len(self.channels)), dtype=np.int64) if local is None
+            else np.array(local, dtype=np.int64).reshape(2, len(self.channels))
+        )
+        for remote in self._remote.values():
+            other = remote.get(key)
+            if other is not None:
+                counts += other
+        return counts
+
+    def _own_path(self) -> Path:
+        return self.directory / f"{SNAPSHOT_PREFIX}{os.getpid()}.npz"
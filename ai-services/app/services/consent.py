@@ -0,0 +1,150 @@
+"""
+Consent Masks
+=============
+Compact consent state shared by every engine.
+
+Consent arrives as raw `consents` rows (consent_type, status, created_at,
+...), possibly several per type since records are immutable. Each HCP's
+rows are resolved once into two `uint8` bitmasks over CONSENT_TYPES:
+
+- recorded: types with at least one consent record
+- granted:  types whose latest record has status "granted"
+
+The latest record of a type is the one with the newest `created_at`; rows
+without it, and ties, go by list order, first wins (the backend sends
+consents newest first). This is the rule the backend's consent check uses.
+
+Types outside the known list (or missing) share the "other" bit. Each
+such type is still resolved on its own first, so the bit is granted when
+the latest record of any of them is: a revoked "fax" does not hide a
+granted "sms". Channel eligibility over many HCPs is then a bitwise AND
+over a `uint8` array:
+
+    eligible(masks.granted, channel_bits(["email"]))
+"""
+
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from app.services.timestamps import epoch_seconds, parse_timestamps
+
+# Bit k is CONSENT_TYPES[k]
+CONSENT_TYPES = (
+    "email", "phone", "visit", "remote_detailing", "data_processing", "marketing", "other",
+)
+OTHER = CONSENT_TYPES.index("other")
+_TYPE_CODES = {name: code for code, name in enumerate(CONSENT_TYPES) if code != OTHER}
+_BITS = (1 << np.arange(len(CONSENT_TYPES))).astype(np.uint8)
+
+# Engagement channels and the consent type each requires
+CHANNEL_CONSENTS = {
+    "email": "email",
+    "phone": "phone",
+    "in_person_visit": "visit",
+    "remote_detailing": "remote_detailing",
+}
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+
+class ConsentMasks(NamedTuple):
+    """Per-HCP `uint8` bitmasks (see module docstring)."""
+
+    granted: np.ndarray
+    recorded: np.ndarray
+
+
+def consent_masks(consent_lists: Sequence[list[dict]]) -> ConsentMasks:
+    """Resolve each HCP's consent rows into masks, for many HCPs at once."""
+    owners, types, granted, created = [], [], [], []
+    for i, consents in enumerate(consent_lists):
+        for consent in consents:
+            owners.append(i)
+            types.append(consent.get("consent_type"))
+            granted.append(consent.get("status") == "granted")
+            created.append(consent.get("created_at"))
+    return _resolve(
+        len(consent_lists), owners, _type_codes(types), granted,
+        epoch_seconds(parse_timestamps(created)),
+    )
+
+
+def consent_masks_from_columns(
+    offsets: Sequence[int], types: Sequence[Optional[str]], statuses: Sequence[Optional[str]]
+) -> ConsentMasks:
+    """Masks from flat consent type/status arrays sliced by per-HCP offsets."""
+    offsets = np.asarray(offsets, dtype=np.int64)
+    owners = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    return _resolve(
+        len(offsets) - 1,
+        owners,
+        _type_codes(types),
+        [s == "granted" for s in statuses],
+        np.full(len(owners), np.nan),
+    )
+
+
+def granted_count(masks: np.ndarray) -> np.ndarray:
+    """Number of consent types set in each mask."""
+    return _POPCOUNT[masks]
+
+
+def channel_bits(channels: Sequence[str]) -> np.ndarray:
+    """Consent bit required by each channel (0 for channels needing none we know of)."""
+    return np.array(
+        [_BITS[CONSENT_TYPES.index(CHANNEL_CONSENTS[c])] if c in CHANNEL_CONSENTS else 0
+         for c in channels],
+        dtype=np.uint8,
+    )
+
+
+def eligible(granted: np.ndarray, required: int) -> np.ndarray:
+    """HCPs whose granted mask includes every bit of `required`."""
+    return (granted & np.uint8(required)) == required
+
+
+def channel_grants(granted: np.ndarray, channels: Sequence[str]) -> np.ndarray:
+    """(HCP x channel) booleans: is the channel's consent granted?"""
+    bits = channel_bits(channels)
+    return (granted[:, None] & bits[None, :]) != 0
+
+
+def _type_codes(types: Sequence[Optional[str]]) -> list[int]:
+    """
+    Code per consent type: its bit for known types, and a distinct code from
+    OTHER upwards per unknown (or missing) type, so each resolves separately.
+    """
+    unknown: dict[Optional[str], int] = {}
+    codes = []
+    for consent_type in types:
+        code = _TYPE_CODES.get(consent_type)
+        if code is None:
+            code = unknown.setdefault(consent_type, OTHER + len(unknown))
+        codes.append(code)
+    return codes
+
+
+def _resolve(
+    n: int, owners, codes, granted, created_seconds: np.ndarray
+) -> ConsentMasks:
+    owners = np.asarray(owners, dtype=np.intp)
+    codes = np.asarray(codes, dtype=np.intp)
+    granted = np.asarray(granted, dtype=bool)
+    # Unknown types resolve under their own codes, then fold into the OTHER bit
+    bits = _BITS[np.minimum(codes, OTHER)]
+
+    recorded_mask = np.zeros(n, dtype=np.uint8)
+    np.bitwise_or.at(recorded_mask, owners, bits)
+
+    # Latest row per (HCP, type): newest created_at first, then list order
+    newest = np.where(np.isnan(created_seconds), -np.inf, created_seconds)
+    order = np.lexsort((np.arange(len(owners)), -newest, codes, owners))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (np.diff(owners[order]) != 0) | (np.diff(codes[order]) != 0)
+    latest = order[first]
+    latest = latest[granted[latest]]
+
+    granted_mask = np.zeros(n, dtype=np.uint8)
+    np.bitwise_or.at(granted_mask, owners[latest], bits[latest])
+    return ConsentMasks(granted_mask, recorded_mask)
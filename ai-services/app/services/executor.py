@@ -0,0 +1,162 @@
+"""
+Batch Executor
+==============
+Keeps CPU-bound engine work off the event loop.
+
+Routers are `async def`, but the engines (scoring, segmentation, NBA) are
+synchronous Python. Calling them inline blocks the worker's event loop, so a
+single large request stalls every other request on that worker.
+
+Two pools:
+- a thread pool for interactive requests (one HCP, small batches); the
+  loop stays free and latency is a thread hop
+- a process pool for large batches, which are split into chunks sized to
+  the input and scored on every core in parallel
+
+Batch functions sent to the process pool must be module-level and take the
+records list as their first argument, followed by picklable arguments. They
+must return one result per record, in order.
+
+Configuration (environment):
+- EXECUTOR_PROCESSES          process pool size (default: CPU count; 0 disables it)
+- EXECUTOR_THREADS            thread pool size (default: min(32, CPU count + 4))
+- EXECUTOR_PROCESS_THRESHOLD  minimum batch size sent to processes (default 5000)
+- EXECUTOR_CHUNK_SIZE         fixed chunk size (default 0: sized to the input)
+- EXECUTOR_MIN_CHUNK          smallest automatic chunk (default 500)
+- EXECUTOR_START_METHOD       multiprocessing start method (default "spawn")
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable, Optional
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROCESS_THRESHOLD = 5000
+DEFAULT_MIN_CHUNK = 500
+# Chunks per process: a few per worker evens out uneven chunk costs
+CHUNKS_PER_PROCESS = 4
+
+
+class BatchExecutor:
+    """Thread pool for small work, chunked process pool for large batches."""
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        threads: Optional[int] = None,
+        process_threshold: int = DEFAULT_PROCESS_THRESHOLD,
+        chunk_size: int = 0,
+        min_chunk: int = DEFAULT_MIN_CHUNK,
+        start_method: str = "spawn",
+    ):
+        cpus = os.cpu_count() or 1
+        self.processes = cpus if processes is None else max(0, processes)
+        self.threads = threads or min(32, cpus + 4)
+        self.process_threshold = process_threshold
+        self.chunk_size = chunk_size
+        self.min_chunk = max(1, min_chunk)
+        self.start_method = start_method
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "BatchExecutor":
+        processes = os.getenv("EXECUTOR_PROCESSES")
+        threads = os.getenv("EXECUTOR_THREADS")
+        return cls(
+            processes=int(processes) if processes else None,
+            threads=int(threads) if threads else None,
+            process_threshold=int(
+                os.getenv("EXECUTOR_PROCESS_THRESHOLD", DEFAULT_PROCESS_THRESHOLD)
+            ),
+            chunk_size=int(os.getenv("EXECUTOR_CHUNK_SIZE", "0")),
+            min_chunk=int(os.getenv("EXECUTOR_MIN_CHUNK", DEFAULT_MIN_CHUNK)),
+            start_method=os.getenv("EXECUTOR_START_METHOD", "spawn"),
+        )
+
+    # ─── Public API ────────────────────────────────────────────
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the thread pool and await the result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._threads(), partial(fn, *args, **kwargs))
+
+    async def run_batch(self, fn: Callable[..., list], records: list, *args) -> list:
+        """Await map_batch() without blocking the event loop."""
+        return await self.run(self.map_batch, fn, records, *args)
+
+    def map_batch(self, fn: Callable[..., list], records: list, *args) -> list:
+        """
+        fn(records, *args), split across the process pool when the batch is
+        large enough, otherwise called directly in the current thread.
+        """
+        if not self.uses_processes(len(records)):
+            return fn(records, *args)
+
+        size = self.chunk_size_for(len(records))
+        chunks = [records[start:start + size] for start in range(0, len(records), size)]
+        try:
+            futures = [self._processes().submit(fn, chunk, *args) for chunk in chunks]
+            results = []
+            for future in futures:
+                results.extend(future.result())
+            return results
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM kill); start a fresh pool next time
+            logger.warning("Process pool broken; scoring %d records in-thread", len(records))
+            self._reset_processes()
+            return fn(records, *args)
+
+    def uses_processes(self, n: int) -> bool:
+        return self.processes > 0 and n >= self.process_threshold
+
+    def chunk_size_for(self, n: int) -> int:
+        """Fixed EXECUTOR_CHUNK_SIZE, or a few chunks per process (at least min_chunk)."""
+        if self.chunk_size > 0:
+            return self.chunk_size
+        per_chunk = -(-n // max(1, self.processes * CHUNKS_PER_PROCESS))
+        return max(self.min_chunk, per_chunk)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pools = (self._process_pool, self._thread_pool)
+            self._process_pool = self._thread_pool = None
+        for pool in pools:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+    # ─── Pools (created on first use) ──────────────────────────
+
+    def _threads(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=self.threads, thread_name_prefix="engine"
+                )
+            return self._thread_pool
+
+    def _processes(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                )
+            return self._process_pool
+
+    def _reset_processes(self) -> None:
+        with self._lock:
+            pool, self._process_pool = self._process_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+executor = BatchExecutor.from_env()
@@ -0,0 +1,126 @@
+"""
+Explanation Templates
+=====================
+Catalog of every human-readable explanation the engines produce.
+
+Factor descriptions and reasoning lines are positional templates filled
+from a short argument list. The `explain` option of the scoring, NBA and
+segmentation endpoints selects how they are returned:
+
+- full:  rendered text (`description`, `reasoning`), the default
+- codes: template IDs plus arguments (`template` + `args`, `reasoningCodes`);
+         clients render them with the catalog from GET /api/v1/explanations/templates
+- none:  no explanation text at all, only factor names, weights and values
+
+Rendering is `TEMPLATES[template].format(*args)`; multi-line reasoning is
+its rendered lines joined with newlines. Bulk callers use codes or none and
+skip string formatting entirely; the UI keeps full explanations.
+"""
+
+from typing import Literal
+import hashlib
+import json
+
+EXPLAIN_FULL = "full"
+EXPLAIN_CODES = "codes"
+EXPLAIN_NONE = "none"
+ExplainMode = Literal["full", "codes", "none"]
+
+TEMPLATES = {
+    # Engagement likelihood
+    "recency.none": "No prior interactions recorded",
+    "recency.invalid": "Unable to parse last interaction date",
+    "recency.days": "Last interaction {0} days ago ({1})",
+    "frequency.none": "No interactions recorded",
+    "frequency.count": "{0} interactions ({1})",
+    "diversity.none": "No channel history",
+    "diversity.single": "Single channel engagement ({0})",
+    "diversity.multi": "Engaged across {0} channels ({1})",
+    "sentiment.none": "No sentiment data available (neutral assumed)",
+    "sentiment.positive": "Positive sentiment trend (avg: {0:.2f})",
+    "sentiment.neutral": "Neutral sentiment (avg: {0:.2f})",
+    "sentiment.negative": "Negative sentiment trend (avg: {0:.2f})",
+    "influence.key_opinion_leader": "Key Opinion Leader — highest strategic value",
+    "influence.high": "High influence — strong strategic importance",
+    "influence.medium": "Medium influence — standard engagement priority",
+    "influence.low": "Low influence — lower engagement priority",
+    "influence.unknown": "Unknown influence level: {0}",
+    "consent.none": "No consent records",
+    "consent.granted": "{0} of {1} consent types granted",
+    # Prescription propensity
+    "propensity.influence": "Influence level: {0}",
+    "propensity.interactions": "{0} total interactions",
+    "propensity.segments": "Member of {0} relevant segments",
+    "propensity.specialty": "Specialty: {0}",
+    "propensity.years": "{0} years of practice",
+    "propensity.years_unknown": "Years of practice unknown",
+    "propensity.therapeutic_areas": "{0} therapeutic areas",
+    # Next Best Action
+    "nba.sentiment": "Average sentiment on {0}: {1:.2f}",
+    "nba.frequency": "{0} past {1} interactions",
+    "nba.novelty": "No prior {0} interactions — diversification opportunity",
+    "nba.learned_priority": "Learned {0} priority {1:.2f} from {2} accepted / {3} rejected",
+    "nba.priority_sample": "Sampled {0} priority {1:.2f} from {2} accepted / {3} rejected",
+    "nba.timing.none": "No prior interactions — suggest near-term engagement",
+    "nba.timing.unknown": "Unable to determine last contact — suggest standard timing",
+    "nba.timing.wait": "Last contact {0} days ago — wait for 1-week gap",
+    "nba.timing.follow_up": "Last contact {0} days ago — follow up soon",
+    "nba.timing.reengage": "Last contact {0} days ago — re-engage promptly",
+    "nba.no_consent": "HCP has no active consent for any engagement channel",
+    "nba.reason.channel": "Recommended {0} based on:",
+    "nba.reason.consent": "- Consent status: {0} is consented",
+    "nba.reason.last_interaction": "- Last interaction: {0}",
+    "nba.reason.interactions": "- Total interactions: {0}",
+    "nba.reason.recent_channels": "- Recent channels used: {0}",
+    "nba.reason.calendar": "- Timing: moved to the rep's next free slot",
+    "nba.reason.explored": "- Channel priorities sampled to explore",
+    "nba.reason.no_consent": (
+        "No engagement channels currently have active consent. Action required: obtain consent."
+    ),
+    # Segmentation
+    "segment.kol": "Key Opinion Leader classification. Influence: {0}, Interactions: {1}.",
+    "segment.high_value": "High influence ({0}) with strong engagement ({1} interactions).",
+    "segment.new_target": (
+        "Limited engagement history ({0} interactions). New target for outreach."
+    ),
+    "segment.at_risk": (
+        "Previously engaged ({0} interactions) but declining sentiment ({1:.2f}). "
+        "At risk of disengagement."
+    ),
+    "segment.growing": (
+        "Medium influence ({0}) with growing engagement ({1} interactions). "
+        "Potential for increased value."
+    ),
+    "segment.standard": "Standard classification. Influence: {0}, Interactions: {1}.",
+}
+
+# Changes whenever a template changes; used as the catalog's ETag
+CATALOG_VERSION = hashlib.sha256(
+    json.dumps(TEMPLATES, sort_keys=True).encode()
+).hexdigest()[:16]
+
+
+def render(template: str, args: list) -> str:
+    return TEMPLATES[template].format(*args)
+
+
+def factor_explanation(mode: str, template: str, args: list) -> dict:
+    """The explanation fields of one factor dict for an explain mode."""
+    if mode == EXPLAIN_FULL:
+        return {"description": render(template, args)}
+    if mode == EXPLAIN_CODES:
+        return {"template": template, "args": args}
+    return {}
+
+
+def reasoning_explanation(mode: str, lines: list[tuple[str, list]]) -> dict:
+    """`reasoning` text (full) or `reasoningCodes` (codes) for reasoning lines."""
+    if mode == EXPLAIN_FULL:
+        return {"reasoning": "\n".join(render(template, args) for template, args in lines)}
+    if mode == EXPLAIN_CODES:
+        return {"reasoningCodes": [{"template": t, "args": args} for t, args in lines]}
+    return {}
+
+
+def catalog() -> dict:
+    return {"version": CATALOG_VERSION, "templates": TEMPLATES}
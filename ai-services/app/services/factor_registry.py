@@ -0,0 +1,310 @@
+"""
+Factor Registry
+===============
+Declarative factor configuration for the weighted scoring models.
+
+Each model version declares, per score type, its factors in order: weight,
+bucket tables (bin edges plus one value per bin) and level tables. Configs
+compile once into a CompiledScoreModel holding a NumPy weight vector and
+NumPy bucket/level tables, which the single-HCP and batch paths share.
+Thresholds and level values are data: a table is evaluated over a whole
+column with one searchsorted, never with a per-HCP if/elif ladder.
+
+Configuration sources:
+- app/config/scoring_models.json (built-in, always loaded)
+- SCORING_MODEL_CONFIG (optional JSON overlay adding or replacing versions)
+
+Several versions stay resident side by side; requests may select one
+explicitly, otherwise the configured default is used. Config files are
+re-read when their modification time changes (checked at most every few
+seconds) or on an explicit reload, so weight experiments need no restart.
+A config that fails to compile is rejected and the previous registry stays
+active.
+
+A reload may change a version's weights or tables under the same version
+name, so each compiled model also carries a fingerprint of its spec;
+`cache_version` (version plus fingerprint) is what caches key on.
+"""
+
+from pathlib import Path
+from typing import Optional
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+BUILTIN_CONFIG_PATH = Path(__file__).resolve().parent.parent / "config" / "scoring_models.json"
+RELOAD_CHECK_SECONDS = 5.0
+
+ENGAGEMENT = "engagement_likelihood"
+PROPENSITY = "prescription_propensity"
+
+# Factors each score type knows how to compute; configs may reorder,
+# reweight or re-bucket them but not invent new ones.
+KNOWN_FACTORS = {
+    ENGAGEMENT: {
+        "interaction_recency",
+        "interaction_frequency",
+        "channel_diversity",
+        "sentiment_trend",
+        "influence_level",
+        "consent_breadth",
+    },
+    PROPENSITY: {
+        "influence_level",
+        "interaction_engagement",
+        "segment_alignment",
+        "specialty_relevance",
+    },
+}
+
+# Tables the kernels read for a factor, per score type; a factor declared
+# without its table cannot be computed, so such a config does not compile
+REQUIRED_TABLES = {
+    ENGAGEMENT: {
+        "interaction_recency": "buckets",
+        "interaction_frequency": "buckets",
+        "channel_diversity": "buckets",
+        "influence_level": "levels",
+    },
+}
+
+
+class BucketTable:
+    """
+    Right-closed bins: x <= edges[0] maps to values[0], edges[i-1] < x <= edges[i]
+    to values[i], and x > edges[-1] to values[-1].
+    """
+
+    def __init__(self, edges: list[float], values: list[float],
+                 labels: Optional[list[str]] = None):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.labels = list(labels) if labels is not None else [""] * len(self.values)
+        if len(self.values) != len(self.edges) + 1:
+            raise ValueError("bucket tables need exactly one more value than edges")
+        if len(self.labels) != len(self.values):
+            raise ValueError("bucket labels must match bucket values")
+        if np.any(np.diff(self.edges) <= 0):
+            raise ValueError("bucket edges must be strictly increasing")
+
+    def index(self, x) -> np.ndarray:
+        return np.searchsorted(self.edges, x, side="left")
+
+    def lookup(self, x) -> np.ndarray:
+        return self.values[self.index(x)]
+
+    def labels_at(self, bins: np.ndarray) -> list[str]:
+        """Labels for bin indices previously returned by index()."""
+        labels = self.labels
+        return [labels[i] for i in bins.tolist()]
+
+
+class _LevelPositions(dict):
+    """Level -> table position; unknown levels resolve to the default slot."""
+
+    def __init__(self, positions: dict, unknown: int):
+        super().__init__(positions)
+        self.unknown = unknown
+
+    def __missing__(self, level) -> int:
+        return self.unknown
+
+
+class LevelTable:
+    """
+    Categorical value table: known levels map to their value, anything else
+    to `default`. A missing level (None or "") reads as `missing`.
+
+    A column of levels is resolved to table positions with one C-level
+    map over a position dict, then to values with one array index.
+    """
+
+    def __init__(self, levels: dict, default: float, missing: Optional[str] = "medium"):
+        self.keys = list(levels)
+        # values[len(keys)] is the default slot for unknown levels
+        self.values = np.array([levels[k] for k in self.keys] + [default], dtype=np.float64)
+        self.default = default
+        positions = {level: j for j, level in enumerate(self.keys)}
+        if missing is not None:
+            positions.setdefault(None, positions.get(missing, len(self.keys)))
+            positions.setdefault("", positions[None])
+        self.positions = _LevelPositions(positions, len(self.keys))
+
+    def index(self, levels) -> np.ndarray:
+        """Table position of each level (len(keys) for unknown levels)."""
+        return np.fromiter(map(self.positions.__getitem__, levels), dtype=np.intp,
+                           count=len(levels))
+
+    def lookup(self, levels) -> np.ndarray:
+        return self.values[self.index(levels)]
+
+
+class CompiledScoreModel:
+    """One score type of one model version, compiled to NumPy arrays."""
+
+    def __init__(self, version: str, score_type: str, spec: dict):
+        factors = spec.get("factors") or []
+        if not factors:
+            raise ValueError(f"{version}/{score_type}: no factors declared")
+        unknown = {f["name"] for f in factors} - KNOWN_FACTORS.get(score_type, set())
+        if unknown:
+            raise ValueError(f"{version}/{score_type}: unknown factors {sorted(unknown)}")
+        required = REQUIRED_TABLES.get(score_type, {})
+        for f in factors:
+            table = required.get(f["name"])
+            if table is not None and not f.get(table):
+                raise ValueError(f"{version}/{score_type}: factor {f['name']} needs {table}")
+
+        self.version = version
+        self.score_type = score_type
+        self.fingerprint = hashlib.sha256(
+            json.dumps(spec, sort_keys=True).encode()
+        ).hexdigest()[:12]
+        self.cache_version = f"{version}+{self.fingerprint}"
+        self.names = tuple(f["name"] for f in factors)
+        self.index = {name: j for j, name in enumerate(self.names)}
+        self.params = {f["name"]: f for f in factors}
+
+        weights = [float(f["weight"]) for f in factors]
+        if any(w < 0 for w in weights):
+            raise ValueError(f"{version}/{score_type}: weights must be non-negative")
+        self.weights = np.asarray(weights)
+        self.weight_list = weights
+        # Summed in declaration order so results match a running total
+        self.total_weight = 0
+        for w in weights:
+            self.total_weight += w
+
+        self.tables = {
+            f["name"]: BucketTable(
+                f["buckets"]["edges"], f["buckets"]["values"], f["buckets"].get("labels")
+            )
+            for f in factors if "buckets" in f
+        }
+        self.levels = {
+            f["name"]: LevelTable(f["levels"], float(f.get("default", 0.5)))
+            for f in factors if "levels" in f
+        }
+
+    def param(self, name: str, key: str, default=None):
+        return self.params.get(name, {}).get(key, default)
+
+    def level_values(self, name: str, levels: list[Optional[str]]) -> np.ndarray:
+        """Map categorical levels through a level table (None reads as 'medium')."""
+        return self.levels[name].lookup(levels)
+
+    def combine(self, values: np.ndarray) -> np.ndarray:
+        """
+        Weighted score ratio (0..1) for an (n, k) matrix of factor values in
+        factor order. Factors are accumulated one at a time, in order, so the
+        result is identical for a single row and a whole batch.
+        """
+        weighted = np.zeros(values.shape[0])
+        for j, weight in enumerate(self.weight_list):
+            weighted = weighted + weight * values[:, j]
+        if self.total_weight <= 0:
+            return np.zeros(values.shape[0])
+        return weighted / self.total_weight
+
+
+def compile_config(config: dict) -> tuple[str, dict]:
+    """Compile a config document into (default version, {version: {score_type: model}})."""
+    versions = {
+        version: {
+            score_type: CompiledScoreModel(version, score_type, spec)
+            for score_type, spec in score_types.items()
+        }
+        for version, score_types in config.get("versions", {}).items()
+    }
+    default = config.get("default")
+    if default not in versions:
+        raise ValueError(f"default model version '{default}' is not declared")
+    return default, versions
+
+
+class FactorRegistry:
+    """Resident compiled models for every configured version."""
+
+    def __init__(self, paths: list[Path], check_interval: float = RELOAD_CHECK_SECONDS):
+        self.paths = paths
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtimes: dict[Path, float] = {}
+        self._checked_at = 0.0
+        self.default_version = ""
+        self._versions: dict[str, dict[str, CompiledScoreModel]] = {}
+        self.reload()
+
+    @classmethod
+    def from_env(cls) -> "FactorRegistry":
+        paths = [BUILTIN_CONFIG_PATH]
+        override = os.getenv("SCORING_MODEL_CONFIG")
+        if override:
+            paths.append(Path(override))
+        return cls(paths)
+
+    def reload(self) -> list[str]:
+        """Re-read and compile every config file, swapping models in atomically."""
+        merged = {"default": None, "versions": {}}
+        mtimes = {}
+        for path in self.paths:
+            if not path.exists():
+                continue
+            mtimes[path] = path.stat().st_mtime
+            with open(path) as f:
+                config = json.load(f)
+            merged["versions"].update(config.get("versions", {}))
+            merged["default"] = config.get("default") or merged["default"]
+
+        default, versions = compile_config(merged)
+        with self._lock:
+            self.default_version = default
+            self._versions = versions
+            self._mtimes = mtimes
+            self._checked_at = time.monotonic()
+        return sorted(versions)
+
+    def get(self, score_type: str, version: Optional[str] = None) -> CompiledScoreModel:
+        """Compiled model for score_type; KeyError for an unknown version."""
+        self._maybe_reload()
+        versions = self._versions
+        models = versions.get(version or self.default_version)
+        if models is None or score_type not in models:
+            raise KeyError(f"Unknown model version '{version}' for {score_type}")
+        return models[score_type]
+
+    def describe(self) -> dict:
+        return {
+            "default": self.default_version,
+            "versions": {
+                version: {
+                    score_type: dict(zip(model.names, model.weight_list))
+                    for score_type, model in models.items()
+                }
+                for version, models in sorted(self._versions.items())
+            },
+        }
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        changed = any(
+            path.exists() and path.stat().st_mtime != self._mtimes.get(path)
+            for path in self.paths
+        )
+        if changed:
+            try:
+                self.reload()
+            except (OSError, ValueError, KeyError, TypeError):
+                # Keep serving the last good models; /models/reload reports errors
+                self._mtimes = {p: p.stat().st_mtime for p in self.paths if p.exists()}
+
+
+registry = FactorRegistry.from_env()
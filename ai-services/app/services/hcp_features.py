@@ -0,0 +1,181 @@
+"""
+Shared HCP Feature Record
+=========================
+Single pass over an HCP's channel history producing the aggregates that the
+scoring, NBA and summary engines need.
+
+Each engine used to walk `channelHistory` itself (NBA once per consented
+channel). Extracting the record once lets several engines share the walk,
+e.g. in the unified insights endpoint.
+
+Aggregates are accumulated in history order, so sums and averages are
+bit-for-bit identical to the per-engine computations they replace.
+
+channel_aggregates() is the batch counterpart for a fixed list of channels:
+one group-by over every HCP's history at once, giving (HCP x channel)
+arrays instead of one dict per HCP.
+"""
+
+from typing import NamedTuple, Sequence
+
+import numpy as np
+
+from app.services.interaction_columns import CHANNELS, InteractionColumns
+
+
+RECENT_CHANNEL_COUNT = 5
+
+
+def extract_hcp_features(data: dict) -> dict:
+    """
+    Build the shared feature record for one HCP payload.
+
+    Returns:
+        history_len: number of interactions in the history
+        channel_stats: {channel: [count, sentiment_sum, sentiment_count]},
+            in order of first appearance
+        sentiment_sum / sentiment_count: totals over all interactions
+        recent_channels: channels of the first RECENT_CHANNEL_COUNT entries
+    """
+    if data.get("channelColumns"):
+        return _features_from_columns(InteractionColumns.from_payload(data["channelColumns"]))
+
+    history = data.get("channelHistory", [])
+    channel_stats: dict = {}
+    sentiment_sum = 0
+    sentiment_count = 0
+
+    for h in history:
+        channel = h.get("channel")
+        stats = channel_stats.get(channel)
+        if stats is None:
+            stats = channel_stats[channel] = [0, 0, 0]
+        stats[0] += 1
+        sentiment = h.get("sentiment")
+        if sentiment is not None:
+            stats[1] += sentiment
+            stats[2] += 1
+            sentiment_sum += sentiment
+            sentiment_count += 1
+
+    return {
+        "history_len": len(history),
+        "channel_stats": channel_stats,
+        "sentiment_sum": sentiment_sum,
+        "sentiment_count": sentiment_count,
+        "recent_channels": [h.get("channel") for h in history[:RECENT_CHANNEL_COUNT]],
+    }
+
+
+class ChannelAggregates(NamedTuple):
+    """(HCP x channel) history aggregates; columns follow the requested channels."""
+
+    counts: np.ndarray            # int64 interactions
+    sentiment_sums: np.ndarray    # float64, summed in history order
+    sentiment_counts: np.ndarray  # int64 interactions with a sentiment
+    recent_channels: list[list]   # per HCP, as in extract_hcp_features()
+
+
+def channel_aggregates(records: list[dict], channels: Sequence[str]) -> ChannelAggregates:
+    """
+    Group the history of many HCPs by (HCP, channel code) in a single pass.
+
+    Aggregates live in flat arrays indexed by HCP * len(channels) + code.
+    Row histories are accumulated straight into them, with no per-HCP or
+    per-channel containers; columnar histories are keyed with array
+    operations and reduced with one `bincount` for the whole batch. Both
+    add in history order, so counts and sentiment sums equal those of
+    extract_hcp_features(). Interactions on channels outside `channels`
+    are skipped.
+    """
+    n, width = len(records), len(channels)
+    size = n * width
+    codes_by_name = {name: code for code, name in enumerate(channels)}
+
+    counts = [0] * size
+    sentiment_sums = [0] * size
+    sentiment_counts = [0] * size
+    column_owners, column_lengths = [], []
+    column_channels: list = []
+    column_sentiments: list = []
+    recent_channels = []
+    channel_code = codes_by_name.get
+    for i, record in enumerate(records):
+        columns = record.get("channelColumns")
+        if columns:
+            column_owners.append(i)
+            channel_codes = columns.get("channel", [])
+            column_lengths.append(len(channel_codes))
+            column_channels.extend(channel_codes)
+            column_sentiments.extend(columns.get("sentiment", []))
+            recent_channels.append(
+                [CHANNELS[code] for code in channel_codes[:RECENT_CHANNEL_COUNT]]
+            )
+            continue
+
+        base = i * width
+        history = record.get("channelHistory", [])
+        for h in history:
+            code = channel_code(h.get("channel"))
+            if code is not None:
+                key = base + code
+                counts[key] += 1
+                sentiment = h.get("sentiment")
+                if sentiment is not None:
+                    sentiment_sums[key] += sentiment
+                    sentiment_counts[key] += 1
+        recent_channels.append([h.get("channel") for h in history[:RECENT_CHANNEL_COUNT]])
+
+    counts = np.array(counts, dtype=np.int64)
+    sentiment_sums = np.array(sentiment_sums, dtype=np.float64)
+    sentiment_counts = np.array(sentiment_counts, dtype=np.int64)
+    if column_owners:
+        codes = np.array(
+            [codes_by_name.get(name, -1) for name in CHANNELS], dtype=np.int64
+        )[np.array(column_channels, dtype=np.int64)]
+        owners = np.repeat(np.array(column_owners, dtype=np.int64), column_lengths)
+        values = np.array(column_sentiments, dtype=np.float64)
+        known = codes >= 0
+        scored = known & ~np.isnan(values)
+        keys = owners * width + codes
+        counts += np.bincount(keys[known], minlength=size)
+        sentiment_sums += np.bincount(keys[scored], weights=values[scored], minlength=size)
+        sentiment_counts += np.bincount(keys[scored], minlength=size)
+
+    return ChannelAggregates(
+        counts=counts.reshape(n, width),
+        sentiment_sums=sentiment_sums.reshape(n, width),
+        sentiment_counts=sentiment_counts.reshape(n, width),
+        recent_channels=recent_channels,
+    )
+
+
+def _features_from_columns(columns: InteractionColumns) -> dict:
+    """Feature record from columnar history, grouped by channel code."""
+    n_codes = len(CHANNELS)
+    has_sentiment = ~np.isnan(columns.sentiment)
+    codes = columns.channel
+    counts = np.bincount(codes, minlength=n_codes)
+    sums = np.bincount(
+        codes[has_sentiment], weights=columns.sentiment[has_sentiment], minlength=n_codes
+    )
+    sentiment_counts = np.bincount(codes[has_sentiment], minlength=n_codes)
+
+    # Channels in order of first appearance, like the row-based record
+    present, first_seen = np.unique(codes, return_index=True)
+    order = present[np.argsort(first_seen)].tolist()
+
+    return {
+        "history_len": len(columns),
+        "channel_stats": {
+            CHANNELS[code]: [
+                int(counts[code]),
+                float(sums[code]) if sentiment_counts[code] else 0,
+                int(sentiment_counts[code]),
+            ]
+            for code in order
+        },
+        "sentiment_sum": sum(columns.sentiment[has_sentiment].tolist()),
+        "sentiment_count": int(np.count_nonzero(has_sentiment)),
+        "recent_channels": columns.channel_names(limit=RECENT_CHANNEL_COUNT),
+    }
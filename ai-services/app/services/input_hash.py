@@ -0,0 +1,252 @@
+"""
+Canonical Input Hashing
+=======================
+One reproducibility hash of an engine's input, shared by every engine and
+returned as `inputDataHash` in every result.
+
+The hash is SHA-256 over a deterministic binary encoding of the payload, so
+equal inputs hash equally however their keys happen to be ordered. The
+encoding is fed to the hash in bounded chunks; no JSON string of the whole
+payload is ever built.
+
+The gain over `json.dumps(sort_keys=True)` + SHA-256 is memory, not time:
+the encoder is pure Python and runs at about the speed of the C-accelerated
+JSON encoder (benchmarks/input_hash.py), but the peak memory of one hash
+stays near FLUSH_BYTES instead of growing with the payload.
+
+Encoding (every value starts with a one-byte type tag; lengths and counts
+are 4-byte big-endian):
+
+    null            N
+    true / false    T / F
+    integer         I + 8-byte signed big-endian
+                    (outside 64 bits: J + length + decimal ASCII)
+    float           D + 8-byte IEEE-754 big-endian; integral floats encode
+                    as integers, as in JSON (1.0 and 1 hash equally), and
+                    NaN encodes as null (JSON has no NaN)
+    string          S + length + UTF-8 bytes
+    bytes           B + length + bytes
+    list / tuple    L + count + items (NumPy arrays as their lists)
+    object          M + count + (key as string, value) pairs, sorted by key
+                    (code point order; non-string keys are stringified)
+
+Any other value is encoded as the string `str(value)`, like
+`json.dumps(default=str)`.
+
+Values shared by many payloads (e.g. a rep's context in batch NBA) can be
+encoded once with `pre_encoded()` and placed in each payload instead; the
+hash is the same as for the original value.
+
+Request payloads: engines read the full `model_dump()` of a request, defaults
+included, but a hash over that changes for every caller as soon as a schema
+gains a field. Routers therefore pass `request_payload(model)`: the full dump,
+carrying the fields the caller actually sent (`exclude_unset`,
+`exclude_none`), and those are what input_data_hash() hashes.
+"""
+
+from typing import Optional
+import hashlib
+import struct
+
+import numpy as np
+from pydantic import BaseModel
+
+# Encoded bytes buffered before they are handed to the hash
+FLUSH_BYTES = 64 * 1024
+
+_INT64_MIN, _INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+_pack_double = struct.Struct(">d").pack
+
+# Memo of encoded short strings: payloads repeat the same keys, channel
+# names, statuses and dates many times over
+_STRINGS: dict[str, bytes] = {}
+# Memo of sorted key order per key tuple: records of one shape share it
+_KEY_ORDERS: dict[tuple, tuple] = {}
+_MEMO_MAX_LENGTH = 64
+_MEMO_MAX_ENTRIES = 65536
+
+
+def input_data_hash(payload, as_of: Optional[str] = None) -> str:
+    """
+    Hex SHA-256 of the canonical encoding of payload.
+
+    `as_of` folds a reference date into the hash (see score_cache); without
+    it the hash depends on the payload alone.
+    """
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    _encode(sent_fields(payload), buffer, digest)
+    if as_of is not None:
+        buffer += b"@"
+        _encode(as_of, buffer, digest)
+    digest.update(buffer)
+    return digest.hexdigest()
+
+
+def input_data_hashes(payloads: list) -> list[str]:
+    return [input_data_hash(payload) for payload in payloads]
+
+
+def canonical_bytes(payload) -> bytes:
+    """The full encoding of payload (for tests and other implementations)."""
+    buffer = bytearray()
+    _encode(payload, buffer, None)
+    return bytes(buffer)
+
+
+class PreEncoded(bytes):
+    """A value already in canonical encoding; copied into the hash as is."""
+
+
+def pre_encoded(value) -> PreEncoded:
+    return PreEncoded(canonical_bytes(value))
+
+
+class RequestPayload(dict):
+    """A request's full model_dump(); `sent` holds only the fields the caller set."""
+
+    def __init__(self, data: dict, sent: dict):
+        super().__init__(data)
+        self.sent = sent
+
+
+def request_payload(model: BaseModel) -> RequestPayload:
+    """Engine payload of a request model, hashed over the fields the caller sent."""
+    return RequestPayload(model.model_dump(), model.model_dump(exclude_unset=True, exclude_none=True))
+
+
+def sent_fields(payload):
+    """The part of payload its input hash covers (all of it unless a RequestPayload)."""
+    return payload.sent if type(payload) is RequestPayload else payload
+
+
+def _encode(value, out: bytearray, digest) -> None:
+    t = type(value)
+    if t is dict:
+        out += b"M"
+        out += len(value).to_bytes(4, "big")
+        keys = _KEY_ORDERS.get(tuple(value))
+        if keys is None:
+            keys = _key_order(value)
+            if keys is None:
+                value = {str(key): item for key, item in value.items()}
+                keys = sorted(value)
+        strings = _STRINGS
+        for key in keys:
+            encoded = strings.get(key)
+            out += encoded if encoded is not None else _encode_str(key)
+            item = value[key]
+            # Common scalars inline, everything else through _encode_item
+            t = type(item)
+            if t is str:
+                encoded = strings.get(item)
+                out += encoded if encoded is not None else _encode_str(item)
+            elif item is None:
+                out += b"N"
+            elif t is float and not item.is_integer() and item == item:
+                out += b"D"
+                out += _pack_double(item)
+            else:
+                _encode_item(item, out, digest)
+        if digest is not None and len(out) >= FLUSH_BYTES:
+            digest.update(out)
+            out.clear()
+    elif t is list or t is tuple:
+        out += b"L"
+        out += len(value).to_bytes(4, "big")
+        for item in value:
+            if type(item) is dict:
+                _encode(item, out, digest)
+            else:
+                _encode_item(item, out, digest)
+        if digest is not None and len(out) >= FLUSH_BYTES:
+            digest.update(out)
+            out.clear()
+    else:
+        _encode_item(value, out, digest)
+
+
+def _key_order(value: dict) -> Optional[tuple]:
+    """Sorted keys of a dict with string keys, memoized by insertion order."""
+    if not all(type(key) is str for key in value):
+        return None
+    keys = tuple(sorted(value))
+    if len(_KEY_ORDERS) >= _MEMO_MAX_ENTRIES:
+        _KEY_ORDERS.clear()
+    _KEY_ORDERS[tuple(value)] = keys
+    return keys
+
+
+def _encode_item(value, out: bytearray, digest) -> None:
+    """Scalars inline; containers recurse into _encode."""
+    t = type(value)
+    if t is str:
+        encoded = _STRINGS.get(value)
+        out += encoded if encoded is not None else _encode_str(value)
+    elif t is float:
+        if value.is_integer():
+            _encode_int(int(value), out)
+        elif value != value:
+            out += b"N"
+        else:
+            out += b"D"
+            out += _pack_double(value)
+    elif value is None:
+        out += b"N"
+    elif t is int:
+        _encode_int(value, out)
+    elif t is dict or t is list or t is tuple:
+        _encode(value, out, digest)
+    elif t is bool:
+        out += b"T" if value else b"F"
+    else:
+        _encode_other(value, out, digest)
+
+
+def _encode_str(value: str) -> bytes:
+    """Encoded string; short strings (keys, enum values, dates) are memoized."""
+    data = value.encode()
+    encoded = b"S" + len(data).to_bytes(4, "big") + data
+    if len(data) <= _MEMO_MAX_LENGTH:
+        if len(_STRINGS) >= _MEMO_MAX_ENTRIES:
+            _STRINGS.clear()
+        _STRINGS[value] = encoded
+    return encoded
+
+
+def _encode_int(value: int, out: bytearray) -> None:
+    if _INT64_MIN <= value <= _INT64_MAX:
+        out += b"I"
+        out += value.to_bytes(8, "big", signed=True)
+    else:
+        data = str(value).encode()
+        out += b"J"
+        out += len(data).to_bytes(4, "big")
+        out += data
+
+
+def _encode_other(value, out: bytearray, digest) -> None:
+    """Subclasses and foreign types, mapped onto the base encodings."""
+    if type(value) is PreEncoded:
+        out += value
+    elif isinstance(value, (bool, np.bool_)):
+        out += b"T" if value else b"F"
+    elif isinstance(value, (int, np.integer)):
+        _encode_int(int(value), out)
+    elif isinstance(value, (float, np.floating)):
+        _encode_item(float(value), out, digest)
+    elif isinstance(value, str):
+        out += _encode_str(str(value))
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        data = bytes(value)
+        out += b"B"
+        out += len(data).to_bytes(4, "big")
+        out += data
+    elif isinstance(value, np.ndarray):
+        _encode(value.tolist(), out, digest)
+    elif isinstance(value, dict):
+        _encode(dict(value), out, digest)
+    elif isinstance(value, (list, tuple)):
+        _encode(list(value), out, digest)
+    else:
+        out += _encode_str(str(value))
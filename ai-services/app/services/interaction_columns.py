@@ -0,0 +1,151 @@
+"""
+Columnar Interaction History
+============================
+Struct-of-arrays representation of HCP channel history.
+
+Instead of one object per interaction, history travels as parallel arrays:
+channel codes, status codes, sentiments and epoch timestamps. Engines read
+these arrays directly, so no per-interaction dict or model is ever built.
+
+Codes are positions in CHANNELS / STATUSES, which mirror the `channel` and
+`status` enums of the backend `interactions` table.
+
+Two wire formats are accepted for batches:
+- JSON with flat arrays plus `historyOffsets` / `consentOffsets`
+- Arrow IPC stream with one row per HCP and list columns for history
+"""
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pyarrow as pa
+
+
+CHANNELS = (
+    "email",
+    "phone",
+    "in_person_visit",
+    "remote_detailing",
+    "conference",
+    "webinar",
+)
+STATUSES = ("planned", "in_progress", "completed", "cancelled", "no_show")
+
+CHANNEL_CODES = {name: code for code, name in enumerate(CHANNELS)}
+STATUS_CODES = {name: code for code, name in enumerate(STATUSES)}
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+class InteractionColumns(NamedTuple):
+    """Parallel arrays describing a sequence of interactions."""
+
+    channel: np.ndarray    # int64 codes into CHANNELS
+    status: np.ndarray     # int64 codes into STATUSES
+    sentiment: np.ndarray  # float64, NaN where no sentiment was recorded
+    timestamp: np.ndarray  # float64 epoch seconds, NaN where unknown
+
+    def __len__(self) -> int:
+        return len(self.channel)
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "InteractionColumns":
+        """Build columns from a `channelColumns` payload (lists or arrays)."""
+        return cls(
+            channel=np.asarray(payload.get("channel", []), dtype=np.int64),
+            status=np.asarray(payload.get("status", []), dtype=np.int64),
+            sentiment=np.array(payload.get("sentiment", []), dtype=np.float64),
+            timestamp=np.array(payload.get("timestamp", []), dtype=np.float64),
+        )
+
+    def channel_names(self, limit: Optional[int] = None) -> list[str]:
+        """Channel names of the first `limit` interactions, in order."""
+        codes = self.channel if limit is None else self.channel[:limit]
+        return [CHANNELS[code] for code in codes.tolist()]
+
+
+def validate_columns(
+    channel: list[int],
+    status: list[int],
+    sentiment: list,
+    timestamp: list,
+) -> None:
+    """Raise ValueError unless the arrays are aligned and codes are in range."""
+    n = len(channel)
+    if not (len(status) == len(sentiment) == len(timestamp) == n):
+        raise ValueError(
+            "channel, status, sentiment and timestamp must have the same length"
+        )
+    if n:
+        channel = np.asarray(channel)
+        status = np.asarray(status)
+        if channel.min() < 0 or channel.max() >= len(CHANNELS):
+            raise ValueError(f"channel codes must be in 0..{len(CHANNELS) - 1}")
+        if status.min() < 0 or status.max() >= len(STATUSES):
+            raise ValueError(f"status codes must be in 0..{len(STATUSES) - 1}")
+
+
+def validate_offsets(offsets: list[int], n_rows: int, n_values: int, name: str) -> None:
+    """Raise ValueError unless offsets partition n_values into n_rows slices."""
+    if len(offsets) != n_rows + 1:
+        raise ValueError(f"{name} must have one more entry than hcpIds")
+    if offsets[0] != 0 or offsets[-1] != n_values:
+        raise ValueError(f"{name} must start at 0 and end at the number of values")
+    if np.any(np.diff(np.asarray(offsets)) < 0):
+        raise ValueError(f"{name} must be non-decreasing")
+
+
+# ─── Arrow IPC ─────────────────────────────────────────────────
+
+def columnar_batch_from_arrow(body: bytes) -> dict:
+    """
+    Decode an Arrow IPC stream into the columnar batch layout.
+
+    Expected columns (one row per HCP):
+        hcpId: string
+        influenceLevel: string (nullable)
+        interactionCount: int
+        lastInteractionAt: float/int epoch seconds (nullable)
+        channel, status: list<int>
+        sentiment, timestamp: list<float> (nullable values)
+        consentType, consentStatus: list<string>
+
+    List columns are read through their offsets and flat value buffers, so
+    interaction data is never expanded into Python objects.
+    """
+    table = pa.ipc.open_stream(body).read_all()
+
+    def column(name):
+        if name not in table.column_names:
+            raise ValueError(f"Arrow payload is missing column '{name}'")
+        return table.column(name).combine_chunks()
+
+    def flat(name, dtype):
+        values = column(name).flatten()
+        return values.to_numpy(zero_copy_only=False).astype(dtype, copy=False)
+
+    history_offsets = column("channel").offsets.to_numpy()
+    consent_offsets = column("consentType").offsets.to_numpy()
+    last = column("lastInteractionAt").cast(pa.float64())
+
+    batch = {
+        "hcpIds": column("hcpId").to_pylist(),
+        "influenceLevels": column("influenceLevel").to_pylist(),
+        "interactionCounts": column("interactionCount").to_numpy(zero_copy_only=False),
+        "lastInteractionAt": last.to_numpy(zero_copy_only=False),
+        "historyOffsets": history_offsets - history_offsets[0],
+        "history": {
+            "channel": flat("channel", np.int64),
+            "status": flat("status", np.int64),
+            "sentiment": flat("sentiment", np.float64),
+            "timestamp": flat("timestamp", np.float64),
+        },
+        "consentOffsets": consent_offsets - consent_offsets[0],
+        "consentTypes": column("consentType").flatten().to_pylist(),
+        "consentStatuses": column("consentStatus").flatten().to_pylist(),
+    }
+    history = batch["history"]
+    validate_columns(
+        history["channel"], history["status"], history["sentiment"], history["timestamp"]
+    )
+    return batch
@@ -14,13 +14,32 @@ NBA NEVER:
 - Hides its reasoning from users
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 
+import numpy as np
+
+from app.services.allocation import UNASSIGNED, UNLIMITED, allocate
+from app.services.channel_bandit import ChannelBandit
+from app.services.consent import CHANNEL_CONSENTS, ConsentMasks, channel_grants, consent_masks
+from app.services.explanations import EXPLAIN_FULL, factor_explanation, reasoning_explanation
+from app.services.factor_registry import BucketTable
+from app.services.hcp_features import ChannelAggregates, channel_aggregates
+from app.services.input_hash import input_data_hash, pre_encoded, sent_fields
+from app.services.schedule import ScheduleIndex
+from app.services.timestamps import (
+    days_since,
+    parse_timestamps,
+    to_utc_iso,
+    utc_now,
+    utc_now_iso,
+)
+
 
 MODEL_VERSION = "nba-v1.0"
 
-# Channel priority based on pharma engagement effectiveness
+# Channel priority based on pharma engagement effectiveness; the prior of
+# the channel bandit, which learns per-context priorities from feedback
 CHANNEL_PRIORITY = {
     "in_person_visit": 0.9,
     "remote_detailing": 0.8,
@@ -30,167 +49,335 @@ CHANNEL_PRIORITY = {
     "conference": 0.4,
 }
 
+# Follow-up timing by days since the last contact (right-closed bins over
+# whole days: <7, 7-29, 30+). Values are days from now, except the first
+# band, which waits until the contact is a week old.
+TIMING_BANDS = BucketTable(
+    [6, 29], [7, 2, 1], ["nba.timing.wait", "nba.timing.follow_up", "nba.timing.reengage"]
+)
+WAIT_BAND = 0
 
-def compute_next_best_action(data: dict) -> dict:
-    """Determine the recommended next action for engaging an HCP."""
-    factors = []
 
-    # Get consented channels
-    consented = _get_consented_channels(data.get("consentStatus", []))
+# Channels a consent can open, in the order they are listed and tie-broken
+_CHANNELS = list(CHANNEL_CONSENTS)
+channel_bandit = ChannelBandit.from_env(_CHANNELS, [CHANNEL_PRIORITY.get(c, 0.5) for c in _CHANNELS])
 
-    # Score each consented channel
-    channel_scores = {}
-    for channel in consented:
-        score, channel_factors = _score_channel(channel, data)
-        channel_scores[channel] = score
-        factors.extend(channel_factors)
 
-    if not channel_scores:
-        return _no_action_response(data["hcpId"], data["userId"])
+def compute_next_best_action(
+    data: dict,
+    explain: str = EXPLAIN_FULL,
+    consents: Optional[ConsentMasks] = None,
+    explore: bool = False,
+) -> dict:
+    """
+    Determine the recommended next action for engaging an HCP.
 
-    # Select best channel
-    best_channel = max(channel_scores, key=channel_scores.get)
-    best_score = channel_scores[best_channel]
+    `consents` are the HCP's consent masks (see app.services.consent).
+    `explain` selects how factor descriptions and reasoning are returned
+    (see app.services.explanations). Channel priorities are the bandit's
+    posterior means, or Thompson samples with `explore`. This is a batch
+    of one.
+    """
+    schedule = ScheduleIndex.from_interactions(data.get("recentUserInteractions") or [])
+    return _next_best_actions(
+        [data], explain, [input_data_hash(data)], schedule, consents, explore
+    )[0]
 
-    # Determine timing
-    timing, timing_reason = _recommend_timing(data)
-    factors.append({
-        "name": "recommended_timing",
-        "weight": 0.1,
-        "value": 0.5,
-        "description": timing_reason,
-    })
 
-    # Generate content suggestion (commercial only, no medical claims)
-    content = _suggest_content(data, best_channel)
+def compute_next_best_actions_batch(
+    hcps: list[dict], context: dict, explain: str = EXPLAIN_FULL, explore: bool = False
+) -> list[dict]:
+    """
+    Next Best Actions for many HCPs of one rep.
 
-    # Build reasoning
-    reasoning_parts = [
-        f"Recommended {best_channel} based on:",
-        f"- Consent status: {best_channel} is consented",
-    ]
+    `context` (userId, pendingTasks, recentUserInteractions) is shared by
+    every HCP and encoded for the input hash only once. Each result is
+    identical to compute_next_best_action() on the HCP merged with the
+    context.
+    """
+    if not hcps:
+        return []
+    shared = {key: pre_encoded(value) for key, value in sent_fields(context).items()}
+    hashes = [input_data_hash({**sent_fields(hcp), **shared}) for hcp in hcps]
+    records = [{**hcp, **context} for hcp in hcps]
+    schedule = ScheduleIndex.from_interactions(context.get("recentUserInteractions") or [])
+    return _next_best_actions(records, explain, hashes, schedule, explore=explore)
 
-    if data.get("lastInteractionDate"):
-        reasoning_parts.append(
-            f"- Last interaction: {data['lastInteractionDate']}"
-        )
 
-    if data.get("interactionCount", 0) > 0:
-        reasoning_parts.append(
-            f"- Total interactions: {data['interactionCount']}"
-        )
+def plan_next_best_actions(hcps: list[dict], context: dict, capacities: dict) -> dict:
+    """
+    One planned action per HCP of a rep's book, within channel capacities.
+
+    `capacities` maps channels to the most actions the rep can take on them
+    (e.g. {"in_person_visit": 8, "phone": 20} for a day); unlisted channels
+    are unlimited. The expected value of an action is its channel's NBA
+    score on a 0-1 scale, and the plan maximizes the book's total under
+    consent and capacity (see app.services.allocation). Without binding
+    capacities every HCP gets its /recommend channel (`preferredChannel`).
+    `inputDataHash` covers the (HCP x channel) values and capacities the
+    plan was solved from.
+    """
+    records = [{**hcp, **context} for hcp in hcps]
+    granted, scores, *_ = _channel_scores(records)
+    values = np.where(granted, scores / 100, -np.inf)
+    planned = allocate(
+        values, np.array([capacities.get(c, UNLIMITED) for c in _CHANNELS], dtype=np.int64)
+    )
+    preferred = np.where(granted.any(axis=1), values.argmax(axis=1), UNASSIGNED)
+    planned_values = np.where(
+        planned == UNASSIGNED, 0.0, values[np.arange(len(records)), np.maximum(planned, 0)]
+    )
 
-    # Recent channel preference
-    recent_channels = [h["channel"] for h in data.get("channelHistory", [])[:5]]
-    if recent_channels:
-        reasoning_parts.append(
-            f"- Recent channels used: {', '.join(set(recent_channels))}"
+    channel_names = _CHANNELS + ["none"]  # UNASSIGNED (-1) reads as "none"
+    plan = [
+        {
+            "hcpId": hcp["hcpId"],
+            "channel": channel_names[channel],
+            "expectedValue": round(value, 2),
+            "preferredChannel": channel_names[best],
+        }
+        for hcp, channel, value, best in zip(
+            hcps, planned.tolist(), planned_values.tolist(), preferred.tolist()
         )
-
-    reasoning = "\n".join(reasoning_parts)
-
-    # Confidence
-    confidence = round(min(best_score / 100, 0.95), 2)
-
+    ]
+    load = np.bincount(planned[planned != UNASSIGNED], minlength=len(_CHANNELS))
     return {
-        "hcpId": data["hcpId"],
-        "recommendedChannel": best_channel,
-        "recommendedTiming": timing.isoformat(),
-        "suggestedContent": content,
-        "reasoning": reasoning,
-        "confidence": confidence,
-        "factors": factors,
+        "plan": plan,
+        "totalExpectedValue": round(float(planned_values.sum()), 2),
+        "channelLoad": dict(zip(_CHANNELS, load.tolist())),
+        "unassigned": int(np.count_nonzero(planned == UNASSIGNED)),
         "modelVersion": MODEL_VERSION,
+        # The solver's input: a book of thousands of full payloads would
+        # cost more to hash than to plan
+        "inputDataHash": input_data_hash({
+            "hcpIds": [hcp["hcpId"] for hcp in hcps],
+            "values": values.tobytes(),
+            "capacities": capacities,
+        }),
     }
 
 
-def _get_consented_channels(consents: list[dict]) -> list[str]:
-    """Map consent types to engagement channels."""
-    consent_channel_map = {
-        "email": "email",
-        "phone": "phone",
-        "visit": "in_person_visit",
-        "remote_detailing": "remote_detailing",
-    }
+def record_feedback(events: list[dict]) -> dict:
+    """
+    Feed recommendation outcomes to the channel bandit, O(1) each.
 
-    granted = set()
-    for consent in consents:
-        if consent.get("status") == "granted":
-            channel = consent_channel_map.get(consent.get("consent_type", ""))
-            if channel:
-                granted.add(channel)
+    Events carry the recommended `channel`, its `status` and the HCP's
+    `specialty` and `influenceLevel`. Only accepted and rejected outcomes
+    of consentable channels count; the rest are returned as `ignored`.
+    """
+    applied = channel_bandit.record_many(
+        (e.get("specialty"), e.get("influenceLevel"), e["channel"], e["status"]) for e in events
+    )
+    return {"applied": applied, "ignored": len(events) - applied}
 
-    return list(granted)
 
+def _next_best_actions(
+    records: list[dict],
+    explain: str,
+    hashes: list[str],
+    schedule: ScheduleIndex,
+    consents: Optional[ConsentMasks] = None,
+    explore: bool = False,
+) -> list[dict]:
+    """
+    Channel scoring over (HCP x channel) matrices: history is grouped by
+    channel code once for the whole batch (channel_aggregates) and consent
+    comes from the masks; only the result dicts are built per HCP. The
+    rep's `schedule` is shared by every HCP.
+    """
+    granted, scores, stats, averages, priorities, outcomes = _channel_scores(
+        records, consents, explore
+    )
+    counts, sentiment_counts = stats.counts, stats.sentiment_counts
 
-def _score_channel(channel: str, data: dict) -> tuple[float, list[dict]]:
-    """Score a specific channel for this HCP."""
-    factors = []
-    score = CHANNEL_PRIORITY.get(channel, 0.5) * 100
+    # Best consented channel; ties go to the first in channel order
+    best = np.where(granted, scores, -np.inf).argmax(axis=1)
+    best_scores = scores[np.arange(len(records)), best]
 
-    # Check past effectiveness on this channel
-    channel_interactions = [
-        h for h in data.get("channelHistory", [])
-        if h.get("channel") == channel
-    ]
+    timings = _recommend_timings(records, schedule)
 
-    if channel_interactions:
-        sentiments = [
-            h["sentiment"] for h in channel_interactions
-            if h.get("sentiment") is not None
-        ]
-        if sentiments:
-            avg_sentiment = sum(sentiments) / len(sentiments)
-            sentiment_boost = avg_sentiment * 15
-            score += sentiment_boost
-            factors.append({
-                "name": f"{channel}_sentiment",
-                "weight": 0.2,
-                "value": (avg_sentiment + 1) / 2,
-                "description": f"Average sentiment on {channel}: {avg_sentiment:.2f}",
-            })
-
-        # Frequency on this channel
-        freq_factor = min(len(channel_interactions) / 10, 1.0)
+    results = []
+    rows = zip(
+        records, stats.recent_channels, hashes, granted.tolist(), best.tolist(),
+        best_scores.tolist(), counts.tolist(), sentiment_counts.tolist(), averages.tolist(),
+        timings, priorities.tolist(), outcomes,
+    )
+    for data, recent_channels, data_hash, row_granted, best_code, best_score, row_counts, \
+            row_sentiment_counts, row_averages, (timing, timing_reason, rescheduled), \
+            row_priorities, row_outcomes in rows:
+        if not any(row_granted):
+            results.append(_no_action_response(data, explain, data_hash))
+            continue
+
+        # Contexts without feedback score on the static priorities: same version as before
+        state = channel_bandit.state_version(row_outcomes)
+        accepted, rejected = row_outcomes.tolist()
+        factors = []
+        for code, channel_granted in enumerate(row_granted):
+            if not channel_granted:
+                continue
+            factors.extend(_channel_factors(
+                _CHANNELS[code], row_counts[code], row_sentiment_counts[code],
+                row_averages[code], explain,
+            ))
+            if explore or accepted[code] or rejected[code]:
+                factors.append(_learned_priority_factor(
+                    _CHANNELS[code], row_priorities[code], accepted[code], rejected[code],
+                    explore, explain,
+                ))
         factors.append({
-            "name": f"{channel}_frequency",
-            "weight": 0.15,
-            "value": freq_factor,
-            "description": f"{len(channel_interactions)} past {channel} interactions",
+            "name": "recommended_timing",
+            "weight": 0.1,
+            "value": 0.5,
+            **factor_explanation(explain, *timing_reason),
+        })
+
+        best_channel = _CHANNELS[best_code]
+        # Generate content suggestion (commercial only, no medical claims)
+        content = _suggest_content(data, best_channel)
+
+        # Build reasoning
+        reasoning_lines = [
+            ("nba.reason.channel", [best_channel]),
+            ("nba.reason.consent", [best_channel]),
+        ]
+        if data.get("lastInteractionDate"):
+            reasoning_lines.append(("nba.reason.last_interaction", [data["lastInteractionDate"]]))
+        if data.get("interactionCount", 0) > 0:
+            reasoning_lines.append(("nba.reason.interactions", [data["interactionCount"]]))
+        # Recent channel preference
+        if recent_channels:
+            reasoning_lines.append(
+                ("nba.reason.recent_channels", [", ".join(dict.fromkeys(recent_channels))])
+            )
+        if rescheduled:
+            reasoning_lines.append(("nba.reason.calendar", []))
+        if explore:
+            reasoning_lines.append(("nba.reason.explored", []))
+
+        results.append({
+            "hcpId": data["hcpId"],
+            "recommendedChannel": best_channel,
+            "recommendedTiming": to_utc_iso(timing),
+            "suggestedContent": content,
+            **reasoning_explanation(explain, reasoning_lines),
+            "confidence": round(min(best_score / 100, 0.95), 2),
+            "factors": factors,
+            "modelVersion": f"{MODEL_VERSION}+{state}" if state else MODEL_VERSION,
+            "inputDataHash": data_hash,
+            "explored": explore,
         })
-    else:
+    return results
+
+
+def _channel_scores(
+    records: list[dict], consents: Optional[ConsentMasks] = None, explore: bool = False
+) -> tuple[np.ndarray, np.ndarray, ChannelAggregates, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (HCP x channel) consent grants, channel scores, history aggregates,
+    average sentiments and bandit priorities over _CHANNELS, plus the
+    (HCP x 2 x channel) accepted / rejected outcomes behind those
+    priorities. A channel's base score is its bandit priority for the HCP's
+    specialty and influence level.
+    """
+    if consents is None:
+        consents = consent_masks([r.get("consentStatus", []) for r in records])
+    granted = channel_grants(consents.granted, _CHANNELS)
+
+    stats = channel_aggregates(records, _CHANNELS)
+    has_sentiment = stats.sentiment_counts > 0
+    averages = np.divide(
+        stats.sentiment_sums, stats.sentiment_counts,
+        out=np.zeros(stats.counts.shape), where=has_sentiment,
+    )
+    priorities, outcomes = channel_bandit.posterior(
+        [(r.get("specialty"), r.get("influenceLevel")) for r in records], sample=explore
+    )
+    scores = priorities * 100 + np.where(has_sentiment, averages * 15, 0.0)
+    return granted, scores, stats, averages, priorities, outcomes
+
+
+def _channel_factors(
+    channel: str, count: int, sentiment_count: int, avg_sentiment: float, explain: str
+) -> list[dict]:
+    """Explanation factors of one consented channel."""
+    if not count:
         # No history = potential for diversification
-        factors.append({
+        return [{
             "name": f"{channel}_novelty",
             "weight": 0.1,
             "value": 0.4,
-            "description": f"No prior {channel} interactions — diversification opportunity",
-        })
-
-    return score, factors
+            **factor_explanation(explain, "nba.novelty", [channel]),
+        }]
 
+    factors = []
+    # Past effectiveness on this channel
+    if sentiment_count:
+        factors.append({
+            "name": f"{channel}_sentiment",
+            "weight": 0.2,
+            "value": (avg_sentiment + 1) / 2,
+            **factor_explanation(explain, "nba.sentiment", [channel, round(avg_sentiment, 2)]),
+        })
+    # Frequency on this channel
+    factors.append({
+        "name": f"{channel}_frequency",
+        "weight": 0.15,
+        "value": min(count / 10, 1.0),
+        **factor_explanation(explain, "nba.frequency", [count, channel]),
+    })
+    return factors
 
-def _recommend_timing(data: dict) -> tuple[datetime, str]:
-    """Determine optimal timing for next interaction."""
-    now = datetime.utcnow()
 
-    last_date = data.get("lastInteractionDate")
-    if not last_date:
-        return now + timedelta(days=1), "No prior interactions — suggest near-term engagement"
+def _learned_priority_factor(
+    channel: str, priority: float, accepted: int, rejected: int, explored: bool, explain: str
+) -> dict:
+    """The bandit priority a channel was scored on, with the outcomes behind it."""
+    template = "nba.priority_sample" if explored else "nba.learned_priority"
+    return {
+        "name": f"{channel}_learned_priority",
+        "weight": 1.0,
+        "value": priority,
+        **factor_explanation(explain, template, [channel, round(priority, 2), accepted, rejected]),
+    }
 
-    try:
-        last = datetime.fromisoformat(last_date.replace("Z", "+00:00"))
-        days_since = (now - last.replace(tzinfo=None)).days
 
-        if days_since < 7:
-            target = now + timedelta(days=7 - days_since)
-            return target, f"Last contact {days_since} days ago — wait for 1-week gap"
-        elif days_since < 30:
-            return now + timedelta(days=2), f"Last contact {days_since} days ago — follow up soon"
+def _recommend_timings(
+    records: list[dict], schedule: ScheduleIndex
+) -> list[tuple[datetime, tuple[str, list], bool]]:
+    """
+    Timing of the next interaction per HCP: the earliest free slot in the
+    rep's schedule at or after the recency-gap timing, with the gap rule's
+    (template, args) reason and whether a booking pushed it back.
+    """
+    now = utc_now()
+    dates = [r.get("lastInteractionDate") for r in records]
+    days = days_since(parse_timestamps(dates), now.timestamp())
+    bands = TIMING_BANDS.index(days).tolist()
+
+    timings = []
+    for date, day_count, band in zip(dates, days.tolist(), bands):
+        if not date:
+            timings.append((now + timedelta(days=1), ("nba.timing.none", [])))
+        elif day_count != day_count:  # NaN: unparseable date
+            timings.append((now + timedelta(days=3), ("nba.timing.unknown", [])))
         else:
-            return now + timedelta(days=1), f"Last contact {days_since} days ago — re-engage promptly"
-    except (ValueError, TypeError):
-        return now + timedelta(days=3), "Unable to determine last contact — suggest standard timing"
+            day_count = int(day_count)
+            delay = TIMING_BANDS.values[band]
+            if band == WAIT_BAND:
+                delay -= day_count
+            timings.append(
+                (now + timedelta(days=float(delay)), (TIMING_BANDS.labels[band], [day_count]))
+            )
+    if not len(schedule):
+        return [(timing, reason, False) for timing, reason in timings]
+
+    earliest = np.array([timing.timestamp() for timing, _ in timings])
+    free = schedule.earliest_free(earliest)
+    return [
+        (datetime.fromtimestamp(slot, timezone.utc) if moved else timing, reason, moved)
+        for (timing, reason), slot, moved in zip(timings, free.tolist(), (free > earliest).tolist())
+    ]
 
 
 def _suggest_content(data: dict, channel: str) -> str:
@@ -222,19 +409,22 @@ def _suggest_content(data: dict, channel: str) -> str:
     )
 
 
-def _no_action_response(hcp_id: str, user_id: str) -> dict:
+def _no_action_response(
+    data: dict, explain: str = EXPLAIN_FULL, data_hash: Optional[str] = None
+) -> dict:
     return {
-        "hcpId": hcp_id,
+        "hcpId": data["hcpId"],
         "recommendedChannel": "none",
-        "recommendedTiming": datetime.utcnow().isoformat(),
+        "recommendedTiming": utc_now_iso(),
         "suggestedContent": "No consented channels available. Obtain consent before engagement.",
-        "reasoning": "No engagement channels currently have active consent. Action required: obtain consent.",
+        **reasoning_explanation(explain, [("nba.reason.no_consent", [])]),
         "confidence": 0.0,
         "factors": [{
             "name": "no_consent",
             "weight": 1.0,
             "value": 0.0,
-            "description": "HCP has no active consent for any engagement channel",
+            **factor_explanation(explain, "nba.no_consent", []),
         }],
         "modelVersion": MODEL_VERSION,
+        "inputDataHash": data_hash or input_data_hash(data),
     }
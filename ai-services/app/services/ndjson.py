@@ -0,0 +1,141 @@
+"""
+NDJSON Streaming
+================
+Newline-delimited JSON helpers for bulk scoring.
+
+Records are read one line at a time from an incrementally received body and
+scored in chunks, so neither side ever materializes the full population as
+one JSON document. Chunks start small so the first results go out quickly,
+then double up to the configured size for throughput. Lines longer than
+STREAM_MAX_LINE_BYTES are dropped as they arrive and reported as invalid,
+so no single line (or a body without newlines) is ever held whole.
+"""
+
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional
+import json
+import os
+
+from pydantic import BaseModel, ValidationError
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+from app.services.input_hash import request_payload
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+STREAM_FIRST_CHUNK = int(os.getenv("STREAM_FIRST_CHUNK", "32"))
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", str(1024 * 1024)))
+
+
+async def aiter_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: Optional[int] = None
+) -> AsyncIterator[tuple[int, Optional[bytes]]]:
+    """
+    Yield (line number, line) from a byte stream, skipping blank lines. A
+    line longer than max_line_bytes (default STREAM_MAX_LINE_BYTES) is
+    discarded while it is read and yielded as (line number, None).
+    """
+    limit = max_line_bytes or STREAM_MAX_LINE_BYTES
+    buffer = b""
+    oversized = False  # the line in progress already went over the limit
+    line_no = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if oversized or len(line) > limit:
+                oversized = False
+                yield line_no, None
+            elif line.strip():
+                yield line_no, line
+        if len(buffer) > limit:
+            oversized = True
+            buffer = b""
+    if oversized:
+        yield line_no + 1, None
+    elif buffer.strip():
+        yield line_no + 1, buffer
+
+
+def chunk_sizes(first: int = STREAM_FIRST_CHUNK, limit: int = STREAM_CHUNK_SIZE) -> Iterator[int]:
+    """first, 2*first, 4*first, ... capped at limit."""
+    size = max(1, min(first, limit))
+    while True:
+        yield size
+        size = min(size * 2, limit)
+
+
+def encode_line(record: dict) -> bytes:
+    return json.dumps(record, separators=(",", ":"), default=str).encode() + b"\n"
+
+
+async def score_ndjson(
+    chunks: AsyncIterator[bytes],
+    schema: type[BaseModel],
+    score_chunk: Callable[[list[dict]], Awaitable[list[dict]]],
+    first_chunk: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Validate NDJSON records against `schema`, score them in growing chunks
+    and yield NDJSON result lines in input order.
+
+    Invalid and oversized lines produce an inline `{"line": n, "error": ...}`
+    entry instead of aborting the stream, since the response status is
+    already sent.
+    """
+    sizes = chunk_sizes(first_chunk or STREAM_FIRST_CHUNK, chunk_size or STREAM_CHUNK_SIZE)
+    target = next(sizes)
+    pending: list[tuple[int, Optional[dict], Optional[str]]] = []
+
+    async def flush():
+        records = [record for _, record, _ in pending if record is not None]
+        results = iter(await score_chunk(records) if records else [])
+        out = bytearray()
+        for line_no, record, error in pending:
+            out += encode_line(next(results) if record is not None else {"line": line_no, "error": error})
+        pending.clear()
+        return bytes(out)
+
+    async for line_no, line in aiter_lines(chunks):
+        if line is None:
+            pending.append((line_no, None, f"line exceeds {STREAM_MAX_LINE_BYTES} bytes"))
+        else:
+            try:
+                pending.append((line_no, request_payload(schema.model_validate_json(line)), None))
+            except ValidationError as e:
+                pending.append((line_no, None, first_validation_error(e)))
+        if len(pending) >= target:
+            yield await flush()
+            target = next(sizes)
+
+    if pending:
+        yield await flush()
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    Streams results while the request body is still being read.
+
+    StreamingResponse watches for disconnects by consuming receive(), which
+    would swallow the request body messages the scorer is reading. Here the
+    body reader sees a disconnect itself (ClientDisconnect) and the response
+    simply stops.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except ClientDisconnect:
+            return
+        if self.background is not None:
+            await self.background()
+
+
+def first_validation_error(error: ValidationError) -> str:
+    """One-line "field.path: message" summary of a validation failure."""
+    detail = error.errors()[0]
+    location = ".".join(str(part) for part in detail.get("loc", ()))
+    return f"{location}: {detail['msg']}" if location else detail["msg"]
@@ -0,0 +1,249 @@
+"""
+Territory Percentile Index
+==========================
+Answers "is 62 good in my territory?" without a table scan: every score the
+service produces with its default models updates a per-territory
+distribution, and scoring results carry the HCP's percentile within its
+territory (`territoryPercentile`). Scores from other model versions are
+ranked against that distribution but never added to it.
+
+Scores are 0-100 rounded to 0.1, so each (score type, territory)
+distribution is an exact 1001-bin histogram rather than an approximate
+quantile sketch. Histograms add, so they merge losslessly, and a lookup is
+one read of a cached cumulative array: O(1) whatever the population.
+
+The index also remembers each HCP's latest bin and update time, so a
+rescored HCP moves between bins instead of being counted twice, and merges
+across workers keep the newest score per HCP.
+
+Snapshots: with PERCENTILE_INDEX_DIR set, each worker process merges every
+snapshot in the directory at startup and, from a background task every
+PERCENTILE_SNAPSHOT_SECONDS and at shutdown, merges them again and writes
+its index to <dir>/index-<pid>.npz, so workers converge without a database.
+Scoring requests never wait on snapshot I/O. A worker's snapshot holds
+everything it merged, so snapshots not rewritten for
+PERCENTILE_SNAPSHOT_STALE_SECONDS (workers that exited, or pids from earlier
+deployments) are deleted once merged instead of being re-read forever.
+
+Percentile rank = share of the territory scoring below the score, plus half
+of those tied with it, in percent.
+"""
+
+from pathlib import Path
+from typing import Optional
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BINS = 1001  # 0.0, 0.1, ..., 100.0
+SNAPSHOT_PREFIX = "index-"
+DEFAULT_SNAPSHOT_SECONDS = 60.0
+# Snapshot intervals after which another worker's file counts as stale
+STALE_SNAPSHOTS = 10
+
+
+def score_bin(score: float) -> int:
+    return min(max(int(round(score * 10)), 0), BINS - 1)
+
+
+class PercentileIndex:
+    """Per (score type, territory) score histograms plus each HCP's latest bin."""
+
+    def __init__(self, directory: Optional[Path] = None,
+                 snapshot_seconds: float = DEFAULT_SNAPSHOT_SECONDS,
+                 stale_seconds: Optional[float] = None):
+        self.directory = directory
+        self.snapshot_seconds = snapshot_seconds
+        self.stale_seconds = (
+            STALE_SNAPSHOTS * snapshot_seconds if stale_seconds is None else stale_seconds
+        )
+        self._histograms: dict[tuple[str, str], np.ndarray] = {}
+        self._cumulative: dict[tuple[str, str], np.ndarray] = {}
+        # (score type, hcp id) -> (territory, bin, updated at)
+        self._entries: dict[tuple[str, str], tuple[str, int, float]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "PercentileIndex":
+        directory = os.getenv("PERCENTILE_INDEX_DIR")
+        stale_seconds = os.getenv("PERCENTILE_SNAPSHOT_STALE_SECONDS")
+        return cls(
+            directory=Path(directory) if directory else None,
+            snapshot_seconds=float(
+                os.getenv("PERCENTILE_SNAPSHOT_SECONDS", DEFAULT_SNAPSHOT_SECONDS)
+            ),
+            stale_seconds=float(stale_seconds) if stale_seconds else None,
+        )
+
+    # ─── Updates and lookups ───────────────────────────────────
+
+    def update(self, score_type: str, scores: list[tuple[str, str, float]],
+               updated_at: Optional[float] = None) -> None:
+        """Record (hcp id, territory, score) triples as the HCPs' latest scores."""
+        updated_at = time.time() if updated_at is None else updated_at
+        with self._lock:
+            for hcp_id, territory, score in scores:
+                self._apply(score_type, hcp_id, territory, score_bin(score), updated_at)
+
+    def percentile(self, score_type: str, territory: str, score: float) -> Optional[float]:
+        """Percentile rank of score within territory (None for an empty territory)."""
+        with self._lock:
+            key = (score_type, territory)
+            counts = self._histograms.get(key)
+            if counts is None:
+                return None
+            cumulative = self._cumulative.get(key)
+            if cumulative is None:
+                cumulative = self._cumulative[key] = np.concatenate(([0], np.cumsum(counts)))
+            population = int(cumulative[-1])
+            if population == 0:
+                return None
+            b = score_bin(score)
+            rank = int(cumulative[b]) + 0.5 * int(counts[b])
+        return round(100 * rank / population, 1)
+
+    def population(self, score_type: str, territory: str) -> int:
+        with self._lock:
+            counts = self._histograms.get((score_type, territory))
+            return 0 if counts is None else int(counts.sum())
+
+    def annotate(self, score_type: str, payloads: list[dict], results: list[dict],
+                 record: bool = True) -> None:
+        """
+        Update the index with freshly produced results and add each result's
+        `territoryPercentile` (HCPs without a territoryId are left as they are).
+
+        With record=False the results are ranked against the territory without
+        being added to it, for scores that must not shape the distribution.
+        """
+        scored = [
+            (result, payload["territoryId"])
+            for payload, result in zip(payloads, results)
+            if payload.get("territoryId")
+        ]
+        if not scored:
+            return
+        if record:
+            self.update(
+                score_type, [(r["hcpId"], territory, r["score"]) for r, territory in scored]
+            )
+        for result, territory in scored:
+            result["territoryPercentile"] = self.percentile(score_type, territory, result["score"])
+
+    # ─── Merging and snapshots ─────────────────────────────────
+
+    def merge(self, other: "PercentileIndex") -> None:
+        """Fold another index in, keeping the newest score of every HCP."""
+        with other._lock:
+            entries = list(other._entries.items())
+        with self._lock:
+            for (score_type, hcp_id), (territory, b, updated_at) in entries:
+                self._apply(score_type, hcp_id, territory, b, updated_at)
+
+    def save(self, path: Path) -> None:
+        """Write a snapshot atomically (write to a temp file, then rename)."""
+        with self._lock:
+            keys = list(self._entries)
+            values = [self._entries[k] for k in keys]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f,
+                score_types=np.array([k[0] for k in keys], dtype=str),
+                hcp_ids=np.array([k[1] for k in keys], dtype=str),
+                territories=np.array([v[0] for v in values], dtype=str),
+                bins=np.array([v[1] for v in values], dtype=np.int16),
+                updated_at=np.array([v[2] for v in values], dtype=np.float64),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "PercentileIndex":
+        index = cls()
+        with np.load(path) as data:
+            rows = zip(
+                data["score_types"].tolist(),
+                data["hcp_ids"].tolist(),
+                data["territories"].tolist(),
+                data["bins"].tolist(),
+                data["updated_at"].tolist(),
+            )
+            for score_type, hcp_id, territory, b, updated_at in rows:
+                index._apply(score_type, hcp_id, territory, b, updated_at)
+        return index
+
+    def load_snapshots(self) -> int:
+        """Merge every snapshot in the index directory; returns how many were read."""
+        return self._merge_files(self._snapshot_paths())
+
+    def snapshot(self) -> None:
+        """
+        Merge the other workers' snapshots, save this worker's one (which now
+        holds all of them), then delete the stale ones.
+        """
+        if self.directory is None:
+            return
+        paths = self._snapshot_paths()
+        self._merge_files(paths)
+        own = self.directory / f"{SNAPSHOT_PREFIX}{os.getpid()}.npz"
+        self.save(own)
+        self._prune([path for path in paths if path != own])
+
+    # ─── Internals ─────────────────────────────────────────────
+
+    def _snapshot_paths(self) -> list[Path]:
+        if self.directory is None or not self.directory.is_dir():
+            return []
+        return sorted(self.directory.glob(f"{SNAPSHOT_PREFIX}*.npz"))
+
+    def _merge_files(self, paths: list[Path]) -> int:
+        loaded = 0
+        for path in paths:
+            try:
+                self.merge(PercentileIndex.load(path))
+                loaded += 1
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Skipping percentile snapshot %s: %s", path, e)
+        return loaded
+
+    def _prune(self, paths: list[Path]) -> None:
+        """Delete snapshots read this pass that no worker has rewritten for stale_seconds."""
+        cutoff = time.time() - self.stale_seconds
+        for path in paths:
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    logger.info("Removed stale percentile snapshot %s", path)
+            except FileNotFoundError:
+                continue  # another worker pruned it first
+            except OSError as e:
+                logger.warning("Could not remove percentile snapshot %s: %s", path, e)
+
+    def _apply(self, score_type: str, hcp_id: str, territory: str, b: int,
+               updated_at: float) -> None:
+        """Move one HCP to bin b of territory unless a newer score is already held."""
+        key = (score_type, hcp_id)
+        previous = self._entries.get(key)
+        if previous is not None:
+            if previous[2] > updated_at:
+                return
+            old = (score_type, previous[0])
+            self._histograms[old][previous[1]] -= 1
+            self._cumulative.pop(old, None)
+        self._entries[key] = (territory, b, updated_at)
+        territory_key = (score_type, territory)
+        counts = self._histograms.get(territory_key)
+        if counts is None:
+            counts = self._histograms[territory_key] = np.zeros(BINS, dtype=np.int64)
+        counts[b] += 1
+        self._cumulative.pop(territory_key, None)
+
+
+percentile_index = PercentileIndex.from_env()
@@ -0,0 +1,281 @@
+"""
+Prescription Propensity Models
+==============================
+Serves trained scikit-learn propensity models from versioned artifacts.
+
+Artifact layout (one directory per version under PROPENSITY_MODEL_DIR):
+
+    <version>/model.joblib   uncompressed joblib dump of a fitted classifier
+    <version>/metadata.json  features, importances, scales, fill values, metrics
+
+Artifacts are loaded with joblib `mmap_mode="r"`, so the estimator's NumPy
+arrays (coefficients, tree node tables) are memory-mapped read-only. Several
+uvicorn workers loading the same file share one physical copy of the model
+through the page cache.
+
+Models are loaded and warmed once at startup (FastAPI lifespan) and score
+whole batches with a single `predict_proba` call. Results keep the factor
+breakdown shape of the weighted models: each model feature is reported as a
+factor whose weight is its normalized importance from training.
+
+When no artifact is installed, callers fall back to the weighted factor
+model from the factor registry.
+"""
+
+from pathlib import Path
+from typing import Optional
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import joblib
+import numpy as np
+
+from app.services.explanations import EXPLAIN_FULL, factor_explanation
+from app.services.factor_registry import PROPENSITY, LevelTable
+from app.services.input_hash import input_data_hashes
+from app.services.timestamps import utc_now_iso
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_DIR = Path(__file__).resolve().parent.parent.parent / "models" / "propensity"
+MODEL_FILE = "model.joblib"
+METADATA_FILE = "metadata.json"
+
+# Model inputs, in column order. Every feature is available on
+# HCPScoringInput, so any HCP that can be factor-scored can be model-scored.
+PROPENSITY_FEATURES = (
+    "influence_rank",
+    "interaction_count",
+    "segment_count",
+    "years_of_practice",
+    "therapeutic_area_count",
+)
+INFLUENCE_RANKS = {"low": 0, "medium": 1, "high": 2, "key_opinion_leader": 3}
+_INFLUENCE_RANK_TABLE = LevelTable(INFLUENCE_RANKS, INFLUENCE_RANKS["medium"])
+
+# Used when an artifact's metadata does not provide its own values
+DEFAULT_SCALES = {
+    "influence_rank": 3,
+    "interaction_count": 20,
+    "segment_count": 5,
+    "years_of_practice": 30,
+    "therapeutic_area_count": 5,
+}
+DEFAULT_CONFIDENCE = 0.7
+
+
+def propensity_feature_matrix(records: list[dict]) -> np.ndarray:
+    """
+    Build the (n, k) model input matrix for HCP payloads.
+
+    Unknown influence levels rank as medium; a missing years of practice is
+    NaN and is filled with the artifact's training value before scoring.
+    """
+    n = len(records)
+    matrix = np.empty((n, len(PROPENSITY_FEATURES)), dtype=np.float64)
+    matrix[:, 0] = _INFLUENCE_RANK_TABLE.lookup([r.get("influenceLevel") for r in records])
+    matrix[:, 1] = [r.get("interactionCount", 0) for r in records]
+    matrix[:, 2] = [len(r.get("segments") or []) for r in records]
+    matrix[:, 3] = [
+        np.nan if r.get("yearsOfPractice") is None else r["yearsOfPractice"] for r in records
+    ]
+    matrix[:, 4] = [len(r.get("therapeuticAreas") or []) for r in records]
+    return matrix
+
+
+class PropensityArtifact:
+    """A loaded, versioned propensity classifier plus its training metadata."""
+
+    def __init__(self, version: str, estimator, metadata: dict):
+        features = tuple(metadata.get("features", PROPENSITY_FEATURES))
+        if features != PROPENSITY_FEATURES:
+            raise ValueError(f"{version}: artifact features {features} do not match serving")
+
+        self.version = version
+        self.estimator = estimator
+        self.metadata = metadata
+        # A retrained artifact installed under the same version has new metadata
+        self.cache_version = "{}+{}".format(version, hashlib.sha256(
+            json.dumps(metadata, sort_keys=True, default=str).encode()
+        ).hexdigest()[:12])
+        self.fill = np.array(
+            [metadata.get("fill", {}).get(name, 0.0) for name in PROPENSITY_FEATURES]
+        )
+        self.scales = np.array(
+            [metadata.get("scales", {}).get(name, DEFAULT_SCALES[name]) for name in PROPENSITY_FEATURES],
+            dtype=np.float64,
+        )
+        importances = np.array(
+            [metadata.get("importances", {}).get(name, 0.0) for name in PROPENSITY_FEATURES]
+        )
+        total = importances.sum()
+        self.weights = (importances / total if total > 0 else importances).round(4).tolist()
+        self.confidence = round(
+            float(metadata.get("metrics", {}).get("accuracy", DEFAULT_CONFIDENCE)), 2
+        )
+
+    @classmethod
+    def load(cls, directory: Path) -> "PropensityArtifact":
+        with open(directory / METADATA_FILE) as f:
+            metadata = json.load(f)
+        estimator = joblib.load(directory / MODEL_FILE, mmap_mode="r")
+        return cls(metadata.get("version", directory.name), estimator, metadata)
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Positive-class probability for each row of a feature matrix."""
+        filled = np.where(np.isnan(features), self.fill, features)
+        return self.estimator.predict_proba(filled)[:, 1]
+
+    def warm(self) -> None:
+        """Run one prediction so lazy setup and page faults happen at startup."""
+        self.predict(np.zeros((1, len(PROPENSITY_FEATURES))))
+
+    def score(self, records: list[dict], explain: str = EXPLAIN_FULL) -> list[dict]:
+        """Score many HCP payloads with one predict_proba call."""
+        if not records:
+            return []
+        features = propensity_feature_matrix(records)
+        probabilities = self.predict(features).tolist()
+        values = np.clip(
+            np.where(np.isnan(features), self.fill, features) / self.scales, 0.0, 1.0
+        ).round(4).tolist()
+        hashes = input_data_hashes(records)
+        computed_at = utc_now_iso()
+
+        return [
+            {
+                "hcpId": record["hcpId"],
+                "scoreType": PROPENSITY,
+                "score": max(0, min(100, round(probability * 100, 1))),
+                "confidence": self.confidence,
+                "factors": [
+                    {
+                        "name": name,
+                        "weight": weight,
+                        "value": value,
+                        **factor_explanation(explain, *_explain(name, record)),
+                    }
+                    for name, weight, value in zip(PROPENSITY_FEATURES, self.weights, row)
+                ],
+                "modelVersion": self.version,
+                "inputDataHash": input_hash,
+                "computedAt": computed_at,
+            }
+            for record, probability, row, input_hash in zip(records, probabilities, values, hashes)
+        ]
+
+
+def _explain(name: str, record: dict) -> tuple[str, list]:
+    if name == "influence_rank":
+        return "propensity.influence", [record.get("influenceLevel") or "unknown"]
+    if name == "interaction_count":
+        return "propensity.interactions", [record.get("interactionCount", 0)]
+    if name == "segment_count":
+        return "propensity.segments", [len(record.get("segments") or [])]
+    if name == "years_of_practice":
+        years = record.get("yearsOfPractice")
+        if years is None:
+            return "propensity.years_unknown", []
+        return "propensity.years", [years]
+    return "propensity.therapeutic_areas", [len(record.get("therapeuticAreas") or [])]
+
+
+def save_artifact(estimator, directory: Path, version: str, metadata: dict) -> Path:
+    """
+    Write a versioned artifact that PropensityModelStore can memory-map.
+
+    The estimator is dumped uncompressed; compressed joblib files cannot be
+    memory-mapped.
+    """
+    target = Path(directory) / version
+    target.mkdir(parents=True, exist_ok=True)
+    joblib.dump(estimator, target / MODEL_FILE)
+    with open(target / METADATA_FILE, "w") as f:
+        json.dump(
+            {**metadata, "version": version, "features": list(PROPENSITY_FEATURES)},
+            f,
+            indent=2,
+            default=str,
+        )
+    return target
+
+
+class PropensityModelStore:
+    """Resident propensity artifacts, keyed by version."""
+
+    def __init__(self, directory: Path, default_version: Optional[str] = None):
+        self.directory = Path(directory)
+        self.requested_default = default_version
+        self.default_version: Optional[str] = None
+        self._models: dict[str, PropensityArtifact] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "PropensityModelStore":
+        return cls(
+            Path(os.getenv("PROPENSITY_MODEL_DIR", DEFAULT_MODEL_DIR)),
+            os.getenv("PROPENSITY_MODEL_VERSION") or None,
+        )
+
+    def load(self) -> list[str]:
+        """
+        Load and warm every artifact under the model directory.
+
+        Artifacts that fail to load are logged and skipped. The default is
+        PROPENSITY_MODEL_VERSION if set, otherwise the most recently trained.
+        """
+        models = {}
+        if self.directory.is_dir():
+            for path in sorted(p for p in self.directory.iterdir() if p.is_dir()):
+                if not (path / MODEL_FILE).exists():
+                    continue
+                try:
+                    artifact = PropensityArtifact.load(path)
+                    artifact.warm()
+                except Exception as e:  # noqa: BLE001 - one bad artifact must not stop startup
+                    logger.warning("Skipping propensity artifact %s: %s", path, e)
+                    continue
+                models[artifact.version] = artifact
+
+        default = self.requested_default
+        if default not in models:
+            if default:
+                logger.warning("Propensity model %s not found; using latest", default)
+            default = max(
+                models, key=lambda v: str(models[v].metadata.get("trainedAt", "")), default=None
+            )
+
+        with self._lock:
+            self._models = models
+            self.default_version = default
+            self._loaded = True
+        return sorted(models)
+
+    def get(self, version: Optional[str] = None) -> Optional[PropensityArtifact]:
+        """Artifact for version (default if None), or None when not installed."""
+        if not self._loaded:
+            self.load()
+        return self._models.get(version or self.default_version)
+
+    def describe(self) -> dict:
+        if not self._loaded:
+            self.load()
+        return {
+            "default": self.default_version,
+            "versions": {
+                version: {
+                    "modelType": artifact.metadata.get("modelType"),
+                    "trainedAt": artifact.metadata.get("trainedAt"),
+                    "metrics": artifact.metadata.get("metrics", {}),
+                    "populatedFeatures": artifact.metadata.get("populatedFeatures"),
+                }
+                for version, artifact in sorted(self._models.items())
+            },
+        }
+
+
+propensity_models = PropensityModelStore.from_env()
@@ -0,0 +1,80 @@
+"""
+Rep Schedule
+============
+Interval index over a rep's booked interactions, used by NBA timing to
+avoid suggesting a slot the rep has already booked.
+
+Each entry of `recentUserInteractions` with a `scheduledAt` blocks
+[scheduledAt, scheduledAt + durationMinutes) of the rep's calendar
+(DEFAULT_DURATION_MINUTES when no duration is given), unless its `status`
+is one of FREED_STATUSES: a cancelled or no-show interaction no longer
+holds its slot. A suggested action needs ACTION_MINUTES free, so it cannot
+*start* inside (scheduledAt - ACTION_MINUTES, end). These ruled-out start
+ranges are merged into sorted, disjoint runs once per request. The earliest
+free start at or after t is then t itself or the end of the run containing
+t: one binary search, done for a whole batch with a single
+numpy.searchsorted.
+"""
+
+from typing import Iterable
+
+import numpy as np
+
+from app.services.timestamps import epoch_seconds, parse_timestamps
+
+DEFAULT_DURATION_MINUTES = 30
+ACTION_MINUTES = 30
+FREED_STATUSES = frozenset({"cancelled", "no_show"})
+
+
+class ScheduleIndex:
+    """Sorted, disjoint runs of start times (epoch seconds) a new action may not take."""
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray):
+        self.starts = starts
+        self.ends = ends
+
+    @classmethod
+    def from_interactions(
+        cls, interactions: Iterable[dict], action_minutes: int = ACTION_MINUTES
+    ) -> "ScheduleIndex":
+        """
+        Index of a rep's scheduled interactions. Cancelled and no-show ones,
+        and those with a missing or invalid `scheduledAt`, are skipped.
+        """
+        interactions = [i for i in interactions if i.get("status") not in FREED_STATUSES]
+        booked = epoch_seconds(parse_timestamps(i.get("scheduledAt") for i in interactions))
+        durations = np.array([_duration_minutes(i) for i in interactions], dtype=np.float64)
+        known = ~np.isnan(booked)
+        starts = booked[known] - action_minutes * 60
+        ends = booked[known] + durations[known] * 60
+
+        order = np.argsort(starts, kind="stable")
+        starts, ends = starts[order], ends[order]
+        if len(starts) == 0:
+            return cls(starts, ends)
+        # A run continues while the next range starts before the furthest end so far
+        reach = np.maximum.accumulate(ends)
+        new_run = np.ones(len(starts), dtype=bool)
+        new_run[1:] = starts[1:] >= reach[:-1]
+        first = np.flatnonzero(new_run)
+        return cls(starts[first], np.maximum.reduceat(ends, first))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def earliest_free(self, times: np.ndarray) -> np.ndarray:
+        """Earliest start at or after each time (epoch seconds) that avoids every booking."""
+        times = np.asarray(times, dtype=np.float64)
+        if len(self.starts) == 0:
+            return times
+        run = np.searchsorted(self.starts, times, side="left") - 1  # last run starting before t
+        ends = self.ends[np.maximum(run, 0)]
+        return np.where((run >= 0) & (times < ends), ends, times)
+
+
+def _duration_minutes(interaction: dict) -> float:
+    minutes = interaction.get("durationMinutes")
+    if isinstance(minutes, (int, float)) and not isinstance(minutes, bool) and minutes > 0:
+        return minutes
+    return DEFAULT_DURATION_MINUTES
@@ -0,0 +1,222 @@
+"""
+Score Cache
+===========
+Two-tier cache for scoring results, so unchanged inputs are not rescored.
+
+Tier 1: in-process LRU, evicted by approximate payload size (bytes)
+Tier 2: shared Redis, used when REDIS_HOST is set and reachable
+
+Keys combine the score type, the model's cache version and the canonical
+input hash (app.services.input_hash) of the payload's scoring inputs.
+
+- Cache version: the model version plus a fingerprint of its config or
+  artifact, so reweighting a version in place changes keys too. The local
+  tier drops every entry of a score type as soon as it sees a new cache
+  version for it; Redis entries of old ones simply expire via TTL.
+- Scoring inputs: callers pass a projection onto the fields their scorer
+  reads, so fields it ignores (previousScores, territoryId, ...) do not
+  turn an unchanged score into a miss. A hit is restamped with the
+  inputDataHash of the payload actually sent.
+
+Scores that depend on the current date (recency) pass an `as_of` value,
+which is folded into the key so a cached score never outlives its day.
+
+Every result returned through the cache carries `cacheStatus`: "hit" or
+"miss".
+"""
+
+from collections import OrderedDict
+from typing import Callable, Optional
+import json
+import logging
+import os
+import threading
+import time
+
+import redis
+
+from app.services.input_hash import input_data_hash
+
+logger = logging.getLogger(__name__)
+
+CACHE_HIT = "hit"
+CACHE_MISS = "miss"
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+REDIS_RETRY_SECONDS = 30
+
+
+class ScoreCache:
+    """In-process LRU in front of an optional shared Redis tier."""
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        shared=None,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        prefix: str = "pharmacrm:score",
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self._shared = shared
+        self._shared_retry_at = 0.0
+        self._local: OrderedDict[str, tuple[dict, int]] = OrderedDict()
+        self._local_bytes = 0
+        self._versions: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ScoreCache":
+        shared = None
+        host = os.getenv("REDIS_HOST")
+        if host:
+            shared = redis.Redis(
+                host=host,
+                port=int(os.getenv("REDIS_PORT", "6379")),
+                socket_timeout=0.25,
+                socket_connect_timeout=0.25,
+            )
+        return cls(
+            max_bytes=int(os.getenv("SCORE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+            shared=shared,
+            ttl_seconds=int(os.getenv("SCORE_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+        )
+
+    # ─── Public API ────────────────────────────────────────────
+
+    def key(self, score_type: str, model_version: str, payload: dict,
+            as_of: Optional[str] = None,
+            inputs: Optional[Callable[[dict], dict]] = None) -> str:
+        scored = payload if inputs is None else inputs(payload)
+        return f"{self.prefix}:{score_type}:{model_version}:{input_data_hash(scored, as_of)}"
+
+    def get_or_compute(
+        self,
+        score_type: str,
+        model_version: str,
+        payload: dict,
+        compute: Callable[[dict], dict],
+        as_of: Optional[str] = None,
+        inputs: Optional[Callable[[dict], dict]] = None,
+    ) -> dict:
+        """Return the cached result for payload, computing and storing it on a miss."""
+        return self.get_or_compute_many(
+            score_type, model_version, [payload],
+            lambda payloads: [compute(p) for p in payloads],
+            as_of=as_of,
+            inputs=inputs,
+        )[0]
+
+    def get_or_compute_many(
+        self,
+        score_type: str,
+        model_version: str,
+        payloads: list[dict],
+        compute_many: Callable[[list[dict]], list[dict]],
+        as_of: Optional[str] = None,
+        inputs: Optional[Callable[[dict], dict]] = None,
+    ) -> list[dict]:
+        """
+        Batch variant: look up every payload, compute only the misses in a
+        single call to compute_many, and return results in input order.
+        `inputs` projects a payload onto the fields the scorer reads.
+        """
+        self._check_version(score_type, model_version)
+        keys = [self.key(score_type, model_version, p, as_of, inputs) for p in payloads]
+        results: list[Optional[dict]] = self._get_many(keys)
+        if inputs is not None:
+            for i, result in enumerate(results):
+                if result is not None and "inputDataHash" in result:
+                    result["inputDataHash"] = input_data_hash(payloads[i])
+
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            computed = compute_many([payloads[i] for i in missing])
+            self._set_many([(keys[i], result) for i, result in zip(missing, computed)])
+            for i, result in zip(missing, computed):
+                results[i] = {**result, "cacheStatus": CACHE_MISS}
+        return results
+
+    def clear(self) -> None:
+        with self._lock:
+            self._local.clear()
+            self._local_bytes = 0
+
+    # ─── Tiers ─────────────────────────────────────────────────
+
+    def _check_version(self, score_type: str, model_version: str) -> None:
+        """Drop local entries for score_type when its model version changes."""
+        with self._lock:
+            previous = self._versions.get(score_type)
+            if previous == model_version:
+                return
+            self._versions[score_type] = model_version
+            if previous is None:
+                return
+            stale = f"{self.prefix}:{score_type}:{previous}:"
+            for key in [k for k in self._local if k.startswith(stale)]:
+                _, size = self._local.pop(key)
+                self._local_bytes -= size
+
+    def _get_many(self, keys: list[str]) -> list[Optional[dict]]:
+        results: list[Optional[dict]] = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._local.get(key)
+                if entry is not None:
+                    self._local.move_to_end(key)
+                    results[i] = {**entry[0], "cacheStatus": CACHE_HIT}
+
+        remote = [i for i, result in enumerate(results) if result is None]
+        if remote and self._shared_available():
+            try:
+                values = self._shared.mget([keys[i] for i in remote])
+            except redis.RedisError as e:
+                self._shared_failed(e)
+                values = []
+            for i, raw in zip(remote, values):
+                if raw is not None:
+                    result = json.loads(raw)
+                    self._set_local(keys[i], result, len(raw))
+                    results[i] = {**result, "cacheStatus": CACHE_HIT}
+        return results
+
+    def _set_many(self, items: list[tuple[str, dict]]) -> None:
+        encoded = [(key, json.dumps(result, default=str)) for key, result in items]
+        for (key, result), (_, raw) in zip(items, encoded):
+            self._set_local(key, result, len(raw))
+
+        if encoded and self._shared_available():
+            try:
+                pipe = self._shared.pipeline(transaction=False)
+                for key, raw in encoded:
+                    pipe.set(key, raw, ex=self.ttl_seconds)
+                pipe.execute()
+            except redis.RedisError as e:
+                self._shared_failed(e)
+
+    def _set_local(self, key: str, result: dict, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._local.pop(key, None)
+            if previous is not None:
+                self._local_bytes -= previous[1]
+            self._local[key] = (result, size)
+            self._local_bytes += size
+            while self._local_bytes > self.max_bytes:
+                _, (_, evicted) = self._local.popitem(last=False)
+                self._local_bytes -= evicted
+
+    def _shared_available(self) -> bool:
+        return self._shared is not None and time.monotonic() >= self._shared_retry_at
+
+    def _shared_failed(self, error: Exception) -> None:
+        """Skip the shared tier for a while instead of failing scoring requests."""
+        logger.warning("Score cache shared tier unavailable: %s", error)
+        self._shared_retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+
+score_cache = ScoreCache.from_env()
@@ -0,0 +1,87 @@
+"""
+Change-Only Score Emission
+==========================
+Compares fresh scores with the previous score supplied in the request, so
+callers persist only scores that actually moved.
+
+Every stored score is an immutable ai_scores row plus an audit_log row.
+Most HCPs do not change overnight, so rewriting identical scores is pure
+write amplification. In change-only mode a result is emitted when:
+- there is no previous score of the same type, or
+- the model version differs, or
+- the score moved by more than epsilon points, or
+- any factor value moved by more than epsilon / 100 (factor values are 0-1
+  fractions of the 0-100 score), or the factor set/weights differ.
+
+Everything else is reported in a compact `unchanged` list.
+
+The previous score is the first `previousScores` entry of the same score
+type (the backend sends them newest first). Entries may be API results
+(camelCase) or ai_scores rows (snake_case, factors as JSON text).
+"""
+
+from typing import Optional
+import json
+import os
+
+DEFAULT_EPSILON = float(os.getenv("SCORE_CHANGE_EPSILON", "0"))
+
+
+def previous_score(payload: dict, score_type: str) -> Optional[dict]:
+    """Most recent previous score of score_type (entries without a type match any)."""
+    for entry in payload.get("previousScores") or []:
+        entry_type = entry.get("scoreType", entry.get("score_type"))
+        if entry_type in (None, score_type):
+            return entry
+    return None
+
+
+def has_changed(result: dict, previous: Optional[dict], epsilon: float = DEFAULT_EPSILON) -> bool:
+    """Whether result differs from previous enough to be stored."""
+    if previous is None or previous.get("score") is None:
+        return True
+
+    previous_version = previous.get("modelVersion", previous.get("model_version"))
+    if previous_version is not None and previous_version != result["modelVersion"]:
+        return True
+    if abs(float(previous["score"]) - result["score"]) > epsilon:
+        return True
+
+    factors = previous.get("factors")
+    if factors is None:
+        # Score-only history: nothing more to compare
+        return False
+    if isinstance(factors, str):
+        factors = json.loads(factors)
+    previous_factors = {f.get("name"): f for f in factors}
+    if previous_factors.keys() != {f["name"] for f in result["factors"]}:
+        return True
+
+    factor_epsilon = epsilon / 100
+    for factor in result["factors"]:
+        before = previous_factors[factor["name"]]
+        if before.get("weight") is not None and before["weight"] != factor["weight"]:
+            return True
+        if abs(float(before.get("value", 0)) - factor["value"]) > factor_epsilon:
+            return True
+    return False
+
+
+def split_changed(
+    payloads: list[dict],
+    results: list[dict],
+    score_type: str,
+    epsilon: Optional[float] = None,
+) -> dict:
+    """
+    {"results": [...changed...], "unchanged": [{"hcpId", "score"}, ...]},
+    keeping request order within each list.
+    """
+    epsilon = DEFAULT_EPSILON if epsilon is None else epsilon
+    changed, unchanged = [], []
+    for payload, result in zip(payloads, results):
+        if has_changed(result, previous_score(payload, score_type), epsilon):
+            changed.append(result)
+        else:
+            unchanged.append({"hcpId": result["hcpId"], "score": result["score"]})
+    return {"results": changed, "unchanged": unchanged}
@@ -11,247 +11,1077 @@ Each factor has:
 - name: human-readable identifier
 - weight: how much it contributes to the final score
 - value: the computed raw value for this factor
-- description: plain English explanation
+- description: plain English explanation (or a template ID and arguments,
+  depending on the `explain` mode; see app.services.explanations)
+
+Weights and bucket tables come from the factor registry, so the single-HCP,
+batch, columnar and incremental paths all evaluate the same compiled model.
 
 This is NOT a black box. Every score can be traced to its input factors.
 """
 
-from datetime import datetime, timedelta
-from typing import Optional
-import hashlib
-import json
+from typing import Callable, Optional
 
+import numpy as np
 
-MODEL_VERSION = "scoring-v1.0"
+from app.services.consent import (
+    ConsentMasks,
+    consent_masks,
+    consent_masks_from_columns,
+    granted_count,
+)
+from app.services.explanations import EXPLAIN_FULL, EXPLAIN_NONE, factor_explanation
+from app.services.factor_registry import (
+    ENGAGEMENT,
+    PROPENSITY,
+    BucketTable,
+    CompiledScoreModel,
+    registry,
+)
+from app.services.hcp_features import extract_hcp_features
+from app.services.input_hash import input_data_hash, input_data_hashes
+from app.services.interaction_columns import CHANNEL_CODES, CHANNELS
+from app.services.propensity_model import propensity_models
+from app.services.timestamps import (
+    epoch_seconds,
+    parse_timestamps,
+    utc_now_iso,
+    utc_now_seconds,
+)
 
+_INFLUENCE_TEMPLATES = {
+    level: (f"influence.{level}", [])
+    for level in ("key_opinion_leader", "high", "medium", "low")
+}
 
-def compute_engagement_score(data: dict) -> dict:
-    """Compute engagement likelihood score with full explainability."""
-    factors = []
-    total_weight = 0
-    weighted_sum = 0
+# Sentiment explanation bands over the normalized sentiment value
+_SENTIMENT_BANDS = BucketTable(
+    [0.4, 0.7], [0, 1, 2], ["sentiment.negative", "sentiment.neutral", "sentiment.positive"]
+)
 
-    # Factor 1: Interaction recency (weight: 0.25)
-    recency_score, recency_desc = _score_recency(data.get("lastInteractionDate"))
-    factors.append({
-        "name": "interaction_recency",
-        "weight": 0.25,
-        "value": recency_score,
-        "description": recency_desc,
-    })
-    weighted_sum += 0.25 * recency_score
-    total_weight += 0.25
-
-    # Factor 2: Interaction frequency (weight: 0.20)
-    freq_score, freq_desc = _score_frequency(data.get("interactionCount", 0))
-    factors.append({
-        "name": "interaction_frequency",
-        "weight": 0.20,
-        "value": freq_score,
-        "description": freq_desc,
-    })
-    weighted_sum += 0.20 * freq_score
-    total_weight += 0.20
-
-    # Factor 3: Channel diversity (weight: 0.15)
-    channel_score, channel_desc = _score_channel_diversity(data.get("channelHistory", []))
-    factors.append({
-        "name": "channel_diversity",
-        "weight": 0.15,
-        "value": channel_score,
-        "description": channel_desc,
-    })
-    weighted_sum += 0.15 * channel_score
-    total_weight += 0.15
-
-    # Factor 4: Sentiment trend (weight: 0.15)
-    sentiment_score, sentiment_desc = _score_sentiment(data.get("channelHistory", []))
-    factors.append({
-        "name": "sentiment_trend",
-        "weight": 0.15,
-        "value": sentiment_score,
-        "description": sentiment_desc,
-    })
-    weighted_sum += 0.15 * sentiment_score
-    total_weight += 0.15
-
-    # Factor 5: Influence level (weight: 0.15)
-    influence_score, influence_desc = _score_influence(data.get("influenceLevel"))
-    factors.append({
-        "name": "influence_level",
-        "weight": 0.15,
-        "value": influence_score,
-        "description": influence_desc,
-    })
-    weighted_sum += 0.15 * influence_score
-    total_weight += 0.15
-
-    # Factor 6: Consent breadth (weight: 0.10)
-    consent_score, consent_desc = _score_consent(data.get("consentStatus", []))
-    factors.append({
-        "name": "consent_breadth",
-        "weight": 0.10,
-        "value": consent_score,
-        "description": consent_desc,
-    })
-    weighted_sum += 0.10 * consent_score
-    total_weight += 0.10
-
-    # Final score
-    final_score = round((weighted_sum / total_weight) * 100, 1) if total_weight > 0 else 0
-    final_score = max(0, min(100, final_score))
-
-    # Confidence based on data completeness
-    data_points = sum([
-        1 if data.get("lastInteractionDate") else 0,
-        1 if data.get("interactionCount", 0) > 0 else 0,
-        1 if len(data.get("channelHistory", [])) > 0 else 0,
-        1 if data.get("influenceLevel") else 0,
-        1 if len(data.get("consentStatus", [])) > 0 else 0,
-    ])
-    confidence = round(data_points / 5, 2)
+# Recency parse states
+_DATE_MISSING, _DATE_PARSED, _DATE_INVALID = 0, 1, 2
 
-    return {
-        "hcpId": data["hcpId"],
-        "scoreType": "engagement_likelihood",
-        "score": final_score,
-        "confidence": confidence,
-        "factors": factors,
-        "modelVersion": MODEL_VERSION,
-        "computedAt": datetime.utcnow().isoformat(),
-    }
+
+def compute_engagement_score(
+    data: dict,
+    features: Optional[dict] = None,
+    model: Optional[CompiledScoreModel] = None,
+    explain: str = EXPLAIN_FULL,
+    consents: Optional[ConsentMasks] = None,
+) -> dict:
+    """
+    Compute engagement likelihood score with full explainability.
+
+    `features` is the shared record from extract_hcp_features() and
+    `consents` the HCP's consent masks (see app.services.consent); both are
+    built here when the caller has not already done so. `model` defaults
+    to the registry's default version. `explain` selects how factor
+    explanations are returned (see app.services.explanations).
+    """
+    if features is None:
+        features = extract_hcp_features(data)
+    columns = _feature_columns([data], [features], consents)
+    return _engagement_results(
+        [data["hcpId"]], columns, model, explain, [input_data_hash(data)]
+    )[0]
 
 
-def compute_prescription_propensity(data: dict) -> dict:
+def compute_prescription_propensity(
+    data: dict, model: Optional[CompiledScoreModel] = None, explain: str = EXPLAIN_FULL
+) -> dict:
     """Compute prescription propensity score."""
-    factors = []
+    return compute_prescription_propensity_batch([data], model, explain)[0]
 
-    # Similar factor-based approach for prescription propensity
-    influence_map = {"key_opinion_leader": 0.9, "high": 0.7, "medium": 0.5, "low": 0.3}
-    influence_val = influence_map.get(data.get("influenceLevel", "medium"), 0.5)
 
-    factors.append({
-        "name": "influence_level",
-        "weight": 0.3,
-        "value": influence_val,
-        "description": f"Influence level: {data.get('influenceLevel', 'unknown')}",
-    })
+def compute_prescription_propensity_batch(
+    records: list[dict], model: Optional[CompiledScoreModel] = None, explain: str = EXPLAIN_FULL
+) -> list[dict]:
+    """
+    Factor-model propensity for many HCPs. Every factor is evaluated over
+    whole columns; the single-HCP path is a batch of one.
+    """
+    if not records:
+        return []
+    if model is None:
+        model = registry.get(PROPENSITY)
 
-    interaction_val = min(data.get("interactionCount", 0) / 20, 1.0)
-    factors.append({
-        "name": "interaction_engagement",
-        "weight": 0.3,
-        "value": interaction_val,
-        "description": f"{data.get('interactionCount', 0)} total interactions",
-    })
+    n = len(records)
+    hashes = input_data_hashes(records)
+    interaction_count = [r.get("interactionCount", 0) for r in records]
+    segment_count = [len(r.get("segments", [])) for r in records]
 
-    segment_val = 0.5 + (len(data.get("segments", [])) * 0.1)
-    segment_val = min(segment_val, 1.0)
-    factors.append({
-        "name": "segment_alignment",
-        "weight": 0.2,
-        "value": segment_val,
-        "description": f"Member of {len(data.get('segments', []))} relevant segments",
-    })
+    influence = model.levels.get("influence_level")
+    by_name = {
+        "influence_level": (
+            influence.lookup([r.get("influenceLevel", "medium") for r in records])
+            if influence is not None
+            else np.full(n, model.param("influence_level", "default", 0.5))
+        ),
+        "interaction_engagement": np.minimum(
+            np.array(interaction_count, dtype=np.float64)
+            / model.param("interaction_engagement", "scale", 20),
+            1.0,
+        ),
+        "segment_alignment": np.minimum(
+            model.param("segment_alignment", "base", 0.5)
+            + np.array(segment_count, dtype=np.float64)
+            * model.param("segment_alignment", "step", 0.1),
+            1.0,
+        ),
+        # Default; would be calibrated per therapeutic area
+        "specialty_relevance": np.full(n, model.param("specialty_relevance", "default", 0.6)),
+    }
+    values = np.column_stack([by_name[name] for name in model.names]).astype(np.float64)
+    scores = [
+        max(0, min(100, round(ratio * 100, 1))) for ratio in model.combine(values).tolist()
+    ]
+    computed_at = utc_now_iso()
 
-    specialty_val = 0.6  # Default; would be calibrated per therapeutic area
-    factors.append({
-        "name": "specialty_relevance",
-        "weight": 0.2,
-        "value": specialty_val,
-        "description": f"Specialty: {data.get('specialty', 'unknown')}",
-    })
+    explanations = None
+    if explain != EXPLAIN_NONE:
+        explained = {
+            "influence_level": [
+                ("propensity.influence", [r.get("influenceLevel", "unknown")]) for r in records
+            ],
+            "interaction_engagement": [
+                ("propensity.interactions", [count]) for count in interaction_count
+            ],
+            "segment_alignment": [("propensity.segments", [count]) for count in segment_count],
+            "specialty_relevance": [
+                ("propensity.specialty", [r.get("specialty", "unknown")]) for r in records
+            ],
+        }
+        explanations = [
+            [factor_explanation(explain, template, args) for template, args in explained[name]]
+            for name in model.names
+        ]
+
+    results = []
+    for i, (row, record) in enumerate(zip(values.tolist(), records)):
+        factors = [
+            {"name": name, "weight": weight, "value": value}
+            for name, weight, value in zip(model.names, model.weight_list, row)
+        ]
+        if explanations is not None:
+            for factor, column in zip(factors, explanations):
+                factor.update(column[i])
+        results.append({
+            "hcpId": record["hcpId"],
+            "scoreType": PROPENSITY,
+            "score": scores[i],
+            "confidence": 0.7,
+            "factors": factors,
+            "modelVersion": model.version,
+            "inputDataHash": hashes[i],
+            "computedAt": computed_at,
+        })
+    return results
 
-    weighted_sum = sum(f["weight"] * f["value"] for f in factors)
-    total_weight = sum(f["weight"] for f in factors)
-    final_score = round((weighted_sum / total_weight) * 100, 1) if total_weight > 0 else 0
 
+def propensity_scorer(
+    version: Optional[str] = None, explain: str = EXPLAIN_FULL
+) -> tuple[str, Callable[[list[dict]], list[dict]]]:
+    """
+    Resolve the propensity model to serve: (model version, batch scorer).
+
+    A trained artifact with the requested version (or the default artifact
+    when no version is given) takes precedence; otherwise the weighted
+    factor model of that version is used. Raises KeyError if neither exists.
+    """
+    artifact = propensity_models.get(version)
+    if artifact is not None:
+        return artifact.version, lambda records: artifact.score(records, explain)
+    model = registry.get(PROPENSITY, version)
+    return model.version, lambda records: compute_prescription_propensity_batch(
+        records, model, explain
+    )
+
+
+def is_default_version(score_type: str, version: str) -> bool:
+    """Whether version is the model served for score_type when none is requested."""
+    if score_type == PROPENSITY:
+        return version == propensity_scorer()[0]
+    return version == registry.get(score_type).version
+
+
+def propensity_cache_version(version: Optional[str] = None) -> str:
+    """
+    Cache version of the propensity model propensity_scorer() serves: the
+    version plus a fingerprint of its artifact or factor config.
+    """
+    artifact = propensity_models.get(version)
+    if artifact is not None:
+        return artifact.cache_version
+    return registry.get(PROPENSITY, version).cache_version
+
+
+def score_propensity_batch(
+    records: list[dict], version: Optional[str] = None, explain: str = EXPLAIN_FULL
+) -> list[dict]:
+    """
+    Score a batch with the propensity model resolved in the calling process.
+
+    Module-level so batches can be sent to executor worker processes, which
+    memory-map the same artifacts instead of receiving a pickled copy.
+    """
+    return propensity_scorer(version, explain)[1](records)
+
+
+# ─── Scoring inputs ────────────────────────────────────────────
+#
+# What each scorer reads from an HCP payload. The score cache keys on these
+# projections, so fields no scorer reads (previousScores, territoryId,
+# consent notes, ...) do not turn an unchanged score into a cache miss.
+
+def engagement_inputs(data: dict) -> dict:
+    """The fields of an HCP payload the engagement score depends on."""
+    columns = data.get("channelColumns")
     return {
         "hcpId": data["hcpId"],
-        "scoreType": "prescription_propensity",
-        "score": max(0, min(100, final_score)),
-        "confidence": 0.7,
-        "factors": factors,
-        "modelVersion": MODEL_VERSION,
-        "computedAt": datetime.utcnow().isoformat(),
+        "influenceLevel": data.get("influenceLevel"),
+        "interactionCount": data.get("interactionCount", 0),
+        "lastInteractionDate": data.get("lastInteractionDate"),
+        "channelHistory": [
+            [h.get("channel"), h.get("sentiment")] for h in data.get("channelHistory", [])
+        ],
+        "channelColumns": [columns["channel"], columns["sentiment"]] if columns else None,
+        "consentStatus": _consent_inputs(data.get("consentStatus", [])),
     }
 
 
-# ─── Factor scoring functions ──────────────────────────────────
-
-def _score_recency(last_date: Optional[str]) -> tuple[float, str]:
-    if not last_date:
-        return 0.1, "No prior interactions recorded"
-    try:
-        last = datetime.fromisoformat(last_date.replace("Z", "+00:00"))
-        days_ago = (datetime.now(last.tzinfo) - last).days
-        if days_ago <= 7:
-            return 0.95, f"Last interaction {days_ago} days ago (very recent)"
-        elif days_ago <= 30:
-            return 0.75, f"Last interaction {days_ago} days ago (recent)"
-        elif days_ago <= 90:
-            return 0.45, f"Last interaction {days_ago} days ago (moderate)"
+def propensity_inputs(data: dict) -> dict:
+    """
+    The fields of an HCP payload the propensity scores (factor model and
+    trained artifacts) depend on; lists only count by their length.
+    """
+    return {
+        "hcpId": data["hcpId"],
+        "influenceLevel": data.get("influenceLevel"),
+        "interactionCount": data.get("interactionCount", 0),
+        "specialty": data.get("specialty"),
+        "segmentCount": len(data.get("segments") or []),
+        "yearsOfPractice": data.get("yearsOfPractice"),
+        "therapeuticAreaCount": len(data.get("therapeuticAreas") or []),
+    }
+
+
+def _consent_inputs(consents: list[dict]) -> list[list]:
+    """The consent row fields consent_masks() reads, in list order (it breaks ties)."""
+    return [[c.get("consent_type"), c.get("status"), c.get("created_at")] for c in consents]
+
+
+# ─── Batch (vectorized) scoring ────────────────────────────────
+#
+# Records are flattened into column arrays once and all engagement factors
+# are evaluated over whole arrays with the compiled model's bucket tables.
+# The single-HCP path is the same kernel with one row.
+
+def compute_engagement_scores_batch(
+    records: list[dict], model: Optional[CompiledScoreModel] = None, explain: str = EXPLAIN_FULL
+) -> list[dict]:
+    """Compute engagement scores for many HCPs in one vectorized pass."""
+    if not records:
+        return []
+    columns = _engagement_columns(records)
+    return _engagement_results(
+        [r["hcpId"] for r in records], columns, model, explain, input_data_hashes(records)
+    )
+
+
+def compute_engagement_scores_columnar(
+    batch: dict, model: Optional[CompiledScoreModel] = None, explain: str = EXPLAIN_FULL
+) -> list[dict]:
+    """
+    Compute engagement scores from a struct-of-arrays batch.
+
+    `batch` follows ColumnarBatchScoringInput (or the Arrow decoding of it):
+    per-HCP arrays plus flat history/consent arrays sliced by offsets. No
+    per-interaction or per-consent Python objects are created.
+    """
+    if not batch["hcpIds"]:
+        return []
+    columns = _columnar_engagement_columns(batch)
+    return _engagement_results(
+        list(batch["hcpIds"]), columns, model, explain, _columnar_hashes(batch)
+    )
+
+
+def _engagement_results(
+    hcp_ids: list[str],
+    columns: dict,
+    model: Optional[CompiledScoreModel] = None,
+    explain: str = EXPLAIN_FULL,
+    hashes: Optional[list[str]] = None,
+) -> list[dict]:
+    """
+    Run the kernel and materialize one result dict per HCP. `hashes` are
+    the canonical input hashes of the HCPs (see app.services.input_hash).
+    """
+    if model is None:
+        model = registry.get(ENGAGEMENT)
+    values, ratios, data_points = _engagement_kernel(columns, model)
+    return _materialize_engagement(
+        hcp_ids, columns, values, ratios, data_points, model, explain, hashes
+    )
+
+
+def _materialize_engagement(
+    hcp_ids: list[str],
+    columns: dict,
+    values: np.ndarray,
+    ratios: np.ndarray,
+    data_points: np.ndarray,
+    model: CompiledScoreModel,
+    explain: str,
+    hashes: Optional[list[str]],
+) -> list[dict]:
+    """Result dicts (with explanations) for kernel output rows."""
+    computed_at = utc_now_iso()
+
+    explanations = None
+    if explain != EXPLAIN_NONE:
+        explanations = [
+            [factor_explanation(explain, template, args) for template, args in column]
+            for column in _engagement_explanations(columns, values, model)
+        ]
+    scores = [max(0, min(100, round(ratio * 100, 1))) for ratio in ratios.tolist()]
+    confidences = [round(points / 5, 2) for points in data_points.tolist()]
+
+    results = []
+    for i, (row, hcp_id) in enumerate(zip(values.tolist(), hcp_ids)):
+        factors = [
+            {"name": name, "weight": weight, "value": value}
+            for name, weight, value in zip(model.names, model.weight_list, row)
+        ]
+        if explanations is not None:
+            for factor, column in zip(factors, explanations):
+                factor.update(column[i])
+        results.append({
+            "hcpId": hcp_id,
+            "scoreType": ENGAGEMENT,
+            "score": scores[i],
+            "confidence": confidences[i],
+            "factors": factors,
+            "modelVersion": model.version,
+            "inputDataHash": hashes[i] if hashes is not None else None,
+            "computedAt": computed_at,
+        })
+    return results
+
+
+def compute_engagement_top_k(
+    records: list[dict],
+    k: int,
+    model: Optional[CompiledScoreModel] = None,
+    explain: str = EXPLAIN_FULL,
+) -> list[dict]:
+    """
+    The k highest engagement scores of a batch, best first.
+
+    The whole batch goes through the vectorized kernel, but result dicts,
+    explanations and input hashes are built for the k winners only. Ties
+    keep input order. Each winner is identical to its batch result.
+    """
+    return compute_engagement_top_k_rows(records, k, model, explain)[1]
+
+
+def compute_engagement_top_k_rows(
+    records: list[dict],
+    k: int,
+    model: Optional[CompiledScoreModel] = None,
+    explain: str = EXPLAIN_FULL,
+) -> tuple[list[int], list[dict]]:
+    """
+    compute_engagement_top_k() plus each winner's index in `records`, which
+    pairs results with their inputs even when a book repeats an hcpId.
+    """
+    if not records or k <= 0:
+        return [], []
+    if model is None:
+        model = registry.get(ENGAGEMENT)
+    columns = _engagement_columns(records)
+    values, ratios, data_points = _engagement_kernel(columns, model)
+    rows = top_k_rows(ratios, k)
+    winners = [records[i] for i in rows.tolist()]
+    return rows.tolist(), _materialize_engagement(
+        [r["hcpId"] for r in winners],
+        _take_rows(columns, rows),
+        values[rows],
+        ratios[rows],
+        data_points[rows],
+        model,
+        explain,
+        input_data_hashes(winners),
+    )
+
+
+def top_k_rows(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k largest values, largest first and ties in index order.
+
+    argpartition finds the k-th largest value in O(n); only the rows at or
+    above it are sorted.
+    """
+    n = len(values)
+    if k >= n:
+        return np.lexsort((np.arange(n), -values))
+    threshold = values[np.argpartition(-values, k - 1)[k - 1]]
+    candidates = np.flatnonzero(values >= threshold)
+    order = np.lexsort((candidates, -values[candidates]))
+    return candidates[order[:k]]
+
+
+def _take_rows(columns: dict, rows: np.ndarray) -> dict:
+    """
+    Restrict evaluated kernel columns to some HCPs, for explanations.
+
+    Per-HCP arrays and lists are indexed; channel_names and now_seconds are
+    shared. Flat history arrays are dropped (the kernel has already reduced
+    them to diversity and first_channel).
+    """
+    picked = rows.tolist()
+    taken = {"n": len(picked), "channel_names": columns["channel_names"]}
+    for name in (
+        "last_state", "days_ago", "interaction_count", "history_len", "diversity",
+        "first_channel", "sentiment_count", "sentiment_avg", "consent_total",
+        "consent_granted",
+    ):
+        taken[name] = columns[name][rows]
+    taken["influence_raw"] = [columns["influence_raw"][i] for i in picked]
+    taken["bins"] = {name: bins[rows] for name, bins in columns["bins"].items()}
+    return taken
+
+
+def _engagement_columns(records: list[dict]) -> dict:
+    """Flatten HCP records into the column arrays consumed by the kernel."""
+    n = len(records)
+    interaction_count = np.zeros(n, dtype=np.int64)
+    history_len = np.zeros(n, dtype=np.int64)
+    influence_raw = [None] * n
+
+    flat_channels = []
+    flat_sentiments = []
+
+    for i, record in enumerate(records):
+        interaction_count[i] = record.get("interactionCount", 0)
+        influence_raw[i] = record.get("influenceLevel")
+
+        columns = record.get("channelColumns")
+        if columns:
+            history_len[i] = len(columns["channel"])
+            flat_channels.extend(map(CHANNELS.__getitem__, columns["channel"]))
+            flat_sentiments.extend(columns["sentiment"])
         else:
-            return 0.15, f"Last interaction {days_ago} days ago (stale)"
-    except (ValueError, TypeError):
-        return 0.3, "Unable to parse last interaction date"
-
-
-def _score_frequency(count: int) -> tuple[float, str]:
-    if count == 0:
-        return 0.1, "No interactions recorded"
-    elif count <= 3:
-        return 0.4, f"{count} interactions (low frequency)"
-    elif count <= 10:
-        return 0.7, f"{count} interactions (moderate frequency)"
-    elif count <= 25:
-        return 0.85, f"{count} interactions (high frequency)"
-    else:
-        return 0.95, f"{count} interactions (very high frequency)"
-
-
-def _score_channel_diversity(history: list[dict]) -> tuple[float, str]:
-    if not history:
-        return 0.1, "No channel history"
-    channels = set(h.get("channel") for h in history if h.get("channel"))
-    diversity = len(channels)
-    if diversity >= 4:
-        return 0.95, f"Engaged across {diversity} channels (excellent diversity)"
-    elif diversity >= 3:
-        return 0.75, f"Engaged across {diversity} channels (good diversity)"
-    elif diversity >= 2:
-        return 0.5, f"Engaged across {diversity} channels (moderate)"
+            history = record.get("channelHistory", [])
+            history_len[i] = len(history)
+            flat_channels.extend([h.get("channel") for h in history])
+            flat_sentiments.extend([h.get("sentiment") for h in history])
+
+    # Factorize channel names once for the whole batch; falsy names are
+    # ignored by the diversity factor, as in the single path.
+    channel_names = list(dict.fromkeys(flat_channels))
+    channel_codes = {name: code for code, name in enumerate(channel_names)}
+    codes = np.fromiter(
+        map(channel_codes.__getitem__, flat_channels),
+        dtype=np.int64,
+        count=len(flat_channels),
+    )
+    owner = np.repeat(np.arange(n), history_len)
+    named = np.array([bool(c) for c in channel_names], dtype=bool)
+    keep = named[codes] if len(codes) else np.zeros(0, dtype=bool)
+
+    # None sentiments become NaN and drop out of the sentiment factor
+    sentiments = np.array(flat_sentiments, dtype=np.float64)
+    has_sentiment = ~np.isnan(sentiments)
+
+    return {
+        "n": n,
+        **_recency_columns([r.get("lastInteractionDate") for r in records]),
+        "interaction_count": interaction_count,
+        "history_len": history_len,
+        "hist_owner": owner[keep],
+        "hist_channel": codes[keep],
+        "channel_names": channel_names,
+        "sentiment_sum": np.bincount(
+            owner[has_sentiment], weights=sentiments[has_sentiment], minlength=n
+        ),
+        "sentiment_count": np.bincount(owner[has_sentiment], minlength=n),
+        "influence_raw": influence_raw,
+        **_consent_columns(consent_masks([r.get("consentStatus", []) for r in records])),
+    }
+
+
+def _columnar_engagement_columns(batch: dict) -> dict:
+    """Build kernel columns from a struct-of-arrays batch without per-row objects."""
+    n = len(batch["hcpIds"])
+
+    last_at = np.array(batch["lastInteractionAt"], dtype=np.float64)
+    has_last = ~np.isnan(last_at)
+
+    history = batch["history"]
+    history_offsets = np.asarray(batch["historyOffsets"], dtype=np.int64)
+    history_len = np.diff(history_offsets)
+    owner = np.repeat(np.arange(n), history_len)
+    sentiments = np.array(history["sentiment"], dtype=np.float64)
+    has_sentiment = ~np.isnan(sentiments)
+
+    return {
+        "n": n,
+        "last_state": np.where(has_last, _DATE_PARSED, _DATE_MISSING).astype(np.int8),
+        "last_seconds": np.where(has_last, last_at, 0.0),
+        "now_seconds": utc_now_seconds(),
+        "interaction_count": np.asarray(batch["interactionCounts"], dtype=np.int64),
+        "history_len": history_len,
+        "hist_owner": owner,
+        "hist_channel": np.asarray(history["channel"], dtype=np.int64),
+        "channel_names": list(CHANNELS),
+        "sentiment_sum": np.bincount(
+            owner[has_sentiment], weights=sentiments[has_sentiment], minlength=n
+        ),
+        "sentiment_count": np.bincount(owner[has_sentiment], minlength=n),
+        "influence_raw": list(batch["influenceLevels"]),
+        **_consent_columns(consent_masks_from_columns(
+            batch["consentOffsets"], batch["consentTypes"], batch["consentStatuses"]
+        )),
+    }
+
+
+def _columnar_hashes(batch: dict) -> list[str]:
+    """Input hash per HCP of a columnar batch, over that HCP's slices."""
+    history = batch["history"]
+    history_offsets = list(batch["historyOffsets"])
+    consent_offsets = list(batch["consentOffsets"])
+    hashes = []
+    for i, hcp_id in enumerate(batch["hcpIds"]):
+        start, end = history_offsets[i], history_offsets[i + 1]
+        consent_start, consent_end = consent_offsets[i], consent_offsets[i + 1]
+        hashes.append(input_data_hash({
+            "hcpId": hcp_id,
+            "influenceLevel": batch["influenceLevels"][i],
+            "interactionCount": batch["interactionCounts"][i],
+            "lastInteractionAt": batch["lastInteractionAt"][i],
+            "history": {name: column[start:end] for name, column in history.items()},
+            "consentTypes": batch["consentTypes"][consent_start:consent_end],
+            "consentStatuses": batch["consentStatuses"][consent_start:consent_end],
+        }))
+    return hashes
+
+
+def _feature_columns(
+    records: list[dict], features: list[dict], consents: Optional[ConsentMasks] = None
+) -> dict:
+    """Build kernel columns from shared feature records (see hcp_features)."""
+    n = len(records)
+
+    # channel_stats keys are already distinct per HCP
+    channel_names = []
+    diversity = []
+    first_channel = []
+    for f in features:
+        named = [c for c in f["channel_stats"] if c]
+        first_channel.append(len(channel_names) if named else -1)
+        diversity.append(len(named))
+        channel_names.extend(named)
+    if consents is None:
+        consents = consent_masks([r.get("consentStatus", []) for r in records])
+
+    return {
+        "n": n,
+        **_recency_columns([r.get("lastInteractionDate") for r in records]),
+        "interaction_count": np.array(
+            [r.get("interactionCount", 0) for r in records], dtype=np.int64
+        ),
+        "history_len": np.array([f["history_len"] for f in features], dtype=np.int64),
+        "channel_names": channel_names,
+        "diversity": np.array(diversity, dtype=np.int64),
+        "first_channel": np.array(first_channel, dtype=np.int64),
+        "sentiment_sum": np.array([f["sentiment_sum"] for f in features], dtype=np.float64),
+        "sentiment_count": np.array([f["sentiment_count"] for f in features], dtype=np.int64),
+        "influence_raw": [r.get("influenceLevel") for r in records],
+        **_consent_columns(consents),
+    }
+
+
+def _consent_columns(consents: ConsentMasks) -> dict:
+    """Consent types on record and granted, counted from the consent masks."""
+    return {
+        "consent_total": granted_count(consents.recorded),
+        "consent_granted": granted_count(consents.granted),
+    }
+
+
+def _recency_columns(dates: list[Optional[str]]) -> dict:
+    """Parse state, epoch seconds and reference time for last-interaction dates."""
+    seconds = epoch_seconds(parse_timestamps(dates))
+    parsed = ~np.isnan(seconds)
+    missing = np.array([not d for d in dates], dtype=bool)
+    return {
+        "last_state": np.where(
+            missing, _DATE_MISSING, np.where(parsed, _DATE_PARSED, _DATE_INVALID)
+        ).astype(np.int8),
+        "last_seconds": np.where(parsed, seconds, 0.0),
+        "now_seconds": utc_now_seconds(),
+    }
+
+
+def _engagement_kernel(
+    columns: dict, model: CompiledScoreModel
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Evaluate the engagement factors over whole arrays.
+
+    Returns the (n, k) factor value matrix in the model's factor order, the
+    weighted score ratio per HCP (0..1, before scaling and rounding) and the
+    data-completeness count used for confidence.
+    """
+    n = columns["n"]
+    by_name = {}
+    bins = columns["bins"] = {}
+
+    # Recency
+    last_state = columns["last_state"]
+    days_ago = np.floor(
+        (columns["now_seconds"] - columns["last_seconds"]) / 86400
+    ).astype(np.int64)
+    columns["days_ago"] = days_ago
+    if "interaction_recency" in model.index:
+        table = model.tables["interaction_recency"]
+        bins["interaction_recency"] = table.index(days_ago)
+        recency = table.values[bins["interaction_recency"]]
+        recency = np.where(
+            last_state == _DATE_MISSING, model.param("interaction_recency", "missing"), recency
+        )
+        recency = np.where(
+            last_state == _DATE_INVALID, model.param("interaction_recency", "invalid"), recency
+        )
+        by_name["interaction_recency"] = recency
+
+    # Frequency
+    count = columns["interaction_count"]
+    if "interaction_frequency" in model.index:
+        table = model.tables["interaction_frequency"]
+        bins["interaction_frequency"] = table.index(count)
+        by_name["interaction_frequency"] = table.values[bins["interaction_frequency"]]
+
+    # Channel diversity (distinct channels per HCP); builders that already
+    # hold distinct channels per HCP supply both columns directly
+    if "diversity" not in columns:
+        _distinct_channels(columns)
+    diversity = columns["diversity"]
+    if "channel_diversity" in model.index:
+        table = model.tables["channel_diversity"]
+        bins["channel_diversity"] = table.index(diversity)
+        by_name["channel_diversity"] = np.where(
+            columns["history_len"] == 0,
+            model.param("channel_diversity", "missing"),
+            table.values[bins["channel_diversity"]],
+        )
+
+    # Sentiment (builders sum with bincount, which adds in input order and so
+    # matches a running sum over the history)
+    sent_count = columns["sentiment_count"]
+    avg = np.divide(
+        columns["sentiment_sum"], sent_count, out=np.zeros(n), where=sent_count > 0
+    )
+    columns["sentiment_avg"] = avg
+    by_name["sentiment_trend"] = np.where(
+        sent_count > 0, (avg + 1) / 2, model.param("sentiment_trend", "missing", 0.5)
+    )
+
+    # Influence
+    if "influence_level" in model.index:
+        by_name["influence_level"] = model.level_values(
+            "influence_level", columns["influence_raw"]
+        )
+
+    # Consent breadth
+    total = columns["consent_total"]
+    by_name["consent_breadth"] = np.where(
+        total > 0,
+        columns["consent_granted"] / np.maximum(total, 1),
+        model.param("consent_breadth", "missing", 0.1),
+    )
+
+    values = np.column_stack([by_name[name] for name in model.names]).astype(np.float64)
+    ratios = model.combine(values)
+
+    data_points = (
+        (last_state != _DATE_MISSING).astype(np.int64)
+        + (count > 0)
+        + (columns["history_len"] > 0)
+        + np.array([bool(level) for level in columns["influence_raw"]])
+        + (total > 0)
+    )
+    return values, ratios, data_points
+
+
+def _distinct_channels(columns: dict) -> None:
+    """Count distinct channels and find the first channel of each HCP."""
+    n = columns["n"]
+    owner = columns["hist_owner"]
+    n_channels = max(len(columns["channel_names"]), 1)
+    pairs = np.unique(owner * n_channels + columns["hist_channel"])
+    first_channel = np.full(n, -1, dtype=np.int64)
+    owners, first_index = np.unique(owner, return_index=True)
+    first_channel[owners] = columns["hist_channel"][first_index]
+    columns["diversity"] = np.bincount(pairs // n_channels, minlength=n)
+    columns["first_channel"] = first_channel
+
+
+def _engagement_explanations(
+    columns: dict, values: np.ndarray, model: CompiledScoreModel
+) -> list[list[tuple[str, list]]]:
+    """(template, args) per HCP, column by column, in the model's factor order."""
+    explained = {}
+    bins = columns["bins"]
+
+    if "interaction_recency" in model.index:
+        labels = model.tables["interaction_recency"].labels_at(bins["interaction_recency"])
+        explained["interaction_recency"] = [
+            ("recency.none", []) if state == _DATE_MISSING
+            else ("recency.invalid", []) if state == _DATE_INVALID
+            else ("recency.days", [days_ago, label])
+            for state, days_ago, label in zip(
+                columns["last_state"].tolist(), columns["days_ago"].tolist(), labels
+            )
+        ]
+
+    if "interaction_frequency" in model.index:
+        counts = columns["interaction_count"]
+        labels = model.tables["interaction_frequency"].labels_at(
+            bins["interaction_frequency"]
+        )
+        explained["interaction_frequency"] = [
+            ("frequency.count", [count, label]) if count else ("frequency.none", [])
+            for count, label in zip(counts.tolist(), labels)
+        ]
+
+    if "channel_diversity" in model.index:
+        names = columns["channel_names"]
+        diversity_bins = bins["channel_diversity"].tolist()
+        labels = model.tables["channel_diversity"].labels_at(bins["channel_diversity"])
+        explained["channel_diversity"] = [
+            ("diversity.none", []) if history_len == 0
+            else ("diversity.multi", [diversity, label]) if bin_index > 0
+            else ("diversity.single", [names[first] if first >= 0 else "none"])
+            for history_len, diversity, first, label, bin_index in zip(
+                columns["history_len"].tolist(),
+                columns["diversity"].tolist(),
+                columns["first_channel"].tolist(),
+                labels,
+                diversity_bins,
+            )
+        ]
+
+    if "sentiment_trend" in model.index:
+        normalized = values[:, model.index["sentiment_trend"]]
     else:
-        return 0.3, f"Single channel engagement ({list(channels)[0] if channels else 'none'})"
-
-
-def _score_sentiment(history: list[dict]) -> tuple[float, str]:
-    sentiments = [h["sentiment"] for h in history if h.get("sentiment") is not None]
-    if not sentiments:
-        return 0.5, "No sentiment data available (neutral assumed)"
-    avg = sum(sentiments) / len(sentiments)
-    normalized = (avg + 1) / 2  # Convert -1..1 to 0..1
-    if normalized > 0.7:
-        return normalized, f"Positive sentiment trend (avg: {avg:.2f})"
-    elif normalized > 0.4:
-        return normalized, f"Neutral sentiment (avg: {avg:.2f})"
+        normalized = np.full(columns["n"], 0.5)
+    bands = _SENTIMENT_BANDS.labels_at(_SENTIMENT_BANDS.index(normalized))
+    sentiment = [
+        (band, [round(avg, 2)]) if count else ("sentiment.none", [])
+        for count, avg, band in zip(
+            columns["sentiment_count"].tolist(), columns["sentiment_avg"].tolist(), bands
+        )
+    ]
+    explained["sentiment_trend"] = sentiment
+
+    explained["influence_level"] = [
+        _INFLUENCE_TEMPLATES.get(level or "medium", ("influence.unknown", [level]))
+        for level in columns["influence_raw"]
+    ]
+
+    explained["consent_breadth"] = [
+        ("consent.granted", [granted, total]) if total else ("consent.none", [])
+        for granted, total in zip(
+            columns["consent_granted"].tolist(), columns["consent_total"].tolist()
+        )
+    ]
+
+    return [explained[name] for name in model.names]
+
+
+# ─── What-if sensitivity ───────────────────────────────────────
+#
+# Scenarios perturb one HCP: field overrides and/or extra interactions. The
+# HCP's history is flattened once; each scenario row reuses those columns
+# and adds only its own changes, so every scenario is evaluated in the same
+# kernel pass as the baseline (row 0).
+
+def compute_engagement_sensitivity(
+    data: dict,
+    scenarios: list[dict],
+    model: Optional[CompiledScoreModel] = None,
+    explain: str = EXPLAIN_FULL,
+) -> dict:
+    """
+    Score what-if scenarios for one HCP against its baseline.
+
+    Each scenario may override interactionCount, lastInteractionDate,
+    influenceLevel or consentStatus, and may add interactions
+    (`addInteractions`). Added interactions join the channel history, count
+    towards interactionCount unless it is overridden, and move the last
+    interaction date forward when they are dated later.
+
+    Returns the baseline result (explained per `explain`) and, per scenario,
+    its score, its score delta, each factor's value and each factor's
+    effect in score points (weight share x value change x 100).
+    """
+    if model is None:
+        model = registry.get(ENGAGEMENT)
+    columns = _scenario_columns(data, scenarios)
+    values, ratios, data_points = _engagement_kernel(columns, model)
+    first = np.arange(1)
+    baseline = _materialize_engagement(
+        [data["hcpId"]], _take_rows(columns, first), values[first], ratios[first],
+        data_points[first], model, explain, [input_data_hash(data)],
+    )[0]
+
+    scores = [max(0, min(100, round(ratio * 100, 1))) for ratio in ratios.tolist()]
+    value_deltas = values[1:] - values[0]
+    if model.total_weight > 0:
+        effects = value_deltas * (model.weights / model.total_weight * 100)
     else:
-        return normalized, f"Negative sentiment trend (avg: {avg:.2f})"
+        effects = np.zeros_like(value_deltas)
+
+    names = model.names
+    results = []
+    for i, (scenario, row, row_effects) in enumerate(
+        zip(scenarios, values[1:].tolist(), effects.round(2).tolist()), start=1
+    ):
+        results.append({
+            "name": scenario.get("name") or f"scenario-{i}",
+            "score": scores[i],
+            "delta": round(scores[i] - scores[0], 1),
+            "values": dict(zip(names, row)),
+            "effects": dict(zip(names, row_effects)),
+        })
+    return {
+        "hcpId": data["hcpId"],
+        "scoreType": ENGAGEMENT,
+        "modelVersion": model.version,
+        "baseline": baseline,
+        "scenarios": results,
+    }
+
+
+def _scenario_columns(data: dict, scenarios: list[dict]) -> dict:
+    """Kernel columns with the baseline in row 0 and one row per scenario."""
+    base = _engagement_columns([data])
+    n = len(scenarios) + 1
+    rows = np.arange(n)
+
+    added = [[]] + [s.get("addInteractions") or [] for s in scenarios]
+    added_len = np.array([len(a) for a in added], dtype=np.int64)
+    flat = [(row, h) for row, interactions in enumerate(added) for h in interactions]
+    flat_rows = np.array([row for row, _ in flat], dtype=np.int64)
+
+    # Recency: overridden dates, then later-dated added interactions
+    base_date = data.get("lastInteractionDate")
+    recency = _recency_columns(
+        [base_date] + [s.get("lastInteractionDate") or base_date for s in scenarios]
+    )
+    added_seconds = epoch_seconds(parse_timestamps([h.get("date") for _, h in flat]))
+    dated = ~np.isnan(added_seconds)
+    latest = np.where(recency["last_state"] == _DATE_PARSED, recency["last_seconds"], -np.inf)
+    np.maximum.at(latest, flat_rows[dated], added_seconds[dated])
+    has_latest = latest > -np.inf
+    recency["last_state"] = np.where(
+        has_latest, _DATE_PARSED, recency["last_state"]
+    ).astype(np.int8)
+    recency["last_seconds"] = np.where(has_latest, latest, 0.0)
+
+    # Channel history: the baseline's channels in every row, plus additions
+    channel_names = list(base["channel_names"])
+    channel_codes = {name: code for code, name in enumerate(channel_names)}
+    for _, h in flat:
+        if h.get("channel") and h["channel"] not in channel_codes:
+            channel_codes[h["channel"]] = len(channel_names)
+            channel_names.append(h["channel"])
+    named = np.array([bool(h.get("channel")) for _, h in flat], dtype=bool)
+    # Distinct baseline channels in first-seen order give the same diversity
+    # and first channel as the full history
+    base_channels = np.array(list(dict.fromkeys(base["hist_channel"].tolist())), dtype=np.int64)
+    hist_owner = np.concatenate([np.repeat(rows, len(base_channels)), flat_rows[named]])
+    hist_channel = np.concatenate([
+        np.tile(base_channels, n),
+        np.array([channel_codes[h["channel"]] for _, h in flat if h.get("channel")],
+                 dtype=np.int64),
+    ])
+
+    sentiments = np.array([h.get("sentiment") for _, h in flat], dtype=np.float64)
+    has_sentiment = ~np.isnan(sentiments)
+
+    count = np.array([
+        s["interactionCount"] if s.get("interactionCount") is not None
+        else data.get("interactionCount", 0) + len(s.get("addInteractions") or [])
+        for s in [{}] + scenarios
+    ], dtype=np.int64)
+    # Consent: the baseline's counts unless a scenario replaces the consents
+    overridden = [i for i, s in enumerate(scenarios, start=1)
+                  if s.get("consentStatus") is not None]
+    consent_total = np.repeat(base["consent_total"], n)
+    consent_granted = np.repeat(base["consent_granted"], n)
+    if overridden:
+        override = _consent_columns(
+            consent_masks([scenarios[i - 1]["consentStatus"] for i in overridden])
+        )
+        consent_total[overridden] = override["consent_total"]
+        consent_granted[overridden] = override["consent_granted"]
+
+    return {
+        "n": n,
+        **recency,
+        "interaction_count": count,
+        "history_len": base["history_len"][0] + added_len,
+        "hist_owner": hist_owner,
+        "hist_channel": hist_channel,
+        "channel_names": channel_names,
+        "sentiment_sum": base["sentiment_sum"][0] + np.bincount(
+            flat_rows[has_sentiment], weights=sentiments[has_sentiment], minlength=n
+        ),
+        "sentiment_count": base["sentiment_count"][0] + np.bincount(
+            flat_rows[has_sentiment], minlength=n
+        ),
+        "influence_raw": [data.get("influenceLevel")] + [
+            s.get("influenceLevel") or data.get("influenceLevel") for s in scenarios
+        ],
+        "consent_total": consent_total,
+        "consent_granted": consent_granted,
+    }
+
+
+# ─── Incremental scoring ───────────────────────────────────────
+#
+# An engagement state summarizes everything the history-dependent factors
+# need: sentiment sum and count, a bitset of channels used (bit k is
+# CHANNELS[k]) plus the distinct channels outside CHANNELS by name, the
+# latest interaction date and the running interaction count. Folding new
+# interactions into a state costs O(new interactions), however long the
+# history already is.
+
+def empty_engagement_state() -> dict:
+    return {
+        "sentimentSum": 0.0,
+        "sentimentCount": 0,
+        "channelMask": 0,
+        "otherChannels": [],
+        "lastInteractionDate": None,
+        "interactionCount": 0,
+    }
+
 
+def update_engagement_state(
+    state: Optional[dict],
+    interactions: list[dict],
+    last_interaction_date: Optional[str] = None,
+) -> dict:
+    """Fold new interactions into a previous engagement state."""
+    updated = {**empty_engagement_state(), **(state or {})}
+    sentiment_sum = updated["sentimentSum"]
+    sentiment_count = updated["sentimentCount"]
+    mask = updated["channelMask"]
+    others = list(updated["otherChannels"])
 
-def _score_influence(level: Optional[str]) -> tuple[float, str]:
-    mapping = {
-        "key_opinion_leader": (0.95, "Key Opinion Leader — highest strategic value"),
-        "high": (0.75, "High influence — strong strategic importance"),
-        "medium": (0.5, "Medium influence — standard engagement priority"),
-        "low": (0.25, "Low influence — lower engagement priority"),
+    for h in interactions:
+        channel = h.get("channel")
+        code = CHANNEL_CODES.get(channel)
+        if code is not None:
+            mask |= 1 << code
+        elif channel and channel not in others:
+            # Off-list channels still count towards diversity, as in a full score
+            others.append(channel)
+        if h.get("sentiment") is not None:
+            sentiment_sum += h["sentiment"]
+            sentiment_count += 1
+
+    updated.update({
+        "sentimentSum": sentiment_sum,
+        "sentimentCount": sentiment_count,
+        "channelMask": mask,
+        "otherChannels": others,
+        "lastInteractionDate": _latest_date([
+            updated["lastInteractionDate"],
+            *(h.get("date") for h in interactions),
+            last_interaction_date,
+        ]),
+        "interactionCount": updated["interactionCount"] + len(interactions),
+    })
+    return updated
+
+
+def compute_engagement_score_incremental(
+    data: dict, model: Optional[CompiledScoreModel] = None, explain: str = EXPLAIN_FULL
+) -> dict:
+    """
+    Update an engagement score from new interactions only.
+
+    `data["state"]` is the state returned by the previous call (or None for a
+    first score) and `data["newInteractions"]` the interactions logged since.
+    The result equals scoring the full history at once, and carries the new
+    state to send with the next delta.
+    """
+    state = update_engagement_state(
+        data.get("state"),
+        data.get("newInteractions", []),
+        data.get("lastInteractionDate"),
+    )
+    result = _engagement_results(
+        [data["hcpId"]], _state_columns([data], [state]), model, explain,
+        [input_data_hash(data)],
+    )[0]
+    result["state"] = state
+    return result
+
+
+def _state_columns(records: list[dict], states: list[dict]) -> dict:
+    """Build kernel columns from engagement states instead of full history."""
+    n = len(states)
+    masks = np.array([s["channelMask"] for s in states], dtype=np.int64)
+    bits = (masks[:, None] >> np.arange(len(CHANNELS))) & 1
+    owner, code = np.nonzero(bits)
+    count = np.array([s["interactionCount"] for s in states], dtype=np.int64)
+
+    # Off-list channels get codes after CHANNELS, one per (HCP, name)
+    channel_names = list(CHANNELS)
+    other_owner = []
+    for i, state in enumerate(states):
+        others = state.get("otherChannels") or []
+        other_owner.extend([i] * len(others))
+        channel_names.extend(others)
+    if other_owner:
+        owner = np.concatenate([owner, np.array(other_owner, dtype=owner.dtype)])
+        code = np.concatenate([code, np.arange(len(CHANNELS), len(channel_names))])
+        order = np.argsort(owner, kind="stable")
+        owner, code = owner[order], code[order]
+
+    influence_raw = [r.get("influenceLevel") for r in records]
+
+    return {
+        "n": n,
+        **_recency_columns([s["lastInteractionDate"] for s in states]),
+        "interaction_count": count,
+        "history_len": count,
+        "hist_owner": owner,
+        "hist_channel": code,
+        "channel_names": channel_names,
+        "sentiment_sum": np.array([s["sentimentSum"] for s in states], dtype=np.float64),
+        "sentiment_count": np.array([s["sentimentCount"] for s in states], dtype=np.int64),
+        "influence_raw": influence_raw,
+        **_consent_columns(consent_masks([r.get("consentStatus", []) for r in records])),
     }
-    return mapping.get(level or "medium", (0.5, f"Unknown influence level: {level}"))
 
 
-def _score_consent(consents: list[dict]) -> tuple[float, str]:
-    granted = [c for c in consents if c.get("status") == "granted"]
-    if not consents:
-        return 0.1, "No consent records"
-    ratio = len(granted) / max(len(consents), 1)
-    return ratio, f"{len(granted)} of {len(consents)} consent types granted"
+def _latest_date(dates: list[Optional[str]]) -> Optional[str]:
+    """
+    Latest of several ISO dates, returned as given. Unparseable dates lose to
+    any parseable one; ties keep the earliest entry.
+    """
+    present = [d for d in dates if d]
+    if not present:
+        return None
+    seconds = epoch_seconds(parse_timestamps(present))
+    if np.isnan(seconds).all():
+        return present[0]
+    return present[int(np.nanargmax(seconds))]
@@ -11,6 +11,10 @@ Output: Segment assignments with confidence and reasoning
 from typing import Optional
 import numpy as np
 
+from app.services.explanations import EXPLAIN_FULL, EXPLAIN_NONE, reasoning_explanation
+from app.services.factor_registry import LevelTable
+from app.services.input_hash import input_data_hashes
+
 MODEL_VERSION = "segmentation-v1.0"
 
 # Pre-defined segment templates (production would learn from data)
@@ -41,80 +45,103 @@ SEGMENTS = {
 }
 
 
-def segment_hcps(hcps: list[dict]) -> list[dict]:
-    """Assign each HCP to the most appropriate segment."""
-    results = []
-
-    for hcp in hcps:
-        segment, confidence, reasoning = _classify_hcp(hcp)
-        results.append({
+# Influence score per level; unknown levels score as medium
+INFLUENCE_SCORES = LevelTable(
+    {"key_opinion_leader": 1.0, "high": 0.8, "medium": 0.5, "low": 0.2}, 0.5
+)
+
+# Rules in priority order (the first match assigns the segment): the
+# segment and reasoning template of each rule
+_KOL, _HIGH_VALUE, _NEW_TARGET, _AT_RISK, _GROWING, _STANDARD = range(6)
+_RULE_SEGMENTS = [
+    "kol_network",
+    "high_value_engaged",
+    "new_targets",
+    "at_risk_disengaged",
+    "growing_potential",
+    "growing_potential",
+]
+_RULE_TEMPLATES = [
+    "segment.kol",
+    "segment.high_value",
+    "segment.new_target",
+    "segment.at_risk",
+    "segment.growing",
+    "segment.standard",
+]
+
+
+def segment_hcps(hcps: list[dict], explain: str = EXPLAIN_FULL) -> list[dict]:
+    """
+    Assign each HCP to the most appropriate segment. `explain` selects how
+    the reasoning is returned (see app.services.explanations).
+
+    The rules are evaluated over whole columns with thresholds read from
+    SEGMENTS, so a population is classified without a per-HCP ladder.
+    """
+    if not hcps:
+        return []
+    influence = [hcp.get("influenceLevel", "medium") for hcp in hcps]
+    interactions = [hcp.get("interactionCount", 0) for hcp in hcps]
+    sentiment = [hcp.get("avgSentiment", 0) for hcp in hcps]
+    rules, confidence = _classify(influence, interactions, sentiment)
+    rules = rules.tolist()
+
+    explanations = [{}] * len(hcps)
+    if explain != EXPLAIN_NONE:
+        explanations = [
+            reasoning_explanation(explain, [_reason(rule, level, count, avg)])
+            for rule, level, count, avg in zip(rules, influence, interactions, sentiment)
+        ]
+    return [
+        {
             "hcpId": hcp.get("id", "unknown"),
-            "segmentName": segment,
-            "confidence": confidence,
-            "reasoning": reasoning,
-        })
-
-    return results
-
-
-def _classify_hcp(hcp: dict) -> tuple[str, float, str]:
-    """Classify a single HCP into a segment with explanation."""
-    influence = hcp.get("influenceLevel", "medium")
-    interactions = hcp.get("interactionCount", 0)
-    avg_sentiment = hcp.get("avgSentiment", 0)
-
-    influence_map = {
-        "key_opinion_leader": 1.0,
-        "high": 0.8,
-        "medium": 0.5,
-        "low": 0.2,
-    }
-    influence_score = influence_map.get(influence, 0.5)
-
-    # Rule-based classification
-    if influence == "key_opinion_leader":
-        return (
-            "kol_network",
-            0.95,
-            f"Key Opinion Leader classification. Influence: {influence}, "
-            f"Interactions: {interactions}."
-        )
-
-    if influence_score >= 0.7 and interactions >= 10:
-        return (
-            "high_value_engaged",
-            round(min(0.9, 0.6 + influence_score * 0.3), 2),
-            f"High influence ({influence}) with strong engagement "
-            f"({interactions} interactions)."
-        )
-
-    if interactions <= 3:
-        return (
-            "new_targets",
-            0.8,
-            f"Limited engagement history ({interactions} interactions). "
-            f"New target for outreach."
+            "segmentName": _RULE_SEGMENTS[rule],
+            "confidence": conf,
+            **explained,
+            "inputDataHash": input_hash,
+        }
+        for hcp, rule, conf, explained, input_hash in zip(
+            hcps, rules, confidence, explanations, input_data_hashes(hcps)
         )
-
-    if interactions >= 5 and avg_sentiment < -0.2:
-        return (
-            "at_risk_disengaged",
-            round(0.7 + abs(avg_sentiment) * 0.2, 2),
-            f"Previously engaged ({interactions} interactions) but declining "
-            f"sentiment ({avg_sentiment:.2f}). At risk of disengagement."
-        )
-
-    if influence_score >= 0.4 and interactions >= 3:
-        return (
-            "growing_potential",
-            round(0.6 + influence_score * 0.2, 2),
-            f"Medium influence ({influence}) with growing engagement "
-            f"({interactions} interactions). Potential for increased value."
-        )
-
-    return (
-        "growing_potential",
-        0.5,
-        f"Standard classification. Influence: {influence}, "
-        f"Interactions: {interactions}."
-    )
+    ]
+
+
+def _classify(
+    influence: list[Optional[str]], interactions: list, sentiment: list
+) -> tuple[np.ndarray, list[float]]:
+    """Rule index and rounded confidence per HCP."""
+    positions = INFLUENCE_SCORES.index(influence)
+    score = INFLUENCE_SCORES.values[positions]
+    count = np.array(interactions, dtype=np.float64)
+    avg = np.array(sentiment, dtype=np.float64)
+
+    high_value = SEGMENTS["high_value_engaged"]
+    growing = SEGMENTS["growing_potential"]
+    at_risk = SEGMENTS["at_risk_disengaged"]
+    conditions = [
+        positions == INFLUENCE_SCORES.keys.index(SEGMENTS["kol_network"]["influence_level"]),
+        (score >= high_value["min_influence"]) & (count >= high_value["min_interactions"]),
+        count <= SEGMENTS["new_targets"]["max_interactions"],
+        (count >= at_risk["min_interactions"]) & (avg < at_risk["sentiment_threshold"]),
+        (score >= growing["min_influence"]) & (count >= growing["min_interactions"]),
+    ]
+    rules = np.select(conditions, np.arange(len(conditions)), default=len(conditions))
+    confidence = np.choose(rules, [
+        np.full(len(score), 0.95),
+        np.minimum(0.9, 0.6 + score * 0.3),
+        np.full(len(score), 0.8),
+        0.7 + np.abs(avg) * 0.2,
+        0.6 + score * 0.2,
+        np.full(len(score), 0.5),
+    ])
+    return rules, [round(c, 2) for c in confidence.tolist()]
+
+
+def _reason(rule: int, influence, interactions, avg_sentiment) -> tuple[str, list]:
+    """(template, args) explaining a rule assignment."""
+    if rule == _NEW_TARGET:
+        return _RULE_TEMPLATES[rule], [interactions]
+    if rule == _AT_RISK:
+        return _RULE_TEMPLATES[rule], [interactions, round(avg_sentiment, 2)]
+    return _RULE_TEMPLATES[rule], [influence, interactions]
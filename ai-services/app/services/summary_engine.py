@@ -0,0 +1,134 @@
+"""
+Account Summary Engine
+======================
+Generates natural language summaries of HCP accounts.
+
+Model: Template-based summarization (v1.0)
+Input: HCP profile, interaction history, segments, previous scores
+Output: Summary text with key insights and input hash for reproducibility
+
+CRITICAL CONSTRAINT:
+- Summaries MUST NOT contain medical claims
+- Summaries MUST NOT recommend treatments
+- Summaries MUST focus on engagement patterns and commercial relationship
+"""
+
+from typing import Optional
+
+from app.services.hcp_features import extract_hcp_features
+from app.services.input_hash import input_data_hash
+from app.services.timestamps import utc_now_iso
+
+
+MODEL_VERSION = "summary-v1.0"
+
+
+def generate_account_summary(data: dict, features: Optional[dict] = None) -> dict:
+    """
+    Build the account summary for one HCP.
+
+    `data` is a SummaryInput payload; `features` is the shared record from
+    extract_hcp_features() when the caller already has one.
+    """
+    input_hash = input_data_hash(data)
+
+    if features is None:
+        features = extract_hcp_features(data)
+
+    summary_parts = []
+    insights = []
+
+    # Engagement overview
+    interaction_count = data.get("interactionCount", 0)
+    if interaction_count == 0:
+        summary_parts.append(
+            "This HCP has no recorded interactions. "
+            "Consider initiating outreach through consented channels."
+        )
+        insights.append("No engagement history — new prospect")
+    elif interaction_count < 5:
+        summary_parts.append(
+            f"This HCP has {interaction_count} recorded interactions, "
+            f"indicating early-stage engagement."
+        )
+        insights.append("Early-stage engagement")
+    elif interaction_count < 15:
+        summary_parts.append(
+            f"This HCP has {interaction_count} recorded interactions, "
+            f"showing moderate engagement levels."
+        )
+        insights.append("Moderate engagement established")
+    else:
+        summary_parts.append(
+            f"This HCP has {interaction_count} recorded interactions, "
+            f"indicating strong, established engagement."
+        )
+        insights.append("Strong engagement relationship")
+
+    # Specialty context
+    specialty = data.get("specialty")
+    if specialty:
+        specialty_display = specialty.replace("_", " ").title()
+        summary_parts.append(f"Specialty: {specialty_display}.")
+        insights.append(f"Specialty: {specialty_display}")
+
+    # Influence level
+    influence_level = data.get("influenceLevel")
+    if influence_level:
+        influence_display = influence_level.replace("_", " ").title()
+        summary_parts.append(f"Classified as {influence_display} influence.")
+        if influence_level == "key_opinion_leader":
+            insights.append("Key Opinion Leader — strategic engagement priority")
+
+    # Channel analysis
+    if features["history_len"]:
+        channels = {}
+        for channel, (count, _, _) in features["channel_stats"].items():
+            ch = channel.replace("_", " ").title()
+            channels[ch] = channels.get(ch, 0) + count
+
+        channel_str = ", ".join(
+            f"{ch} ({count})" for ch, count in
+            sorted(channels.items(), key=lambda x: -x[1])
+        )
+        summary_parts.append(f"Channel distribution: {channel_str}.")
+
+        # Identify preferred channel
+        preferred = max(channels, key=channels.get)
+        insights.append(f"Preferred channel: {preferred}")
+
+        # Sentiment analysis
+        if features["sentiment_count"]:
+            avg_sentiment = features["sentiment_sum"] / features["sentiment_count"]
+            if avg_sentiment > 0.3:
+                insights.append("Positive sentiment trend")
+            elif avg_sentiment < -0.3:
+                insights.append("Declining sentiment — attention required")
+
+    # Segment membership
+    segments = data.get("segments", [])
+    if segments:
+        summary_parts.append(
+            f"Segment membership: {', '.join(segments)}."
+        )
+
+    # Previous scores
+    previous_scores = data.get("previousScores", [])
+    if previous_scores:
+        latest_score = previous_scores[0]
+        if "score" in latest_score:
+            summary_parts.append(
+                f"Latest AI engagement score: {latest_score['score']}."
+            )
+
+    summary = " ".join(summary_parts)
+
+    return {
+        "entityId": data["hcpId"],
+        "entityType": "hcp",
+        "summary": summary,
+        "keyInsights": insights,
+        "generatedAt": utc_now_iso(),
+        "modelVersion": MODEL_VERSION,
+        "inputDataHash": input_hash,
+    }
@@ -0,0 +1,152 @@
+"""
+Timestamps
+==========
+Shared date handling for every engine.
+
+All instants are UTC. ISO-8601 strings are parsed a column at a time into
+`datetime64[s]` arrays: the UTC offset suffix ("Z", "+02:00") is split off
+and the remaining local parts are parsed by NumPy in one call. Naive strings
+are read as UTC. Missing or unparseable values become NaT.
+
+Parsed strings are remembered in a process-wide cache, since the same
+timestamps (last interaction dates, scheduled slots) recur across requests.
+
+API outputs keep their existing format: naive ISO strings in UTC, as
+produced by `utc_now_iso()`.
+"""
+
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+import threading
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+CACHE_MAX_ENTRIES = 100_000
+
+_NAT_INT = np.iinfo(np.int64).min
+_cache: dict[str, int] = {}
+_cache_lock = threading.Lock()
+
+
+# ─── Current time ──────────────────────────────────────────────
+
+def utc_now() -> datetime:
+    """Current instant as an aware UTC datetime."""
+    return datetime.now(timezone.utc)
+
+
+def utc_now_seconds() -> float:
+    return utc_now().timestamp()
+
+
+def to_utc_iso(moment: datetime) -> str:
+    """Naive-UTC ISO string, the format every API response uses."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.isoformat()
+
+
+def utc_now_iso() -> str:
+    return to_utc_iso(utc_now())
+
+
+def utc_today_iso() -> str:
+    return utc_now().date().isoformat()
+
+
+# ─── Parsing ───────────────────────────────────────────────────
+
+def parse_timestamps(values: Iterable[Optional[str]]) -> np.ndarray:
+    """Parse ISO-8601 strings into a `datetime64[s]` UTC array (NaT if missing/invalid)."""
+    values = list(values)
+    known: dict[str, int] = {}
+    pending = []
+    with _cache_lock:
+        for value in dict.fromkeys(values):
+            if not value:
+                continue
+            seconds = _cache.get(value)
+            if seconds is None:
+                pending.append(value)
+            else:
+                known[value] = seconds
+
+    if pending:
+        parsed = dict(zip(pending, _parse_unique(pending)))
+        known.update(parsed)
+        with _cache_lock:
+            if len(_cache) + len(parsed) > CACHE_MAX_ENTRIES:
+                _cache.clear()
+            _cache.update(parsed)
+
+    seconds = np.fromiter(
+        (known.get(value, _NAT_INT) if value else _NAT_INT for value in values),
+        dtype=np.int64,
+        count=len(values),
+    )
+    return seconds.view("datetime64[s]")
+
+
+def parse_timestamp(value: Optional[str]) -> np.datetime64:
+    """Scalar convenience wrapper around parse_timestamps()."""
+    return parse_timestamps([value])[0]
+
+
+def epoch_seconds(timestamps: np.ndarray) -> np.ndarray:
+    """float64 seconds since the epoch, NaN where NaT."""
+    seconds = timestamps.astype("datetime64[s]").astype(np.int64).astype(np.float64)
+    seconds[np.isnat(timestamps)] = np.nan
+    return seconds
+
+
+def days_since(timestamps: np.ndarray, now_seconds: float) -> np.ndarray:
+    """Whole days elapsed (floored, like timedelta.days); NaN where NaT."""
+    return np.floor((now_seconds - epoch_seconds(timestamps)) / SECONDS_PER_DAY)
+
+
+def _parse_unique(values: list[str]) -> list[int]:
+    """Epoch seconds (or the NaT sentinel) for distinct, non-empty strings."""
+    local = []
+    offsets = np.zeros(len(values), dtype=np.int64)
+    fallback = []
+    for i, value in enumerate(values):
+        if not (
+            isinstance(value, str) and len(value) >= 10
+            and value[4] == "-" and value[:4].isdigit()
+        ):
+            fallback.append(i)
+            local.append("NaT")
+        elif value[-1] == "Z":
+            local.append(value[:-1])
+        elif (
+            len(value) > 16 and value[-6] in "+-" and value[-3] == ":"
+            and value[-5:-3].isdigit() and value[-2:].isdigit()
+        ):
+            sign = 1 if value[-6] == "+" else -1
+            offsets[i] = sign * (int(value[-5:-3]) * 3600 + int(value[-2:]) * 60)
+            local.append(value[:-6])
+        else:
+            local.append(value)
+
+    try:
+        micros = np.array(local, dtype="datetime64[us]").astype(np.int64)
+    except ValueError:
+        # At least one malformed string: parse this batch one by one
+        return [_parse_one(value) for value in values]
+
+    valid = micros != _NAT_INT
+    seconds = np.where(valid, np.floor_divide(micros, 1_000_000) - offsets, _NAT_INT).tolist()
+    for i in fallback:
+        seconds[i] = _parse_one(values[i])
+    return seconds
+
+
+def _parse_one(value: str) -> int:
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (ValueError, TypeError, AttributeError):
+        return _NAT_INT
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() // 1)
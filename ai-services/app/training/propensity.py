@@ -0,0 +1,367 @@
+"""
+Propensity Model Training
+=========================
+Offline training for the prescription propensity model.
+
+Usage:
+    python -m app.training.propensity \\
+        --prescriptions prescription_data.parquet \\
+        --hcps hcps.csv \\
+        --interactions interactions.parquet \\
+        --segments hcp_segments.csv \\
+        --output models/propensity
+
+Inputs are exports of the backend tables (CSV or Parquet):
+- prescriptions: hcp_id, quantity (one row per prescription_data record)
+- hcps: id or hcp_id, influence_level, years_of_practice, therapeutic_areas
+- interactions: hcp_id (one row per interaction)
+- segments: hcp_id (one row per hcp_segments assignment)
+
+The hcps table has no interaction or segment counts, so they are counted
+from the interactions and segments exports, the way prepareHCPData builds
+interactionCount and segments at serving time (interactions capped at the
+SERVED_INTERACTIONS it sends). An hcps export that already carries
+interaction_count / segment_count columns may stand in for either export;
+training fails if a count has neither source rather than learning a
+constant zero. metadata.json lists the features the inputs populated.
+
+Every export is streamed in chunks and reduced with vectorized groupby to
+one row per HCP, so memory grows with the number of HCPs, never with the
+number of prescription or interaction rows. A full-country export runs on
+a laptop.
+
+Label: an HCP is a high-propensity prescriber when their total prescribed
+quantity is at or above the --label-quantile of prescribing HCPs. HCPs with
+no prescriptions are negatives.
+
+Output: a versioned artifact loadable by PropensityModelStore (model.joblib
+plus metadata.json) and a report.json with the training metrics.
+"""
+
+from pathlib import Path
+from typing import Iterator, Optional
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.inspection import permutation_importance
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, brier_score_loss, log_loss, roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from app.services.propensity_model import (
+    DEFAULT_MODEL_DIR,
+    INFLUENCE_RANKS,
+    PROPENSITY_FEATURES,
+    save_artifact,
+)
+from app.services.timestamps import utc_now
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+# Partial per-HCP aggregates are merged once this many accumulate
+COMPACT_EVERY = 16
+IMPORTANCE_SAMPLE_ROWS = 20_000
+# prepareHCPData sends an HCP's latest 50 interactions; interactionCount is their number
+SERVED_INTERACTIONS = 50
+SCALE_QUANTILE = 0.95
+
+REPORT_FILE = "report.json"
+MODEL_TYPES = {"gbm": "HistGradientBoostingClassifier", "logistic": "LogisticRegression"}
+
+
+# ─── Streaming readers ─────────────────────────────────────────
+
+def read_chunks(path: Path, columns: list[str], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Yield DataFrame chunks of a CSV or Parquet export, reading only `columns`."""
+    path = Path(path)
+    if path.suffix in (".parquet", ".pq"):
+        parquet = pq.ParquetFile(path)
+        available = [c for c in columns if c in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=available):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(
+            path, usecols=lambda c: c in columns, chunksize=chunk_rows
+        )
+
+
+def aggregate_prescriptions(path: Path, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Total prescribed quantity and record count per HCP.
+
+    Each chunk is reduced with groupby; partial results are merged every
+    COMPACT_EVERY chunks so at most that many per-HCP partials are held.
+    """
+    partials: list[pd.DataFrame] = []
+    rows = 0
+    for chunk in read_chunks(path, ["hcp_id", "quantity"], chunk_rows):
+        rows += len(chunk)
+        chunk = chunk.dropna(subset=["hcp_id"])
+        partials.append(
+            chunk.groupby("hcp_id", sort=False)["quantity"].agg(total_quantity="sum", records="count")
+        )
+        if len(partials) >= COMPACT_EVERY:
+            partials = [_merge_partials(partials)]
+
+    logger.info("Read %d prescription rows", rows)
+    if not partials:
+        return pd.DataFrame(
+            {"total_quantity": pd.Series(dtype=np.float64), "records": pd.Series(dtype=np.int64)}
+        )
+    return _merge_partials(partials)
+
+
+def count_rows(path: Path, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> pd.Series:
+    """Rows per hcp_id of an export (interactions, hcp_segments), streamed like prescriptions."""
+    partials: list[pd.Series] = []
+    for chunk in read_chunks(path, ["hcp_id"], chunk_rows):
+        partials.append(chunk["hcp_id"].dropna().value_counts(sort=False))
+        if len(partials) >= COMPACT_EVERY:
+            partials = [_merge_partials(partials)]
+    if not partials:
+        return pd.Series(dtype=np.int64)
+    return _merge_partials(partials)
+
+
+def _merge_partials(partials: list):
+    return pd.concat(partials).groupby(level=0, sort=False).sum()
+
+
+def load_hcp_features(
+    path: Path,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    interaction_counts: Optional[pd.Series] = None,
+    segment_counts: Optional[pd.Series] = None,
+) -> tuple[pd.DataFrame, list[str]]:
+    """
+    Per-HCP model features (PROPENSITY_FEATURES columns, indexed by hcp_id)
+    and the features the inputs populated (at least one non-missing value).
+
+    Mirrors propensity_feature_matrix(): unknown influence ranks as medium,
+    missing years of practice stay NaN, HCPs absent from a count export
+    count zero. Counts come from `interaction_counts` / `segment_counts`
+    (see count_rows) or else from the export's own columns; a count with
+    neither source raises ValueError.
+    """
+    columns = [
+        "id", "hcp_id", "influence_level", "years_of_practice", "therapeutic_areas",
+        "interaction_count", "segment_count",
+    ]
+    frames = []
+    present = {"interaction_count": False, "segment_count": False}
+    for chunk in read_chunks(path, columns, chunk_rows):
+        ids = chunk["hcp_id"] if "hcp_id" in chunk else chunk["id"]
+        for name in present:
+            present[name] |= name in chunk
+        frames.append(pd.DataFrame({
+            "influence_rank": _column(chunk, "influence_level")
+                .map(INFLUENCE_RANKS).to_numpy(np.float64),
+            "interaction_count": _column(chunk, "interaction_count").to_numpy(np.float64),
+            "segment_count": _column(chunk, "segment_count").to_numpy(np.float64),
+            "years_of_practice": pd.to_numeric(
+                _column(chunk, "years_of_practice"), errors="coerce"
+            ).to_numpy(np.float64),
+            "therapeutic_area_count": (
+                _list_length(chunk["therapeutic_areas"]) if "therapeutic_areas" in chunk
+                else np.full(len(chunk), np.nan)
+            ),
+        }, index=ids.to_numpy()))
+
+    if not frames:
+        return pd.DataFrame(columns=list(PROPENSITY_FEATURES), dtype=np.float64), []
+    features = pd.concat(frames)
+    features.index.name = "hcp_id"
+    features = features[~features.index.duplicated(keep="last")][list(PROPENSITY_FEATURES)]
+
+    for name, counts, option in (
+        ("interaction_count", interaction_counts, "--interactions"),
+        ("segment_count", segment_counts, "--segments"),
+    ):
+        if counts is not None:
+            features[name] = counts.reindex(features.index).to_numpy(np.float64)
+        elif not present[name]:
+            raise ValueError(
+                f"No source for {name}: pass {option} or an hcps export with a {name} column"
+            )
+    features["interaction_count"] = features["interaction_count"].clip(upper=SERVED_INTERACTIONS)
+
+    populated = [name for name in PROPENSITY_FEATURES if features[name].notna().any()]
+    features["influence_rank"] = features["influence_rank"].fillna(INFLUENCE_RANKS["medium"])
+    count_columns = ["interaction_count", "segment_count", "therapeutic_area_count"]
+    features[count_columns] = features[count_columns].fillna(0)
+    return features, populated
+
+
+def _column(chunk: pd.DataFrame, name: str) -> pd.Series:
+    if name in chunk:
+        return chunk[name]
+    return pd.Series(np.nan, index=chunk.index)
+
+
+def _list_length(values: pd.Series) -> np.ndarray:
+    """Length of list cells: Arrow lists from Parquet or JSON arrays from CSV."""
+    if values.map(lambda v: isinstance(v, (list, np.ndarray))).any():
+        return values.map(lambda v: len(v) if isinstance(v, (list, np.ndarray)) else 0).to_numpy(
+            np.float64
+        )
+    # JSON arrays of strings: two quotes per element
+    return (values.fillna("[]").astype(str).str.count('"') // 2).to_numpy(np.float64)
+
+
+# ─── Dataset and model ─────────────────────────────────────────
+
+def build_dataset(
+    features: pd.DataFrame, prescriptions: pd.DataFrame, label_quantile: float
+) -> tuple[np.ndarray, np.ndarray, float]:
+    """Join features with prescription totals; returns (X, y, label threshold)."""
+    totals = prescriptions["total_quantity"].reindex(features.index).fillna(0)
+    prescribing = totals[totals > 0]
+    threshold = float(prescribing.quantile(label_quantile)) if len(prescribing) else 0.0
+    y = ((totals >= threshold) & (totals > 0)).to_numpy(np.int8)
+    return features.to_numpy(np.float64), y, threshold
+
+
+def make_estimator(kind: str, seed: int):
+    if kind == "gbm":
+        return HistGradientBoostingClassifier(max_iter=200, early_stopping=True, random_state=seed)
+    if kind == "logistic":
+        return make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000))
+    raise ValueError(f"Unknown model kind '{kind}'")
+
+
+def train(
+    prescriptions_path: Path,
+    hcps_path: Path,
+    interactions_path: Optional[Path] = None,
+    segments_path: Optional[Path] = None,
+    output_dir: Path = DEFAULT_MODEL_DIR,
+    version: Optional[str] = None,
+    kind: str = "gbm",
+    label_quantile: float = 0.75,
+    validation_fraction: float = 0.2,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    seed: int = 42,
+) -> dict:
+    """Run the full pipeline and return the training report."""
+    started = time.monotonic()
+    trained_at = utc_now().replace(tzinfo=None)
+    version = version or f"propensity-{kind}-{trained_at:%Y%m%d%H%M%S}"
+
+    prescriptions = aggregate_prescriptions(prescriptions_path, chunk_rows)
+    features, populated = load_hcp_features(
+        hcps_path,
+        chunk_rows,
+        interaction_counts=count_rows(interactions_path, chunk_rows) if interactions_path else None,
+        segment_counts=count_rows(segments_path, chunk_rows) if segments_path else None,
+    )
+    missing = [name for name in PROPENSITY_FEATURES if name not in populated]
+    if missing:
+        logger.warning("No HCP has a value for %s; training on fill values", ", ".join(missing))
+    X, y, threshold = build_dataset(features, prescriptions, label_quantile)
+    if len(np.unique(y)) < 2:
+        raise ValueError("Training data needs both positive and negative HCPs")
+
+    # Missing values are filled exactly as at serving time
+    fill = np.nanmedian(X, axis=0)
+    fill = np.where(np.isnan(fill), 0.0, fill)
+    X = np.where(np.isnan(X), fill, X)
+
+    X_train, X_valid, y_train, y_valid = train_test_split(
+        X, y, test_size=validation_fraction, stratify=y, random_state=seed
+    )
+    estimator = make_estimator(kind, seed).fit(X_train, y_train)
+
+    probabilities = estimator.predict_proba(X_valid)[:, 1]
+    metrics = {
+        "accuracy": round(float(accuracy_score(y_valid, probabilities >= 0.5)), 4),
+        "rocAuc": round(float(roc_auc_score(y_valid, probabilities)), 4),
+        "logLoss": round(float(log_loss(y_valid, probabilities, labels=[0, 1])), 4),
+        "brier": round(float(brier_score_loss(y_valid, probabilities)), 4),
+        "positiveRate": round(float(y.mean()), 4),
+        "trainRows": int(len(y_train)),
+        "validationRows": int(len(y_valid)),
+    }
+
+    sample = min(len(y_valid), IMPORTANCE_SAMPLE_ROWS)
+    importance = permutation_importance(
+        estimator, X_valid[:sample], y_valid[:sample],
+        scoring="roc_auc", n_repeats=3, random_state=seed,
+    )
+    importances = np.clip(importance.importances_mean, 0, None)
+    scales = np.maximum(np.quantile(X, SCALE_QUANTILE, axis=0), 1.0)
+
+    metadata = {
+        "modelType": MODEL_TYPES[kind],
+        "trainedAt": trained_at.isoformat(),
+        "importances": _by_feature(importances),
+        "scales": _by_feature(scales),
+        "fill": _by_feature(fill),
+        "populatedFeatures": populated,
+        "metrics": metrics,
+        "label": {"quantile": label_quantile, "minTotalQuantity": threshold},
+    }
+    target = save_artifact(estimator, output_dir, version, metadata)
+
+    report = {
+        **metadata,
+        "version": version,
+        "hcps": int(len(features)),
+        "prescribingHcps": int(len(prescriptions)),
+        "elapsedSeconds": round(time.monotonic() - started, 1),
+    }
+    with open(target / REPORT_FILE, "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def _by_feature(values: np.ndarray) -> dict:
+    return {name: round(float(v), 6) for name, v in zip(PROPENSITY_FEATURES, values)}
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Train the prescription propensity model")
+    parser.add_argument("--prescriptions", type=Path, required=True,
+                        help="prescription_data export (CSV or Parquet)")
+    parser.add_argument("--hcps", type=Path, required=True, help="hcps export (CSV or Parquet)")
+    parser.add_argument("--interactions", type=Path, default=None,
+                        help="interactions export, counted per HCP for interaction_count")
+    parser.add_argument("--segments", type=Path, default=None,
+                        help="hcp_segments export, counted per HCP for segment_count")
+    parser.add_argument("--output", type=Path, default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--version", default=None)
+    parser.add_argument("--model", choices=["gbm", "logistic"], default="gbm")
+    parser.add_argument("--label-quantile", type=float, default=0.75)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        report = train(
+            args.prescriptions,
+            args.hcps,
+            interactions_path=args.interactions,
+            segments_path=args.segments,
+            output_dir=args.output,
+            version=args.version,
+            kind=args.model,
+            label_quantile=args.label_quantile,
+            chunk_rows=args.chunk_rows,
+            seed=args.seed,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
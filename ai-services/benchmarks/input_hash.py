@@ -0,0 +1,92 @@
+"""
+Input Hash Benchmark
+====================
+Compares canonical input hashing (app.services.input_hash) with the JSON
+approach it replaces: `json.dumps(sort_keys=True, default=str)` then SHA-256.
+
+Run from ai-services/:
+
+    python -m benchmarks.input_hash [--repeat 3]
+
+Reports time per payload and peak memory of a single hash for HCP payloads
+of growing channel history length. Expect times within noise of the JSON
+approach at every size; the difference is peak memory, which stays flat
+for input_data_hash while the JSON string grows with the history.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import time
+import tracemalloc
+
+from app.services.input_hash import input_data_hash
+
+# (interactions per payload, payloads per run)
+SIZES = [(0, 20000), (20, 5000), (200, 500), (20000, 3)]
+CHANNELS = ["email", "phone", "in_person_visit", "remote_detailing", "webinar"]
+
+
+def json_hash(payload: dict) -> str:
+    """The previous summary/cache approach."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def make_payload(i: int, interactions: int, rng: random.Random) -> dict:
+    return {
+        "hcpId": f"hcp-{i}",
+        "userId": "user-001",
+        "specialty": "cardiology",
+        "influenceLevel": rng.choice(["low", "medium", "high", "key_opinion_leader"]),
+        "interactionCount": interactions,
+        "lastInteractionDate": "2024-06-01T10:00:00Z",
+        "channelHistory": [
+            {
+                "channel": rng.choice(CHANNELS),
+                "status": "completed",
+                "sentiment": rng.choice([None, round(rng.uniform(-1, 1), 3)]),
+                "date": f"2024-05-{rng.randint(1, 28):02d}T10:00:00Z",
+            }
+            for _ in range(interactions)
+        ],
+        "consentStatus": [{"consent_type": "email", "status": "granted"}],
+        "segments": ["cardio"],
+        "previousScores": [],
+    }
+
+
+def measure(fn, payloads: list[dict], repeat: int) -> tuple[float, float]:
+    """(best microseconds per payload, peak KiB hashing one payload)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            fn(payload)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(payloads[0])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best * 1e6 / len(payloads), peak / 1024
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark canonical input hashing")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(7)
+    print(f"{'history':>8}  {'json.dumps+sha256':>26}  {'input_data_hash':>26}")
+    for interactions, count in SIZES:
+        payloads = [make_payload(i, interactions, rng) for i in range(count)]
+        before = measure(json_hash, payloads, args.repeat)
+        after = measure(input_data_hash, payloads, args.repeat)
+        print(
+            f"{interactions:>8}  {before[0]:>10.1f} us {before[1]:>8.1f} KiB"
+            f"  {after[0]:>10.1f} us {after[1]:>8.1f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
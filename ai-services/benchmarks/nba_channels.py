@@ -0,0 +1,123 @@
+"""
+NBA Channel Aggregation Benchmark
+=================================
+Compares the per-channel history aggregation behind NBA channel scoring:
+
+- per-channel filter: `channelHistory` filtered once per channel, then a
+  sentiment list built per channel (the original `_score_channel`)
+- feature record: extract_hcp_features() per HCP, copied into matrices
+- group-by: channel_aggregates(), one pass over the whole batch into
+  (HCP x channel) arrays, with a bincount for columnar history
+
+Run from ai-services/:
+
+    python -m benchmarks.nba_channels [--repeat 3]
+
+Reports time per HCP for HCPs with 50, 500 and 5,000 interactions of
+history, sent as `channelHistory` rows and as `channelColumns` (the
+per-channel filter only reads rows).
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.services.hcp_features import channel_aggregates, extract_hcp_features
+from app.services.interaction_columns import CHANNEL_CODES, STATUS_CODES
+from app.services.nba_engine import _CHANNELS
+
+# (interactions per HCP, HCPs per run)
+SIZES = [(50, 2000), (500, 200), (5000, 20)]
+CHANNELS = ["email", "phone", "in_person_visit", "remote_detailing", "webinar"]
+
+
+def per_channel_filter(records: list[dict]) -> np.ndarray:
+    stats = np.zeros((3, len(records), len(_CHANNELS)))
+    for i, data in enumerate(records):
+        for code, channel in enumerate(_CHANNELS):
+            interactions = [h for h in data.get("channelHistory", []) if h.get("channel") == channel]
+            sentiments = [h["sentiment"] for h in interactions if h.get("sentiment") is not None]
+            stats[:, i, code] = len(interactions), sum(sentiments), len(sentiments)
+    return stats
+
+
+def feature_record(records: list[dict]) -> np.ndarray:
+    stats = np.zeros((3, len(records), len(_CHANNELS)))
+    for i, data in enumerate(records):
+        channel_stats = extract_hcp_features(data)["channel_stats"]
+        for code, channel in enumerate(_CHANNELS):
+            entry = channel_stats.get(channel)
+            if entry is not None:
+                stats[:, i, code] = entry
+    return stats
+
+
+def group_by(records: list[dict]) -> np.ndarray:
+    stats = channel_aggregates(records, _CHANNELS)
+    return np.stack([stats.counts, stats.sentiment_sums, stats.sentiment_counts])
+
+
+def make_record(i: int, interactions: int, rng: random.Random) -> dict:
+    return {
+        "hcpId": f"hcp-{i}",
+        "channelHistory": [
+            {
+                "channel": rng.choice(CHANNELS),
+                "status": "completed",
+                "sentiment": rng.choice([None, round(rng.uniform(-1, 1), 3)]),
+                "date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00Z",
+            }
+            for _ in range(interactions)
+        ],
+    }
+
+
+def to_columns(record: dict) -> dict:
+    history = record["channelHistory"]
+    return {
+        "hcpId": record["hcpId"],
+        "channelColumns": {
+            "channel": [CHANNEL_CODES[h["channel"]] for h in history],
+            "status": [STATUS_CODES[h["status"]] for h in history],
+            "sentiment": [h["sentiment"] for h in history],
+            "timestamp": [None] * len(history),
+        },
+    }
+
+
+def measure(fn, records: list[dict], repeat: int) -> float:
+    """Best microseconds per HCP."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(records)
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6 / len(records)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark NBA channel aggregation")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(7)
+    approaches = [per_channel_filter, feature_record, group_by]
+    print(f"{'history':>8}  {'format':>7}" + "".join(f"  {fn.__name__:>20}" for fn in approaches))
+    for interactions, count in SIZES:
+        rows = [make_record(i, interactions, rng) for i in range(count)]
+        columns = [to_columns(record) for record in rows]
+        expected = per_channel_filter(rows)
+        for fn in approaches[1:]:
+            assert np.allclose(fn(rows), expected) and np.allclose(fn(columns), expected)
+        print(f"{interactions:>8}  {'rows':>7}" + "".join(
+            f"  {measure(fn, rows, args.repeat):>17.1f} us" for fn in approaches
+        ))
+        print(f"{interactions:>8}  {'columns':>7}  {'-':>20}" + "".join(
+            f"  {measure(fn, columns, args.repeat):>17.1f} us" for fn in approaches[1:]
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Tests for capacity-constrained allocation.
+Validates capacity limits, optimality against brute force and repair moves.
+"""
+
+import itertools
+
+import numpy as np
+
+from app.services.allocation import UNASSIGNED, UNLIMITED, allocate
+
+NO = -np.inf
+
+
+def _total(values: np.ndarray, assignment: np.ndarray) -> float:
+    return sum(values[i, c] for i, c in enumerate(assignment.tolist()) if c != UNASSIGNED)
+
+
+def _brute_force(values: np.ndarray, capacities: list[int]) -> float:
+    n, width = values.shape
+    best = 0.0
+    for assignment in itertools.product(range(-1, width), repeat=n):
+        load = np.bincount([c for c in assignment if c >= 0], minlength=width)
+        if any(0 <= cap < load[c] for c, cap in enumerate(capacities)):
+            continue
+        if any(c >= 0 and not values[i, c] > 0 for i, c in enumerate(assignment)):
+            continue
+        best = max(best, sum(values[i, c] for i, c in enumerate(assignment) if c >= 0))
+    return best
+
+
+class TestAllocate:
+    def test_without_binding_capacity_everyone_gets_their_best(self):
+        values = np.array([[0.6, 0.9], [0.8, 0.7], [NO, NO]])
+        assert allocate(values, np.array([UNLIMITED, 5])).tolist() == [1, 0, UNASSIGNED]
+
+    def test_capacity_goes_where_it_adds_most(self):
+        # Greedy by value would give the visit (1) to HCP 0 and leave HCP 1 on 0.4
+        values = np.array([[0.85, 0.95], [0.4, 0.9]])
+        assignment = allocate(values, np.array([UNLIMITED, 1]))
+        assert assignment.tolist() == [0, 1]
+
+    def test_repair_moves_placed_items_between_capped_options(self):
+        # HCP 1 can only take option 0, so HCP 0 is moved to option 1
+        values = np.array([[0.9, 0.8], [0.85, NO]])
+        assignment = allocate(values, np.array([1, 1]))
+        assert assignment.tolist() == [1, 0]
+
+    def test_full_options_leave_items_unassigned(self):
+        values = np.array([[0.9], [0.8], [0.7]])
+        assert allocate(values, np.array([2])).tolist() == [0, 0, UNASSIGNED]
+        assert allocate(values, np.array([0])).tolist() == [UNASSIGNED] * 3
+
+    def test_worthless_options_are_not_taken(self):
+        values = np.array([[0.0, -0.5]])
+        assert allocate(values, np.array([UNLIMITED, UNLIMITED])).tolist() == [UNASSIGNED]
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(7)
+        for _ in range(200):
+            n, width = rng.integers(1, 6), rng.integers(1, 4)
+            values = np.round(rng.uniform(-0.2, 1, (n, width)), 1)
+            values[rng.uniform(size=(n, width)) < 0.3] = NO
+            capacities = rng.integers(-1, 3, width)
+            assignment = allocate(values, capacities)
+            load = np.bincount(assignment[assignment >= 0], minlength=width)
+            assert all(cap < 0 or load[c] <= cap for c, cap in enumerate(capacities))
+            assert abs(_total(values, assignment) - _brute_force(values, capacities.tolist())) < 1e-9
+
+    def test_large_book(self):
+        rng = np.random.default_rng(3)
+        values = rng.uniform(0.4, 1.0, (5000, 4))
+        values[rng.uniform(size=values.shape) < 0.3] = NO
+        assignment = allocate(values, np.array([UNLIMITED, 20, 8, 50]))
+        load = np.bincount(assignment[assignment >= 0], minlength=4)
+        assert load[1:].tolist() == [20, 8, 50]
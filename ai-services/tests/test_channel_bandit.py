@@ -0,0 +1,193 @@
+"""
+Tests for the NBA channel bandit.
+Validates priors, posterior updates, sampling, snapshot merges and the feedback endpoints.
+"""
+
+import os
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import API_KEY, app
+from app.services.channel_bandit import ChannelBandit
+from app.services.nba_engine import channel_bandit
+
+HEADERS = {"X-API-Key": API_KEY}
+CHANNELS = ["email", "phone", "in_person_visit"]
+PRIOR = [0.6, 0.7, 0.9]
+
+
+def _bandit(directory=None, **kwargs) -> ChannelBandit:
+    return ChannelBandit(CHANNELS, PRIOR, prior_strength=10, directory=directory, **kwargs)
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+class TestChannelBandit:
+    def test_without_feedback_priorities_are_the_prior(self):
+        priorities = _bandit().priorities([("Cardiology", "high"), (None, None)])
+        assert priorities.tolist() == [PRIOR, PRIOR]
+
+    def test_outcomes_move_their_context_only(self):
+        bandit = _bandit()
+        for _ in range(10):
+            bandit.record("Cardiology", "high", "email", "accepted")
+            bandit.record("Cardiology", "high", "in_person_visit", "rejected")
+        cardiology, oncology = bandit.priorities([("Cardiology", "high"), ("Oncology", "high")])
+        # (0.6 * 10 + 10) / 20 and 0.9 * 10 / 20
+        assert cardiology.tolist() == pytest.approx([0.8, 0.7, 0.45])
+        assert oncology.tolist() == PRIOR
+        assert bandit.outcomes("Cardiology", "high")["email"] == [10, 0]
+
+    def test_outcomes_without_signal_are_ignored(self):
+        bandit = _bandit()
+        assert not bandit.record("Cardiology", "high", "email", "pending")
+        assert not bandit.record("Cardiology", "high", "email", "expired")
+        assert not bandit.record("Cardiology", "high", "webinar", "accepted")
+        assert bandit.record_many([
+            ("Cardiology", "high", "email", "accepted"),
+            ("Cardiology", "high", "phone", "expired"),
+        ]) == 1
+
+    def test_samples_follow_the_posterior(self):
+        bandit = _bandit(seed=1)
+        for _ in range(200):
+            bandit.record("Cardiology", "high", "email", "accepted")
+        samples = bandit.priorities([("Cardiology", "high")] * 2000, sample=True)
+        assert samples.shape == (2000, 3)
+        assert samples[:, 0].mean() == pytest.approx(206 / 210, abs=0.01)
+        assert samples[:, 2].mean() == pytest.approx(0.9, abs=0.02)
+        assert samples[:, 2].std() > 0.05
+
+    def test_posterior_reports_its_counts_and_state(self):
+        bandit = _bandit()
+        bandit.record("Cardiology", "high", "phone", "rejected")
+        _, counts = bandit.posterior([("Cardiology", "high"), ("Oncology", "high")])
+        assert counts[0].tolist() == [[0, 0, 0], [0, 1, 0]]
+        assert bandit.state_version(counts[1]) is None
+        before = bandit.state_version(counts[0])
+        bandit.record("Cardiology", "high", "phone", "accepted")
+        _, counts = bandit.posterior([("Cardiology", "high")])
+        assert before and bandit.state_version(counts[0]) != before
+
+    def test_workers_converge_through_snapshots(self, tmp_path):
+        a, b = _bandit(tmp_path), _bandit(tmp_path)
+        a.record("Cardiology", "high", "email", "accepted")
+        b.record("Cardiology", "high", "email", "rejected")
+        b.record("Cardiology", "high", "phone", "accepted")
+        a.save(tmp_path / "bandit-a.npz")
+        b.save(tmp_path / "bandit-b.npz")
+        assert a.load_snapshots() == 2
+        # Reloading replaces a file's contribution instead of adding it again
+        a.load_snapshots()
+        assert a.outcomes("Cardiology", "high") == {
+            "email": [2, 1], "phone": [1, 0], "in_person_visit": [0, 0],
+        }
+
+    def test_snapshots_are_realigned_by_channel_name(self, tmp_path):
+        other = ChannelBandit(["phone", "email"], [0.7, 0.6], directory=tmp_path)
+        other.record(None, None, "email", "accepted")
+        other.save(tmp_path / "bandit-other.npz")
+        bandit = _bandit(tmp_path)
+        bandit.load_snapshots()
+        assert bandit.outcomes(None, None)["email"] == [1, 0]
+
+    def test_own_leftover_snapshot_is_adopted(self, tmp_path):
+        earlier = _bandit(tmp_path)
+        earlier.record("Cardiology", "high", "phone", "accepted")
+        earlier.snapshot()
+        restarted = _bandit(tmp_path)
+        restarted.load_snapshots()
+        restarted.snapshot()
+        assert restarted.outcomes("Cardiology", "high")["phone"] == [1, 0]
+        assert (tmp_path / f"bandit-{os.getpid()}.npz").exists()
+
+    def test_unreadable_snapshot_is_skipped(self, tmp_path):
+        (tmp_path / "bandit-bad.npz").write_bytes(b"not a snapshot")
+        _bandit().save(tmp_path / "bandit-good.npz")
+        assert _bandit(tmp_path).load_snapshots() == 1
+
+
+class TestFeedbackEndpoints:
+    def _recommend(self, client, specialty: str) -> dict:
+        response = client.post("/api/v1/nba/recommend", headers=HEADERS, json={
+            "hcpId": "hcp-1",
+            "userId": "rep-1",
+            "specialty": specialty,
+            "influenceLevel": "high",
+            "consentStatus": [
+                {"consent_type": "email", "status": "granted"},
+                {"consent_type": "visit", "status": "granted"},
+            ],
+        })
+        assert response.status_code == 200
+        return response.json()
+
+    def test_feedback_changes_the_recommended_channel(self, client):
+        specialty = "feedback-test-batch"
+        assert self._recommend(client, specialty)["recommendedChannel"] == "in_person_visit"
+        events = [
+            {"channel": "in_person_visit", "status": "rejected", "specialty": specialty,
+             "influenceLevel": "high"},
+            {"channel": "email", "status": "accepted", "specialty": specialty,
+             "influenceLevel": "high"},
+        ] * 30 + [{"channel": "email", "status": "pending", "specialty": specialty}]
+        response = client.post("/api/v1/nba/feedback", headers=HEADERS, json={"events": events})
+        assert response.json() == {"applied": 60, "ignored": 1}
+        result = self._recommend(client, specialty)
+        assert result["recommendedChannel"] == "email"
+        assert result["modelVersion"].startswith("nba-v1.0+")
+        assert not result["explored"]
+        learned = {f["name"]: f for f in result["factors"] if f["name"].endswith("_learned_priority")}
+        assert learned["email_learned_priority"]["value"] == pytest.approx((0.6 * 20 + 30) / 50)
+        assert learned["in_person_visit_learned_priority"]["description"] == (
+            "Learned in_person_visit priority 0.36 from 0 accepted / 30 rejected"
+        )
+
+    def test_without_feedback_the_result_is_unchanged(self, client):
+        result = self._recommend(client, "feedback-test-none")
+        assert result["modelVersion"] == "nba-v1.0"
+        assert not any(f["name"].endswith("_learned_priority") for f in result["factors"])
+
+    def test_stream_replays_history(self, client):
+        specialty = "feedback-test-stream"
+        lines = [
+            f'{{"channel": "phone", "status": "accepted", "specialty": "{specialty}"}}'
+        ] * 5 + ["not json", '{"channel": "phone", "status": "expired"}']
+        response = client.post(
+            "/api/v1/nba/feedback/stream", headers=HEADERS, content="\n".join(lines).encode()
+        )
+        assert response.json() == {"applied": 5, "ignored": 1, "invalid": 1}
+        assert channel_bandit.outcomes(specialty, None)["phone"] == [5, 0]
+
+    def test_stream_counts_oversized_lines_as_invalid(self, client, monkeypatch):
+        monkeypatch.setattr("app.services.ndjson.STREAM_MAX_LINE_BYTES", 200)
+        specialty = "feedback-test-oversized"
+        lines = [
+            f'{{"channel": "phone", "status": "accepted", "specialty": "{specialty}"}}',
+            f'{{"channel": "phone", "status": "accepted", "specialty": "{"x" * 500}"}}',
+        ]
+        response = client.post(
+            "/api/v1/nba/feedback/stream", headers=HEADERS, content="\n".join(lines).encode()
+        )
+        assert response.json() == {"applied": 1, "ignored": 0, "invalid": 1}
+
+    def test_explore_samples_priorities(self, client):
+        response = client.post("/api/v1/nba/recommend?explore=true", headers=HEADERS, json={
+            "hcpId": "hcp-1",
+            "userId": "rep-1",
+            "specialty": "feedback-test-explore",
+            "consentStatus": [{"consent_type": "email", "status": "granted"}],
+        })
+        assert response.status_code == 200
+        result = response.json()
+        assert result["recommendedChannel"] == "email"
+        assert 0 < result["confidence"] <= 0.95
+        assert result["explored"]
+        assert "- Channel priorities sampled to explore" in result["reasoning"]
+        sample = next(f for f in result["factors"] if f["name"] == "email_learned_priority")
+        assert sample["description"].startswith("Sampled email priority")
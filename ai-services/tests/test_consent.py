@@ -0,0 +1,115 @@
+"""
+Tests for consent masks.
+Validates latest-status resolution, bit layout and bulk eligibility checks.
+"""
+
+import numpy as np
+
+from app.services.consent import (
+    CONSENT_TYPES,
+    channel_bits,
+    channel_grants,
+    consent_masks,
+    consent_masks_from_columns,
+    eligible,
+    granted_count,
+)
+from app.services.scoring_engine import compute_engagement_score
+
+
+def _bits(*types: str) -> int:
+    return sum(1 << CONSENT_TYPES.index(t) for t in types)
+
+
+class TestResolution:
+    def test_latest_record_per_type_wins(self):
+        masks = consent_masks([[
+            {"consent_type": "email", "status": "granted", "created_at": "2024-01-01T00:00:00Z"},
+            {"consent_type": "email", "status": "revoked", "created_at": "2024-02-01T00:00:00Z"},
+            {"consent_type": "phone", "status": "revoked", "created_at": "2024-01-01T00:00:00Z"},
+            {"consent_type": "phone", "status": "granted", "created_at": "2024-03-01T00:00:00Z"},
+        ]])
+        assert masks.granted.tolist() == [_bits("phone")]
+        assert masks.recorded.tolist() == [_bits("email", "phone")]
+
+    def test_without_timestamps_first_row_wins(self):
+        masks = consent_masks([[
+            {"consent_type": "visit", "status": "granted"},
+            {"consent_type": "visit", "status": "revoked"},
+        ]])
+        assert masks.granted.tolist() == [_bits("visit")]
+
+    def test_unknown_and_missing_types_share_other(self):
+        masks = consent_masks([[{"consent_type": "fax", "status": "granted"}, {"status": "revoked"}]])
+        assert masks.recorded.tolist() == [_bits("other")]
+        assert masks.granted.tolist() == [_bits("other")]
+
+    def test_unknown_types_resolve_separately(self):
+        rows = [[
+            {"consent_type": "sms", "status": "granted", "created_at": "2024-01-01T00:00:00Z"},
+            {"consent_type": "fax", "status": "revoked", "created_at": "2024-02-01T00:00:00Z"},
+        ], [
+            {"consent_type": "sms", "status": "granted", "created_at": "2024-01-01T00:00:00Z"},
+            {"consent_type": "sms", "status": "revoked", "created_at": "2024-02-01T00:00:00Z"},
+            {"consent_type": "fax", "status": "revoked"},
+        ]]
+        assert consent_masks(rows).granted.tolist() == [_bits("other"), 0]
+        columns = consent_masks_from_columns(
+            [0, 1, 3], ["fax", "sms", "fax"], ["revoked", "granted", "revoked"]
+        )
+        assert columns.granted.tolist() == [0, _bits("other")]
+
+    def test_many_hcps(self):
+        masks = consent_masks([
+            [],
+            [{"consent_type": "email", "status": "granted"}],
+            [{"consent_type": "marketing", "status": "pending"}],
+        ])
+        assert masks.granted.dtype == np.uint8
+        assert masks.granted.tolist() == [0, _bits("email"), 0]
+        assert granted_count(masks.recorded).tolist() == [0, 1, 1]
+
+    def test_columns_match_rows(self):
+        rows = [
+            [{"consent_type": "email", "status": "granted"},
+             {"consent_type": "phone", "status": "revoked"}],
+            [],
+            [{"consent_type": "visit", "status": "granted"},
+             {"consent_type": "visit", "status": "revoked"}],
+        ]
+        columns = consent_masks_from_columns(
+            [0, 2, 2, 4],
+            [c["consent_type"] for group in rows for c in group],
+            [c["status"] for group in rows for c in group],
+        )
+        by_rows = consent_masks(rows)
+        assert columns.granted.tolist() == by_rows.granted.tolist()
+        assert columns.recorded.tolist() == by_rows.recorded.tolist()
+
+
+class TestEligibility:
+    def test_bulk_checks_are_bitwise(self):
+        granted = np.array([_bits("email"), _bits("email", "visit"), 0], dtype=np.uint8)
+        both = int(channel_bits(["email", "in_person_visit"]).sum())
+        assert eligible(granted, both).tolist() == [False, True, False]
+        assert channel_grants(granted, ["email", "in_person_visit"]).tolist() == [
+            [True, False], [True, True], [False, False]
+        ]
+
+    def test_channels_without_consent_type(self):
+        assert channel_bits(["webinar"]).tolist() == [0]
+
+
+class TestScoring:
+    def test_consent_breadth_counts_types_not_rows(self):
+        result = compute_engagement_score({
+            "hcpId": "consent-001",
+            "consentStatus": [
+                {"consent_type": "email", "status": "granted"},
+                {"consent_type": "email", "status": "revoked"},
+                {"consent_type": "phone", "status": "revoked"},
+            ],
+        }, explain="codes")
+        consent = next(f for f in result["factors"] if f["name"] == "consent_breadth")
+        assert consent["value"] == 0.5
+        assert consent["args"] == [1, 2]
@@ -0,0 +1,107 @@
+"""
+Tests for the batch executor.
+Validates chunk sizing, pool selection and that chunked process-pool
+results match in-thread results in order.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import API_KEY, app
+from app.routers import segmentation
+from app.services.executor import BatchExecutor
+from app.services.factor_registry import registry
+from app.services.scoring_engine import ENGAGEMENT, compute_engagement_scores_batch
+from app.services.segmentation_engine import segment_hcps
+
+HEADERS = {"X-API-Key": API_KEY}
+
+
+def _hcps(n: int) -> list[dict]:
+    return [
+        {
+            "id": f"exec-{i}",
+            "influenceLevel": ["low", "medium", "high", "key_opinion_leader"][i % 4],
+            "interactionCount": i % 25,
+            "avgSentiment": (i % 9 - 4) / 4,
+        }
+        for i in range(n)
+    ]
+
+
+def _thread_name(records: list) -> list:
+    return [threading.current_thread().name for _ in records]
+
+
+@pytest.fixture(scope="module")
+def process_executor():
+    pool = BatchExecutor(processes=2, threads=2, process_threshold=100, min_chunk=10)
+    yield pool
+    pool.shutdown()
+
+
+class TestChunking:
+    def test_chunks_scale_with_input(self):
+        pool = BatchExecutor(processes=4, min_chunk=100)
+        assert pool.chunk_size_for(1_000) == 100
+        assert pool.chunk_size_for(160_000) == 10_000
+
+    def test_fixed_chunk_size(self):
+        assert BatchExecutor(processes=4, chunk_size=250).chunk_size_for(100_000) == 250
+
+    def test_threshold_and_disabled_pool(self):
+        pool = BatchExecutor(processes=2, process_threshold=1000)
+        assert not pool.uses_processes(999)
+        assert pool.uses_processes(1000)
+        assert not BatchExecutor(processes=0, process_threshold=1).uses_processes(10_000)
+
+    def test_env_configuration(self, monkeypatch):
+        monkeypatch.setenv("EXECUTOR_PROCESSES", "3")
+        monkeypatch.setenv("EXECUTOR_THREADS", "5")
+        monkeypatch.setenv("EXECUTOR_PROCESS_THRESHOLD", "42")
+        monkeypatch.setenv("EXECUTOR_CHUNK_SIZE", "7")
+        pool = BatchExecutor.from_env()
+        assert (pool.processes, pool.threads, pool.process_threshold, pool.chunk_size) == (3, 5, 42, 7)
+
+
+class TestExecution:
+    def test_small_batches_stay_in_thread(self):
+        pool = BatchExecutor(processes=2, threads=1, process_threshold=100)
+        try:
+            names = asyncio.run(pool.run_batch(_thread_name, list(range(10))))
+        finally:
+            pool.shutdown()
+        assert set(names) == {"engine_0"}
+
+    def test_process_chunks_match_single_call(self, process_executor):
+        hcps = _hcps(1_000)
+        assert process_executor.map_batch(segment_hcps, hcps) == segment_hcps(hcps)
+
+    def test_engagement_model_is_shipped_to_workers(self, process_executor):
+        model = registry.get(ENGAGEMENT)
+        records = [
+            {
+                "hcpId": f"exec-{i}",
+                "influenceLevel": "high",
+                "interactionCount": i % 30,
+                "channelHistory": [{"channel": "email", "status": "completed"}] * (i % 4),
+            }
+            for i in range(300)
+        ]
+        strip = lambda results: [{k: v for k, v in r.items() if k != "computedAt"} for r in results]
+        assert strip(process_executor.map_batch(compute_engagement_scores_batch, records, model)) == \
+            strip(compute_engagement_scores_batch(records, model))
+
+
+class TestRouting:
+    def test_segmentation_endpoint_uses_process_pool(self, monkeypatch, process_executor):
+        monkeypatch.setattr(segmentation, "executor", process_executor)
+        hcps = _hcps(500)
+        response = TestClient(app).post(
+            "/api/v1/segmentation/classify", json={"hcps": hcps}, headers=HEADERS
+        )
+        assert response.status_code == 200
+        assert response.json() == segment_hcps(hcps)
@@ -0,0 +1,169 @@
+"""
+Tests for explain modes and the template catalog.
+Codes must render to exactly the full-mode text; none must omit explanations.
+"""
+
+import hashlib
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import API_KEY, app
+from app.services.explanations import CATALOG_VERSION, TEMPLATES, render
+from app.services.nba_engine import compute_next_best_action
+from app.services.scoring_engine import (
+    compute_engagement_scores_batch,
+    compute_prescription_propensity_batch,
+)
+from app.services.segmentation_engine import segment_hcps
+
+HEADERS = {"X-API-Key": API_KEY}
+
+
+def _hcp(i: int) -> dict:
+    return {
+        "hcpId": f"explain-{i}",
+        "userId": "user-001",
+        "specialty": "cardiology",
+        "influenceLevel": ["low", "medium", "high", "key_opinion_leader", "unusual"][i % 5],
+        "interactionCount": i * 3,
+        "yearsOfPractice": None if i % 4 == 0 else 5 + i,
+        "lastInteractionDate": ["2024-06-01T10:00:00Z", None, "not a date"][i % 3],
+        "segments": ["cardio"] * (i % 3),
+        "channelHistory": [
+            {"channel": "email", "status": "completed", "sentiment": 0.6 - i * 0.2,
+             "date": "2024-05-01T10:00:00Z"},
+            {"channel": "phone", "status": "completed", "sentiment": None},
+        ][: i % 3],
+        "consentStatus": [
+            {"consent_type": "email", "status": "granted"},
+            {"consent_type": "visit", "status": "granted" if i % 2 else "revoked"},
+        ][: i % 3],
+    }
+
+
+HCPS = [_hcp(i) for i in range(10)]
+
+
+def _rendered_factors(results: list[dict]) -> list[list]:
+    return [[render(f["template"], f["args"]) for f in r["factors"]] for r in results]
+
+
+def _descriptions(results: list[dict]) -> list[list]:
+    return [[f["description"] for f in r["factors"]] for r in results]
+
+
+def _reasoning(result: dict) -> str:
+    return "\n".join(render(c["template"], c["args"]) for c in result["reasoningCodes"])
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+class TestEngineModes:
+    def test_engagement_codes_render_to_full_text(self):
+        full = compute_engagement_scores_batch(HCPS)
+        codes = compute_engagement_scores_batch(HCPS, explain="codes")
+        assert _rendered_factors(codes) == _descriptions(full)
+        assert [r["score"] for r in codes] == [r["score"] for r in full]
+
+    def test_propensity_codes_render_to_full_text(self):
+        full = compute_prescription_propensity_batch(HCPS)
+        codes = compute_prescription_propensity_batch(HCPS, explain="codes")
+        assert _rendered_factors(codes) == _descriptions(full)
+
+    def test_none_mode_keeps_scores_and_drops_text(self):
+        full = compute_engagement_scores_batch(HCPS)
+        bare = compute_engagement_scores_batch(HCPS, explain="none")
+        for f, b in zip(full, bare):
+            assert b["score"] == f["score"]
+            assert [set(x) for x in b["factors"]] == [{"name", "weight", "value"}] * len(f["factors"])
+
+    def test_nba_reasoning_codes(self):
+        for hcp in HCPS:
+            full = compute_next_best_action(hcp)
+            codes = compute_next_best_action(hcp, explain="codes")
+            assert _reasoning(codes) == full["reasoning"]
+            assert "reasoning" not in codes
+            assert _rendered_factors([codes]) == _descriptions([full])
+
+    def test_segmentation_reasoning_codes(self):
+        full = segment_hcps(HCPS)
+        codes = segment_hcps(HCPS, explain="codes")
+        assert [_reasoning(c) for c in codes] == [f["reasoning"] for f in full]
+        assert all(
+            set(s) == {"hcpId", "segmentName", "confidence", "inputDataHash"}
+            for s in segment_hcps(HCPS, explain="none")
+        )
+
+
+class TestEndpoints:
+    def test_codes_response_has_no_null_fields(self, client):
+        body = client.post(
+            "/api/v1/scoring/engagement", params={"explain": "codes"}, json=HCPS[3], headers=HEADERS
+        ).json()
+        assert all(set(f) == {"name", "weight", "value", "template", "args"} for f in body["factors"])
+
+    def test_full_response_unchanged(self, client):
+        body = client.post("/api/v1/scoring/engagement", json=HCPS[3], headers=HEADERS).json()
+        assert all(set(f) == {"name", "weight", "value", "description"} for f in body["factors"])
+
+    def test_modes_are_cached_separately(self, client):
+        url = "/api/v1/scoring/prescription-propensity/batch"
+        payload = {"hcps": HCPS}
+        full = client.post(url, json=payload, headers=HEADERS).json()
+        codes = client.post(url, params={"explain": "codes"}, json=payload, headers=HEADERS).json()
+        again = client.post(url, json=payload, headers=HEADERS).json()
+        assert _rendered_factors(codes["results"]) == _descriptions(full["results"])
+        assert _descriptions(again["results"]) == _descriptions(full["results"])
+
+    def test_bulk_payload_shrinks(self, client):
+        sizes = {
+            mode: len(client.post(
+                "/api/v1/scoring/engagement/batch",
+                params={"explain": mode}, json={"hcps": HCPS}, headers=HEADERS,
+            ).content)
+            for mode in ("full", "codes", "none")
+        }
+        assert sizes["none"] < sizes["codes"] < sizes["full"]
+
+    def test_nba_and_segmentation_modes(self, client):
+        nba = client.post(
+            "/api/v1/nba/recommend", params={"explain": "codes"}, json=HCPS[4], headers=HEADERS
+        ).json()
+        assert "reasoning" not in nba and nba["reasoningCodes"]
+
+        segments = client.post(
+            "/api/v1/segmentation/classify", params={"explain": "none"},
+            json={"hcps": HCPS}, headers=HEADERS,
+        ).json()
+        assert all("reasoning" not in s and "reasoningCodes" not in s for s in segments)
+
+    def test_invalid_mode_rejected(self, client):
+        response = client.post(
+            "/api/v1/scoring/engagement", params={"explain": "verbose"}, json=HCPS[0], headers=HEADERS
+        )
+        assert response.status_code == 422
+
+
+class TestCatalog:
+    def test_catalog(self, client):
+        response = client.get("/api/v1/explanations/templates", headers=HEADERS)
+        assert response.status_code == 200
+        assert response.json() == {"version": CATALOG_VERSION, "templates": TEMPLATES}
+        assert response.headers["etag"] == f'"{CATALOG_VERSION}"'
+        assert "max-age" in response.headers["cache-control"]
+
+    def test_if_none_match(self, client):
+        response = client.get(
+            "/api/v1/explanations/templates",
+            headers={**HEADERS, "If-None-Match": f'"{CATALOG_VERSION}"'},
+        )
+        assert response.status_code == 304
+
+    def test_version_tracks_templates(self):
+        digest = hashlib.sha256(json.dumps(TEMPLATES, sort_keys=True).encode()).hexdigest()
+        assert CATALOG_VERSION == digest[:16]
@@ -0,0 +1,246 @@
+"""
+Tests for the factor registry.
+Validates config compilation, side-by-side versions and hot reload.
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import API_KEY, app
+from app.services.factor_registry import (
+    BUILTIN_CONFIG_PATH,
+    BucketTable,
+    FactorRegistry,
+    LevelTable,
+    compile_config,
+)
+from app.services.score_cache import CACHE_MISS, ScoreCache
+from app.services.scoring_engine import (
+    compute_engagement_score,
+    compute_engagement_scores_batch,
+    compute_prescription_propensity,
+    compute_prescription_propensity_batch,
+)
+
+HEADERS = {"X-API-Key": API_KEY}
+
+HCP = {
+    "hcpId": "registry-001",
+    "influenceLevel": "high",
+    "interactionCount": 12,
+    "lastInteractionDate": None,
+    "channelHistory": [
+        {"channel": "email", "status": "completed", "sentiment": 0.4},
+        {"channel": "phone", "status": "completed", "sentiment": 0.1},
+    ],
+    "consentStatus": [{"status": "granted"}],
+}
+
+
+def _builtin() -> dict:
+    with open(BUILTIN_CONFIG_PATH) as f:
+        return json.load(f)
+
+
+def _experiment(weight: float) -> dict:
+    """Overlay declaring a second version that only reweights recency."""
+    spec = _builtin()["versions"]["scoring-v1.0"]
+    spec["engagement_likelihood"]["factors"][0]["weight"] = weight
+    return {"versions": {"scoring-exp": spec}}
+
+
+def _write(path, config: dict, mtime: float) -> None:
+    path.write_text(json.dumps(config))
+    os.utime(path, (mtime, mtime))
+
+
+class TestCompilation:
+    def test_bucket_table_bins_are_right_closed(self):
+        table = BucketTable([7, 30], [0.9, 0.5, 0.1])
+        assert table.lookup(np.array([0, 7, 8, 30, 31])).tolist() == [0.9, 0.9, 0.5, 0.5, 0.1]
+
+    def test_bucket_table_rejects_mismatched_values(self):
+        with pytest.raises(ValueError):
+            BucketTable([7, 30], [0.9, 0.5])
+
+    def test_level_table_defaults_and_missing(self):
+        table = LevelTable({"high": 0.75, "medium": 0.5, "low": 0.25}, default=0.4)
+        levels = ["high", None, "", "unheard-of", "low"]
+        assert table.lookup(levels).tolist() == [0.75, 0.5, 0.5, 0.4, 0.25]
+        assert table.lookup([]).tolist() == []
+
+    def test_level_table_without_missing_level(self):
+        table = LevelTable({"a": 1.0}, default=0.0, missing=None)
+        assert table.lookup([None, "a", ""]).tolist() == [0.0, 1.0, 0.0]
+
+    def test_unknown_factor_is_rejected(self):
+        config = _builtin()
+        config["versions"]["scoring-v1.0"]["engagement_likelihood"]["factors"].append(
+            {"name": "astrology", "weight": 0.1}
+        )
+        with pytest.raises(ValueError):
+            compile_config(config)
+
+    def test_table_driven_factor_needs_its_table(self):
+        for name, table in (("interaction_recency", "buckets"), ("influence_level", "levels")):
+            config = _builtin()
+            factors = config["versions"]["scoring-v1.0"]["engagement_likelihood"]["factors"]
+            for factor in factors:
+                if factor["name"] == name:
+                    del factor[table]
+            with pytest.raises(ValueError, match=f"{name} needs {table}"):
+                compile_config(config)
+
+    def test_default_must_be_declared(self):
+        config = _builtin()
+        config["default"] = "scoring-v9"
+        with pytest.raises(ValueError):
+            compile_config(config)
+
+
+class TestRegistry:
+    def test_versions_stay_resident_side_by_side(self, tmp_path):
+        overlay = tmp_path / "models.json"
+        _write(overlay, _experiment(1.0), 1000)
+        registry = FactorRegistry([BUILTIN_CONFIG_PATH, overlay])
+
+        default = registry.get("engagement_likelihood")
+        experiment = registry.get("engagement_likelihood", "scoring-exp")
+        assert default.version == "scoring-v1.0"
+        assert experiment.weight_list[0] == 1.0
+
+        base = compute_engagement_score(HCP, model=default)
+        reweighted = compute_engagement_score(HCP, model=experiment)
+        assert reweighted["modelVersion"] == "scoring-exp"
+        # Recency is the weakest factor here, so weighting it up lowers the score
+        assert reweighted["score"] < base["score"]
+
+    def test_unknown_version_raises_key_error(self):
+        registry = FactorRegistry([BUILTIN_CONFIG_PATH])
+        with pytest.raises(KeyError):
+            registry.get("engagement_likelihood", "scoring-v9")
+
+    def test_changed_config_is_picked_up_without_restart(self, tmp_path):
+        overlay = tmp_path / "models.json"
+        _write(overlay, _experiment(1.0), 1000)
+        registry = FactorRegistry([BUILTIN_CONFIG_PATH, overlay], check_interval=0)
+
+        _write(overlay, _experiment(2.0), 2000)
+        assert registry.get("engagement_likelihood", "scoring-exp").weight_list[0] == 2.0
+
+    def test_reweighting_a_version_changes_its_cache_version(self, tmp_path):
+        overlay = tmp_path / "models.json"
+        _write(overlay, _experiment(1.0), 1000)
+        registry = FactorRegistry([BUILTIN_CONFIG_PATH, overlay], check_interval=0)
+        before = registry.get("engagement_likelihood", "scoring-exp")
+        cache = ScoreCache()
+        cache.get_or_compute(
+            "engagement_likelihood", before.cache_version, HCP,
+            lambda p: compute_engagement_score(p, model=before),
+        )
+
+        _write(overlay, _experiment(2.0), 2000)
+        after = registry.get("engagement_likelihood", "scoring-exp")
+        assert after.version == before.version
+        assert after.cache_version != before.cache_version
+        result = cache.get_or_compute(
+            "engagement_likelihood", after.cache_version, HCP,
+            lambda p: compute_engagement_score(p, model=after),
+        )
+        assert result["cacheStatus"] == CACHE_MISS
+        assert result["modelVersion"] == "scoring-exp"
+
+    def test_unchanged_spec_keeps_its_fingerprint(self):
+        assert (
+            FactorRegistry([BUILTIN_CONFIG_PATH]).get("engagement_likelihood").cache_version
+            == FactorRegistry([BUILTIN_CONFIG_PATH]).get("engagement_likelihood").cache_version
+        )
+
+    def test_invalid_config_keeps_last_good_models(self, tmp_path):
+        overlay = tmp_path / "models.json"
+        _write(overlay, _experiment(1.0), 1000)
+        registry = FactorRegistry([BUILTIN_CONFIG_PATH, overlay], check_interval=0)
+
+        broken = _experiment(1.0)
+        broken["versions"]["scoring-exp"]["engagement_likelihood"]["factors"] = []
+        _write(overlay, broken, 2000)
+        assert registry.get("engagement_likelihood", "scoring-exp").weight_list[0] == 1.0
+        with pytest.raises(ValueError):
+            registry.reload()
+
+
+    def test_config_missing_a_table_keeps_last_good_models(self, tmp_path):
+        overlay = tmp_path / "models.json"
+        _write(overlay, _experiment(1.0), 1000)
+        registry = FactorRegistry([BUILTIN_CONFIG_PATH, overlay], check_interval=0)
+
+        broken = _experiment(2.0)
+        broken["versions"]["scoring-exp"]["engagement_likelihood"]["factors"][0] = {
+            "name": "interaction_recency", "weight": 1.0,
+        }
+        _write(overlay, broken, 2000)
+        model = registry.get("engagement_likelihood", "scoring-exp")
+        assert model.weight_list[0] == 1.0
+        assert compute_engagement_scores_batch([HCP], model=model)[0]["score"] > 0
+        with pytest.raises(ValueError):
+            registry.reload()
+
+
+class TestSharedKernel:
+    def test_single_and_batch_agree_for_every_version(self, tmp_path):
+        overlay = tmp_path / "models.json"
+        _write(overlay, _experiment(0.6), 1000)
+        registry = FactorRegistry([BUILTIN_CONFIG_PATH, overlay])
+
+        for version in ("scoring-v1.0", "scoring-exp"):
+            model = registry.get("engagement_likelihood", version)
+            single = compute_engagement_score(HCP, model=model)
+            batch = compute_engagement_scores_batch([HCP], model)[0]
+            assert single["score"] == batch["score"]
+            assert single["factors"] == batch["factors"]
+
+    def test_propensity_single_and_batch_agree(self):
+        hcps = [
+            {**HCP, "hcpId": f"registry-{i}", "influenceLevel": level, "segments": ["a"] * i}
+            for i, level in enumerate(["low", "key_opinion_leader", None, "unusual"])
+        ]
+        batch = compute_prescription_propensity_batch(hcps)
+        for hcp, result in zip(hcps, batch):
+            single = compute_prescription_propensity(hcp)
+            assert single["score"] == result["score"]
+            assert single["factors"] == result["factors"]
+
+    def test_propensity_weights_come_from_config(self):
+        result = compute_prescription_propensity(HCP)
+        weights = {f["name"]: f["weight"] for f in result["factors"]}
+        assert weights == {
+            "influence_level": 0.3,
+            "interaction_engagement": 0.3,
+            "segment_alignment": 0.2,
+            "specialty_relevance": 0.2,
+        }
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+class TestModelEndpoints:
+    def test_lists_resident_versions(self, client):
+        body = client.get("/api/v1/scoring/models", headers=HEADERS).json()
+        assert body["default"] in body["versions"]
+        assert "engagement_likelihood" in body["versions"][body["default"]]
+
+    def test_unknown_model_version_is_404(self, client):
+        response = client.post(
+            "/api/v1/scoring/engagement",
+            params={"model_version": "scoring-v9"},
+            json=HCP,
+            headers=HEADERS,
+        )
+        assert response.status_code == 404
@@ -0,0 +1,159 @@
+"""
+Tests for canonical input hashing.
+Validates the encoding, its streaming and the inputDataHash of every engine.
+"""
+
+import hashlib
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import API_KEY, app
+from app.services import input_hash
+from app.schemas.scoring import HCPScoringInput, NBABatchInput
+from app.services.input_hash import canonical_bytes, input_data_hash, pre_encoded, request_payload
+from app.services.nba_engine import compute_next_best_action, compute_next_best_actions_batch
+from app.services.scoring_engine import (
+    compute_engagement_score,
+    compute_engagement_score_incremental,
+    compute_engagement_scores_batch,
+    compute_prescription_propensity_batch,
+)
+from app.services.segmentation_engine import segment_hcps
+from app.services.summary_engine import generate_account_summary
+
+HCP = {
+    "hcpId": "hash-001",
+    "userId": "user-001",
+    "influenceLevel": "high",
+    "interactionCount": 3,
+    "lastInteractionDate": "2024-06-01T10:00:00Z",
+    "channelHistory": [
+        {"channel": "email", "status": "completed", "sentiment": 0.25, "date": None},
+        {"channel": "phone", "status": "no_show", "sentiment": None, "date": None},
+    ],
+    "consentStatus": [{"consent_type": "email", "status": "granted"}],
+    "segments": ["cardio"],
+}
+
+
+def _reversed(value):
+    """Same value with every dict's keys in reverse insertion order."""
+    if isinstance(value, dict):
+        return {k: _reversed(value[k]) for k in reversed(list(value))}
+    if isinstance(value, list):
+        return [_reversed(v) for v in value]
+    return value
+
+
+class TestEncoding:
+    def test_reference_vector(self):
+        """Locks the wire format; other implementations must reproduce it."""
+        value = {"b": [1, 2.5, None, True], "a": "x"}
+        assert canonical_bytes(value).hex() == (
+            "4d00000002" "5300000001" "61" "5300000001" "78"
+            "5300000001" "62" "4c00000004" "490000000000000001"
+            "44" "4004000000000000" "4e" "54"
+        )
+        assert input_data_hash(value) == hashlib.sha256(canonical_bytes(value)).hexdigest()
+
+    def test_key_order_does_not_matter(self):
+        assert input_data_hash(HCP) == input_data_hash(_reversed(HCP))
+
+    def test_json_number_semantics(self):
+        assert input_data_hash({"x": 1.0}) == input_data_hash({"x": 1})
+        assert input_data_hash({"x": float("nan")}) == input_data_hash({"x": None})
+        assert input_data_hash({"x": np.int64(7)}) == input_data_hash({"x": 7})
+        assert input_data_hash(np.array([1.5, np.nan])) == input_data_hash([1.5, None])
+
+    def test_types_are_distinguished(self):
+        values = [1, "1", [1], {"1": 1}, None, False, 0, "", [], {}, 2 ** 70, 1.5]
+        assert len({canonical_bytes(v) for v in values}) == len(values)
+
+    def test_as_of_is_folded_in(self):
+        assert input_data_hash(HCP, "2024-06-02") != input_data_hash(HCP)
+        assert input_data_hash(HCP, "2024-06-02") != input_data_hash(HCP, "2024-06-03")
+
+    def test_streaming_matches_one_shot(self, monkeypatch):
+        """Flushing into the hash in small chunks yields the same digest."""
+        big = {**HCP, "channelHistory": HCP["channelHistory"] * 2000}
+        expected = hashlib.sha256(canonical_bytes(big)).hexdigest()
+        monkeypatch.setattr(input_hash, "FLUSH_BYTES", 256)
+        assert input_data_hash(big) == expected
+
+    def test_pre_encoded_values_hash_like_the_originals(self):
+        context = {"userId": "u-1", "recentUserInteractions": [{"channel": "email"}]}
+        shared = {key: pre_encoded(value) for key, value in context.items()}
+        assert input_data_hash({**HCP, **shared}) == input_data_hash({**HCP, **context})
+
+
+class TestEngines:
+    @pytest.fixture
+    def expected(self):
+        return input_data_hash(HCP)
+
+    def test_scoring(self, expected):
+        assert compute_engagement_score(HCP)["inputDataHash"] == expected
+        assert compute_engagement_scores_batch([HCP])[0]["inputDataHash"] == expected
+        assert compute_prescription_propensity_batch([HCP])[0]["inputDataHash"] == expected
+
+    def test_incremental(self):
+        data = {"hcpId": "hash-001", "newInteractions": HCP["channelHistory"]}
+        assert compute_engagement_score_incremental(data)["inputDataHash"] == input_data_hash(data)
+
+    def test_nba_segmentation_and_summary(self, expected):
+        assert compute_next_best_action(HCP)["inputDataHash"] == expected
+        assert compute_next_best_action({**HCP, "consentStatus": []})["inputDataHash"] == (
+            input_data_hash({**HCP, "consentStatus": []})
+        )
+        assert segment_hcps([HCP])[0]["inputDataHash"] == expected
+        assert generate_account_summary(HCP)["inputDataHash"] == expected
+
+    def test_summary_hash_ignores_key_order(self):
+        assert (generate_account_summary(HCP)["inputDataHash"]
+                == generate_account_summary(_reversed(HCP))["inputDataHash"])
+
+
+class TestRequestPayloads:
+    SENT = {"hcpId": "hash-002", "interactionCount": 2, "specialty": None}
+
+    def test_hash_covers_only_the_sent_fields(self):
+        payload = request_payload(HCPScoringInput.model_validate(self.SENT))
+        # Engines still see every field, defaults included
+        assert payload["channelHistory"] == [] and payload["influenceLevel"] is None
+        expected = input_data_hash({"hcpId": "hash-002", "interactionCount": 2})
+        assert input_data_hash(payload) == expected
+        assert compute_engagement_score(payload)["inputDataHash"] == expected
+
+    def test_new_schema_fields_keep_existing_hashes(self):
+        class Extended(HCPScoringInput):
+            territoryTier: int = 0
+            tags: list[str] = []
+
+        before = request_payload(HCPScoringInput.model_validate(self.SENT))
+        after = request_payload(Extended.model_validate(self.SENT))
+        assert input_data_hash(after) == input_data_hash(before)
+        as_of = "2026-01-01"
+        assert input_data_hash(after, as_of=as_of) == input_data_hash(before, as_of=as_of)
+
+    def test_batch_nba_hashes_the_sent_fields(self):
+        data = NBABatchInput.model_validate({
+            "context": {"userId": "rep-1"},
+            "hcps": [{
+                "hcpId": "hash-003",
+                "specialty": "cardiology",
+                "consentStatus": [{"consent_type": "email", "status": "granted"}],
+            }],
+        })
+        hcp, context = request_payload(data.hcps[0]), request_payload(data.context)
+        [result] = compute_next_best_actions_batch([hcp], context)
+        assert result["inputDataHash"] == input_data_hash({**hcp.sent, **context.sent})
+
+    def test_endpoint_hash_matches_the_request_body(self):
+        body = {"hcpId": "hash-004", "interactionCount": 1, "lastInteractionDate": None}
+        response = TestClient(app).post(
+            "/api/v1/scoring/engagement", json=body, headers={"X-API-Key": API_KEY}
+        )
+        sent = {"hcpId": "hash-004", "interactionCount": 1}
+        assert response.json()["inputDataHash"] == input_data_hash(sent)
@@ -0,0 +1,81 @@
+"""
+Tests for the unified HCP insight endpoint.
+Each section must match the dedicated endpoint for the same payload.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import API_KEY, app
+
+HEADERS = {"X-API-Key": API_KEY}
+
+PAYLOAD = {
+    "hcpId": "insight-001",
+    "userId": "user-001",
+    "specialty": "cardiology",
+    "influenceLevel": "key_opinion_leader",
+    "interactionCount": 6,
+    "lastInteractionDate": "2024-06-01T10:00:00Z",
+    "channelHistory": [
+        {"channel": "email", "status": "completed", "sentiment": 0.6},
+        {"channel": "in_person_visit", "status": "completed", "sentiment": 0.2},
+        {"channel": "email", "status": "completed", "sentiment": None},
+        {"channel": "phone", "status": "no_show", "sentiment": -0.1},
+    ],
+    "consentStatus": [
+        {"consent_type": "email", "status": "granted"},
+        {"consent_type": "visit", "status": "granted"},
+        {"consent_type": "phone", "status": "revoked"},
+    ],
+    "segments": ["kol_network"],
+    "previousScores": [{"score": 71.5}],
+}
+
+VOLATILE = {"computedAt", "generatedAt", "recommendedTiming", "cacheStatus", "reasoning"}
+
+
+def _stable(result: dict) -> dict:
+    return {k: v for k, v in result.items() if k not in VOLATILE}
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+class TestHCPInsights:
+    def test_sections_match_dedicated_endpoints(self, client):
+        insight = client.post("/api/v1/insights/hcp", json=PAYLOAD, headers=HEADERS)
+        assert insight.status_code == 200
+        body = insight.json()
+
+        engagement = client.post("/api/v1/scoring/engagement", json=PAYLOAD, headers=HEADERS).json()
+        propensity = client.post(
+            "/api/v1/scoring/prescription-propensity", json=PAYLOAD, headers=HEADERS
+        ).json()
+        nba = client.post("/api/v1/nba/recommend", json=PAYLOAD, headers=HEADERS).json()
+        summary = client.post("/api/v1/summaries/account", json=PAYLOAD, headers=HEADERS).json()
+
+        assert _stable(body["engagement"]) == _stable(engagement)
+        assert _stable(body["propensity"]) == _stable(propensity)
+        assert body["nextBestAction"]["recommendedChannel"] == nba["recommendedChannel"]
+        assert sorted(body["nextBestAction"]["factors"], key=lambda f: f["name"]) == sorted(
+            nba["factors"], key=lambda f: f["name"]
+        )
+        assert _stable(body["summary"]) == _stable(summary)
+
+    def test_summary_hash_matches_summary_endpoint(self, client):
+        """The summary section hashes the summary input, not the whole payload."""
+        body = client.post("/api/v1/insights/hcp", json=PAYLOAD, headers=HEADERS).json()
+        summary = client.post("/api/v1/summaries/account", json=PAYLOAD, headers=HEADERS).json()
+        assert body["summary"]["inputDataHash"] == summary["inputDataHash"]
+
+    def test_scores_share_the_scoring_cache(self, client):
+        """A rescore that only adds the latest score to previousScores is a cache hit."""
+        payload = {**PAYLOAD, "hcpId": "insight-cache-001"}
+        first = client.post("/api/v1/insights/hcp", json=payload, headers=HEADERS).json()
+        rescored = {**payload, "previousScores": [{"score": first["engagement"]["score"]}]}
+        second = client.post("/api/v1/insights/hcp", json=rescored, headers=HEADERS).json()
+        assert second["engagement"]["cacheStatus"] == "hit"
+        assert second["propensity"]["cacheStatus"] == "hit"
@@ -4,7 +4,16 @@ Validates consent enforcement, channel selection, and explainability.
 """
 
 import pytest
-from app.services.nba_engine import compute_next_best_action
+from fastapi.testclient import TestClient
+
+from app.main import API_KEY, app
+from app.services.hcp_features import channel_aggregates, extract_hcp_features
+from app.services.interaction_columns import CHANNEL_CODES, STATUS_CODES
+from app.services.nba_engine import (
+    compute_next_best_action,
+    compute_next_best_actions_batch,
+    plan_next_best_actions,
+)
 
 
 class TestNextBestAction:
@@ -77,3 +86,251 @@ class TestNextBestAction:
         })
         timing = datetime.fromisoformat(result["recommendedTiming"])
         assert timing > datetime.utcnow()
+
+    def test_channel_columns_match_channel_history(self):
+        """Columnar history must produce the same recommendation and factors."""
+        history = [
+            {"channel": "email", "status": "completed", "sentiment": 0.4},
+            {"channel": "phone", "status": "completed", "sentiment": None},
+            {"channel": "email", "status": "no_show", "sentiment": -0.2},
+        ]
+        base = {
+            "hcpId": "test-007",
+            "userId": "user-001",
+            "interactionCount": 3,
+            "consentStatus": [
+                {"consent_type": "email", "status": "granted"},
+                {"consent_type": "phone", "status": "granted"},
+                {"consent_type": "visit", "status": "granted"},
+            ],
+        }
+        columns = {
+            "channel": [CHANNEL_CODES[h["channel"]] for h in history],
+            "status": [STATUS_CODES[h["status"]] for h in history],
+            "sentiment": [h["sentiment"] for h in history],
+            "timestamp": [None] * len(history),
+        }
+        by_rows = compute_next_best_action({**base, "channelHistory": history})
+        by_columns = compute_next_best_action({**base, "channelColumns": columns})
+        assert by_columns["recommendedChannel"] == by_rows["recommendedChannel"]
+        assert by_columns["confidence"] == by_rows["confidence"]
+        assert sorted(by_columns["factors"], key=lambda f: f["name"]) == sorted(
+            by_rows["factors"], key=lambda f: f["name"]
+        )
+
+    @pytest.mark.parametrize("days_ago,wait_days,template", [
+        (2, 5, "nba.timing.wait"),
+        (6, 1, "nba.timing.wait"),
+        (7, 2, "nba.timing.follow_up"),
+        (29, 2, "nba.timing.follow_up"),
+        (30, 1, "nba.timing.reengage"),
+    ])
+    def test_timing_bands(self, days_ago, wait_days, template):
+        """Follow-up timing is read from the day bands."""
+        from datetime import datetime, timedelta, timezone
+
+        last = datetime.now(timezone.utc) - timedelta(days=days_ago, hours=1)
+        result = compute_next_best_action({
+            "hcpId": "test-007",
+            "userId": "user-001",
+            "lastInteractionDate": last.isoformat(),
+            "consentStatus": [{"consent_type": "email", "status": "granted"}],
+        }, explain="codes")
+        timing = next(f for f in result["factors"] if f["name"] == "recommended_timing")
+        assert (timing["template"], timing["args"]) == (template, [days_ago])
+        recommended = datetime.fromisoformat(result["recommendedTiming"])
+        if recommended.tzinfo is None:
+            recommended = recommended.replace(tzinfo=timezone.utc)
+        delay = recommended - datetime.now(timezone.utc)
+        assert timedelta(days=wait_days - 1) < delay <= timedelta(days=wait_days)
+
+    def test_timing_skips_booked_slots(self):
+        """Timing moves to the end of the rep's bookings around the gap-rule slot."""
+        from datetime import datetime, timedelta, timezone
+
+        due = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(days=1)
+        bookings = [
+            {"hcpId": "other", "scheduledAt": (due - timedelta(minutes=10)).isoformat()},
+            {"hcpId": "other", "scheduledAt": (due + timedelta(minutes=15)).isoformat(),
+             "durationMinutes": 60},
+        ]
+        result = compute_next_best_action({
+            "hcpId": "test-008",
+            "userId": "user-001",
+            "recentUserInteractions": bookings,
+            "consentStatus": [{"consent_type": "email", "status": "granted"}],
+        }, explain="codes")
+        recommended = datetime.fromisoformat(result["recommendedTiming"]).replace(tzinfo=timezone.utc)
+        assert recommended == due + timedelta(minutes=75)
+        assert {"template": "nba.reason.calendar", "args": []} in result["reasoningCodes"]
+
+
+class TestBatchNextBestAction:
+    CONTEXT = {
+        "userId": "user-001",
+        "pendingTasks": 3,
+        "recentUserInteractions": [{"hcpId": "batch-nba-1", "channel": "phone"}],
+    }
+    HCPS = [
+        {"hcpId": "batch-nba-0", "consentStatus": []},
+        {
+            "hcpId": "batch-nba-1",
+            "specialty": "oncology",
+            "influenceLevel": "high",
+            "interactionCount": 6,
+            "lastInteractionDate": "2024-01-10T10:00:00Z",
+            "channelHistory": [
+                {"channel": "phone", "status": "completed", "sentiment": 0.9},
+                {"channel": "email", "status": "completed", "sentiment": -0.5},
+                {"channel": "phone", "status": "completed"},
+            ],
+            "consentStatus": [
+                {"consent_type": "phone", "status": "granted"},
+                {"consent_type": "email", "status": "granted"},
+                {"consent_type": "visit", "status": "revoked"},
+                {"consent_type": "fax", "status": "granted"},
+            ],
+        },
+        {
+            "hcpId": "batch-nba-2",
+            "specialty": "cardiology",
+            "lastInteractionDate": "not-a-date",
+            "consentStatus": [
+                {"consent_type": "remote_detailing", "status": "granted"},
+                {"consent_type": "visit", "status": "granted"},
+            ],
+        },
+    ]
+
+    def _strip(self, result):
+        return {k: v for k, v in result.items() if k != "recommendedTiming"}
+
+    def test_batch_matches_single_requests(self):
+        batch = compute_next_best_actions_batch(self.HCPS, self.CONTEXT, explain="codes")
+        for hcp, result in zip(self.HCPS, batch):
+            single = compute_next_best_action({**hcp, **self.CONTEXT}, explain="codes")
+            assert self._strip(result) == self._strip(single)
+
+    def test_channels_in_channel_order(self):
+        result = compute_next_best_actions_batch(self.HCPS, self.CONTEXT)[2]
+        names = [f["name"] for f in result["factors"]]
+        assert names == ["in_person_visit_novelty", "remote_detailing_novelty", "recommended_timing"]
+        assert result["recommendedChannel"] == "in_person_visit"
+
+    def test_latest_consent_record_decides(self):
+        hcp = {
+            "hcpId": "batch-nba-3",
+            "consentStatus": [
+                {"consent_type": "visit", "status": "granted",
+                 "created_at": "2024-01-01T00:00:00Z"},
+                {"consent_type": "visit", "status": "revoked",
+                 "created_at": "2024-03-01T00:00:00Z"},
+                {"consent_type": "email", "status": "granted",
+                 "created_at": "2024-02-01T00:00:00Z"},
+            ],
+        }
+        result = compute_next_best_actions_batch([hcp], self.CONTEXT)[0]
+        assert result["recommendedChannel"] == "email"
+        assert [f["name"] for f in result["factors"]][:-1] == ["email_novelty"]
+
+    def test_endpoint(self):
+        response = TestClient(app).post(
+            "/api/v1/nba/recommend/batch",
+            json={"context": self.CONTEXT, "hcps": self.HCPS},
+            headers={"X-API-Key": API_KEY},
+        )
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["hcpId"] for r in results] == [h["hcpId"] for h in self.HCPS]
+        assert [r["recommendedChannel"] for r in results] == ["none", "phone", "in_person_visit"]
+
+
+class TestChannelAggregates:
+    CHANNELS = ["email", "phone", "in_person_visit"]
+    HISTORY = [
+        {"channel": "phone", "status": "completed", "sentiment": 0.3},
+        {"channel": "webinar", "status": "completed", "sentiment": 0.9},
+        {"channel": "phone", "status": "completed", "sentiment": None},
+        {"channel": "email", "status": "no_show", "sentiment": -0.1},
+        {"channel": "phone", "status": "completed", "sentiment": 0.7},
+    ]
+
+    def test_rows_and_columns_match_feature_record(self):
+        columns = {
+            "channel": [CHANNEL_CODES[h["channel"]] for h in self.HISTORY],
+            "status": [STATUS_CODES[h["status"]] for h in self.HISTORY],
+            "sentiment": [h["sentiment"] for h in self.HISTORY],
+            "timestamp": [None] * len(self.HISTORY),
+        }
+        records = [
+            {"channelHistory": self.HISTORY},
+            {"channelHistory": []},
+            {"channelColumns": columns},
+        ]
+        stats = channel_aggregates(records, self.CHANNELS)
+        channel_stats = extract_hcp_features(records[0])["channel_stats"]
+        for row in (0, 2):
+            for code, channel in enumerate(self.CHANNELS):
+                count, total, sentiment_count = channel_stats.get(channel, [0, 0, 0])
+                assert stats.counts[row, code] == count
+                assert stats.sentiment_sums[row, code] == total
+                assert stats.sentiment_counts[row, code] == sentiment_count
+        assert stats.counts[1].tolist() == [0, 0, 0]
+        assert stats.recent_channels[0] == stats.recent_channels[2] == [
+            h["channel"] for h in self.HISTORY
+        ]
+
+    def test_unlisted_channels_are_skipped(self):
+        stats = channel_aggregates([{"channelHistory": self.HISTORY}], self.CHANNELS)
+        assert int(stats.counts.sum()) == 4
+
+
+class TestPlan:
+    CONTEXT = {"userId": "user-001", "pendingTasks": 0, "recentUserInteractions": []}
+    ALL_CONSENTS = [
+        {"consent_type": t, "status": "granted"}
+        for t in ("email", "phone", "visit", "remote_detailing")
+    ]
+
+    def _book(self) -> list[dict]:
+        return [
+            {"hcpId": f"plan-{i}", "consentStatus": self.ALL_CONSENTS} for i in range(5)
+        ] + [
+            {"hcpId": "plan-visit-only",
+             "consentStatus": [{"consent_type": "visit", "status": "granted"}]},
+            {"hcpId": "plan-no-consent", "consentStatus": []},
+        ]
+
+    def test_without_capacities_plan_matches_recommendations(self):
+        book = self._book()
+        plan = plan_next_best_actions(book, self.CONTEXT, {})
+        recommended = compute_next_best_actions_batch(book, self.CONTEXT)
+        assert [p["channel"] for p in plan["plan"]] == [
+            r["recommendedChannel"] for r in recommended
+        ]
+        assert plan["unassigned"] == 1
+
+    def test_capacities_are_respected_and_consent_kept(self):
+        plan = plan_next_best_actions(
+            self._book(), self.CONTEXT, {"in_person_visit": 1, "remote_detailing": 2}
+        )
+        assert plan["channelLoad"] == {
+            "email": 0, "phone": 3, "in_person_visit": 1, "remote_detailing": 2
+        }
+        by_hcp = {p["hcpId"]: p for p in plan["plan"]}
+        # The only visit goes to the HCP who has no other channel
+        assert by_hcp["plan-visit-only"]["channel"] == "in_person_visit"
+        assert by_hcp["plan-0"]["preferredChannel"] == "in_person_visit"
+        assert by_hcp["plan-no-consent"]["channel"] == "none"
+        assert plan["totalExpectedValue"] == round(0.9 + 2 * 0.8 + 3 * 0.7, 2)
+
+    def test_endpoint(self):
+        client = TestClient(app)
+        headers = {"X-API-Key": API_KEY}
+        body = {"context": self.CONTEXT, "hcps": self._book(), "capacities": {"phone": 0}}
+        response = client.post("/api/v1/nba/plan", json=body, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["channelLoad"]["phone"] == 0
+
+        body["capacities"] = {"webinar": 3}
+        assert client.post("/api/v1/nba/plan", json=body, headers=headers).status_code == 422
@@ -0,0 +1,143 @@
+"""
+Tests for NDJSON streaming scoring.
+Validates ordering, inline errors, chunk growth and flat memory use.
+"""
+
+import asyncio
+import json
+import tracemalloc
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import API_KEY, app
+from app.schemas.scoring import HCPScoringInput
+from app.services.ndjson import aiter_lines, chunk_sizes, score_ndjson
+
+HEADERS = {"X-API-Key": API_KEY, "Content-Type": "application/x-ndjson"}
+
+
+def _hcp(i: int) -> dict:
+    return {
+        "hcpId": f"stream-{i}",
+        "influenceLevel": ["low", "medium", "high", "key_opinion_leader"][i % 4],
+        "interactionCount": i % 30,
+        "channelHistory": [
+            {"channel": "email", "status": "completed", "sentiment": (i % 7 - 3) / 3},
+            {"channel": "phone", "status": "completed"},
+        ][: i % 3],
+        "consentStatus": [{"status": "granted"}] * (i % 2),
+    }
+
+
+def _body(records: list[dict]) -> bytes:
+    return "".join(json.dumps(r) + "\n" for r in records).encode()
+
+
+async def _chunked(body: bytes, size: int):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+def _stable(result: dict) -> dict:
+    return {k: v for k, v in result.items() if k not in ("computedAt", "cacheStatus")}
+
+
+class TestStreamEndpoint:
+    def test_results_match_batch_endpoint_in_order(self, client):
+        records = [_hcp(i) for i in range(300)]
+        streamed = client.post("/api/v1/scoring/stream", content=_body(records), headers=HEADERS)
+        assert streamed.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in streamed.text.splitlines()]
+
+        batch = client.post(
+            "/api/v1/scoring/engagement/batch",
+            json={"hcps": records},
+            headers={"X-API-Key": API_KEY},
+        ).json()["results"]
+        assert [_stable(r) for r in lines] == [_stable(r) for r in batch]
+
+    def test_invalid_lines_are_reported_inline(self, client):
+        body = _body([_hcp(0)]) + b"{not json\n" + b'{"influenceLevel": "high"}\n' + _body([_hcp(1)])
+        lines = [
+            json.loads(line)
+            for line in client.post("/api/v1/scoring/stream", content=body, headers=HEADERS)
+            .text.splitlines()
+        ]
+        assert [line.get("hcpId") for line in lines] == ["stream-0", None, None, "stream-1"]
+        assert lines[1]["line"] == 2
+        assert lines[2]["error"].startswith("hcpId")
+
+    def test_propensity_stream(self, client):
+        response = client.post(
+            "/api/v1/scoring/stream",
+            params={"score_type": "prescription_propensity"},
+            content=_body([_hcp(0), _hcp(1)]),
+            headers=HEADERS,
+        )
+        results = [json.loads(line) for line in response.text.splitlines()]
+        assert {r["scoreType"] for r in results} == {"prescription_propensity"}
+
+
+class TestStreaming:
+    def test_lines_split_across_chunks(self):
+        async def collect():
+            return [line async for line in aiter_lines(_chunked(b'{"a":1}\n\n{"b":2}\n{"c":3}', 3))]
+
+        assert asyncio.run(collect()) == [(1, b'{"a":1}'), (3, b'{"b":2}'), (4, b'{"c":3}')]
+
+    def test_oversized_lines_are_dropped_while_read(self):
+        body = b'{"a":1}\n' + b"x" * 50 + b'\n{"b":2}\n' + b"y" * 40
+
+        async def collect():
+            return [line async for line in aiter_lines(_chunked(body, 7), max_line_bytes=16)]
+
+        assert asyncio.run(collect()) == [(1, b'{"a":1}'), (2, None), (3, b'{"b":2}'), (4, None)]
+
+    def test_oversized_line_is_reported_inline(self, monkeypatch):
+        monkeypatch.setattr("app.services.ndjson.STREAM_MAX_LINE_BYTES", 300)
+
+        async def score(records):
+            return [{"hcpId": r["hcpId"]} for r in records]
+
+        async def collect():
+            body = _body([_hcp(1), {"hcpId": "x" * 500}, _hcp(2)])
+            return [line async for line in score_ndjson(_chunked(body, 64), HCPScoringInput, score)]
+
+        lines = [json.loads(line) for chunk in asyncio.run(collect()) for line in chunk.splitlines()]
+        assert lines == [
+            {"hcpId": "stream-1"},
+            {"line": 2, "error": "line exceeds 300 bytes"},
+            {"hcpId": "stream-2"},
+        ]
+
+    def test_chunks_grow_to_limit(self):
+        sizes = chunk_sizes(32, 100)
+        assert [next(sizes) for _ in range(5)] == [32, 64, 100, 100, 100]
+
+    def test_peak_memory_does_not_grow_with_input(self):
+        async def score(records):
+            return [{"hcpId": r["hcpId"]} for r in records]
+
+        async def lines(n):
+            for i in range(n):
+                yield (json.dumps(_hcp(i)) + "\n").encode()
+
+        async def drain(n):
+            async for _ in score_ndjson(lines(n), HCPScoringInput, score, 32, 500):
+                pass
+
+        def peak(n):
+            tracemalloc.start()
+            asyncio.run(drain(n))
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return peak_bytes
+
+        small, large = peak(1_000), peak(8_000)
+        assert large < small * 1.5
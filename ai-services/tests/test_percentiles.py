@@ -0,0 +1,189 @@
+"""
+Tests for the territory percentile index.
+Validates percentile ranks, rescoring, merges, snapshots and the scoring endpoints.
+"""
+
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import API_KEY, app
+from app.services.percentiles import PercentileIndex, score_bin
+from app.services.scoring_engine import ENGAGEMENT, PROPENSITY
+
+HEADERS = {"X-API-Key": API_KEY}
+
+
+def _index(scores: list[float], territory: str = "north", updated_at: float = 1.0) -> PercentileIndex:
+    index = PercentileIndex()
+    index.update(
+        ENGAGEMENT,
+        [(f"hcp-{i}", territory, score) for i, score in enumerate(scores)],
+        updated_at=updated_at,
+    )
+    return index
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+class TestPercentiles:
+    def test_rank_counts_half_of_ties(self):
+        index = _index([10, 20, 30, 40])
+        assert index.percentile(ENGAGEMENT, "north", 30) == 62.5
+        assert index.percentile(ENGAGEMENT, "north", 25) == 50.0
+        assert index.percentile(ENGAGEMENT, "north", 0) == 0.0
+        assert index.percentile(ENGAGEMENT, "north", 100) == 100.0
+
+    def test_territories_and_score_types_are_separate(self):
+        index = _index([10, 20])
+        index.update(ENGAGEMENT, [("hcp-9", "south", 90)])
+        assert index.population(ENGAGEMENT, "north") == 2
+        assert index.percentile(ENGAGEMENT, "south", 90) == 50.0
+        assert index.percentile(PROPENSITY, "north", 50) is None
+
+    def test_bins_are_tenths(self):
+        assert score_bin(62.44) == score_bin(62.4) == 624
+        assert (score_bin(-1), score_bin(100.04)) == (0, 1000)
+
+    def test_rescoring_moves_an_hcp(self):
+        index = _index([10, 20, 30], updated_at=1.0)
+        index.update(ENGAGEMENT, [("hcp-0", "north", 50)], updated_at=2.0)
+        assert index.population(ENGAGEMENT, "north") == 3
+        assert index.percentile(ENGAGEMENT, "north", 50) == 83.3
+
+    def test_moving_territory(self):
+        index = _index([10, 20])
+        index.update(ENGAGEMENT, [("hcp-0", "south", 10)], updated_at=2.0)
+        assert index.population(ENGAGEMENT, "north") == 1
+        assert index.population(ENGAGEMENT, "south") == 1
+
+    def test_annotate_skips_hcps_without_territory(self):
+        index = PercentileIndex()
+        payloads = [{"territoryId": "east"}, {"territoryId": None}]
+        results = [{"hcpId": "a", "score": 40.0}, {"hcpId": "b", "score": 60.0}]
+        index.annotate(ENGAGEMENT, payloads, results)
+        assert results[0]["territoryPercentile"] == 50.0
+        assert "territoryPercentile" not in results[1]
+
+    def test_annotate_without_record_leaves_population_alone(self):
+        index = _index([10, 20, 30, 40])
+        results = [{"hcpId": "hcp-0", "score": 35.0}]
+        index.annotate(ENGAGEMENT, [{"territoryId": "north"}], results, record=False)
+        assert results[0]["territoryPercentile"] == 75.0
+        assert index.population(ENGAGEMENT, "north") == 4
+        assert index.percentile(ENGAGEMENT, "north", 10) == 12.5
+
+
+class TestMergeAndSnapshots:
+    def test_merge_keeps_newest_score_per_hcp(self):
+        first = _index([10, 20], updated_at=1.0)
+        second = _index([30], updated_at=2.0)  # hcp-0 rescored on another worker
+        second.update(ENGAGEMENT, [("hcp-7", "north", 70)], updated_at=2.0)
+        first.merge(second)
+        assert first.population(ENGAGEMENT, "north") == 3
+        assert first.percentile(ENGAGEMENT, "north", 30) == 50.0
+
+        stale = _index([5], updated_at=0.5)
+        first.merge(stale)
+        assert first.percentile(ENGAGEMENT, "north", 30) == 50.0
+
+    def test_save_and_load_roundtrip(self, tmp_path):
+        index = _index([12.3, 45.6, 78.9])
+        index.save(tmp_path / "index-1.npz")
+        loaded = PercentileIndex.load(tmp_path / "index-1.npz")
+        for score in (0, 12.3, 50, 78.9, 100):
+            assert loaded.percentile(ENGAGEMENT, "north", score) == index.percentile(
+                ENGAGEMENT, "north", score
+            )
+
+    def test_workers_converge_through_snapshots(self, tmp_path):
+        a = PercentileIndex(directory=tmp_path)
+        b = PercentileIndex(directory=tmp_path)
+        a.update(ENGAGEMENT, [("hcp-a", "west", 20)])
+        b.update(ENGAGEMENT, [("hcp-b", "west", 80)])
+        a.save(tmp_path / "index-a.npz")
+        b.save(tmp_path / "index-b.npz")
+        assert a.load_snapshots() == 2
+        assert a.population(ENGAGEMENT, "west") == 2
+        assert a.percentile(ENGAGEMENT, "west", 80) == 75.0
+
+    def test_stale_snapshots_are_merged_then_removed(self, tmp_path):
+        _index([10]).save(tmp_path / "index-old.npz")
+        os.utime(tmp_path / "index-old.npz", (time.time() - 3600,) * 2)
+        live = PercentileIndex()
+        live.update(ENGAGEMENT, [("hcp-live", "north", 90)])
+        live.save(tmp_path / "index-live.npz")
+        index = PercentileIndex(directory=tmp_path, stale_seconds=600)
+        index.snapshot()
+        assert sorted(p.name for p in tmp_path.glob("index-*.npz")) == [
+            f"index-{os.getpid()}.npz", "index-live.npz",
+        ]
+        # The stale file's scores live on in this worker's snapshot
+        assert index.population(ENGAGEMENT, "north") == 2
+        restarted = PercentileIndex(directory=tmp_path)
+        restarted.load_snapshots()
+        assert restarted.population(ENGAGEMENT, "north") == 2
+
+    def test_annotate_does_no_snapshot_io(self, tmp_path):
+        index = PercentileIndex(directory=tmp_path, snapshot_seconds=0)
+        result = {"hcpId": "hcp-1", "score": 40.0}
+        index.annotate(ENGAGEMENT, [{"territoryId": "north"}], [result])
+        assert result["territoryPercentile"] == 50.0
+        assert not list(tmp_path.iterdir())
+
+    def test_unreadable_snapshot_is_skipped(self, tmp_path):
+        (tmp_path / "index-bad.npz").write_bytes(b"not a snapshot")
+        _index([10]).save(tmp_path / "index-good.npz")
+        index = PercentileIndex(directory=tmp_path)
+        assert index.load_snapshots() == 1
+        assert index.population(ENGAGEMENT, "north") == 1
+
+
+class TestEndpoints:
+    def _hcp(self, i: int, territory: str) -> dict:
+        return {
+            "hcpId": f"percentile-{territory}-{i}",
+            "territoryId": territory,
+            "influenceLevel": "high",
+            "interactionCount": i * 3,
+            "channelHistory": [{"channel": "email", "status": "completed", "sentiment": 0.4}],
+        }
+
+    def test_batch_results_carry_territory_percentile(self, client):
+        hcps = [self._hcp(i, "percentile-t1") for i in range(5)]
+        results = client.post(
+            "/api/v1/scoring/engagement/batch", json={"hcps": hcps}, headers=HEADERS
+        ).json()["results"]
+        percentiles = [r["territoryPercentile"] for r in results]
+        assert percentiles == sorted(percentiles)
+        assert percentiles[0] < 50 < percentiles[-1]
+
+        lookup = client.get(
+            "/api/v1/scoring/percentile",
+            params={"territory_id": "percentile-t1", "score": results[-1]["score"]},
+            headers=HEADERS,
+        ).json()
+        assert lookup["population"] == 5
+        assert lookup["percentile"] == percentiles[-1]
+
+    def test_rescoring_does_not_grow_the_territory(self, client):
+        hcp = self._hcp(1, "percentile-t2")
+        for _ in range(3):
+            client.post("/api/v1/scoring/engagement", json=hcp, headers=HEADERS)
+        lookup = client.get(
+            "/api/v1/scoring/percentile",
+            params={"territory_id": "percentile-t2", "score": 50},
+            headers=HEADERS,
+        ).json()
+        assert lookup["population"] == 1
+
+    def test_no_territory_no_percentile(self, client):
+        hcp = self._hcp(1, "x")
+        del hcp["territoryId"]
+        result = client.post("/api/v1/scoring/engagement", json=hcp, headers=HEADERS).json()
+        assert "territoryPercentile" not in result
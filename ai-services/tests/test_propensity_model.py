@@ -0,0 +1,160 @@
+"""
+Tests for trained propensity model serving.
+Validates artifact loading, memory mapping, batching and fallback.
+"""
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+
+from app.main import API_KEY, app
+from app.services import scoring_engine
+from app.services.percentiles import percentile_index
+from app.services.propensity_model import (
+    PROPENSITY_FEATURES,
+    PropensityModelStore,
+    propensity_feature_matrix,
+    save_artifact,
+)
+
+HCPS = [
+    {
+        "hcpId": "prop-001",
+        "influenceLevel": "key_opinion_leader",
+        "interactionCount": 30,
+        "segments": ["kol_network", "high_value_engaged"],
+        "yearsOfPractice": 25,
+        "therapeuticAreas": ["cardiology", "lipids"],
+    },
+    {
+        "hcpId": "prop-002",
+        "influenceLevel": "low",
+        "interactionCount": 1,
+        "segments": [],
+        "yearsOfPractice": None,
+        "therapeuticAreas": None,
+    },
+]
+
+
+def _training_data(n: int = 400) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(7)
+    X = np.column_stack([
+        rng.integers(0, 4, n),
+        rng.integers(0, 40, n),
+        rng.integers(0, 5, n),
+        rng.integers(1, 35, n),
+        rng.integers(0, 4, n),
+    ]).astype(np.float64)
+    y = (X[:, 0] + X[:, 1] / 10 + rng.normal(0, 1, n) > 3).astype(int)
+    return X, y
+
+
+def _install(directory, version: str, estimator, trained_at: str) -> None:
+    X, y = _training_data()
+    estimator.fit(X, y)
+    save_artifact(
+        estimator,
+        directory,
+        version,
+        {
+            "modelType": type(estimator).__name__,
+            "trainedAt": trained_at,
+            "importances": dict(zip(PROPENSITY_FEATURES, [4, 3, 1, 1, 1])),
+            "fill": {"years_of_practice": 12.0},
+            "metrics": {"accuracy": 0.81},
+        },
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    _install(tmp_path, "propensity-lr-1", LogisticRegression(max_iter=500), "2024-01-01")
+    _install(tmp_path, "propensity-gb-1", HistGradientBoostingClassifier(max_iter=20), "2024-02-01")
+    return PropensityModelStore(tmp_path)
+
+
+class TestFeatures:
+    def test_matrix_follows_feature_order(self):
+        matrix = propensity_feature_matrix(HCPS)
+        assert matrix.shape == (2, len(PROPENSITY_FEATURES))
+        assert matrix[0].tolist() == [3, 30, 2, 25, 2]
+        assert np.isnan(matrix[1, 3])
+
+
+class TestPropensityArtifacts:
+    def test_latest_artifact_is_default(self, store):
+        assert store.load() == ["propensity-gb-1", "propensity-lr-1"]
+        assert store.get().version == "propensity-gb-1"
+
+    def test_arrays_are_memory_mapped(self, store):
+        estimator = store.get("propensity-lr-1").estimator
+        assert isinstance(estimator.coef_, np.memmap)
+
+    def test_batch_matches_single_scoring(self, store):
+        for version in ("propensity-lr-1", "propensity-gb-1"):
+            artifact = store.get(version)
+            batch = artifact.score(HCPS)
+            for hcp, result in zip(HCPS, batch):
+                single = artifact.score([hcp])[0]
+                assert single["score"] == result["score"]
+                assert single["factors"] == result["factors"]
+
+    def test_results_keep_factor_shape(self, store):
+        result = store.get().score(HCPS)[0]
+        assert result["scoreType"] == "prescription_propensity"
+        assert result["modelVersion"] == "propensity-gb-1"
+        assert 0 <= result["score"] <= 100
+        assert result["confidence"] == 0.81
+        assert [f["name"] for f in result["factors"]] == list(PROPENSITY_FEATURES)
+        assert abs(sum(f["weight"] for f in result["factors"]) - 1.0) < 1e-3
+        for factor in result["factors"]:
+            assert 0 <= factor["value"] <= 1
+            assert factor["description"]
+
+    def test_stronger_profile_scores_higher(self, store):
+        strong, weak = store.get("propensity-lr-1").score(HCPS)
+        assert strong["score"] > weak["score"]
+
+    def test_broken_artifact_is_skipped(self, tmp_path, store):
+        (tmp_path / "propensity-broken").mkdir()
+        (tmp_path / "propensity-broken" / "model.joblib").write_bytes(b"not a model")
+        assert "propensity-broken" not in store.load()
+
+    def test_empty_directory_falls_back(self, tmp_path):
+        assert PropensityModelStore(tmp_path / "missing").get() is None
+
+
+class TestPropensityEndpoints:
+    @pytest.fixture
+    def client(self, store, monkeypatch):
+        monkeypatch.setattr(scoring_engine, "propensity_models", store)
+        return TestClient(app)
+
+    def _post(self, client, path, payload, **params):
+        return client.post(
+            f"/api/v1/scoring/{path}",
+            params=params,
+            json=payload,
+            headers={"X-API-Key": API_KEY},
+        )
+
+    def test_batch_endpoint_uses_trained_model(self, client):
+        body = self._post(client, "prescription-propensity/batch", {"hcps": HCPS}).json()
+        assert [r["modelVersion"] for r in body["results"]] == ["propensity-gb-1"] * 2
+
+    def test_factor_model_version_can_still_be_selected(self, client):
+        result = self._post(
+            client, "prescription-propensity", HCPS[0], model_version="scoring-v1.0"
+        ).json()
+        assert result["modelVersion"] == "scoring-v1.0"
+        assert result["factors"][0]["name"] == "influence_level"
+
+    def test_other_versions_do_not_feed_the_percentile_index(self, client):
+        hcp = {**HCPS[0], "hcpId": "prop-territory", "territoryId": "propensity-t1"}
+        self._post(client, "prescription-propensity", hcp, model_version="scoring-v1.0")
+        assert percentile_index.population("prescription_propensity", "propensity-t1") == 0
+        self._post(client, "prescription-propensity", hcp)
+        assert percentile_index.population("prescription_propensity", "propensity-t1") == 1
@@ -0,0 +1,219 @@
+"""
+Tests for the nightly rescoring job.
+Validates snapshot formats, COPY output, rejects and checkpoint resume.
+"""
+
+from datetime import datetime, timedelta
+import csv
+import json
+import re
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.jobs import rescore
+from app.services.scoring_engine import ENGAGEMENT, compute_engagement_scores_batch
+
+
+def _hcp(i: int) -> dict:
+    return {
+        "hcpId": f"rescore-{i}",
+        "influenceLevel": ["low", "medium", "high", "key_opinion_leader"][i % 4],
+        "interactionCount": i % 20,
+        "yearsOfPractice": 5 + i % 25,
+        "segments": ["cardio"] * (i % 3),
+        "channelHistory": [
+            {"channel": "email", "status": "completed", "sentiment": 0.5},
+            {"channel": "phone", "status": "completed"},
+        ][: i % 3],
+        "consentStatus": [{"status": "granted"}] * (i % 2),
+    }
+
+
+def _write_csv(path, records):
+    fields = list(records[0])
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for record in records:
+            writer.writerow({
+                k: json.dumps(v) if isinstance(v, (list, dict)) else v for k, v in record.items()
+            })
+    return path
+
+
+def _write_ndjson(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records))
+    return path
+
+
+def _read_copy(path, columns) -> list[dict]:
+    """Decode a COPY text format file."""
+    unescape = {"t": "\t", "n": "\n", "r": "\r", "\\": "\\"}
+    rows = []
+    for line in path.read_text().splitlines():
+        values = [
+            None if field == "\\N" else re.sub(r"\\(.)", lambda m: unescape[m.group(1)], field)
+            for field in line.split("\t")
+        ]
+        rows.append(dict(zip(columns, values)))
+    return rows
+
+
+def _scores(output_dir) -> list[dict]:
+    """ai_scores rows without the run-dependent computed_at."""
+    rows = _read_copy(output_dir / rescore.AI_SCORES_FILE, rescore.AI_SCORES_COLUMNS)
+    return [{k: v for k, v in row.items() if k != "computed_at"} for row in rows]
+
+
+@pytest.fixture
+def records():
+    return [_hcp(i) for i in range(250)]
+
+
+class TestSnapshotFormats:
+    def test_csv_ndjson_and_parquet_agree(self, tmp_path, records):
+        csv_path = _write_csv(tmp_path / "snapshot.csv", records)
+        ndjson_path = _write_ndjson(tmp_path / "snapshot.ndjson", records)
+        parquet_path = tmp_path / "snapshot.parquet"
+        pq.write_table(
+            pa.Table.from_pylist([{**r, "channelHistory": json.dumps(r["channelHistory"])}
+                                  for r in records]),
+            parquet_path,
+            row_group_size=64,
+        )
+
+        outputs = []
+        for name, path in [("csv", csv_path), ("ndjson", ndjson_path), ("pq", parquet_path)]:
+            rescore.run(path, tmp_path / name, chunk_rows=100, workers=0)
+            outputs.append(_scores(tmp_path / name))
+        assert outputs[0] == outputs[1] == outputs[2]
+        assert len(outputs[0]) == 2 * len(records)
+
+    def test_snake_case_columns(self):
+        record = rescore.prepare_record({"hcp_id": "x", "interaction_count": "4", "segments": '["a"]'})
+        assert (record["hcpId"], record["interactionCount"], record["segments"]) == ("x", 4, ["a"])
+
+
+class TestOutput:
+    def test_scores_match_engine(self, tmp_path, records):
+        rescore.run(_write_ndjson(tmp_path / "in.ndjson", records), tmp_path / "out",
+                    score_types=(ENGAGEMENT,), workers=0)
+        expected = compute_engagement_scores_batch(records)
+        rows = _scores(tmp_path / "out")
+        assert [row["hcp_id"] for row in rows] == [r["hcpId"] for r in expected]
+        assert [float(row["score"]) for row in rows] == [r["score"] for r in expected]
+        assert json.loads(rows[0]["factors"]) == expected[0]["factors"]
+
+        audit = _read_copy(tmp_path / "out" / rescore.AUDIT_LOG_FILE, rescore.AUDIT_LOG_COLUMNS)
+        assert audit[0]["user_id"] is None and audit[0]["action"] == "ai_decision"
+        assert json.loads(audit[0]["new_state"])["scoreType"] == ENGAGEMENT
+        assert json.loads(audit[0]["metadata"])["factors"] == expected[0]["factors"]
+        assert "\\copy ai_scores (hcp_id," in (tmp_path / "out" / rescore.LOAD_FILE).read_text()
+
+    def test_computed_at_carries_a_utc_offset(self, tmp_path, records):
+        rescore.run(_write_ndjson(tmp_path / "in.ndjson", records[:3]), tmp_path / "out",
+                    score_types=(ENGAGEMENT,), workers=0)
+        rows = _read_copy(tmp_path / "out" / rescore.AI_SCORES_FILE, rescore.AI_SCORES_COLUMNS)
+        for row in rows:
+            assert row["computed_at"].endswith("+00:00")
+            assert datetime.fromisoformat(row["computed_at"]).utcoffset() == timedelta(0)
+
+    def test_copy_escaping(self):
+        assert rescore.copy_line([None, "a\tb", "c\\d", 1.5]) == "\\N\ta\\tb\tc\\\\d\t1.5\n"
+
+    def test_invalid_rows_are_rejected_not_fatal(self, tmp_path, records):
+        path = tmp_path / "in.ndjson"
+        path.write_text(
+            json.dumps(records[0]) + "\n" + json.dumps({"influenceLevel": "high"}) + "\n"
+            + json.dumps(records[1]) + "\n"
+        )
+        summary = rescore.run(path, tmp_path / "out", workers=0)
+        assert (summary["rows"], summary["scored"], summary["rejected"]) == (3, 2, 1)
+        reject = json.loads((tmp_path / "out" / rescore.REJECTS_FILE).read_text())
+        assert reject["row"] == 2 and reject["error"].startswith("hcpId")
+
+    def test_parallel_workers(self, tmp_path, records):
+        path = _write_ndjson(tmp_path / "in.ndjson", records)
+        rescore.run(path, tmp_path / "serial", chunk_rows=100, workers=0)
+        rescore.run(path, tmp_path / "parallel", chunk_rows=100, workers=2)
+        assert _scores(tmp_path / "serial") == _scores(tmp_path / "parallel")
+
+
+class TestCheckpoint:
+    def test_resume_after_crash_writes_each_row_once(self, tmp_path, records, monkeypatch):
+        path = _write_ndjson(tmp_path / "in.ndjson", records)
+        rescore.run(path, tmp_path / "clean", chunk_rows=100, workers=0)
+
+        # Die after the second chunk's rows were written but before its checkpoint
+        real_save = rescore.save_checkpoint
+        saves = []
+
+        def crashing_save(output_dir, checkpoint):
+            saves.append(checkpoint["rowsDone"])
+            if len(saves) == 2:
+                raise RuntimeError("killed")
+            real_save(output_dir, checkpoint)
+
+        monkeypatch.setattr(rescore, "save_checkpoint", crashing_save)
+        with pytest.raises(RuntimeError):
+            rescore.run(path, tmp_path / "crashed", chunk_rows=100, workers=0)
+        monkeypatch.setattr(rescore, "save_checkpoint", real_save)
+
+        summary = rescore.run(path, tmp_path / "crashed", chunk_rows=100, workers=0)
+        assert summary["resumedFromRow"] == 100
+        assert _scores(tmp_path / "crashed") == _scores(tmp_path / "clean")
+
+    def test_completed_run_is_not_repeated(self, tmp_path, records):
+        path = _write_ndjson(tmp_path / "in.ndjson", records)
+        rescore.run(path, tmp_path / "out", workers=0)
+        summary = rescore.run(path, tmp_path / "out", workers=0)
+        assert summary["resumedFromRow"] == len(records)
+        assert len(_scores(tmp_path / "out")) == 2 * len(records)
+
+    def test_changed_input_requires_restart(self, tmp_path, records):
+        path = _write_ndjson(tmp_path / "in.ndjson", records)
+        rescore.run(path, tmp_path / "out", workers=0)
+        _write_ndjson(path, records[:10])
+        with pytest.raises(ValueError):
+            rescore.run(path, tmp_path / "out", workers=0)
+        summary = rescore.run(path, tmp_path / "out", workers=0, restart=True)
+        assert summary["rows"] == 10
+
+    def test_versions_are_chosen_per_score_type(self, tmp_path, records):
+        path = _write_ndjson(tmp_path / "in.ndjson", records[:5])
+        summary = rescore.run(
+            path, tmp_path / "out", score_types=(ENGAGEMENT,), workers=0,
+            model_version="scoring-v9", engagement_version="scoring-v1.0",
+        )
+        assert summary["modelVersions"] == {ENGAGEMENT: "scoring-v1.0"}
+
+    def test_unknown_version_is_a_usage_error(self, tmp_path, records, capsys):
+        path = _write_ndjson(tmp_path / "in.ndjson", records[:5])
+        with pytest.raises(SystemExit) as exit_info:
+            rescore.main([
+                "--input", str(path), "--output", str(tmp_path / "out"), "--workers", "0",
+                "--propensity-version", "propensity-missing",
+            ])
+        assert exit_info.value.code == 2
+        assert "propensity-missing" in capsys.readouterr().err
+
+    def test_changed_only_skips_unmoved_scores(self, tmp_path, records):
+        path = _write_ndjson(tmp_path / "in.ndjson", records)
+        rescore.run(path, tmp_path / "first", score_types=(ENGAGEMENT,), workers=0)
+        previous = {row["hcp_id"]: row for row in _scores(tmp_path / "first")}
+        for i, record in enumerate(records):
+            row = previous[record["hcpId"]]
+            score = float(row["score"]) + (10 if i % 5 == 0 else 0)
+            record["previousScores"] = [{
+                "score_type": ENGAGEMENT, "score": score,
+                "model_version": row["model_version"], "factors": row["factors"],
+            }]
+
+        path = _write_ndjson(tmp_path / "next.ndjson", records)
+        summary = rescore.run(path, tmp_path / "next", score_types=(ENGAGEMENT,), workers=0,
+                              changed_only=True)
+        written = [row["hcp_id"] for row in _scores(tmp_path / "next")]
+        assert written == [r["hcpId"] for i, r in enumerate(records) if i % 5 == 0]
+        assert summary["unchanged"] == len(records) - len(written)
@@ -0,0 +1,85 @@
+"""
+Tests for the rep schedule index.
+Validates booking merges, slot boundaries and free-slot search against a linear scan.
+"""
+
+import numpy as np
+
+from app.services.schedule import ScheduleIndex
+
+HOUR = 3600
+
+
+def _booking(seconds: int, minutes=None) -> dict:
+    moment = np.datetime64(seconds, "s").astype(str) + "Z"
+    return {"scheduledAt": moment} if minutes is None else {"scheduledAt": moment, "durationMinutes": minutes}
+
+
+def _linear_scan(bookings: list[tuple[int, int]], t: float, action: int) -> float:
+    """Earliest start >= t whose [start, start + action) overlaps no booking."""
+    while True:
+        clash = [end for start, end in bookings if t < end and start < t + action]
+        if not clash:
+            return t
+        t = max(clash)
+
+
+class TestScheduleIndex:
+    def test_overlapping_bookings_are_merged(self):
+        index = ScheduleIndex.from_interactions([
+            _booking(10 * HOUR, 60),
+            _booking(10 * HOUR + 1800, 60),
+            _booking(14 * HOUR),
+        ])
+        assert len(index) == 2
+        assert index.starts.tolist() == [10 * HOUR - 1800, 14 * HOUR - 1800]
+        assert index.ends.tolist() == [11 * HOUR + 1800, 14 * HOUR + 1800]
+
+    def test_slots_may_touch_bookings(self):
+        index = ScheduleIndex.from_interactions([_booking(10 * HOUR)])
+        times = np.array([9 * HOUR + 1800, 9 * HOUR + 1801, 10 * HOUR + 1799, 10 * HOUR + 1800])
+        assert index.earliest_free(times).tolist() == [
+            9 * HOUR + 1800, 10 * HOUR + 1800, 10 * HOUR + 1800, 10 * HOUR + 1800,
+        ]
+
+    def test_back_to_back_bookings_leave_no_gap(self):
+        # A 30-minute gap fits a 30-minute action; a shorter one does not
+        index = ScheduleIndex.from_interactions([
+            _booking(10 * HOUR), _booking(11 * HOUR), _booking(11 * HOUR + 2400),
+        ])
+        assert index.earliest_free(np.array([10 * HOUR])).tolist() == [10 * HOUR + 1800]
+        assert index.earliest_free(np.array([10 * HOUR + 1801])).tolist() == [12 * HOUR + 600]
+
+    def test_missing_and_invalid_bookings_are_skipped(self):
+        index = ScheduleIndex.from_interactions([
+            {"channel": "phone"}, {"scheduledAt": "not a date"}, {"scheduledAt": None},
+        ])
+        assert len(index) == 0
+        assert index.earliest_free(np.array([5.0])).tolist() == [5.0]
+
+    def test_cancelled_and_no_show_bookings_free_their_slot(self):
+        index = ScheduleIndex.from_interactions([
+            {**_booking(10 * HOUR), "status": "cancelled"},
+            {**_booking(11 * HOUR), "status": "no_show"},
+            {**_booking(12 * HOUR), "status": "planned"},
+            _booking(13 * HOUR),
+        ])
+        assert index.starts.tolist() == [12 * HOUR - 1800, 13 * HOUR - 1800]
+        assert index.earliest_free(np.array([10 * HOUR, 11 * HOUR])).tolist() == [10 * HOUR, 11 * HOUR]
+
+    def test_invalid_durations_use_the_default(self):
+        index = ScheduleIndex.from_interactions([_booking(10 * HOUR, "long"), _booking(12 * HOUR, -5)])
+        assert (index.ends - index.starts).tolist() == [3600, 3600]
+
+    def test_matches_linear_scan(self):
+        rng = np.random.default_rng(11)
+        for _ in range(100):
+            starts = rng.integers(0, 48, rng.integers(0, 20)) * 900
+            minutes = rng.integers(1, 5, len(starts)) * 15
+            index = ScheduleIndex.from_interactions(
+                [_booking(int(s), int(m)) for s, m in zip(starts, minutes)]
+            )
+            bookings = [(int(s), int(s) + int(m) * 60) for s, m in zip(starts, minutes)]
+            times = rng.integers(0, 50 * 900, 30).astype(np.float64)
+            expected = [_linear_scan(bookings, t, 1800) for t in times.tolist()]
+            assert index.earliest_free(times).tolist() == expected
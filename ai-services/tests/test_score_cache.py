@@ -0,0 +1,171 @@
+"""
+Tests for the two-tier score cache.
+Validates hit/miss reporting, version invalidation and size-based eviction.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import API_KEY, app
+from app.services.input_hash import input_data_hash
+from app.services.score_cache import CACHE_HIT, CACHE_MISS, ScoreCache
+from app.services.scoring_engine import (
+    compute_engagement_score,
+    compute_engagement_scores_batch,
+    engagement_inputs,
+    propensity_inputs,
+)
+
+
+class LocalRedis:
+    """In-memory stand-in for the subset of redis.Redis the cache uses."""
+
+    def __init__(self):
+        self.store = {}
+
+    def mget(self, keys):
+        return [self.store.get(k) for k in keys]
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value.encode() if isinstance(value, str) else value
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        return []
+
+
+class CountingEngine:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, data):
+        self.calls += 1
+        return compute_engagement_score(data)
+
+
+HCP = {"hcpId": "cache-001", "interactionCount": 4, "influenceLevel": "high"}
+
+
+class TestScoreCache:
+    def test_second_request_is_a_hit(self):
+        cache = ScoreCache()
+        engine = CountingEngine()
+        first = cache.get_or_compute("engagement_likelihood", "v1", HCP, engine)
+        second = cache.get_or_compute("engagement_likelihood", "v1", dict(HCP), engine)
+        assert first["cacheStatus"] == CACHE_MISS
+        assert second["cacheStatus"] == CACHE_HIT
+        assert second["score"] == first["score"]
+        assert engine.calls == 1
+
+    def test_key_is_independent_of_key_order(self):
+        cache = ScoreCache()
+        reordered = dict(reversed(list(HCP.items())))
+        assert cache.key("s", "v1", HCP) == cache.key("s", "v1", reordered)
+
+    def test_changed_input_is_a_miss(self):
+        cache = ScoreCache()
+        engine = CountingEngine()
+        cache.get_or_compute("engagement_likelihood", "v1", HCP, engine)
+        changed = {**HCP, "interactionCount": 5}
+        result = cache.get_or_compute("engagement_likelihood", "v1", changed, engine)
+        assert result["cacheStatus"] == CACHE_MISS
+        assert engine.calls == 2
+
+    def test_model_version_change_invalidates(self):
+        cache = ScoreCache()
+        engine = CountingEngine()
+        cache.get_or_compute("engagement_likelihood", "v1", HCP, engine)
+        result = cache.get_or_compute("engagement_likelihood", "v2", HCP, engine)
+        assert result["cacheStatus"] == CACHE_MISS
+        assert not any(":v1:" in key for key in cache._local)
+
+    def test_as_of_is_part_of_the_key(self):
+        cache = ScoreCache()
+        engine = CountingEngine()
+        cache.get_or_compute("engagement_likelihood", "v1", HCP, engine, as_of="2026-01-01")
+        result = cache.get_or_compute("engagement_likelihood", "v1", HCP, engine, as_of="2026-01-02")
+        assert result["cacheStatus"] == CACHE_MISS
+
+    def test_size_based_eviction(self):
+        engine = CountingEngine()
+        probe = ScoreCache()
+        probe.get_or_compute("engagement_likelihood", "v1", HCP, engine)
+        entry_size = probe._local_bytes
+
+        cache = ScoreCache(max_bytes=int(entry_size * 2.5))
+        for i in range(5):
+            cache.get_or_compute("engagement_likelihood", "v1", {**HCP, "hcpId": f"h{i}"}, engine)
+        assert cache._local_bytes <= cache.max_bytes
+        assert len(cache._local) == 2
+        evicted = cache.get_or_compute("engagement_likelihood", "v1", {**HCP, "hcpId": "h0"}, engine)
+        assert evicted["cacheStatus"] == CACHE_MISS
+
+    def test_shared_tier_serves_other_workers(self):
+        shared = LocalRedis()
+        engine = CountingEngine()
+        ScoreCache(shared=shared).get_or_compute("engagement_likelihood", "v1", HCP, engine)
+        result = ScoreCache(shared=shared).get_or_compute(
+            "engagement_likelihood", "v1", HCP, engine
+        )
+        assert result["cacheStatus"] == CACHE_HIT
+        assert engine.calls == 1
+
+    def test_batch_computes_only_misses(self):
+        cache = ScoreCache()
+        batches = []
+
+        def compute_many(records):
+            batches.append(len(records))
+            return compute_engagement_scores_batch(records)
+
+        records = [{**HCP, "hcpId": f"b{i}"} for i in range(4)]
+        cache.get_or_compute_many("engagement_likelihood", "v1", records[:2], compute_many)
+        results = cache.get_or_compute_many("engagement_likelihood", "v1", records, compute_many)
+        assert batches == [2, 2]
+        assert [r["cacheStatus"] for r in results] == [CACHE_HIT, CACHE_HIT, CACHE_MISS, CACHE_MISS]
+        assert [r["hcpId"] for r in results] == ["b0", "b1", "b2", "b3"]
+
+    def test_fields_the_scorer_ignores_do_not_change_the_key(self):
+        cache = ScoreCache()
+        engine = CountingEngine()
+        base = {**HCP, "previousScores": [{"score": 50.0}], "segments": ["a"], "territoryId": "t1"}
+        cache.get_or_compute("engagement_likelihood", "v1", base, engine, inputs=engagement_inputs)
+        rescored = {**base, "previousScores": [{"score": 61.0}, {"score": 50.0}],
+                    "segments": ["a", "b"], "territoryId": "t2"}
+        result = cache.get_or_compute(
+            "engagement_likelihood", "v1", rescored, engine, inputs=engagement_inputs
+        )
+        assert result["cacheStatus"] == CACHE_HIT
+        assert engine.calls == 1
+        # The hit still reports the hash of the payload that was sent
+        assert result["inputDataHash"] == input_data_hash(rescored)
+
+    def test_propensity_inputs_count_lists(self):
+        base = {**HCP, "segments": ["a", "b"], "therapeuticAreas": ["x"]}
+        same_sizes = {**base, "segments": ["c", "d"], "therapeuticAreas": ["y"]}
+        assert propensity_inputs(base) == propensity_inputs(same_sizes)
+        assert propensity_inputs(base) != propensity_inputs({**base, "segments": ["a"]})
+
+
+class TestScoringEndpointCache:
+    def test_backend_rescore_hits_the_cache(self):
+        """prepareHCPData sends the latest scores back; that alone must not miss."""
+        client = TestClient(app)
+        headers = {"X-API-Key": API_KEY}
+        body = {
+            "hcpId": "cache-endpoint-001",
+            "influenceLevel": "high",
+            "interactionCount": 3,
+            "channelHistory": [{"channel": "email", "status": "completed", "sentiment": 0.5}],
+            "consentStatus": [{"consent_type": "email", "status": "granted", "notes": "web form"}],
+            "previousScores": [],
+            "segments": ["kol"],
+        }
+        for path in ("/api/v1/scoring/engagement", "/api/v1/scoring/prescription-propensity"):
+            first = client.post(path, json=body, headers=headers).json()
+            rescored = {**body, "previousScores": [{"score": first["score"]}], "segments": ["new"]}
+            second = client.post(path, json=rescored, headers=headers).json()
+            assert second["cacheStatus"] == CACHE_HIT
+            assert second["score"] == first["score"]
@@ -0,0 +1,135 @@
+"""
+Tests for change-only score emission.
+Validates the change rules and the changed_only mode of the scoring endpoints.
+"""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import API_KEY, app
+from app.services.score_changes import has_changed, previous_score, split_changed
+from app.services.scoring_engine import ENGAGEMENT, PROPENSITY
+
+HEADERS = {"X-API-Key": API_KEY}
+
+RESULT = {
+    "hcpId": "hcp-1",
+    "scoreType": ENGAGEMENT,
+    "score": 62.4,
+    "modelVersion": "scoring-v1.0",
+    "factors": [
+        {"name": "interaction_recency", "weight": 0.25, "value": 0.8},
+        {"name": "influence_level", "weight": 0.15, "value": 0.75},
+    ],
+}
+
+
+def _previous(**overrides) -> dict:
+    return {**RESULT, **overrides}
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+class TestChangeRules:
+    def test_identical_score_is_unchanged(self):
+        assert not has_changed(RESULT, _previous())
+
+    def test_no_previous_score_is_changed(self):
+        assert has_changed(RESULT, None)
+
+    def test_score_epsilon(self):
+        assert has_changed(RESULT, _previous(score=62.0))
+        assert not has_changed(RESULT, _previous(score=62.0), epsilon=0.5)
+
+    def test_factor_moves_are_scaled_to_score_points(self):
+        moved = [dict(RESULT["factors"][0], value=0.795), RESULT["factors"][1]]
+        assert has_changed(RESULT, _previous(factors=moved))
+        assert not has_changed(RESULT, _previous(factors=moved), epsilon=1.0)
+
+    def test_model_version_change(self):
+        assert has_changed(RESULT, _previous(modelVersion="scoring-v0.9"))
+
+    def test_ai_scores_row_shape(self):
+        row = {
+            "score_type": ENGAGEMENT,
+            "score": 62.4,
+            "model_version": "scoring-v1.0",
+            "factors": json.dumps(RESULT["factors"]),
+        }
+        assert not has_changed(RESULT, row)
+
+    def test_previous_score_matches_type(self):
+        payload = {"previousScores": [{"scoreType": PROPENSITY, "score": 10}, _previous()]}
+        assert previous_score(payload, ENGAGEMENT)["score"] == 62.4
+        assert previous_score({"previousScores": [{"score": 5}]}, PROPENSITY) == {"score": 5}
+
+    def test_split_keeps_order(self):
+        payloads = [{"previousScores": [_previous()]}, {}, {"previousScores": [_previous()]}]
+        results = [RESULT, dict(RESULT, hcpId="hcp-2"), dict(RESULT, hcpId="hcp-3")]
+        split = split_changed(payloads, results, ENGAGEMENT)
+        assert [r["hcpId"] for r in split["results"]] == ["hcp-2"]
+        assert split["unchanged"] == [
+            {"hcpId": "hcp-1", "score": 62.4},
+            {"hcpId": "hcp-3", "score": 62.4},
+        ]
+
+
+class TestEndpoints:
+    def _hcp(self, i: int) -> dict:
+        return {
+            "hcpId": f"changes-{i}",
+            "influenceLevel": "high",
+            "interactionCount": i,
+            "channelHistory": [{"channel": "email", "status": "completed", "sentiment": 0.4}],
+        }
+
+    def test_single_endpoint(self, client):
+        hcp = self._hcp(3)
+        first = client.post("/api/v1/scoring/engagement", json=hcp, headers=HEADERS).json()
+
+        unchanged = client.post(
+            "/api/v1/scoring/engagement",
+            params={"changed_only": True},
+            json={**hcp, "previousScores": [first]},
+            headers=HEADERS,
+        ).json()
+        assert unchanged == {
+            "results": [],
+            "unchanged": [{"hcpId": "changes-3", "score": first["score"]}],
+        }
+
+        changed = client.post(
+            "/api/v1/scoring/engagement",
+            params={"changed_only": True},
+            json={**hcp, "previousScores": [{**first, "score": first["score"] - 5}]},
+            headers=HEADERS,
+        ).json()
+        assert [r["hcpId"] for r in changed["results"]] == ["changes-3"]
+
+    def test_batch_endpoint(self, client):
+        hcps = [self._hcp(i) for i in range(4)]
+        first = client.post(
+            "/api/v1/scoring/prescription-propensity/batch", json={"hcps": hcps}, headers=HEADERS
+        ).json()["results"]
+        hcps[0]["previousScores"] = [first[0]]
+        hcps[2]["previousScores"] = [{**first[2], "score": first[2]["score"] + 2}]
+
+        response = client.post(
+            "/api/v1/scoring/prescription-propensity/batch",
+            params={"changed_only": True, "epsilon": 1},
+            json={"hcps": hcps},
+            headers=HEADERS,
+        ).json()
+        assert [r["hcpId"] for r in response["results"]] == ["changes-1", "changes-2", "changes-3"]
+        assert [u["hcpId"] for u in response["unchanged"]] == ["changes-0"]
+
+    def test_default_mode_unchanged(self, client):
+        response = client.post(
+            "/api/v1/scoring/engagement/batch", json={"hcps": [self._hcp(1)]}, headers=HEADERS
+        ).json()
+        assert list(response) == ["results"]
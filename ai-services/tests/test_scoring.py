@@ -3,10 +3,31 @@ Tests for the AI Scoring Engine.
 Validates that scoring is explainable, bounded, and correct.
 """
 
+from datetime import datetime
+
+import numpy as np
 import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app.main import API_KEY, app
+from app.schemas.scoring import ChannelHistoryColumns
+from app.services.interaction_columns import (
+    CHANNEL_CODES,
+    STATUS_CODES,
+    columnar_batch_from_arrow,
+)
 from app.services.scoring_engine import (
     compute_engagement_score,
+    compute_engagement_score_incremental,
+    compute_engagement_scores_batch,
+    compute_engagement_scores_columnar,
+    compute_engagement_sensitivity,
+    compute_engagement_top_k,
+    compute_engagement_top_k_rows,
     compute_prescription_propensity,
+    top_k_rows,
+    update_engagement_state,
 )
 
 
@@ -109,3 +130,355 @@ class TestPrescriptionPropensity:
         assert len(result["factors"]) > 0
         for factor in result["factors"]:
             assert "description" in factor
+
+
+class TestBatchEngagementScoring:
+    RECORDS = [
+        {"hcpId": "batch-001"},
+        {
+            "hcpId": "batch-002",
+            "interactionCount": 20,
+            "influenceLevel": "high",
+            "lastInteractionDate": "2024-01-15T10:00:00Z",
+            "channelHistory": [
+                {"channel": "email", "status": "completed", "sentiment": 0.5},
+                {"channel": "phone", "status": "completed", "sentiment": 0.3},
+                {"channel": "email", "status": "completed", "sentiment": -0.1},
+            ],
+            "consentStatus": [
+                {"status": "granted", "consent_type": "email"},
+                {"status": "revoked", "consent_type": "phone"},
+            ],
+        },
+        {
+            "hcpId": "batch-003",
+            "interactionCount": 2,
+            "influenceLevel": "regional",
+            "lastInteractionDate": "not-a-date",
+            "channelHistory": [{"channel": "webinar", "status": "completed"}],
+        },
+        {
+            "hcpId": "batch-004",
+            "interactionCount": 40,
+            "influenceLevel": "key_opinion_leader",
+            "lastInteractionDate": "2020-06-01T08:00:00",
+            "channelHistory": [
+                {"channel": c, "status": "completed", "sentiment": -0.8}
+                for c in ("email", "phone", "webinar", "conference", "email")
+            ],
+            "consentStatus": [{"status": "granted", "consent_type": "visit"}],
+        },
+        {
+            "hcpId": "batch-005",
+            "interactionCount": 7,
+            "influenceLevel": "low",
+            "channelHistory": [{"channel": "", "status": "planned"}],
+        },
+    ]
+
+    def test_batch_matches_single_path(self):
+        """Batch results must equal per-HCP results, factor for factor."""
+        batch = compute_engagement_scores_batch(self.RECORDS)
+        assert len(batch) == len(self.RECORDS)
+        for record, result in zip(self.RECORDS, batch):
+            single = compute_engagement_score(record)
+            for key in ("hcpId", "scoreType", "score", "confidence", "factors", "modelVersion"):
+                assert result[key] == single[key], key
+
+    def test_empty_batch(self):
+        assert compute_engagement_scores_batch([]) == []
+
+
+class TestTopK:
+    RECORDS = TestBatchEngagementScoring.RECORDS * 3
+
+    def test_rows_are_best_first_with_ties_in_order(self):
+        values = np.array([0.2, 0.9, 0.5, 0.9, 0.1, 0.5])
+        assert top_k_rows(values, 3).tolist() == [1, 3, 2]
+        assert top_k_rows(values, 4).tolist() == [1, 3, 2, 5]
+        assert top_k_rows(values, 10).tolist() == [1, 3, 2, 5, 0, 4]
+
+    def test_winners_match_batch_results(self):
+        batch = compute_engagement_scores_batch(self.RECORDS, explain="codes")
+        expected = sorted(range(len(batch)), key=lambda i: (-batch[i]["score"], i))[:4]
+        top = compute_engagement_top_k(self.RECORDS, 4, explain="codes")
+        assert len(top) == 4
+        for i, result in zip(expected, top):
+            for key in ("hcpId", "score", "confidence", "factors", "inputDataHash"):
+                assert result[key] == batch[i][key], key
+
+    def test_k_larger_than_book(self):
+        assert len(compute_engagement_top_k(self.RECORDS[:2], 20)) == 2
+        assert compute_engagement_top_k([], 5) == []
+
+    def test_rows_pair_winners_with_repeated_ids(self):
+        records = [{**r, "hcpId": "same"} for r in TestBatchEngagementScoring.RECORDS]
+        batch = compute_engagement_scores_batch(records)
+        rows, top = compute_engagement_top_k_rows(records, 3)
+        for i, result in zip(rows, top):
+            assert result["score"] == batch[i]["score"]
+            assert result["inputDataHash"] == batch[i]["inputDataHash"]
+
+    def test_endpoint(self):
+        response = TestClient(app).post(
+            "/api/v1/scoring/top-k",
+            params={"k": 2},
+            json={"hcps": self.RECORDS},
+            headers={"X-API-Key": API_KEY},
+        ).json()
+        assert response["total"] == len(self.RECORDS)
+        scores = [r["score"] for r in response["results"]]
+        assert len(scores) == 2 and scores == sorted(scores, reverse=True)
+        assert "description" in response["results"][0]["factors"][0]
+
+
+
+class TestSensitivity:
+    HCP = TestBatchEngagementScoring.RECORDS[1]
+    VISIT = {
+        "channel": "in_person_visit", "status": "completed", "sentiment": 0.9,
+        "date": "2024-02-01T09:00:00Z",
+    }
+
+    def test_scenarios_match_rescoring_edited_inputs(self):
+        scenarios = [
+            {"name": "visit", "addInteractions": [self.VISIT]},
+            {"influenceLevel": "key_opinion_leader"},
+            {"consentStatus": [{"status": "granted"}, {"status": "granted"}]},
+            {"addInteractions": [{"channel": "email", "status": "completed"}],
+             "interactionCount": 50},
+        ]
+        edited = [
+            {**self.HCP, "channelHistory": self.HCP["channelHistory"] + [self.VISIT],
+             "interactionCount": 21, "lastInteractionDate": self.VISIT["date"]},
+            {**self.HCP, "influenceLevel": "key_opinion_leader"},
+            {**self.HCP, "consentStatus": scenarios[2]["consentStatus"]},
+            {**self.HCP, "channelHistory": self.HCP["channelHistory"]
+             + scenarios[3]["addInteractions"], "interactionCount": 50},
+        ]
+        result = compute_engagement_sensitivity(self.HCP, scenarios)
+        expected = compute_engagement_scores_batch([self.HCP] + edited)
+        assert result["baseline"]["score"] == expected[0]["score"]
+        assert [s["name"] for s in result["scenarios"]] == [
+            "visit", "scenario-2", "scenario-3", "scenario-4"
+        ]
+        for scenario, rescored in zip(result["scenarios"], expected[1:]):
+            assert scenario["score"] == rescored["score"]
+            assert list(scenario["values"].values()) == [f["value"] for f in rescored["factors"]]
+
+    def test_effects_are_weighted_value_changes(self):
+        result = compute_engagement_sensitivity(
+            self.HCP, [{"influenceLevel": "key_opinion_leader"}]
+        )
+        scenario = result["scenarios"][0]
+        factors = result["baseline"]["factors"]
+        total = sum(f["weight"] for f in factors)
+        for factor in factors:
+            change = scenario["values"][factor["name"]] - factor["value"]
+            effect = round(factor["weight"] / total * change * 100, 2)
+            assert scenario["effects"][factor["name"]] == effect
+        assert scenario["effects"]["influence_level"] > 0
+        assert abs(sum(scenario["effects"].values()) - scenario["delta"]) < 0.1
+
+    def test_older_added_interaction_keeps_recency(self):
+        old = dict(self.VISIT, date="2020-01-01T00:00:00Z")
+        result = compute_engagement_sensitivity(self.HCP, [{"addInteractions": [old]}])
+        assert result["scenarios"][0]["effects"]["interaction_recency"] == 0
+
+    def test_endpoint(self):
+        response = TestClient(app).post(
+            "/api/v1/scoring/engagement/sensitivity",
+            params={"explain": "none"},
+            json={"hcp": self.HCP, "scenarios": [{"addInteractions": [self.VISIT]}] * 3},
+            headers={"X-API-Key": API_KEY},
+        ).json()
+        assert len(response["scenarios"]) == 3
+        assert "description" not in response["baseline"]["factors"][0]
+        assert response["scenarios"][0]["delta"] > 0
+
+
+def _to_columnar(records: list[dict]) -> dict:
+    """Convert HCP records to the struct-of-arrays batch layout."""
+    batch = {
+        "hcpIds": [], "influenceLevels": [], "interactionCounts": [],
+        "lastInteractionAt": [], "historyOffsets": [0],
+        "history": {"channel": [], "status": [], "sentiment": [], "timestamp": []},
+        "consentOffsets": [0], "consentTypes": [], "consentStatuses": [],
+    }
+    for r in records:
+        batch["hcpIds"].append(r["hcpId"])
+        batch["influenceLevels"].append(r.get("influenceLevel"))
+        batch["interactionCounts"].append(r.get("interactionCount", 0))
+        last = r.get("lastInteractionDate")
+        batch["lastInteractionAt"].append(
+            datetime.fromisoformat(last.replace("Z", "+00:00")).timestamp() if last else None
+        )
+        for h in r.get("channelHistory", []):
+            batch["history"]["channel"].append(CHANNEL_CODES[h["channel"]])
+            batch["history"]["status"].append(STATUS_CODES[h["status"]])
+            batch["history"]["sentiment"].append(h.get("sentiment"))
+            batch["history"]["timestamp"].append(None)
+        batch["historyOffsets"].append(len(batch["history"]["channel"]))
+        for c in r.get("consentStatus", []):
+            batch["consentTypes"].append(c["consent_type"])
+            batch["consentStatuses"].append(c["status"])
+        batch["consentOffsets"].append(len(batch["consentTypes"]))
+    return batch
+
+
+class TestColumnarScoring:
+    RECORDS = [
+        record for record in TestBatchEngagementScoring.RECORDS
+        if record["hcpId"] in ("batch-001", "batch-002")
+    ] + [{
+        "hcpId": "columnar-003",
+        "interactionCount": 12,
+        "influenceLevel": "key_opinion_leader",
+        "lastInteractionDate": "2021-03-01T09:30:00Z",
+        "channelHistory": [
+            {"channel": c, "status": "completed", "sentiment": s}
+            for c, s in [("in_person_visit", 0.9), ("webinar", None), ("phone", 0.1),
+                         ("remote_detailing", -0.4), ("in_person_visit", 0.6)]
+        ],
+        "consentStatus": [
+            {"status": "granted", "consent_type": "visit"},
+            {"status": "granted", "consent_type": "phone"},
+        ],
+    }]
+
+    def _assert_same(self, left, right):
+        assert len(left) == len(right)
+        for a, b in zip(left, right):
+            for key in ("hcpId", "score", "confidence", "factors"):
+                assert a[key] == b[key], key
+
+    def test_columnar_batch_matches_record_batch(self):
+        columnar = compute_engagement_scores_columnar(_to_columnar(self.RECORDS))
+        self._assert_same(columnar, compute_engagement_scores_batch(self.RECORDS))
+
+    def test_arrow_batch_matches_record_batch(self):
+        pa = pytest.importorskip("pyarrow")
+        batch = _to_columnar(self.RECORDS)
+        offsets, consent_offsets = batch["historyOffsets"], batch["consentOffsets"]
+
+        def rows(values, bounds):
+            return [values[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+
+        table = pa.table({
+            "hcpId": batch["hcpIds"],
+            "influenceLevel": batch["influenceLevels"],
+            "interactionCount": batch["interactionCounts"],
+            "lastInteractionAt": batch["lastInteractionAt"],
+            "channel": rows(batch["history"]["channel"], offsets),
+            "status": rows(batch["history"]["status"], offsets),
+            "sentiment": pa.array(rows(batch["history"]["sentiment"], offsets),
+                                  type=pa.list_(pa.float64())),
+            "timestamp": pa.array(rows(batch["history"]["timestamp"], offsets),
+                                  type=pa.list_(pa.float64())),
+            "consentType": rows(batch["consentTypes"], consent_offsets),
+            "consentStatus": rows(batch["consentStatuses"], consent_offsets),
+        })
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        decoded = columnar_batch_from_arrow(sink.getvalue().to_pybytes())
+        columnar = compute_engagement_scores_columnar(decoded)
+        self._assert_same(columnar, compute_engagement_scores_batch(self.RECORDS))
+        # Arrow and JSON encodings of the same HCP hash equally
+        assert [r["inputDataHash"] for r in columnar] == [
+            r["inputDataHash"] for r in compute_engagement_scores_columnar(batch)
+        ]
+
+    def test_single_hcp_channel_columns(self):
+        record = self.RECORDS[-1]
+        batch = _to_columnar([record])
+        columnar_record = {**record, "channelHistory": [], "channelColumns": batch["history"]}
+        self._assert_same(
+            [compute_engagement_score(columnar_record)],
+            [compute_engagement_score(record)],
+        )
+
+    def test_misaligned_columns_rejected(self):
+        with pytest.raises(ValidationError):
+            ChannelHistoryColumns(channel=[0, 1], status=[2], sentiment=[None], timestamp=[None])
+        with pytest.raises(ValidationError):
+            ChannelHistoryColumns(channel=[42], status=[2], sentiment=[None], timestamp=[None])
+
+
+class TestIncrementalScoring:
+    HISTORY = [
+        {"channel": "email", "status": "completed", "sentiment": 0.5, "date": "2024-01-02T10:00:00Z"},
+        {"channel": "email", "status": "completed", "sentiment": None, "date": "2024-02-10T10:00:00Z"},
+        {"channel": "phone", "status": "completed", "sentiment": -0.25, "date": "2024-03-05T10:00:00Z"},
+        {"channel": "webinar", "status": "completed", "sentiment": 0.75, "date": "2024-04-20T10:00:00Z"},
+        {"channel": "in_person_visit", "status": "completed", "sentiment": 0.25, "date": "2024-05-01T10:00:00Z"},
+    ]
+    PROFILE = {
+        "hcpId": "inc-001",
+        "influenceLevel": "high",
+        "consentStatus": [{"status": "granted", "consent_type": "email"}],
+    }
+
+    def test_deltas_match_full_history(self):
+        """Scoring in deltas must equal scoring the whole history at once."""
+        state = None
+        for chunk in (self.HISTORY[:2], self.HISTORY[2:3], self.HISTORY[3:]):
+            result = compute_engagement_score_incremental(
+                {**self.PROFILE, "state": state, "newInteractions": chunk}
+            )
+            state = result["state"]
+
+        full = compute_engagement_score({
+            **self.PROFILE,
+            "interactionCount": len(self.HISTORY),
+            "lastInteractionDate": "2024-05-01T10:00:00Z",
+            "channelHistory": self.HISTORY,
+        })
+        assert result["score"] == full["score"]
+        assert result["confidence"] == full["confidence"]
+        assert result["factors"] == full["factors"]
+        assert state["interactionCount"] == 5
+        assert state["lastInteractionDate"] == "2024-05-01T10:00:00Z"
+
+    def test_off_list_channels_match_full_history(self):
+        """Channels outside the known list count towards diversity in both paths."""
+        history = [
+            {"channel": "email", "status": "completed", "sentiment": 0.5},
+            {"channel": "sms", "status": "completed", "sentiment": None},
+            {"channel": "sms", "status": "completed", "sentiment": 0.1},
+            {"channel": "fax", "status": "completed", "sentiment": None},
+        ]
+        state = None
+        for chunk in (history[:2], history[2:]):
+            result = compute_engagement_score_incremental(
+                {**self.PROFILE, "state": state, "newInteractions": chunk}
+            )
+            state = result["state"]
+        full = compute_engagement_score(
+            {**self.PROFILE, "interactionCount": len(history), "channelHistory": history}
+        )
+        assert result["score"] == full["score"]
+        assert result["factors"] == full["factors"]
+        assert state["otherChannels"] == ["sms", "fax"]
+
+    def test_single_off_list_channel_is_named(self):
+        history = [{"channel": "sms", "status": "completed"}]
+        result = compute_engagement_score_incremental(
+            {**self.PROFILE, "newInteractions": history}
+        )
+        full = compute_engagement_score(
+            {**self.PROFILE, "interactionCount": 1, "channelHistory": history}
+        )
+        assert result["factors"] == full["factors"]
+
+    def test_first_score_without_state(self):
+        result = compute_engagement_score_incremental({"hcpId": "inc-002"})
+        assert result["score"] == compute_engagement_score({"hcpId": "inc-002"})["score"]
+        assert result["state"]["channelMask"] == 0
+
+    def test_state_only_grows_with_new_channels(self):
+        first = update_engagement_state(None, self.HISTORY[:1])
+        again = update_engagement_state(first, self.HISTORY[1:2])
+        assert again["channelMask"] == first["channelMask"]
+        assert again["interactionCount"] == 2
@@ -3,6 +3,7 @@ Tests for the AI Segmentation engine.
 """
 
 import pytest
+from app.services import segmentation_engine
 from app.services.segmentation_engine import segment_hcps
 
 
@@ -64,3 +65,26 @@ class TestSegmentation:
         ])
         for result in results:
             assert 0 <= result["confidence"] <= 1
+
+    def test_rule_thresholds_are_data(self, monkeypatch):
+        """Segment thresholds come from SEGMENTS, not from code."""
+        hcp = {"id": "test-008", "influenceLevel": "high", "interactionCount": 8}
+        assert segment_hcps([hcp])[0]["segmentName"] == "growing_potential"
+
+        high_value = {**segmentation_engine.SEGMENTS["high_value_engaged"], "min_interactions": 8}
+        monkeypatch.setitem(segmentation_engine.SEGMENTS, "high_value_engaged", high_value)
+        assert segment_hcps([hcp])[0]["segmentName"] == "high_value_engaged"
+
+    def test_rule_priority_over_a_population(self):
+        """Each HCP gets the first matching rule, as in the reasoning text."""
+        results = segment_hcps([
+            {"id": "kol", "influenceLevel": "key_opinion_leader", "interactionCount": 0},
+            {"id": "risk", "influenceLevel": "high", "interactionCount": 6, "avgSentiment": -0.6},
+            {"id": "new", "influenceLevel": "high", "interactionCount": 3, "avgSentiment": -0.6},
+            {"id": "std", "influenceLevel": "low", "interactionCount": 4},
+        ])
+        assert [r["segmentName"] for r in results] == [
+            "kol_network", "at_risk_disengaged", "new_targets", "growing_potential",
+        ]
+        assert results[1]["confidence"] == 0.82
+        assert results[3]["reasoning"].startswith("Standard classification")
@@ -0,0 +1,68 @@
+"""
+Tests for the shared timestamp layer.
+Validates column parsing against datetime.fromisoformat and UTC handling.
+"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.services import timestamps
+from app.services.timestamps import days_since, epoch_seconds, parse_timestamps
+
+VALUES = [
+    "2024-06-01T10:00:00Z",
+    "2024-06-01T10:00:00.923456",
+    "2024-06-01",
+    "2024-06-01 10:00:00+02:00",
+    "2024-06-01T10:00:00-05:30",
+    "20240601",
+    "not a date",
+    "2024-13-01T00:00:00",
+    "",
+    None,
+]
+
+
+def _reference(value):
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (ValueError, TypeError, AttributeError):
+        return np.datetime64("NaT", "s")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return np.datetime64(int(parsed.timestamp() // 1), "s")
+
+
+class TestParsing:
+    def test_matches_fromisoformat_as_utc(self):
+        parsed = parse_timestamps(VALUES)
+        assert parsed.dtype == np.dtype("datetime64[s]")
+        expected = np.array([_reference(v) for v in VALUES])
+        np.testing.assert_array_equal(parsed, expected)
+
+    def test_offsets_are_normalized_to_utc(self):
+        parsed = parse_timestamps(["2024-06-01T12:00:00+02:00", "2024-06-01T10:00:00Z"])
+        assert parsed[0] == parsed[1]
+
+    def test_repeated_values_are_served_from_cache(self):
+        timestamps._cache.clear()
+        parse_timestamps(["2024-06-01T10:00:00Z"] * 100)
+        assert list(timestamps._cache) == ["2024-06-01T10:00:00Z"]
+
+    def test_one_malformed_value_does_not_spoil_the_batch(self):
+        parsed = parse_timestamps(["2024-06-01T10:00:00Z", "2024-06-31T10:00:00Z"])
+        assert parsed[0] == np.datetime64("2024-06-01T10:00:00")
+        assert np.isnat(parsed[1])
+
+
+class TestArithmetic:
+    def test_days_since_floors_and_keeps_nat(self):
+        now = datetime(2024, 6, 11, 9, 0, tzinfo=timezone.utc).timestamp()
+        days = days_since(parse_timestamps(["2024-06-01T10:00:00Z", None]), now)
+        assert days[0] == 9
+        assert np.isnan(days[1])
+
+    def test_epoch_seconds(self):
+        seconds = epoch_seconds(parse_timestamps(["1970-01-02T00:00:00Z"]))
+        assert seconds.tolist() == [86400.0]
@@ -0,0 +1,137 @@
+"""
+Tests for the offline propensity training pipeline.
+Validates chunked aggregation, feature extraction and artifact output.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.propensity_model import PropensityModelStore, propensity_feature_matrix
+from app.training.propensity import (
+    SERVED_INTERACTIONS,
+    aggregate_prescriptions,
+    count_rows,
+    load_hcp_features,
+    train,
+)
+
+N_HCPS = 300
+INFLUENCE = ["key_opinion_leader", "high", "medium", "low"]
+
+
+@pytest.fixture
+def exports(tmp_path):
+    rng = np.random.default_rng(3)
+    influence = rng.integers(0, 4, N_HCPS)
+    hcps = pd.DataFrame({
+        "id": [f"hcp-{i}" for i in range(N_HCPS)],
+        "influence_level": [INFLUENCE[i] for i in influence],
+        "years_of_practice": np.where(rng.random(N_HCPS) < 0.1, np.nan, rng.integers(1, 35, N_HCPS)),
+        "therapeutic_areas": [json.dumps(["a"] * k) for k in rng.integers(0, 4, N_HCPS)],
+    })
+    # Some HCPs have more interactions than prepareHCPData sends
+    interactions = pd.DataFrame({
+        "hcp_id": np.repeat(hcps["id"], rng.integers(0, 70, N_HCPS)),
+        "channel": "email",
+    })
+    segments = pd.DataFrame({"hcp_id": np.repeat(hcps["id"], rng.integers(0, 3, N_HCPS))})
+    # KOLs and high-influence HCPs prescribe more
+    volume = (4 - influence) * 10
+    rows = rng.integers(0, N_HCPS, 5000)
+    prescriptions = pd.DataFrame({
+        "hcp_id": [f"hcp-{i}" for i in rows],
+        "product_id": "product-1",
+        "quantity": rng.poisson(volume[rows]),
+        "period_start": "2024-01-01",
+    })
+    hcps.to_csv(tmp_path / "hcps.csv", index=False)
+    interactions.to_parquet(tmp_path / "interactions.parquet", index=False)
+    segments.to_csv(tmp_path / "hcp_segments.csv", index=False)
+    prescriptions.to_csv(tmp_path / "prescriptions.csv", index=False)
+    prescriptions.to_parquet(tmp_path / "prescriptions.parquet", index=False)
+    return tmp_path, hcps, prescriptions
+
+
+def _counts(path):
+    return {
+        "interaction_counts": count_rows(path / "interactions.parquet", chunk_rows=101),
+        "segment_counts": count_rows(path / "hcp_segments.csv", chunk_rows=101),
+    }
+
+
+class TestStreaming:
+    def test_chunked_totals_match_full_groupby(self, exports):
+        path, _, prescriptions = exports
+        expected = prescriptions.groupby("hcp_id")["quantity"].sum()
+        for name in ("prescriptions.csv", "prescriptions.parquet"):
+            totals = aggregate_prescriptions(path / name, chunk_rows=97)["total_quantity"]
+            assert totals.sort_index().equals(expected.sort_index())
+
+    def test_features_match_serving_features(self, exports):
+        path, hcps, _ = exports
+        features, populated = load_hcp_features(path / "hcps.csv", chunk_rows=50, **_counts(path))
+        interactions = pd.read_parquet(path / "interactions.parquet")["hcp_id"].value_counts()
+        segments = pd.read_csv(path / "hcp_segments.csv")["hcp_id"].value_counts()
+        payloads = [
+            {
+                "hcpId": row.id,
+                "influenceLevel": row.influence_level,
+                "interactionCount": min(int(interactions.get(row.id, 0)), SERVED_INTERACTIONS),
+                "segments": ["s"] * int(segments.get(row.id, 0)),
+                "yearsOfPractice": None if np.isnan(row.years_of_practice) else row.years_of_practice,
+                "therapeuticAreas": json.loads(row.therapeutic_areas),
+            }
+            for row in hcps.itertuples()
+        ]
+        np.testing.assert_array_equal(features.to_numpy(), propensity_feature_matrix(payloads))
+        assert features["interaction_count"].max() == SERVED_INTERACTIONS
+        assert len(populated) == 5
+
+    def test_counts_without_a_source_are_rejected(self, exports):
+        path, _, _ = exports
+        with pytest.raises(ValueError, match="--segments"):
+            load_hcp_features(
+                path / "hcps.csv", interaction_counts=_counts(path)["interaction_counts"]
+            )
+
+    def test_count_columns_of_the_export_are_used(self, tmp_path):
+        pd.DataFrame({
+            "id": ["a", "b"], "interaction_count": [3, None], "segment_count": [1, 2],
+        }).to_csv(tmp_path / "hcps.csv", index=False)
+        features, populated = load_hcp_features(tmp_path / "hcps.csv")
+        assert features["interaction_count"].tolist() == [3, 0]
+        assert features["segment_count"].tolist() == [1, 2]
+        assert features["therapeutic_area_count"].tolist() == [0, 0]
+        assert populated == ["interaction_count", "segment_count"]
+
+
+class TestTraining:
+    @pytest.mark.parametrize("kind", ["gbm", "logistic"])
+    def test_writes_servable_artifact_and_report(self, exports, kind):
+        path, _, _ = exports
+        output = path / "models"
+        report = train(
+            path / "prescriptions.parquet",
+            path / "hcps.csv",
+            interactions_path=path / "interactions.parquet",
+            segments_path=path / "hcp_segments.csv",
+            output_dir=output,
+            version=f"propensity-{kind}-test",
+            kind=kind,
+            chunk_rows=500,
+        )
+        assert report["hcps"] == N_HCPS
+        assert 0.0 <= report["metrics"]["rocAuc"] <= 1.0
+        assert (output / f"propensity-{kind}-test" / "report.json").exists()
+        metadata = json.loads((output / f"propensity-{kind}-test" / "metadata.json").read_text())
+        assert "interaction_count" in metadata["populatedFeatures"]
+
+        artifact = PropensityModelStore(output).get(f"propensity-{kind}-test")
+        kol, low = artifact.score([
+            {"hcpId": "a", "influenceLevel": "key_opinion_leader", "interactionCount": 5},
+            {"hcpId": "b", "influenceLevel": "low", "interactionCount": 5},
+        ])
+        assert kol["score"] > low["score"]
@@ -25,6 +25,23 @@ router.post(
 
 // ─── NEXT BEST ACTION ─────────────────────────────────────────
 
+// Registered before /nba/:hcpId so "batch" is not read as an HCP ID
+router.post(
+  '/nba/batch',
+  authenticate,
+  validateBody(z.object({
+    hcpIds: z.array(z.string().uuid()).min(1).max(500),
+  })),
+  async (req: Request, res: Response, next: NextFunction) => {
+    try {
+      const results = await aiService.requestNextBestActions(req.body.hcpIds, req.user!.id);
+      res.json({ success: true, data: results });
+    } catch (error) {
+      next(error);
+    }
+  }
+);
+
 router.post(
   '/nba/:hcpId',
   authenticate,
@@ -55,7 +55,7 @@ export class AIIntelligenceService {
         confidence: result.confidence,
         factors: JSON.stringify(result.factors),
         model_version: result.modelVersion,
-        input_data_hash: this.hashInputData(inputData),
+        input_data_hash: result.inputDataHash, // canonical hash computed by the AI service
         computed_at: new Date(),
       });
 
@@ -112,18 +112,7 @@ export class AIIntelligenceService {
       const result: NextBestAction = await response.json();
 
       // Persist NBA recommendation
-      await this.db('next_best_actions').insert({
-        hcp_id: hcpId,
-        user_id: userId,
-        recommended_channel: result.recommendedChannel,
-        recommended_timing: result.recommendedTiming,
-        suggested_content: result.suggestedContent,
-        reasoning: result.reasoning,
-        confidence: result.confidence,
-        factors: JSON.stringify(result.factors),
-        model_version: result.modelVersion,
-        status: 'pending',
-      });
+      await this.db('next_best_actions').insert(this.toNBARow(result, userId));
 
       logger.info('NBA computed', {
         hcpId,
@@ -139,6 +128,47 @@ export class AIIntelligenceService {
     }
   }
 
+  /**
+   * Request Next Best Actions for many HCPs of one user (e.g. the morning
+   * list) in one AI service call. The user's context is prepared and sent once.
+   */
+  async requestNextBestActions(hcpIds: UUID[], userId: UUID): Promise<NextBestAction[]> {
+    const [context, hcps] = await Promise.all([
+      this.prepareRepContext(userId),
+      Promise.all(hcpIds.map((hcpId) => this.prepareHCPData(hcpId))),
+    ]);
+
+    try {
+      const response = await fetch(`${this.aiServiceUrl}/api/v1/nba/recommend/batch`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-API-Key': config.ai.apiKey,
+        },
+        body: JSON.stringify({ context, hcps }),
+      });
+
+      if (!response.ok) {
+        throw new Error(`AI service returned ${response.status}`);
+      }
+
+      const { results }: { results: NextBestAction[] } = await response.json();
+
+      if (results.length > 0) {
+        await this.db('next_best_actions').insert(
+          results.map((result) => this.toNBARow(result, userId))
+        );
+      }
+
+      logger.info('NBA batch computed', { userId, count: results.length });
+
+      return results;
+    } catch (error) {
+      logger.error('NBA batch computation failed', { userId, count: hcpIds.length, error });
+      throw error;
+    }
+  }
+
   /**
    * Request AI-generated account summary.
    * IMPORTANT: Summary must NOT contain medical claims or treatment recommendations.
@@ -278,6 +308,21 @@ export class AIIntelligenceService {
 
   // ─── DATA PREPARATION ───────────────────────────────────────
 
+  private toNBARow(result: NextBestAction, userId: UUID): Record<string, unknown> {
+    return {
+      hcp_id: result.hcpId,
+      user_id: userId,
+      recommended_channel: result.recommendedChannel,
+      recommended_timing: result.recommendedTiming,
+      suggested_content: result.suggestedContent,
+      reasoning: result.reasoning,
+      confidence: result.confidence,
+      factors: JSON.stringify(result.factors),
+      model_version: result.modelVersion,
+      status: 'pending',
+    };
+  }
+
   private async prepareHCPData(hcpId: UUID): Promise<Record<string, unknown>> {
     const [hcp, interactions, consents, scores, segments] = await Promise.all([
       this.db('hcps').where({ id: hcpId }).first(),
@@ -318,8 +363,15 @@ export class AIIntelligenceService {
   }
 
   private async prepareNBAData(hcpId: UUID, userId: UUID): Promise<Record<string, unknown>> {
-    const hcpData = await this.prepareHCPData(hcpId);
+    const [hcpData, context] = await Promise.all([
+      this.prepareHCPData(hcpId),
+      this.prepareRepContext(userId),
+    ]);
+    return { ...hcpData, ...context };
+  }
 
+  /** Per-user NBA context, shared by all of the user's HCPs. */
+  private async prepareRepContext(userId: UUID): Promise<Record<string, unknown>> {
     const [userTasks, userInteractions] = await Promise.all([
       this.db('tasks')
         .where({ assigned_to: userId })
@@ -332,19 +384,15 @@ export class AIIntelligenceService {
     ]);
 
     return {
-      ...hcpData,
       userId,
       pendingTasks: userTasks.length,
       recentUserInteractions: userInteractions.map((i: Record<string, unknown>) => ({
         hcpId: i.hcp_id,
         channel: i.channel,
         scheduledAt: i.scheduled_at,
+        durationMinutes: i.duration_minutes,
+        status: i.status,
       })),
     };
   }
-
-  private hashInputData(data: Record<string, unknown>): string {
-    const crypto = require('crypto');
-    return crypto.createHash('sha256').update(JSON.stringify(data)).digest('hex');
-  }
 }
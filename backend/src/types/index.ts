@@ -144,7 +144,9 @@ export interface AIScoreResult {
   confidence: number; // 0-1
   factors: AIScoreFactor[];
   modelVersion: string;
+  inputDataHash: string; // canonical hash of the scoring input
   computedAt: ISODateTime;
+  territoryPercentile?: number; // 0-100, rank within the HCP's territory
 }
 
 export interface AIScoreFactor {
@@ -163,6 +165,8 @@ export interface NextBestAction {
   confidence: number;
   factors: AIScoreFactor[];
   modelVersion: string;
+  inputDataHash: string;
+  explored?: boolean;
 }
 
 export interface AISummary {
@@ -0,0 +1,71 @@
+/**
+ * Unit tests for the data the backend prepares for the AI service.
+ * The database is replaced by an in-memory query builder per table.
+ */
+
+const rows: Record<string, Record<string, unknown>[]> = {};
+
+jest.mock('../../src/database/connection', () => ({
+  getDatabase: () => (table: string) => {
+    const query = {
+      where: () => query,
+      whereIn: () => query,
+      orderBy: () => query,
+      limit: () => query,
+      then: (resolve: (value: unknown) => unknown) => resolve(rows[table] ?? []),
+    };
+    return query;
+  },
+}));
+
+import { AIIntelligenceService } from '../../src/modules/ai-intelligence/ai-intelligence.service';
+
+describe('AI Intelligence data preparation', () => {
+  describe('Rep NBA context', () => {
+    it('should send booking durations and statuses for schedule-aware timing', async () => {
+      rows.tasks = [{ id: 't1' }];
+      rows.interactions = [
+        {
+          hcp_id: 'h1',
+          channel: 'in_person_visit',
+          scheduled_at: '2026-03-02T10:00:00Z',
+          duration_minutes: 60,
+          status: 'planned',
+        },
+        {
+          hcp_id: 'h2',
+          channel: 'phone',
+          scheduled_at: '2026-03-02T14:00:00Z',
+          duration_minutes: null,
+          status: 'cancelled',
+        },
+      ];
+
+      const service = new AIIntelligenceService();
+      const context = await (service as unknown as {
+        prepareRepContext(userId: string): Promise<Record<string, unknown>>;
+      }).prepareRepContext('u1');
+
+      expect(context).toEqual({
+        userId: 'u1',
+        pendingTasks: 1,
+        recentUserInteractions: [
+          {
+            hcpId: 'h1',
+            channel: 'in_person_visit',
+            scheduledAt: '2026-03-02T10:00:00Z',
+            durationMinutes: 60,
+            status: 'planned',
+          },
+          {
+            hcpId: 'h2',
+            channel: 'phone',
+            scheduledAt: '2026-03-02T14:00:00Z',
+            durationMinutes: null,
+            status: 'cancelled',
+          },
+        ],
+      });
+    });
+  });
+});